@@ -0,0 +1,80 @@
+-- Batched functions of the child script of a V-REP scene used by COMPAS FAB.
+--
+-- They are called through the remote API like the other functions of the
+-- script, with integers, floats, strings and a buffer, and answer with the
+-- same. Each of them repeats one of the functions of the script, so they
+-- are pasted at the end of the script which defines them.
+
+local function appendValues(target, values)
+    for i = 1, #values do
+        target[#target + 1] = values[i]
+    end
+    return target
+end
+
+local function sliceValues(values, first, last)
+    local slice = {}
+    for i = first, last do
+        slice[#slice + 1] = values[i]
+    end
+    return slice
+end
+
+-- Matrices of shapes for every configuration of a path.
+-- Integers: robot index, number of configurations, shape handles.
+-- Floats: joint values of all configurations.
+-- Strings: name of the robot, as passed to moveRobotFK.
+-- Returns the 12 values of the matrix of every shape for every configuration.
+getPathShapeMatrices = function(inInts, inFloats, inStrings, inBuffer)
+    local count = inInts[2]
+    local handles = sliceValues(inInts, 3, #inInts)
+    local joints = math.floor(#inFloats / count)
+    local matrices = {}
+
+    for i = 0, count - 1 do
+        moveRobotFK({}, sliceValues(inFloats, i * joints + 1, (i + 1) * joints), inStrings, inBuffer)
+        local _, shapeMatrices = getShapeMatrices(handles, {}, {}, inBuffer)
+        appendValues(matrices, shapeMatrices)
+    end
+
+    return {}, matrices, {}, ''
+end
+
+-- Meshes of many shapes.
+-- Integers: shape handles.
+-- Returns, as integers, the number of vertex coordinates and of face indices
+-- of every shape followed by the face indices of all shapes, and the vertex
+-- coordinates of all shapes as floats.
+getShapeMeshes = function(inInts, inFloats, inStrings, inBuffer)
+    local counts, faces, vertices = {}, {}, {}
+
+    for i = 1, #inInts do
+        local shapeFaces, shapeVertices = getShapeMesh({inInts[i]}, {}, {}, inBuffer)
+        appendValues(counts, {#shapeVertices, #shapeFaces})
+        appendValues(faces, shapeFaces)
+        appendValues(vertices, shapeVertices)
+    end
+
+    return appendValues(counts, faces), vertices, {}, ''
+end
+
+-- Robot states for many goal poses.
+-- Integers: robot index, number of trials, maximum number of results,
+-- number of poses, number of joints of the robot.
+-- Floats: the 16 values of the matrix of every pose.
+-- Strings: joint limits, as passed to searchRobotStates.
+-- Returns the number of states found for every pose as integers, and the
+-- joint values of all states as floats.
+searchRobotStatesMany = function(inInts, inFloats, inStrings, inBuffer)
+    local count, joints = inInts[4], inInts[5]
+    local counts, states = {}, {}
+
+    for i = 0, count - 1 do
+        local _, poseStates = searchRobotStates({inInts[1], inInts[2], inInts[3]},
+                                                sliceValues(inFloats, i * 16 + 1, (i + 1) * 16), inStrings, inBuffer)
+        counts[#counts + 1] = math.floor(#poseStates / joints)
+        appendValues(states, poseStates)
+    end
+
+    return counts, states, {}, ''
+end
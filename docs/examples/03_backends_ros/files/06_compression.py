@@ -0,0 +1,67 @@
+import time
+
+from compas.datastructures import Mesh
+from compas.geometry import Frame
+
+import compas_fab
+from compas_fab.backends import RosClient
+from compas_fab.robots import CollisionMesh
+from compas_fab.robots import Configuration
+from compas_fab.robots.ur5 import Robot
+
+# Bytes sent and received on the websocket connection
+wire = dict(sent=0, received=0)
+
+
+def count_bytes(proto):
+    send_message, on_message = proto.send_message, proto.onMessage
+
+    def counted_send_message(payload):
+        wire['sent'] += len(payload)
+        return send_message(payload)
+
+    def counted_on_message(payload, isBinary):
+        wire['received'] += len(payload)
+        return on_message(payload, isBinary)
+
+    proto.send_message, proto.onMessage = counted_send_message, counted_on_message
+
+
+def measure(name, compression, call):
+    wire.update(sent=0, received=0)
+    start = time.time()
+    call()
+    print('%-22s %-5s %8.1f ms %10d bytes sent %10d bytes received' % (
+        name, compression, (time.time() - start) * 1000, wire['sent'], wire['received']))
+
+
+with RosClient() as client:
+    client.factory.on_ready(count_bytes)
+    robot = Robot(client)
+
+    mesh = Mesh.from_stl(compas_fab.get('planning_scene/cone.stl'))
+    frames = [Frame([0.3, 0.1, 0.5], [1, 0, 0], [0, 1, 0]), Frame([0.5, 0.1, 0.6], [1, 0, 0], [0, 1, 0])]
+    start_configuration = Configuration.from_revolute_values([-0.042, 0.033, -2.174, 5.282, -1.528, 0.000])
+
+    def add_collision_mesh():
+        client.add_collision_mesh(CollisionMesh(mesh, 'cone'))
+        # Publishing does not wait for the planning scene to be updated, only until the message is sent
+        while not wire['sent']:
+            time.sleep(0.001)
+
+    for compression in ('none', 'png'):
+        # Compression of the published messages
+        client.publish_compression = compression
+        measure('add_collision_mesh', compression, add_collision_mesh)
+        time.sleep(1)
+
+    for compression in ('none', 'png', 'cbor'):
+        # Compression of the service responses
+        client.compression = compression
+        measure('get_planning_scene', compression, lambda: client.get_planning_scene(use_mirror=False))
+        measure('plan_cartesian_motion', compression,
+                lambda: robot.plan_cartesian_motion(frames, start_configuration, max_step=0.01))
+
+    client.publish_compression = 'none'
+    client.remove_collision_mesh('cone')
+    time.sleep(1)
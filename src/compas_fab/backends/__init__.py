@@ -26,6 +26,17 @@ ROS
     RosClient
     RosFileServerLoader
 
+Local
+-----
+
+Requires ``numpy`` and ``scipy``, not available on IronPython.
+
+.. autosummary::
+    :toctree: generated/
+    :nosignatures:
+
+    LocalClient
+
 Long-running tasks
 ------------------
 
@@ -50,6 +61,8 @@ Exceptions
 
 """
 
+import compas
+
 from .exceptions import *               # noqa: F401,F403
 from .tasks import *                    # noqa: F401,F403
 from .ros.client import *               # noqa: F401,F403
@@ -57,4 +70,7 @@ from .ros.exceptions import *           # noqa: F401,F403
 from .ros.fileserver_loader import *    # noqa: F401,F403
 from .vrep.client import *              # noqa: F401,F403
 
+if not compas.IPY:
+    from .local.client import *         # noqa: F401,F403
+
 __all__ = [name for name in dir() if not name.startswith('_')]
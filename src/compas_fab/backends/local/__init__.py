@@ -0,0 +1,23 @@
+"""
+*******************************************************************************
+compas_fab.backends.local
+*******************************************************************************
+
+.. module:: compas_fab.backends.local
+
+Package with an in-process planner backend, which plans in joint space
+without ROS. Requires ``numpy`` and ``scipy``, not available on IronPython.
+
+.. autosummary::
+    :toctree: generated/
+
+    LocalClient
+
+"""
+
+from __future__ import absolute_import
+
+from .client import *     # noqa: F401,F403
+from .planner import *    # noqa: F401,F403
+
+__all__ = [name for name in dir() if not name.startswith('_')]
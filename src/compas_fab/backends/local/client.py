@@ -0,0 +1,207 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+from compas.utilities import await_callback
+
+from compas_fab.backends.local.planner import LocalPlanner
+
+__all__ = [
+    'LocalClient',
+]
+
+
+class LocalClient(LocalPlanner):
+    """Interface to plan in-process, without ROS.
+
+    The client plans motions in joint space against the robot's collision
+    geometry and a local planning scene, with the same methods as the
+    :class:`compas_fab.backends.RosClient`. Since it does not need a
+    connection, a client can be created in every process of a pool to plan
+    many motions in parallel.
+
+    :class:`.LocalClient` is a context manager type, like the other clients.
+
+    Examples
+    --------
+    >>> from compas_fab.backends import LocalClient
+    >>> from compas_fab.robots.ur5 import Robot
+    >>> with LocalClient() as client:
+    ...     robot = Robot(client, load_geometry=True)
+    ...     configuration = robot.zero_configuration()
+    ...     configuration.values[0] = 1.
+    ...     goal_constraints = robot.constraints_from_configuration(configuration, [0.01], [0.01])
+    ...     trajectory = robot.plan_motion(goal_constraints, robot.zero_configuration())
+    >>> trajectory.fraction
+    1.0
+    """
+
+    def __enter__(self):
+        self.init_planner()
+        return self
+
+    def __exit__(self, *args):
+        self.dispose_planner()
+
+    def inverse_kinematics(self, robot, frame, group,
+                           start_configuration, avoid_collisions=True,
+                           constraints=None, attempts=8,
+                           attached_collision_meshes=None):
+        kwargs = {}
+        kwargs['robot'] = robot
+        kwargs['frame'] = frame
+        kwargs['group'] = group
+        kwargs['start_configuration'] = start_configuration
+        kwargs['avoid_collisions'] = avoid_collisions
+        kwargs['constraints'] = constraints
+        kwargs['attempts'] = attempts
+        kwargs['attached_collision_meshes'] = attached_collision_meshes
+
+        kwargs['errback_name'] = 'errback'
+
+        return await_callback(self.inverse_kinematics_async, **kwargs)
+
+    def forward_kinematics(self, robot, configuration, group, ee_link):
+        kwargs = {}
+        kwargs['robot'] = robot
+        kwargs['configuration'] = configuration
+        kwargs['group'] = group
+        kwargs['ee_link'] = ee_link
+
+        kwargs['errback_name'] = 'errback'
+
+        return await_callback(self.forward_kinematics_async, **kwargs)
+
+    def plan_cartesian_motion(self,
+                              robot, frames, start_configuration,
+                              group, max_step, jump_threshold,
+                              avoid_collisions, path_constraints,
+                              attached_collision_meshes, compression=None):
+        kwargs = {}
+        kwargs['robot'] = robot
+        kwargs['frames'] = frames
+        kwargs['start_configuration'] = start_configuration
+        kwargs['group'] = group
+        kwargs['max_step'] = max_step
+        kwargs['jump_threshold'] = jump_threshold
+        kwargs['avoid_collisions'] = avoid_collisions
+        kwargs['path_constraints'] = path_constraints
+        kwargs['attached_collision_meshes'] = attached_collision_meshes
+        kwargs['compression'] = compression
+
+        kwargs['errback_name'] = 'errback'
+
+        return await_callback(self.plan_cartesian_motion_async, **kwargs)
+
+    def plan_motion(self, robot, goal_constraints, start_configuration, group,
+                    path_constraints=None, trajectory_constraints=None,
+                    planner_id='', num_planning_attempts=8,
+                    allowed_planning_time=2.,
+                    max_velocity_scaling_factor=1.,
+                    max_acceleration_scaling_factor=1.,
+                    attached_collision_meshes=None,
+                    workspace_parameters=None,
+                    compression=None):
+        kwargs = {}
+        kwargs['robot'] = robot
+        kwargs['goal_constraints'] = goal_constraints
+        kwargs['start_configuration'] = start_configuration
+        kwargs['group'] = group
+        kwargs['path_constraints'] = path_constraints
+        kwargs['trajectory_constraints'] = trajectory_constraints
+        kwargs['planner_id'] = planner_id
+        kwargs['num_planning_attempts'] = num_planning_attempts
+        kwargs['allowed_planning_time'] = allowed_planning_time
+        kwargs['max_velocity_scaling_factor'] = max_velocity_scaling_factor
+        kwargs['max_acceleration_scaling_factor'] = max_acceleration_scaling_factor
+        kwargs['attached_collision_meshes'] = attached_collision_meshes
+        kwargs['workspace_parameters'] = workspace_parameters
+        kwargs['compression'] = compression
+
+        kwargs['errback_name'] = 'errback'
+
+        return await_callback(self.plan_motion_async, **kwargs)
+
+    def smooth_trajectory(self, robot, trajectory, max_velocity_scaling_factor=1.,
+                          attached_collision_meshes=None, timeout=0.05, seed=None):
+        """Shorten a trajectory with shortcuts free of collisions, and time it again.
+
+        Randomly sampled shortcuts replace parts of the path with straight
+        motions, of all joints or only some of them. The shortcuts are
+        checked against the local planning scene in batches, until the
+        ``timeout`` is reached.
+
+        Parameters
+        ----------
+        robot : :class:`compas_fab.robots.Robot`
+            The robot of the trajectory.
+        trajectory : :class:`compas_fab.robots.JointTrajectory`
+            The trajectory, e.g. planned by any backend, in meters and radians.
+        max_velocity_scaling_factor : float, optional
+            Factor scaling the maximum joint velocities when timing the
+            smoothed path. Defaults to ``1``.
+        attached_collision_meshes : list of :class:`compas_fab.robots.AttachedCollisionMesh`, optional
+            Collision meshes attached to the robot in addition to those of the scene.
+        timeout : float, optional
+            Time in seconds spent shortening the path. Defaults to ``0.05``.
+        seed : int, optional
+            Seed of the random shortcuts.
+
+        Returns
+        -------
+        :class:`compas_fab.robots.JointTrajectory`
+            The smoothed trajectory, with a ``smoothing_report`` attribute
+            holding the ``path_length`` and ``duration`` before and after
+            smoothing, their relative reductions and the ``smoothing_time``.
+            Both paths are timed with the joint velocity limits, such that
+            the reductions only result from the shortcuts.
+        """
+        kwargs = {}
+        kwargs['robot'] = robot
+        kwargs['trajectory'] = trajectory
+        kwargs['max_velocity_scaling_factor'] = max_velocity_scaling_factor
+        kwargs['attached_collision_meshes'] = attached_collision_meshes
+        kwargs['timeout'] = timeout
+        kwargs['seed'] = seed
+
+        kwargs['errback_name'] = 'errback'
+
+        return await_callback(self.smooth_trajectory_async, **kwargs)
+
+    def apply_planning_scene_diff(self, collision_meshes=None, moved_collision_meshes=None,
+                                  appended_collision_meshes=None,
+                                  removed_collision_mesh_ids=None,
+                                  attached_collision_meshes=None,
+                                  removed_attached_collision_mesh_ids=None):
+        """Apply several changes to the local planning scene at once.
+
+        Parameters
+        ----------
+        collision_meshes : list of :class:`compas_fab.robots.CollisionMesh`, optional
+            Collision meshes to add or replace. Meshes sharing an id are combined in one object.
+        moved_collision_meshes : list of :class:`compas_fab.robots.CollisionMesh`, optional
+            Collision meshes with a new frame.
+        appended_collision_meshes : list of :class:`compas_fab.robots.CollisionMesh`, optional
+            Collision meshes to append to existing objects.
+        removed_collision_mesh_ids : list of str, optional
+            Identifiers of the collision meshes to remove.
+        attached_collision_meshes : list of :class:`compas_fab.robots.AttachedCollisionMesh`, optional
+            Attached collision meshes to add or replace.
+        removed_attached_collision_mesh_ids : list of str, optional
+            Identifiers of the attached collision meshes to remove.
+
+        Returns
+        -------
+        bool
+            ``True`` if the changes were applied.
+        """
+        kwargs = {}
+        kwargs['collision_meshes'] = collision_meshes
+        kwargs['moved_collision_meshes'] = moved_collision_meshes
+        kwargs['appended_collision_meshes'] = appended_collision_meshes
+        kwargs['removed_collision_mesh_ids'] = removed_collision_mesh_ids
+        kwargs['attached_collision_meshes'] = attached_collision_meshes
+        kwargs['removed_attached_collision_mesh_ids'] = removed_attached_collision_mesh_ids
+        kwargs['errback_name'] = 'errback'
+
+        return await_callback(self.apply_planning_scene_diff_async, **kwargs)
@@ -0,0 +1,410 @@
+"""
+Internal implementation of the planner backend interface with in-process planners
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import functools
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from compas.geometry import Frame
+from compas.geometry import Transformation
+
+from compas_fab.backends.exceptions import BackendError
+from compas_fab.backends.local.planners_numpy import ConfigurationSpace
+from compas_fab.backends.local.planners_numpy import LazyPRM
+from compas_fab.backends.local.planners_numpy import RRTConnect
+from compas_fab.backends.local.planners_numpy import joint_bounds
+from compas_fab.backends.local.planners_numpy import shortcut_path
+from compas_fab.backends.ros.planner_backend import PlannerBackend
+from compas_fab.robots import Configuration
+from compas_fab.robots.collision_numpy import CollisionCheckerNumpy
+from compas_fab.robots.dispatch import map_concurrently
+from compas_fab.robots.kinematics_numpy import ForwardKinematicsNumpy
+from compas_fab.robots.plan_cache import canonical_hash
+from compas_fab.robots.plan_cache import mesh_hash
+from compas_fab.robots.segments_numpy import SegmentCheckerNumpy
+from compas_fab.robots.trajectory_numpy import timed_trajectory_numpy
+
+LOGGER = logging.getLogger('compas_fab.backends.local.planner')
+
+__all__ = [
+    'LocalPlanner',
+]
+
+PLANNERS = ('RRTConnect', 'LazyPRM')
+PLANNER_PREFIXES = {
+    'RRTConnect': re.compile('RRT'),
+    'LazyPRM': re.compile('(Lazy)?PRM'),
+}
+
+# Number of collision checkers and roadmaps kept, the least recently used are discarded
+MAX_CACHED = 8
+
+# Number of hashes of meshes not in the planning scene kept, e.g. of attached tools
+MAX_CACHED_MESHES = 64
+
+
+def _cached(cache, lock, key, build):
+    with lock:
+        value = cache.pop(key, None)
+        if value is None:
+            value = build()
+        cache[key] = value
+        while len(cache) > MAX_CACHED:
+            cache.popitem(last=False)
+        return value
+
+
+class LocalPlanner(PlannerBackend):
+    """Planner backend which plans in-process, without ROS.
+
+    Motions are planned in joint space with RRT-Connect or a lazy
+    probabilistic roadmap, against the robot's collision geometry and the
+    collision meshes added to the local planning scene. Only joint goal
+    constraints are supported. Trajectories of any planner can be shortened
+    with :meth:`smooth_trajectory_async`.
+    """
+
+    @property
+    def _local(self):
+        # Planners are mixed into other classes, their state is created on first use
+        if not hasattr(self, '_local_state'):
+            self._local_state = dict(lock=threading.RLock(),
+                                     collision_meshes=OrderedDict(),
+                                     attached_collision_meshes=OrderedDict(),
+                                     kinematics=OrderedDict(),
+                                     checkers=OrderedDict(),
+                                     segment_checkers=OrderedDict(),
+                                     roadmaps=OrderedDict(),
+                                     object_hashes={},
+                                     mesh_hashes=OrderedDict(),
+                                     hash=None)
+        return self._local_state
+
+    @property
+    def planning_scene_hash(self):
+        """str: Hash of the collision meshes of the local planning scene.
+
+        Every collision mesh is hashed once, when it is added or attached, so
+        meshes are expected not to be modified in place afterwards.
+        """
+        state = self._local
+        with state['lock']:
+            if state['hash'] is None:
+                state['hash'] = canonical_hash(sorted([list(key), value[1]] for key, value in state['object_hashes'].items()))
+            return state['hash']
+
+    def _mesh_hash(self, mesh):
+        state = self._local
+        with state['lock']:
+            entry = state['mesh_hashes'].pop(id(mesh), None)
+            # The entry holds a reference to the mesh, but it may have been discarded since
+            if entry is None or entry[0] is not mesh:
+                entry = (mesh, mesh_hash(mesh))
+            state['mesh_hashes'][id(mesh)] = entry
+            while len(state['mesh_hashes']) > MAX_CACHED_MESHES:
+                state['mesh_hashes'].popitem(last=False)
+        return entry[1]
+
+    def _object_hash(self, collision_object):
+        """Hash a collision mesh or an attached collision mesh."""
+        collision_mesh = getattr(collision_object, 'collision_mesh', collision_object)
+        parts = [self._mesh_hash(collision_mesh.mesh), collision_mesh.id, collision_mesh.frame, collision_mesh.root_name]
+        if collision_object is not collision_mesh:
+            parts.extend([collision_object.link_name, collision_object.touch_links, collision_object.weight])
+        return canonical_hash(parts)
+
+    def init_planner(self):
+        pass
+
+    def dispose_planner(self):
+        pass
+
+    # ==========================================================================
+    # planning services
+    # ==========================================================================
+
+    def _kinematics(self, robot):
+        return _cached(self._local['kinematics'], self._local['lock'], id(robot), lambda: ForwardKinematicsNumpy(robot))
+
+    def collision_checker(self, robot, attached_collision_meshes=None):
+        """Get the collision checker of a robot in the local planning scene.
+
+        Parameters
+        ----------
+        robot : :class:`compas_fab.robots.Robot`
+            The robot, with its geometry loaded.
+        attached_collision_meshes : list of :class:`compas_fab.robots.AttachedCollisionMesh`, optional
+            Collision meshes attached to the robot in addition to those of the scene.
+
+        Returns
+        -------
+        :class:`compas_fab.robots.CollisionCheckerNumpy`
+        """
+        return self._scene_checker('checkers', CollisionCheckerNumpy, robot, attached_collision_meshes)
+
+    def segment_checker(self, robot, attached_collision_meshes=None):
+        """Get the checker of straight joint space motions of a robot in the local planning scene.
+
+        Parameters
+        ----------
+        robot : :class:`compas_fab.robots.Robot`
+            The robot, with its geometry loaded.
+        attached_collision_meshes : list of :class:`compas_fab.robots.AttachedCollisionMesh`, optional
+            Collision meshes attached to the robot in addition to those of the scene.
+
+        Returns
+        -------
+        :class:`compas_fab.robots.SegmentCheckerNumpy`
+        """
+        return self._scene_checker('segment_checkers', SegmentCheckerNumpy, robot, attached_collision_meshes)
+
+    def _scene_checker(self, cache, checker_class, robot, attached_collision_meshes):
+        state = self._local
+        with state['lock']:
+            collision_meshes = [cm for cms in state['collision_meshes'].values() for cm in cms]
+            attached = OrderedDict(state['attached_collision_meshes'])
+            attached_hashes = dict((key[1], value[1]) for key, value in state['object_hashes'].items() if key[0] == 'attached')
+        for acm in attached_collision_meshes or []:
+            attached[acm.collision_mesh.id] = acm
+            attached_hashes[acm.collision_mesh.id] = self._object_hash(acm)
+
+        # Checkers only read the pairs allowed to collide when they are built
+        semantics_version = robot.semantics.version if robot.semantics else None
+        key = (id(robot), semantics_version, self.planning_scene_hash, canonical_hash(sorted(attached_hashes.items())))
+        return _cached(state[cache], state['lock'], key,
+                       lambda: checker_class(robot, collision_meshes, list(attached.values())))
+
+    def inverse_kinematics_async(self, callback, errback, *args, **kwargs):
+        errback(BackendError('The local planner does not support inverse kinematics'))
+
+    def forward_kinematics_async(self, callback, errback, robot, configuration, group, ee_link):
+        """Compute the frame of a link with the local forward kinematics."""
+        try:
+            kinematics = self._kinematics(robot)
+            values = dict(zip(configuration.joint_names, configuration.values))
+            frames = kinematics.link_frames([[values.get(name, 0.) for name in kinematics.joint_names]])
+            matrix = frames[0, kinematics.link_names.index(ee_link)]
+            frame = Frame.from_transformation(Transformation.from_matrix(matrix.tolist()))
+        except Exception as e:
+            errback(e)
+            return
+
+        callback(frame)
+
+    def plan_cartesian_motion_async(self, callback, errback, *args, **kwargs):
+        errback(BackendError('The local planner does not support cartesian motions'))
+
+    def plan_motion_async(self, callback, errback,
+                          robot, goal_constraints, start_configuration, group,
+                          path_constraints=None, trajectory_constraints=None,
+                          planner_id='', num_planning_attempts=8,
+                          allowed_planning_time=2.,
+                          max_velocity_scaling_factor=1.,
+                          max_acceleration_scaling_factor=1.,
+                          attached_collision_meshes=None,
+                          workspace_parameters=None,
+                          compression=None):
+        """Plan a motion in joint space with RRT-Connect or a lazy probabilistic roadmap."""
+        try:
+            trajectory = self._plan_motion(robot, goal_constraints, start_configuration, group,
+                                           path_constraints, trajectory_constraints, planner_id,
+                                           num_planning_attempts, allowed_planning_time,
+                                           max_velocity_scaling_factor, max_acceleration_scaling_factor,
+                                           attached_collision_meshes)
+        except Exception as e:
+            errback(e)
+            return
+
+        callback(trajectory)
+
+    def _plan_motion(self, robot, goal_constraints, start_configuration, group,
+                     path_constraints, trajectory_constraints, planner_id,
+                     num_planning_attempts, allowed_planning_time,
+                     max_velocity_scaling_factor, max_acceleration_scaling_factor, attached_collision_meshes):
+        started = time.time()
+
+        if path_constraints or trajectory_constraints:
+            raise BackendError('The local planner does not support path or trajectory constraints')
+
+        # Planner ids of MoveIt!'s OMPL configuration, e.g. RRTConnectkConfigDefault, are accepted as well
+        planner_name = next((name for name in PLANNERS if PLANNER_PREFIXES[name].match(planner_id or 'RRT')), None)
+        if not planner_name:
+            raise BackendError('Unsupported planner: %s. Must be one of: %s' % (planner_id, ', '.join(PLANNERS)))
+
+        checker = self.collision_checker(robot, attached_collision_meshes)
+        joint_names = robot.get_configurable_joint_names(group)
+        lower, upper = joint_bounds(robot, joint_names)
+
+        start_values = dict(zip(start_configuration.joint_names, start_configuration.values))
+        full_start = [start_values.get(name, 0.) for name in checker.kinematics.joint_names]
+        start = np.array([start_values.get(name, 0.) for name in joint_names])
+        goals = np.array([self._goal_values(constraints, joint_names, start_values) for constraints in _goal_sets(goal_constraints)])
+
+        space = ConfigurationSpace(checker, joint_names, full_start, lower, upper)
+        if not space.is_valid(start)[0]:
+            raise BackendError('The start configuration is in collision or out of the joint limits: %s' % checker.collision_pairs(full_start))
+        goals = goals[space.is_valid(goals)]
+        if not len(goals):
+            raise BackendError('All goal configurations are in collision or out of the joint limits')
+
+        if planner_name == 'LazyPRM':
+            # The roadmap is shared by the queries in the same joint space and scene, one at a time
+            key = (id(checker), tuple(joint_names), tuple(np.round(full_start, 6)))
+            roadmap = _cached(self._local['roadmaps'], self._local['lock'], key, lambda: (threading.Lock(), LazyPRM(space, seed=0)))
+            with roadmap[0]:
+                paths = [roadmap[1].solve(start, goals, allowed_planning_time)]
+        else:
+            tasks = [functools.partial(RRTConnect(space, seed=seed).solve, start, goals, allowed_planning_time)
+                     for seed in range(max(1, num_planning_attempts))]
+            paths = [path for path, _ in map_concurrently(tasks)]
+
+        paths = [path for path in paths if path is not None]
+        if not paths:
+            raise BackendError('No motion found within %s seconds' % allowed_planning_time)
+        path = min(paths, key=lambda p: np.sum(np.linalg.norm(np.diff(p, axis=0), axis=1)))
+
+        full_names = checker.kinematics.joint_names
+        trajectory = timed_trajectory_numpy(robot, joint_names, path,
+                                            Configuration(full_start, robot.get_joint_types_by_names(full_names), full_names),
+                                            max_velocity_scaling_factor, max_acceleration_scaling_factor)
+        trajectory.planning_time = time.time() - started
+
+        return trajectory
+
+    def smooth_trajectory_async(self, callback, errback,
+                                robot, trajectory, max_velocity_scaling_factor=1.,
+                                attached_collision_meshes=None, timeout=0.05, seed=None):
+        """Shorten a trajectory with shortcuts free of collisions in the local planning scene, and time it again."""
+        try:
+            trajectory = self._smooth_trajectory(robot, trajectory, max_velocity_scaling_factor,
+                                                 attached_collision_meshes, timeout, seed)
+        except Exception as e:
+            errback(e)
+            return
+
+        callback(trajectory)
+
+    def _smooth_trajectory(self, robot, trajectory, max_velocity_scaling_factor, attached_collision_meshes, timeout, seed):
+        started = time.time()
+
+        checker = self.collision_checker(robot, attached_collision_meshes)
+        joint_names = list(trajectory.joint_names)
+        lower, upper = joint_bounds(robot, joint_names)
+        start_values = dict(zip(trajectory.start_configuration.joint_names, trajectory.start_configuration.values))
+        full_start = [start_values.get(name, 0.) for name in checker.kinematics.joint_names]
+        space = ConfigurationSpace(checker, joint_names, full_start, lower, upper)
+
+        path = np.array([point.values for point in trajectory.points], dtype=float)
+        if len(path) < 2:
+            raise BackendError('The trajectory needs at least two points to be smoothed')
+        shortened = shortcut_path(space, path, timeout, seed=seed)
+
+        # Both paths are timed alike, such that the reduction only results from the shortcuts
+        lengths = [np.sum(np.linalg.norm(np.diff(p, axis=0), axis=1)) for p in (path, shortened)]
+        original = timed_trajectory_numpy(robot, joint_names, path, trajectory.start_configuration,
+                                          max_velocity_scaling_factor)
+        smoothed = timed_trajectory_numpy(robot, joint_names, shortened, trajectory.start_configuration.copy(),
+                                          max_velocity_scaling_factor, fraction=trajectory.fraction)
+        durations = [t.points[-1].time_from_start.seconds for t in (original, smoothed)]
+        smoothed.smoothing_report = dict(path_length=lengths[0],
+                                         smoothed_path_length=lengths[1],
+                                         path_length_reduction=1. - lengths[1] / lengths[0] if lengths[0] else 0.,
+                                         duration=durations[0],
+                                         smoothed_duration=durations[1],
+                                         duration_reduction=1. - durations[1] / durations[0] if durations[0] else 0.,
+                                         smoothing_time=time.time() - started)
+        LOGGER.debug('Smoothed trajectory: %s', smoothed.smoothing_report)
+
+        return smoothed
+
+    @staticmethod
+    def _goal_values(constraints, joint_names, start_values):
+        values = dict(start_values)
+        for constraint in constraints:
+            if constraint.type != constraint.JOINT:
+                raise BackendError('The local planner only supports joint goal constraints')
+            values[constraint.joint_name] = constraint.value
+        return [values.get(name, 0.) for name in joint_names]
+
+    # ==========================================================================
+    # collision objects and planning scene
+    # ==========================================================================
+
+    def _update_scene(self, update):
+        state = self._local
+        with state['lock']:
+            update(state['collision_meshes'], state['attached_collision_meshes'])
+
+            # Only the objects which were replaced are hashed again
+            object_hashes = {}
+            for kind, objects in (('world', state['collision_meshes']), ('attached', state['attached_collision_meshes'])):
+                for object_id, value in objects.items():
+                    items = value if kind == 'world' else [value]
+                    previous = state['object_hashes'].get((kind, object_id))
+                    if previous and len(previous[0]) == len(items) and all(a is b for a, b in zip(previous[0], items)):
+                        object_hashes[(kind, object_id)] = previous
+                    else:
+                        object_hashes[(kind, object_id)] = (list(items), canonical_hash([self._object_hash(item) for item in items]))
+            state['object_hashes'] = object_hashes
+            state['hash'] = None
+
+    def get_planning_scene_async(self, callback, errback, *args, **kwargs):
+        errback(BackendError('The local planner does not support planning scene messages'))
+
+    def apply_planning_scene_diff_async(self, callback, errback,
+                                        collision_meshes=None, moved_collision_meshes=None,
+                                        appended_collision_meshes=None,
+                                        removed_collision_mesh_ids=None,
+                                        attached_collision_meshes=None,
+                                        removed_attached_collision_mesh_ids=None):
+        """Apply changes to the local planning scene."""
+        def update(world, attached):
+            for id in removed_collision_mesh_ids or []:
+                world.pop(id, None)
+            replaced = OrderedDict()
+            for cm in list(collision_meshes or []) + list(moved_collision_meshes or []):
+                replaced.setdefault(cm.id, []).append(cm)
+            world.update(replaced)
+            for cm in appended_collision_meshes or []:
+                world.setdefault(cm.id, []).append(cm)
+            for id in removed_attached_collision_mesh_ids or []:
+                attached.pop(id, None)
+            for acm in attached_collision_meshes or []:
+                attached[acm.collision_mesh.id] = acm
+
+        self._update_scene(update)
+        callback(True)
+
+    def add_collision_mesh(self, collision_mesh):
+        """Add a collision mesh to the local planning scene."""
+        self._update_scene(lambda world, attached: world.__setitem__(collision_mesh.id, [collision_mesh]))
+
+    def remove_collision_mesh(self, id):
+        """Remove a collision mesh from the local planning scene."""
+        self._update_scene(lambda world, attached: world.pop(id, None))
+
+    def append_collision_mesh(self, collision_mesh):
+        """Append a collision mesh to the local planning scene."""
+        self._update_scene(lambda world, attached: world.setdefault(collision_mesh.id, []).append(collision_mesh))
+
+    def add_attached_collision_mesh(self, attached_collision_mesh):
+        """Add a collision mesh attached to the robot."""
+        self._update_scene(lambda world, attached: attached.__setitem__(attached_collision_mesh.collision_mesh.id, attached_collision_mesh))
+
+    def remove_attached_collision_mesh(self, id):
+        """Remove an attached collision mesh from the robot."""
+        self._update_scene(lambda world, attached: attached.pop(id, None))
+
+
+def _goal_sets(goal_constraints):
+    if goal_constraints and isinstance(goal_constraints[0], (list, tuple)):
+        return goal_constraints
+    return [goal_constraints]
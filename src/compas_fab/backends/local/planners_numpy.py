@@ -0,0 +1,461 @@
+"""
+Internal implementation of sampling-based motion planners in joint space
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import heapq
+import logging
+import math
+import time
+
+import numpy as np
+from compas.robots import Joint
+from scipy.spatial import cKDTree
+
+LOGGER = logging.getLogger('compas_fab.backends.local.planners_numpy')
+
+__all__ = [
+    'ConfigurationSpace',
+    'LazyPRM',
+    'RRTConnect',
+    'shortcut_path',
+]
+
+# Interval of the configurations checked first along a motion
+COARSE_STEPS = 4
+
+# Number of configurations checked in the first batch of shortcuts
+INITIAL_CHECKS = 64
+
+
+class ConfigurationSpace(object):
+    """Joint space of a planning group, with the collision checker of its robot.
+
+    Parameters
+    ----------
+    checker : :class:`compas_fab.robots.CollisionCheckerNumpy`
+        The collision checker of the robot and the scene.
+    joint_names : list of str
+        Names of the joints of the planning group.
+    start_values : list of float
+        Values of all configurable joints of the robot, those which are not
+        part of the group keep these values.
+    lower, upper : list of float
+        Joint limits of the group's joints.
+    resolution : float, optional
+        Maximum distance in joint space between the configurations checked
+        along a motion. Defaults to ``0.05``.
+    """
+
+    def __init__(self, checker, joint_names, start_values, lower, upper, resolution=0.05):
+        self.checker = checker
+        self.joint_names = list(joint_names)
+        self.indices = [checker.kinematics.joint_names.index(name) for name in joint_names]
+        self.start_values = np.asarray(start_values, dtype=float)
+        self.lower = np.asarray(lower, dtype=float)
+        self.upper = np.asarray(upper, dtype=float)
+        self.resolution = resolution
+        self.checks = 0
+
+    @property
+    def dimension(self):
+        return len(self.indices)
+
+    def sample(self, count, rng):
+        return rng.uniform(self.lower, self.upper, (count, self.dimension))
+
+    def full_configurations(self, values):
+        full = np.repeat(self.start_values[None], len(values), axis=0)
+        full[:, self.indices] = values
+        return full
+
+    def is_valid(self, values):
+        """Check group configurations, ``True`` for those within the limits and free of collisions."""
+        values = np.atleast_2d(values)
+        valid = np.all((values >= self.lower) & (values <= self.upper), axis=1)
+        if valid.any():
+            self.checks += int(valid.sum())
+            valid[valid] = ~self.checker.in_collision(self.full_configurations(values[valid]))
+        return valid
+
+    def motions_valid(self, starts, ends):
+        """Check the straight motions between pairs of configurations, all at once."""
+        starts, ends = np.atleast_2d(starts), np.atleast_2d(ends)
+        steps = np.maximum(np.ceil(np.linalg.norm(ends - starts, axis=1) / self.resolution).astype(int), 1)
+        owners = np.repeat(np.arange(len(starts)), steps + 1)
+        t = (np.arange(len(owners)) - np.repeat(np.cumsum(steps + 1) - steps - 1, steps + 1)) / np.repeat(steps, steps + 1)
+        points = starts[owners] + t[:, None] * (ends[owners] - starts[owners])
+
+        # Check every few configurations first, most invalid motions are found without checking the others
+        coarse = (np.arange(len(owners)) - np.repeat(np.cumsum(steps + 1) - steps - 1, steps + 1)) % COARSE_STEPS == 0
+        valid = np.bincount(owners[coarse], weights=~self.is_valid(points[coarse]), minlength=len(starts)) == 0
+        fine = ~coarse & valid[owners]
+        if fine.any():
+            valid &= np.bincount(owners[fine], weights=~self.is_valid(points[fine]), minlength=len(starts)) == 0
+        return valid
+
+
+class RRTConnect(object):
+    """Bidirectional rapidly-exploring random trees.
+
+    One tree grows from the start and one from the goals, each tree
+    alternately extends towards a random sample and the other tree tries to
+    connect to the new node.
+
+    Parameters
+    ----------
+    space : :class:`ConfigurationSpace`
+        The joint space to plan in.
+    max_step : float, optional
+        Maximum length of the edges of the trees. Defaults to ``0.5``.
+    seed : int, optional
+        Seed of the random samples.
+    """
+
+    def __init__(self, space, max_step=0.5, seed=None):
+        self.space = space
+        self.max_step = max_step
+        self.rng = np.random.RandomState(seed)
+
+    def solve(self, start, goals, timeout):
+        """Find a path from the start to any of the goals.
+
+        Returns
+        -------
+        :class:`numpy.ndarray` or ``None``
+            The configurations of the path, or ``None`` if no path was found in time.
+        """
+        space = self.space
+        start = np.asarray(start, dtype=float)
+        goals = np.atleast_2d(goals)
+        for end in goals:
+            if space.motions_valid(start, end)[0]:
+                return np.array([start, end])
+
+        deadline = time.time() + timeout
+        start_tree = _Tree(start[None])
+        trees = [start_tree, _Tree(goals)]
+
+        while time.time() < deadline:
+            sample = space.sample(1, self.rng)[0]
+            grown, other = trees
+            node = self._extend(grown, sample)
+            if node is not None:
+                connection = self._connect(other, grown.nodes[node])
+                if connection is not None:
+                    path = np.concatenate([grown.path(node)[::-1], other.path(connection)])
+                    return path if grown is start_tree else path[::-1]
+            trees.reverse()
+
+        return None
+
+    def _extend(self, tree, target):
+        nearest = tree.nearest(target)
+        origin = tree.nodes[nearest]
+        distance = np.linalg.norm(target - origin)
+        if distance > self.max_step:
+            target = origin + (target - origin) * self.max_step / distance
+        if not self.space.motions_valid(origin, target)[0]:
+            return None
+        return tree.add(target, nearest)
+
+    def _connect(self, tree, target):
+        while True:
+            node = self._extend(tree, target)
+            if node is None:
+                return None
+            if np.allclose(tree.nodes[node], target):
+                return node
+
+
+class _Tree(object):
+    """Nodes with parents, in a growing array."""
+
+    def __init__(self, roots):
+        self.nodes = np.array(roots, dtype=float)
+        self.parents = [-1] * len(roots)
+        self.count = len(roots)
+
+    def nearest(self, target):
+        return int(np.argmin(np.sum((self.nodes[:self.count] - target) ** 2, axis=1)))
+
+    def add(self, node, parent):
+        if self.count == len(self.nodes):
+            self.nodes = np.concatenate([self.nodes, np.zeros_like(self.nodes)])
+        self.nodes[self.count] = node
+        self.parents.append(parent)
+        self.count += 1
+        return self.count - 1
+
+    def path(self, node):
+        """Nodes from the given one to its root."""
+        path = []
+        while node >= 0:
+            path.append(self.nodes[node])
+            node = self.parents[node]
+        return np.array(path)
+
+
+class LazyPRM(object):
+    """Probabilistic roadmap whose nodes and edges are only checked for collisions on use.
+
+    The roadmap connects random configurations to their nearest neighbors
+    without checking them. Shortest paths through the roadmap are checked,
+    and invalid nodes and edges are removed until a valid path is found. The
+    roadmap, with the results of the checks, is kept for later queries in
+    the same joint space and scene.
+
+    Parameters
+    ----------
+    space : :class:`ConfigurationSpace`
+        The joint space to plan in.
+    neighbors : int, optional
+        Number of nearest neighbors connected to each node. Defaults to ``10``.
+    batch_size : int, optional
+        Number of nodes added to the roadmap at once. Defaults to ``500``.
+    seed : int, optional
+        Seed of the random samples.
+    """
+
+    def __init__(self, space, neighbors=10, batch_size=500, seed=None):
+        self.space = space
+        self.neighbors = neighbors
+        self.batch_size = batch_size
+        self.rng = np.random.RandomState(seed)
+        self.nodes = np.zeros((0, space.dimension))
+        self.node_valid = np.zeros(0, dtype=np.int8)  # 0 unknown, 1 valid, -1 invalid
+        self.edges = {}
+        # Nodes connected by the edges not known to be invalid, updated as they are checked
+        self.adjacency = {}
+
+    def _add_nodes(self, values):
+        first = len(self.nodes)
+        self.nodes = np.concatenate([self.nodes, values])
+        self.node_valid = np.concatenate([self.node_valid, np.zeros(len(values), dtype=np.int8)])
+        if len(self.nodes) < 2:
+            return list(range(first, len(self.nodes)))
+
+        # Connect the new nodes to their nearest neighbors, edges are valid until checked
+        tree = cKDTree(self.nodes)
+        _, neighbors = tree.query(self.nodes[first:], min(self.neighbors + 1, len(self.nodes)))
+        for node, node_neighbors in zip(range(first, len(self.nodes)), np.atleast_2d(neighbors)):
+            for neighbor in node_neighbors:
+                if neighbor != node and self.node_valid[neighbor] >= 0:
+                    edge = (min(node, neighbor), max(node, neighbor))
+                    if edge not in self.edges:
+                        self.edges[edge] = 0
+                        self.adjacency.setdefault(node, set()).add(neighbor)
+                        self.adjacency.setdefault(neighbor, set()).add(node)
+        return list(range(first, len(self.nodes)))
+
+    def solve(self, start, goals, timeout):
+        """Find a path from the start to any of the goals.
+
+        Returns
+        -------
+        :class:`numpy.ndarray` or ``None``
+            The configurations of the path, or ``None`` if no path was found in time.
+        """
+        deadline = time.time() + timeout
+        start_node = self._add_nodes(np.atleast_2d(start))[0]
+        goal_nodes = set(self._add_nodes(np.atleast_2d(goals)))
+        # The start and the goals are checked by the caller
+        self.node_valid[[start_node] + list(goal_nodes)] = 1
+
+        if len(self.nodes) < self.batch_size:
+            self._add_nodes(self.space.sample(self.batch_size, self.rng))
+
+        while time.time() < deadline:
+            path = self._shortest_path(start_node, goal_nodes)
+            if path is None:
+                self._add_nodes(self.space.sample(self.batch_size, self.rng))
+                continue
+
+            # Check the nodes of the path, then its edges
+            unknown = [node for node in path if self.node_valid[node] == 0]
+            if unknown:
+                self.node_valid[unknown] = np.where(self.space.is_valid(self.nodes[unknown]), 1, -1)
+                for node in unknown:
+                    if self.node_valid[node] < 0:
+                        self._remove_node(node)
+            edges = [(min(a, b), max(a, b)) for a, b in zip(path[:-1], path[1:])]
+            unknown = [edge for edge in edges if self.edges[edge] == 0]
+            if unknown and (self.node_valid[path] > 0).all():
+                indices = np.array(unknown)
+                valid = self.space.motions_valid(self.nodes[indices[:, 0]], self.nodes[indices[:, 1]])
+                for edge, edge_valid in zip(unknown, valid):
+                    self.edges[edge] = 1 if edge_valid else -1
+                    if not edge_valid:
+                        self.adjacency[edge[0]].discard(edge[1])
+                        self.adjacency[edge[1]].discard(edge[0])
+
+            if (self.node_valid[path] > 0).all() and all(self.edges[edge] > 0 for edge in edges):
+                return self.nodes[path]
+
+        return None
+
+    def _remove_node(self, node):
+        """Remove an invalid node from the adjacency of the roadmap."""
+        for neighbor in self.adjacency.pop(node, ()):
+            self.adjacency[neighbor].discard(node)
+
+    def _shortest_path(self, start, goals):
+        """Dijkstra's shortest path through the nodes and edges not known to be invalid."""
+        adjacency = self.adjacency
+        distances = {start: 0.}
+        previous = {}
+        queue = [(0., start)]
+        while queue:
+            distance, node = heapq.heappop(queue)
+            if node in goals:
+                path = [node]
+                while node != start:
+                    node = previous[node]
+                    path.append(node)
+                return path[::-1]
+            if distance > distances[node]:
+                continue
+            for neighbor in adjacency.get(node, []):
+                candidate = distance + float(np.linalg.norm(self.nodes[neighbor] - self.nodes[node]))
+                if candidate < distances.get(neighbor, float('inf')):
+                    distances[neighbor] = candidate
+                    previous[neighbor] = node
+                    heapq.heappush(queue, (candidate, neighbor))
+        return None
+
+
+def shortcut_path(space, path, timeout=0.05, batch_size=16, partial_ratio=0.5, seed=None):
+    """Shorten a path by replacing parts of it with straight motions.
+
+    Each round samples a batch of pairs of points along the path. A shortcut
+    replaces the path between the two points with a straight motion of all
+    joints, a partial shortcut only of some joints, while the other joints
+    keep following the path. The motions of all shortcuts of a batch are
+    checked for collisions at once, and the valid ones which do not overlap
+    are applied, the longest reductions first.
+
+    Parameters
+    ----------
+    space : :class:`ConfigurationSpace`
+        The joint space of the path.
+    path : :class:`numpy.ndarray`
+        The configurations of a valid path.
+    timeout : float, optional
+        Time in seconds after which no more batches are sampled. Defaults to ``0.05``.
+    batch_size : int, optional
+        Number of shortcuts checked at once. Defaults to ``16``.
+    partial_ratio : float, optional
+        Share of the shortcuts which are partial. Defaults to ``0.5``.
+    seed : int, optional
+        Seed of the random samples.
+
+    Returns
+    -------
+    :class:`numpy.ndarray`
+        The configurations of the shortened path.
+    """
+    rng = np.random.RandomState(seed)
+    path = _remove_redundant(np.array(path, dtype=float))
+    deadline = time.time() + timeout
+
+    # Seconds per checked configuration, measured to fit the batches into the remaining time
+    rate = None
+
+    while len(path) > 2 and time.time() < deadline:
+        lengths = np.linalg.norm(np.diff(path, axis=0), axis=1)
+        arc = np.concatenate([[0.], np.cumsum(lengths)])
+        if arc[-1] < 1e-9:
+            break
+
+        # Pairs of points along the path, on different segments, half of them at its configurations
+        ends = rng.uniform(0., arc[-1], (batch_size, 2))
+        at_waypoints = rng.uniform(size=ends.shape) < 0.5
+        ends[at_waypoints] = arc[rng.randint(len(path), size=int(at_waypoints.sum()))]
+        ends = np.sort(ends, axis=1)
+        segments = np.clip(np.searchsorted(arc, ends, side='right') - 1, 0, len(path) - 2)
+        ends, segments = ends[segments[:, 0] < segments[:, 1]], segments[segments[:, 0] < segments[:, 1]]
+        t = (ends - arc[segments]) / lengths[segments]
+        points = path[segments] + t[..., None] * (path[segments + 1] - path[segments])
+
+        candidates, starts, stops, owners = [], [], [], []
+        for (a, b), (first, last), (point_a, point_b) in zip(ends, segments, points):
+            if rng.uniform() < partial_ratio:
+                # Only some joints move straight, the others follow the path between both points
+                mask = rng.uniform(size=space.dimension) < 0.5
+                if not mask.any() or mask.all():
+                    mask[rng.randint(space.dimension)] = ~mask.all()
+                inner = path[first + 1:last + 1].copy()
+                weights = (arc[first + 1:last + 1] - a) / (b - a)
+                inner[:, mask] = (point_a + weights[:, None] * (point_b - point_a))[:, mask]
+                motion = np.concatenate([[point_a], inner, [point_b]])
+            else:
+                motion = np.array([point_a, point_b])
+
+            gain = (b - a) - np.sum(np.linalg.norm(np.diff(motion, axis=0), axis=1))
+            if gain > 1e-6:
+                owners.extend([len(candidates)] * (len(motion) - 1))
+                starts.append(motion[:-1])
+                stops.append(motion[1:])
+                candidates.append((gain, first, last, motion))
+
+        if not candidates:
+            continue
+
+        # Only check as many shortcuts as fit into the remaining time, at least one
+        checks = np.cumsum([np.sum(np.ceil(np.linalg.norm(b - a, axis=1) / space.resolution)) for a, b in zip(starts, stops)])
+        budget = INITIAL_CHECKS if rate is None else (deadline - time.time()) / rate
+        count = max(1, int(np.searchsorted(checks, budget, side='right')))
+        candidates, starts, stops = candidates[:count], starts[:count], stops[:count]
+        owners = owners[:len(np.concatenate(starts))]
+
+        checked = time.time()
+        invalid = ~space.motions_valid(np.concatenate(starts), np.concatenate(stops))
+        rate = (time.time() - checked) / checks[count - 1]
+        valid = np.bincount(owners, weights=invalid, minlength=len(candidates)) == 0
+
+        # Apply the valid shortcuts which do not overlap, from the end of the path to keep the indices
+        applied = []
+        for index in sorted(np.flatnonzero(valid), key=lambda i: -candidates[i][0]):
+            _, first, last, _ = candidates[index]
+            if all(last < other_first or first > other_last for other_first, other_last, _ in applied):
+                applied.append((first, last, candidates[index][3]))
+        for first, last, motion in sorted(applied, key=lambda c: -c[0]):
+            path = np.concatenate([path[:first + 1], motion, path[last + 1:]])
+        path = _remove_redundant(path)
+
+    return path
+
+
+def _remove_redundant(path):
+    """Remove the configurations which coincide with their predecessor or lie on a straight motion."""
+    keep = [0]
+    for index in range(1, len(path) - 1):
+        before, after = path[index] - path[keep[-1]], path[index + 1] - path[index]
+        if np.linalg.norm(before) < 1e-9:
+            continue
+        norms = np.linalg.norm(before) * np.linalg.norm(after)
+        if norms > 1e-12 and np.dot(before, after) / norms > 1. - 1e-9:
+            continue
+        keep.append(index)
+    if len(path) > 1 and (len(keep) == 1 or np.linalg.norm(path[-1] - path[keep[-1]]) > 1e-9):
+        keep.append(len(path) - 1)
+    return path[keep]
+
+
+def joint_bounds(robot, joint_names):
+    """Lower and upper limits of joints, in meters and radians."""
+    scale = 1. / robot.scale_factor
+    lower, upper = [], []
+    for name in joint_names:
+        joint = robot.get_joint_by_name(name)
+        if joint.type == Joint.CONTINUOUS or not joint.limit:
+            low, high = -math.pi, math.pi
+        else:
+            low, high = joint.limit.lower, joint.limit.upper
+            if joint.type == Joint.PRISMATIC:
+                low, high = low * scale, high * scale
+        lower.append(low)
+        upper.append(high)
+    return lower, upper
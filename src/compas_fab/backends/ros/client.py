@@ -9,6 +9,9 @@ from roslibpy import Ros
 from roslibpy.actionlib import ActionClient
 from roslibpy.actionlib import Goal
 
+from compas_fab.backends.ros.compression import enable_compression
+from compas_fab.backends.ros.compression import validate_compression
+from compas_fab.backends.ros.compression import validate_publish_compression
 from compas_fab.backends.ros.exceptions import RosError
 from compas_fab.backends.ros.fileserver_loader import RosFileServerLoader
 from compas_fab.backends.ros.messages import ExecuteTrajectoryFeedback
@@ -23,6 +26,7 @@ from compas_fab.backends.ros.messages import JointTrajectoryPoint as RosMsgJoint
 from compas_fab.backends.ros.messages import MoveItErrorCodes
 from compas_fab.backends.ros.messages import RobotTrajectory
 from compas_fab.backends.ros.messages import Time
+from compas_fab.backends.ros.planner_backend import RequestCoalescer
 from compas_fab.backends.ros.planner_backend_moveit import MoveItPlanner
 from compas_fab.backends.tasks import CancellableFutureResult
 from compas_fab.robots import Robot
@@ -80,7 +84,21 @@ class RosClient(Ros):
         ``True`` to indicate it should use a secure web socket, otherwise ``False``.
     planner_backend: str
         Name of the planner backend plugin to use. The plugin must be a sub-class of
-        :class:`PlannerBackend`. Defaults to :class:`moveit`.
+        :class:`PlannerBackend`. Defaults to :class:`moveit`, use ``local``
+        to plan in-process, see :class:`compas_fab.backends.LocalClient`.
+    compression : str, optional
+        Compression the **rosbridge** should use for service responses, one of
+        ``none``, ``png`` or ``cbor``. Compressed responses are decoded
+        transparently. ``cbor`` is only supported on CPython. Defaults to ``none``.
+        It can be overridden per call on the methods that receive large responses.
+    publish_compression : str, optional
+        Compression of the messages published to topics, e.g. the collision
+        objects added to the planning scene, one of ``none`` or ``png``, which
+        the **rosbridge** decodes. Defaults to ``none``.
+    coalesce_requests : bool, optional
+        ``True`` to coalesce identical service requests: a request issued while an
+        identical one is waiting for its response is not sent again, but receives
+        the same response. Defaults to ``False``.
 
     Examples
     --------
@@ -95,13 +113,40 @@ class RosClient(Ros):
     For more examples, check out the :ref:`ROS examples page <ros_examples>`.
     """
 
-    def __init__(self, host='localhost', port=9090, is_secure=False, planner_backend='moveit'):
+    def __init__(self, host='localhost', port=9090, is_secure=False, planner_backend='moveit', compression=None, coalesce_requests=False,
+                 publish_compression=None):
         super(RosClient, self).__init__(host, port, is_secure)
 
+        self.compression = compression or 'none'
+        validate_compression(self.compression)
+        self.publish_compression = publish_compression or 'none'
+        validate_publish_compression(self.publish_compression)
+
+        # Register the decoders on the current connection and on every reconnection
+        self.factory.on('ready', enable_compression)
+        self.factory.on_ready(enable_compression)
+
+        self.request_coalescer = RequestCoalescer() if coalesce_requests else None
+        self.planning_scene_mirror = None
+
+        # The local planner requires numpy, it is only registered when it is used
+        if planner_backend == 'local' and 'local' not in PLANNER_BACKENDS:
+            from compas_fab.backends.local.planner import LocalPlanner
+            PLANNER_BACKENDS['local'] = LocalPlanner
+
         # Dynamically mixin the planner plugin into this class
         planner_backend_type = PLANNER_BACKENDS[planner_backend]
         self.__class__ = type('RosClient_' + planner_backend_type.__name__, (planner_backend_type, RosClient), {})
 
+    @property
+    def coalescing_stats(self):
+        """dict: Counters of service ``requests``, requests ``coalesced`` into
+        an identical request in flight, and service ``calls`` actually sent.
+        ``None`` if request coalescing is disabled."""
+        if not self.request_coalescer:
+            return None
+        return dict(self.request_coalescer.stats)
+
     def __enter__(self):
         self.run()
         self.connect()
@@ -146,6 +191,7 @@ class RosClient(Ros):
         """
         robot_name = None
         use_local_cache = False
+        robot_directory = local_cache_directory
 
         if local_cache_directory is not None:
             use_local_cache = True
@@ -167,7 +213,9 @@ class RosClient(Ros):
         if load_geometry:
             model.load_geometry(loader)
 
-        return Robot(model, semantics=semantics, client=self)
+        robot = Robot(model, semantics=semantics, client=self)
+        robot.local_cache_directory = robot_directory
+        return robot
 
     def inverse_kinematics(self, robot, frame, group,
                            start_configuration, avoid_collisions=True,
@@ -181,6 +229,7 @@ class RosClient(Ros):
         kwargs['avoid_collisions'] = avoid_collisions
         kwargs['constraints'] = constraints
         kwargs['attempts'] = attempts
+        kwargs['attached_collision_meshes'] = attached_collision_meshes
 
         kwargs['errback_name'] = 'errback'
 
@@ -201,7 +250,7 @@ class RosClient(Ros):
                               robot, frames, start_configuration,
                               group, max_step, jump_threshold,
                               avoid_collisions, path_constraints,
-                              attached_collision_meshes):
+                              attached_collision_meshes, compression=None):
         kwargs = {}
         kwargs['robot'] = robot
         kwargs['frames'] = frames
@@ -212,6 +261,7 @@ class RosClient(Ros):
         kwargs['avoid_collisions'] = avoid_collisions
         kwargs['path_constraints'] = path_constraints
         kwargs['attached_collision_meshes'] = attached_collision_meshes
+        kwargs['compression'] = compression
 
         kwargs['errback_name'] = 'errback'
 
@@ -224,7 +274,8 @@ class RosClient(Ros):
                     max_velocity_scaling_factor=1.,
                     max_acceleration_scaling_factor=1.,
                     attached_collision_meshes=None,
-                    workspace_parameters=None):
+                    workspace_parameters=None,
+                    compression=None):
         kwargs = {}
         kwargs['robot'] = robot
         kwargs['goal_constraints'] = goal_constraints
@@ -239,6 +290,7 @@ class RosClient(Ros):
         kwargs['max_acceleration_scaling_factor'] = max_acceleration_scaling_factor
         kwargs['attached_collision_meshes'] = attached_collision_meshes
         kwargs['workspace_parameters'] = workspace_parameters
+        kwargs['compression'] = compression
 
         kwargs['errback_name'] = 'errback'
 
@@ -260,8 +312,25 @@ class RosClient(Ros):
     # collision objects and planning scene
     # ==========================================================================
 
-    def get_planning_scene(self):
+    def get_planning_scene(self, compression=None, use_mirror=True):
+        """Retrieve the planning scene.
+
+        Parameters
+        ----------
+        compression : str, optional
+            Compression of the response, overrides the client's compression.
+        use_mirror : bool, optional
+            ``True`` to return the snapshot of the planning scene mirror, if it
+            is synchronized (see :meth:`monitor_planning_scene`), instead of
+            calling the service. Defaults to ``True``.
+
+        Returns
+        -------
+        :class:`compas_fab.backends.ros.messages.PlanningScene`
+        """
         kwargs = {}
+        kwargs['compression'] = compression
+        kwargs['use_mirror'] = use_mirror
         kwargs['errback_name'] = 'errback'
 
         return await_callback(self.get_planning_scene_async, **kwargs)
@@ -269,6 +338,83 @@ class RosClient(Ros):
     def get_planning_scene_async(self, *args, **kwargs):
         raise NotImplementedError('No planner plugin assigned')
 
+    def monitor_planning_scene(self, topic_name='/monitored_planning_scene', resync_interval=None, compression=None):
+        """Keep a local mirror of the planning scene.
+
+        The mirror subscribes to the updates published by the planning scene
+        monitor and applies them locally. Afterwards, :meth:`get_planning_scene`
+        returns a snapshot of the mirror without calling the service, which is
+        only used to resynchronize the mirror.
+
+        Parameters
+        ----------
+        topic_name : str, optional
+            Topic of the planning scene updates. Defaults to ``/monitored_planning_scene``.
+        resync_interval : float, optional
+            Number of seconds after which the full scene is requested again,
+            to recover from missed updates. Defaults to never.
+        compression : str, optional
+            Compression of the updates and of the full scene, overrides the
+            client's compression.
+
+        Returns
+        -------
+        :class:`compas_fab.backends.ros.planning_scene_mirror.PlanningSceneMirror`
+            The mirror, with the current snapshot in ``scene`` and a
+            ``version`` counter incremented on every change.
+
+        Examples
+        --------
+        >>> with RosClient() as client:                     # doctest: +SKIP
+        ...     mirror = client.monitor_planning_scene()
+        ...     mirror.wait_until_synchronized(timeout=5)
+        ...     scene = client.get_planning_scene()
+        True
+        """
+        raise NotImplementedError('No planner backend assigned')
+
+    def apply_planning_scene_diff(self, collision_meshes=None, moved_collision_meshes=None,
+                                  appended_collision_meshes=None,
+                                  removed_collision_mesh_ids=None,
+                                  attached_collision_meshes=None,
+                                  removed_attached_collision_mesh_ids=None):
+        """Apply several changes to the planning scene at once.
+
+        Parameters
+        ----------
+        collision_meshes : list of :class:`compas_fab.robots.CollisionMesh`, optional
+            Collision meshes to add or replace. Meshes sharing an id are combined in one object.
+        moved_collision_meshes : list of :class:`compas_fab.robots.CollisionMesh`, optional
+            Collision meshes whose geometry is already in the planning scene,
+            but which have a new frame. Their geometry is not sent again.
+        appended_collision_meshes : list of :class:`compas_fab.robots.CollisionMesh`, optional
+            Collision meshes to append to existing objects.
+        removed_collision_mesh_ids : list of str, optional
+            Identifiers of the collision meshes to remove.
+        attached_collision_meshes : list of :class:`compas_fab.robots.AttachedCollisionMesh`, optional
+            Attached collision meshes to add or replace.
+        removed_attached_collision_mesh_ids : list of str, optional
+            Identifiers of the attached collision meshes to remove.
+
+        Returns
+        -------
+        bool
+            ``True`` if the changes were applied.
+        """
+        kwargs = {}
+        kwargs['collision_meshes'] = collision_meshes
+        kwargs['moved_collision_meshes'] = moved_collision_meshes
+        kwargs['appended_collision_meshes'] = appended_collision_meshes
+        kwargs['removed_collision_mesh_ids'] = removed_collision_mesh_ids
+        kwargs['attached_collision_meshes'] = attached_collision_meshes
+        kwargs['removed_attached_collision_mesh_ids'] = removed_attached_collision_mesh_ids
+        kwargs['errback_name'] = 'errback'
+
+        return await_callback(self.apply_planning_scene_diff_async, **kwargs)
+
+    def apply_planning_scene_diff_async(self, *args, **kwargs):
+        raise NotImplementedError('No planner plugin assigned')
+
     def add_collision_mesh(self, collision_mesh):
         raise NotImplementedError('No planner backend assigned')
 
@@ -0,0 +1,374 @@
+"""
+Internal helpers to decode compressed payloads sent by the **rosbridge**.
+
+The **rosbridge** can compress the messages it sends to clients, either as
+a PNG image embedded in a JSON message (``compression='png'``), or as binary
+CBOR frames (``compression='cbor'``). These helpers decode both formats
+transparently, so that the rest of the client keeps working on plain dicts.
+The **rosbridge** also accepts PNG-compressed messages from clients, which
+are encoded by :func:`encode_png`.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import base64
+import json
+import logging
+import math
+import struct
+import zlib
+
+import compas
+from roslibpy import Message
+
+__all__ = [
+    'SUPPORTED_COMPRESSION_TYPES',
+    'SUPPORTED_PUBLISH_COMPRESSION_TYPES',
+    'decode_png',
+    'encode_png',
+    'decode_cbor',
+    'enable_compression',
+]
+
+LOG = logging.getLogger('compas_fab.backends.ros.compression')
+
+SUPPORTED_COMPRESSION_TYPES = ('none', 'png', 'cbor')
+
+# The rosbridge only decodes PNG compressed messages sent by clients
+SUPPORTED_PUBLISH_COMPRESSION_TYPES = ('none', 'png')
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+PNG_BYTES_PER_PIXEL = {0: 1, 2: 3, 4: 2, 6: 4}
+
+# Typed arrays (RFC 8746), used by the rosbridge to encode numeric arrays
+CBOR_TYPED_ARRAYS = {
+    64: ('B', '>'), 65: ('H', '>'), 66: ('I', '>'), 67: ('Q', '>'),
+    68: ('B', '>'), 69: ('H', '<'), 70: ('I', '<'), 71: ('Q', '<'),
+    72: ('b', '>'), 73: ('h', '>'), 74: ('i', '>'), 75: ('q', '>'),
+    77: ('h', '<'), 78: ('i', '<'), 79: ('q', '<'),
+    80: ('e', '>'), 81: ('f', '>'), 82: ('d', '>'),
+    84: ('e', '<'), 85: ('f', '<'), 86: ('d', '<'),
+}
+
+
+def validate_compression(compression, proto=None):
+    """Raise an exception if the compression type is not supported.
+
+    ``cbor`` is not supported on IronPython, nor on a **rosbridge** protocol
+    ``proto`` whose binary frames are not decoded by :func:`enable_compression`.
+    """
+    if compression not in SUPPORTED_COMPRESSION_TYPES:
+        raise ValueError('Unsupported compression type. Must be one of: ' + str(SUPPORTED_COMPRESSION_TYPES))
+
+    if compression == 'cbor':
+        if compas.IPY:
+            raise ValueError('CBOR compression is not supported on IronPython')
+        if proto is not None and not getattr(proto, '_cbor_enabled', False):
+            raise ValueError('CBOR compression is not supported on this connection, its binary messages are not decoded')
+
+
+def validate_publish_compression(compression):
+    """Raise an exception if the compression type of published messages is not supported."""
+    if compression not in SUPPORTED_PUBLISH_COMPRESSION_TYPES:
+        raise ValueError('Unsupported compression type of published messages. Must be one of: ' +
+                         str(SUPPORTED_PUBLISH_COMPRESSION_TYPES))
+
+
+def _png_chunk(chunk_type, data):
+    crc = zlib.crc32(chunk_type + data) & 0xffffffff
+    return struct.pack('>I', len(data)) + chunk_type + data + struct.pack('>I', crc)
+
+
+def encode_png(string):
+    """Encode a message as the payload of a PNG-compressed **rosbridge** message.
+
+    Like the **rosbridge**, the message is stored in the pixels of an RGB
+    image, padded with new lines to fill its last row.
+
+    Parameters
+    ----------
+    string : str
+        The JSON string of the message.
+
+    Returns
+    -------
+    str
+        Base64-encoded PNG image, to send in the ``data`` field of a message
+        with ``op`` set to ``png``.
+    """
+    data = string.encode('utf8')
+    width = max(1, int(math.floor(math.sqrt(len(data) / 3.))))
+    height = max(1, int(math.ceil(len(data) / 3. / width)))
+    stride = width * 3
+    data += b'\n' * (stride * height - len(data))
+
+    # Every row starts with filter type 0, i.e. unfiltered
+    raw = b''.join(b'\x00' + data[row * stride:(row + 1) * stride] for row in range(height))
+    png = (PNG_SIGNATURE +
+           _png_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)) +
+           _png_chunk(b'IDAT', zlib.compress(raw, 9)) +
+           _png_chunk(b'IEND', b''))
+    return base64.b64encode(png).decode('ascii')
+
+
+def png_message(message):
+    """Wrap a **rosbridge** message into a PNG-compressed message.
+
+    Parameters
+    ----------
+    message : dict
+        The message, e.g. of a ``publish`` operation.
+
+    Returns
+    -------
+    dict
+        Message with ``op`` set to ``png``.
+    """
+    return {'op': 'png', 'data': encode_png(json.dumps(dict(message)))}
+
+
+def _paeth(a, b, c):
+    p = a + b - c
+    pa, pb, pc = abs(p - a), abs(p - b), abs(p - c)
+    if pa <= pb and pa <= pc:
+        return a
+    if pb <= pc:
+        return b
+    return c
+
+
+def decode_png(data):
+    """Decode the payload of a PNG-compressed **rosbridge** message.
+
+    Parameters
+    ----------
+    data : str
+        Base64-encoded PNG image, as found in the ``data`` field of
+        a message with ``op`` set to ``png``.
+
+    Returns
+    -------
+    str
+        The JSON string of the compressed message.
+    """
+    png = bytearray(base64.b64decode(data))
+    if png[:8] != PNG_SIGNATURE:
+        raise ValueError('Invalid PNG signature')
+
+    idat = bytearray()
+    offset = 8
+    width = height = bpp = None
+    while offset < len(png):
+        length, = struct.unpack('>I', bytes(png[offset:offset + 4]))
+        chunk_type = bytes(png[offset + 4:offset + 8])
+        chunk = png[offset + 8:offset + 8 + length]
+        offset += 12 + length
+
+        if chunk_type == b'IHDR':
+            width, height, bit_depth, color_type, _, _, interlace = struct.unpack('>IIBBBBB', bytes(chunk))
+            if bit_depth != 8 or interlace != 0 or color_type not in PNG_BYTES_PER_PIXEL:
+                raise ValueError('Unsupported PNG format')
+            bpp = PNG_BYTES_PER_PIXEL[color_type]
+        elif chunk_type == b'IDAT':
+            idat.extend(chunk)
+        elif chunk_type == b'IEND':
+            break
+
+    if bpp is None:
+        raise ValueError('PNG header not found')
+
+    raw = bytearray(zlib.decompress(bytes(idat)))
+    stride = width * bpp
+    result = bytearray()
+    previous = bytearray(stride)
+
+    for row_index in range(height):
+        start = row_index * (stride + 1)
+        filter_type = raw[start]
+        row = raw[start + 1:start + 1 + stride]
+
+        if filter_type == 1:
+            for i in range(bpp, stride):
+                row[i] = (row[i] + row[i - bpp]) & 0xff
+        elif filter_type == 2:
+            for i in range(stride):
+                row[i] = (row[i] + previous[i]) & 0xff
+        elif filter_type == 3:
+            for i in range(stride):
+                left = row[i - bpp] if i >= bpp else 0
+                row[i] = (row[i] + ((left + previous[i]) >> 1)) & 0xff
+        elif filter_type == 4:
+            for i in range(stride):
+                left = row[i - bpp] if i >= bpp else 0
+                upper_left = previous[i - bpp] if i >= bpp else 0
+                row[i] = (row[i] + _paeth(left, previous[i], upper_left)) & 0xff
+        elif filter_type != 0:
+            raise ValueError('Invalid PNG filter type: %d' % filter_type)
+
+        result.extend(row)
+        previous = row
+
+    # The rosbridge pads the image with new lines to make it square
+    return bytes(result).rstrip(b'\n').decode('utf8')
+
+
+class _CborDecoder(object):
+    def __init__(self, payload):
+        self.payload = bytes(payload)
+        self.offset = 0
+
+    def read(self, length):
+        value = self.payload[self.offset:self.offset + length]
+        if len(value) != length:
+            raise ValueError('Unexpected end of CBOR payload')
+        self.offset += length
+        return value
+
+    def read_argument(self, info):
+        if info < 24:
+            return info
+        if info == 24:
+            return struct.unpack('>B', self.read(1))[0]
+        if info == 25:
+            return struct.unpack('>H', self.read(2))[0]
+        if info == 26:
+            return struct.unpack('>I', self.read(4))[0]
+        if info == 27:
+            return struct.unpack('>Q', self.read(8))[0]
+        if info == 31:
+            return None
+        raise ValueError('Invalid CBOR additional information: %d' % info)
+
+    def is_break(self):
+        if self.payload[self.offset:self.offset + 1] == b'\xff':
+            self.offset += 1
+            return True
+        return False
+
+    def decode(self):
+        initial_byte = struct.unpack('>B', self.read(1))[0]
+        major_type, info = initial_byte >> 5, initial_byte & 0x1f
+
+        if major_type == 7:
+            return self.decode_simple(info)
+
+        argument = self.read_argument(info)
+
+        if major_type == 0:
+            return argument
+        if major_type == 1:
+            return -1 - argument
+        if major_type in (2, 3):
+            if argument is None:
+                chunks = []
+                while not self.is_break():
+                    chunks.append(self.decode())
+                value = (u'' if major_type == 3 else b'').join(chunks)
+            else:
+                value = self.read(argument)
+                if major_type == 3:
+                    value = value.decode('utf8')
+            return value
+        if major_type == 4:
+            if argument is None:
+                items = []
+                while not self.is_break():
+                    items.append(self.decode())
+                return items
+            return [self.decode() for _ in range(argument)]
+        if major_type == 5:
+            result = {}
+            if argument is None:
+                while not self.is_break():
+                    key = self.decode()
+                    result[key] = self.decode()
+            else:
+                for _ in range(argument):
+                    key = self.decode()
+                    result[key] = self.decode()
+            return result
+        if major_type == 6:
+            value = self.decode()
+            if argument in CBOR_TYPED_ARRAYS:
+                return self.decode_typed_array(argument, value)
+            return value
+
+        raise ValueError('Invalid CBOR major type: %d' % major_type)
+
+    def decode_simple(self, info):
+        if info == 20:
+            return False
+        if info == 21:
+            return True
+        if info in (22, 23):
+            return None
+        if info == 25:
+            return struct.unpack('>e', self.read(2))[0]
+        if info == 26:
+            return struct.unpack('>f', self.read(4))[0]
+        if info == 27:
+            return struct.unpack('>d', self.read(8))[0]
+        raise ValueError('Unsupported CBOR simple value: %d' % info)
+
+    def decode_typed_array(self, tag, data):
+        item_format, byte_order = CBOR_TYPED_ARRAYS[tag]
+        count = len(data) // struct.calcsize(item_format)
+        return list(struct.unpack('%s%d%s' % (byte_order, count, item_format), data))
+
+
+def decode_cbor(payload):
+    """Decode a binary CBOR **rosbridge** message.
+
+    Numeric arrays encoded as typed arrays are decoded into lists.
+
+    Parameters
+    ----------
+    payload : bytes
+        Binary payload of the websocket frame.
+
+    Returns
+    -------
+    dict
+        The decoded message.
+    """
+    return _CborDecoder(payload).decode()
+
+
+def enable_compression(proto):
+    """Enable decoding of compressed messages on a **rosbridge** protocol instance.
+
+    Text frames containing PNG-compressed messages are decoded and dispatched
+    again. Binary frames are decoded as CBOR, if the protocol implementation
+    exposes them (i.e. on CPython).
+    """
+    if getattr(proto, '_compression_enabled', False):
+        return proto
+
+    proto._compression_enabled = True
+
+    def handle_png(message):
+        proto.on_message(decode_png(message['data']).encode('utf8'))
+
+    proto.register_message_handlers('png', handle_png)
+
+    if hasattr(proto, 'onMessage'):
+        on_text_message = proto.onMessage
+
+        def on_message(payload, isBinary):
+            if not isBinary:
+                return on_text_message(payload, isBinary)
+
+            try:
+                message = Message(decode_cbor(payload))
+                handler = proto._message_handlers.get(message['op'], None)
+                if not handler:
+                    raise ValueError('No handler registered for operation "%s"' % message['op'])
+                handler(message)
+            except Exception:
+                LOG.exception('Failed to handle binary message. Message skipped.')
+
+        proto.onMessage = on_message
+        proto._cbor_enabled = True
+
+    return proto
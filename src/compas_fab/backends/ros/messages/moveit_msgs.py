@@ -70,7 +70,7 @@ class CollisionObject(ROSmsg):
         kwargs['meshes'] = [Mesh.from_msg(i) for i in msg['meshes']]
         kwargs['mesh_poses'] = [Pose.from_msg(i) for i in msg['mesh_poses']]
         kwargs['planes'] = [Plane.from_msg(i) for i in msg['planes']]
-        kwargs['plane_poses'] = [Pose.from_frame(i) for i in msg['plane_poses']]
+        kwargs['plane_poses'] = [Pose.from_msg(i) for i in msg['plane_poses']]
 
         kwargs['operation'] = msg['operation']
 
@@ -102,6 +102,12 @@ class AttachedCollisionObject(ROSmsg):
 
         return cls(**kwargs)
 
+    @classmethod
+    def from_msg(cls, msg):
+        object = CollisionObject.from_msg(msg['object'])
+        detach_posture = JointTrajectory.from_msg(msg['detach_posture']) if msg.get('detach_posture') else None
+        return cls(msg['link_name'], object, msg['touch_links'], detach_posture, msg['weight'])
+
 
 class Constraints(ROSmsg):
     """http://docs.ros.org/kinetic/api/moveit_msgs/html/msg/Constraints.html
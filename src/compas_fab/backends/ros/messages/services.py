@@ -177,3 +177,21 @@ class GetPlanningSceneResponse(ROSmsg):
     @classmethod
     def from_msg(cls, msg):
         return PlanningScene.from_msg(msg['scene'])
+
+
+class ApplyPlanningSceneRequest(ROSmsg):
+    """http://docs.ros.org/melodic/api/moveit_msgs/html/srv/ApplyPlanningScene.html
+    """
+    def __init__(self, scene=None):
+        self.scene = scene or PlanningScene()
+
+
+class ApplyPlanningSceneResponse(ROSmsg):
+    """http://docs.ros.org/melodic/api/moveit_msgs/html/srv/ApplyPlanningScene.html
+    """
+    def __init__(self, success=False):
+        self.success = success
+
+    @classmethod
+    def from_msg(cls, msg):
+        return cls(msg['success'])
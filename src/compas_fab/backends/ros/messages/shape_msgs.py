@@ -75,11 +75,49 @@ class SolidPrimitive(ROSmsg):
 
 class Mesh(ROSmsg):
     """http://docs.ros.org/kinetic/api/shape_msgs/html/msg/Mesh.html
+
+    Meshes created with :meth:`from_msg` keep their geometry in the raw
+    message form, and only decode :attr:`triangles` and :attr:`vertices`
+    when they are accessed. :attr:`mesh` reads the raw form directly.
     """
     def __init__(self, triangles=None, vertices=None):
+        self._msg = None
         self.triangles = triangles or []  # shape_msgs/MeshTriangle[]
         self.vertices = vertices or []  # geometry_msgs/Point[]
 
+    @property
+    def triangles(self):
+        if self._triangles is None:
+            self._triangles = [MeshTriangle.from_msg(t) for t in self._msg['triangles']]
+            self._release_msg()
+        return self._triangles
+
+    @triangles.setter
+    def triangles(self, triangles):
+        self._triangles = triangles
+
+    @property
+    def vertices(self):
+        if self._vertices is None:
+            self._vertices = [Point.from_msg(v) for v in self._msg['vertices']]
+            self._release_msg()
+        return self._vertices
+
+    @vertices.setter
+    def vertices(self, vertices):
+        self._vertices = vertices
+
+    def _release_msg(self):
+        if self._triangles is not None and self._vertices is not None:
+            self._msg = None
+
+    @property
+    def msg(self):
+        if self._msg is not None:
+            return self._msg
+        return {'triangles': [t.msg for t in self.triangles],
+                'vertices': [v.msg for v in self.vertices]}
+
     @classmethod
     def from_mesh(cls, compas_mesh):
         """Construct a `Mesh` message from a :class:`compas.datastructures.Mesh`.
@@ -92,15 +130,23 @@ class Mesh(ROSmsg):
 
     @classmethod
     def from_msg(cls, msg):
-        triangles = [MeshTriangle.from_msg(t) for t in msg['triangles']]
-        vertices = [Point.from_msg(v) for v in msg['vertices']]
-        return cls(triangles, vertices)
+        mesh = cls()
+        mesh._msg = msg
+        mesh._triangles = None
+        mesh._vertices = None
+        return mesh
 
     @property
     def mesh(self):
         cls = compas.datastructures.Mesh
-        vertices = [(v.x, v.y, v.z) for v in self.vertices]
-        faces = [t.vertex_indices for t in self.triangles]
+        if self._vertices is None:
+            vertices = [(v['x'], v['y'], v['z']) for v in self._msg['vertices']]
+        else:
+            vertices = [(v.x, v.y, v.z) for v in self._vertices]
+        if self._triangles is None:
+            faces = [t['vertex_indices'] for t in self._msg['triangles']]
+        else:
+            faces = [t.vertex_indices for t in self._triangles]
         return cls.from_vertices_and_faces(vertices, faces)
 
 
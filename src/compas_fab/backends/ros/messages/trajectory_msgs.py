@@ -34,6 +34,11 @@ class JointTrajectoryPoint(ROSmsg):
 
 class JointTrajectory(ROSmsg):
     """http://docs.ros.org/kinetic/api/trajectory_msgs/html/msg/JointTrajectory.html
+
+    Trajectories created with :meth:`from_msg` keep the points in their raw
+    message form, and only build :class:`JointTrajectoryPoint` instances
+    when :attr:`points` is accessed. Use :meth:`iter_point_values` to read
+    the values without creating them at all.
     """
 
     def __init__(self, header=None, joint_names=None, points=None):
@@ -41,12 +46,53 @@ class JointTrajectory(ROSmsg):
         self.joint_names = joint_names or []
         self.points = points or []
 
+    @property
+    def points(self):
+        if self._points is None:
+            self._points = [JointTrajectoryPoint.from_msg(item) for item in self._points_msg]
+            self._points_msg = None
+        return self._points
+
+    @points.setter
+    def points(self, points):
+        self._points = points
+        self._points_msg = None
+
+    def iter_point_values(self):
+        """Iterate over the values of the trajectory points.
+
+        Yields
+        ------
+        tuple
+            ``positions``, ``velocities``, ``accelerations``, ``effort``,
+            ``secs`` and ``nsecs`` of each point.
+        """
+        if self._points is None:
+            for item in self._points_msg:
+                time_from_start = item['time_from_start']
+                yield (item['positions'], item['velocities'], item['accelerations'], item['effort'],
+                       time_from_start['secs'], time_from_start['nsecs'])
+        else:
+            for pt in self._points:
+                yield (pt.positions, pt.velocities, pt.accelerations, pt.effort,
+                       pt.time_from_start.secs, pt.time_from_start.nsecs)
+
+    @property
+    def msg(self):
+        if self._points is None:
+            points = self._points_msg
+        else:
+            points = [p.msg for p in self._points]
+        return {'header': self.header.msg, 'joint_names': self.joint_names, 'points': points}
+
     @classmethod
     def from_msg(cls, msg):
         header = Header.from_msg(msg['header'])
         joint_names = msg['joint_names']
-        points = [JointTrajectoryPoint.from_msg(item) for item in msg['points']]
-        return cls(header, joint_names, points)
+        trajectory = cls(header, joint_names)
+        trajectory._points = None
+        trajectory._points_msg = msg['points']
+        return trajectory
 
 
 class MultiDOFJointTrajectoryPoint(ROSmsg):
@@ -8,16 +8,26 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import functools
+import json
+import logging
+import threading
+
+from roslibpy import Message
 from roslibpy import Service
 from roslibpy import ServiceRequest
 
+from compas_fab.backends.ros.compression import validate_compression
 from compas_fab.backends.ros.exceptions import RosValidationError
 
 __all__ = [
     'PlannerBackend',
+    'RequestCoalescer',
     'ServiceDescription'
 ]
 
+LOG = logging.getLogger('compas_fab.backends.ros.planner_backend')
+
 
 class PlannerBackend(object):
     """Base class for ROS planner backends."""
@@ -47,6 +57,12 @@ class PlannerBackend(object):
     def get_planning_scene_async(self, *args, **kwargs):
         pass
 
+    def apply_planning_scene_diff_async(self, *args, **kwargs):
+        pass
+
+    def monitor_planning_scene(self, *args, **kwargs):
+        pass
+
     def add_collision_mesh(self, collision_mesh):
         pass
 
@@ -63,6 +79,94 @@ class PlannerBackend(object):
         pass
 
 
+class RequestCoalescer(object):
+    """Internal class to coalesce identical service requests in flight.
+
+    Requests are considered identical when their service name, response class,
+    validator, compression and canonical JSON encoding match. While a request is waiting for its response,
+    identical requests attach to it instead of being sent again, and all of
+    them receive the same response (or error).
+
+    Attributes
+    ----------
+    stats : dict
+        Counters of ``requests`` received, requests ``coalesced`` into a pending
+        call, and service ``calls`` actually sent.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}
+        self.stats = dict(requests=0, coalesced=0, calls=0)
+
+    @staticmethod
+    def key(service, compression, request_msg):
+        """Compute the key identifying a request.
+
+        Services of the same name decoding or validating their responses
+        differently, e.g. to a response object or to the raw message, do
+        not share their responses.
+        """
+        return (service.name, service.response_class, service.validator, compression,
+                json.dumps(request_msg, sort_keys=True, separators=(',', ':')))
+
+    @property
+    def in_flight(self):
+        """int: Number of distinct requests waiting for a response."""
+        with self._lock:
+            return len(self._pending)
+
+    def attach(self, key, callback, errback):
+        """Attach the callbacks to the request identified by ``key``.
+
+        Returns
+        -------
+        bool
+            ``True`` if there was no identical request in flight and the caller
+            needs to send it, otherwise ``False``.
+        """
+        with self._lock:
+            self.stats['requests'] += 1
+            waiters = self._pending.get(key)
+            if waiters is not None:
+                self.stats['coalesced'] += 1
+                waiters.append((callback, errback))
+                return False
+
+            self.stats['calls'] += 1
+            self._pending[key] = [(callback, errback)]
+            return True
+
+    def resolve(self, key, response):
+        """Invoke the callbacks of all requests attached to ``key``."""
+        for callback, _ in self._pop(key):
+            self._invoke(callback, response)
+
+    def reject(self, key, error):
+        """Invoke the error callbacks of all requests attached to ``key``."""
+        for _, errback in self._pop(key):
+            self._invoke(errback, error)
+
+    @staticmethod
+    def _invoke(callback, value):
+        # A failing callback must not keep the other waiters from their response
+        if not callback:
+            return
+        try:
+            callback(value)
+        except Exception:
+            LOG.exception('Callback of a coalesced request failed')
+
+    def reset_stats(self):
+        with self._lock:
+            for name in self.stats:
+                self.stats[name] = 0
+
+    def _pop(self, key):
+        with self._lock:
+            return self._pending.pop(key, [])
+
+
 class ServiceDescription(object):
     """Internal class to simplify service call code."""
 
@@ -73,28 +177,79 @@ class ServiceDescription(object):
         self.response_class = response_class
         self.validator = validator
 
-    def call(self, client, request, callback, errback):
+    def call(self, client, request, callback, errback, compression=None):
+        """Call the service.
+
+        Parameters
+        ----------
+        client : :class:`compas_fab.backends.RosClient`
+            The client used to call the service.
+        request : tuple or dict or object
+            Arguments of the request class, or the request itself, e.g. an
+            already encoded request with a ``msg`` attribute.
+        callback : callable
+            Function invoked with the response object.
+        errback : callable
+            Function invoked in case of error.
+        compression : str, optional
+            Compression of the response sent by the **rosbridge**, one of
+            ``none``, ``png`` or ``cbor``. Defaults to the client's compression.
+
+        Notes
+        -----
+        If the client has a ``request_coalescer``, identical requests issued
+        while this one is in flight share its response.
+        """
+        if isinstance(request, tuple):
+            request_msg = self.request_class(*request)
+        elif isinstance(request, dict):
+            request_msg = self.request_class(**request)
+        else:
+            request_msg = request
+
+        compression = compression or getattr(client, 'compression', None) or 'none'
+        # The protocol of the current connection, if any, has to decode the compressed responses
+        validate_compression(compression, getattr(getattr(client, 'factory', None), '_proto', None))
+
+        coalescer = getattr(client, 'request_coalescer', None)
+        if coalescer:
+            key = coalescer.key(self, compression, request_msg.msg)
+            if not coalescer.attach(key, callback, errback):
+                return
+
+            on_success = functools.partial(coalescer.resolve, key)
+            on_error = functools.partial(coalescer.reject, key)
+        else:
+            on_success, on_error = callback, errback
+
         def inner_handler(response_msg):
-            response_object = self.response_class.from_msg(response_msg)
+            # Without response class, the raw message is passed on
+            response_object = self.response_class.from_msg(response_msg) if self.response_class else response_msg
 
             # Validate the response if there's a validator function assigned
             if self.validator:
                 try:
                     self.validator(response_object)
                 except Exception as e:
-                    errback(RosValidationError(e, response_object))
+                    on_error(RosValidationError(e, response_object))
                     return
 
-            callback(response_object)
+            on_success(response_object)
 
-        if isinstance(request, tuple):
-            request_msg = self.request_class(*request)
+        if compression == 'none':
+            srv = Service(client, self.name, self.type)
+            srv.call(ServiceRequest(request_msg.msg),
+                     callback=inner_handler, errback=on_error)
         else:
-            request_msg = self.request_class(**request)
-
-        srv = Service(client, self.name, self.type)
-        srv.call(ServiceRequest(request_msg.msg),
-                 callback=inner_handler, errback=errback)
-
-    def __call__(self, client, request, callback, errback):
-        return self.call(client, request, callback, errback)
+            # roslibpy services do not expose the compression field of the protocol
+            message = Message({
+                'op': 'call_service',
+                'id': 'call_service:%s:%d' % (self.name, client.id_counter),
+                'service': self.name,
+                'args': request_msg.msg,
+                'compression': compression,
+            })
+            client.call_async_service(message, inner_handler, on_error)
+
+    def __call__(self, client, request, callback, errback, compression=None):
+        return self.call(client, request, callback, errback, compression)
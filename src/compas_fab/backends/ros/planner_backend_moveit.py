@@ -5,9 +5,15 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+from collections import OrderedDict
+
+from roslibpy import Message
 from roslibpy import Topic
 
+from compas_fab.backends.ros.compression import png_message
 from compas_fab.backends.ros.exceptions import RosError
+from compas_fab.backends.ros.messages import ApplyPlanningSceneRequest
+from compas_fab.backends.ros.messages import ApplyPlanningSceneResponse
 from compas_fab.backends.ros.messages import AttachedCollisionObject
 from compas_fab.backends.ros.messages import CollisionObject
 from compas_fab.backends.ros.messages import Constraints
@@ -22,12 +28,15 @@ from compas_fab.backends.ros.messages import GetPositionIKResponse
 from compas_fab.backends.ros.messages import Header
 from compas_fab.backends.ros.messages import JointConstraint
 from compas_fab.backends.ros.messages import JointState
+from compas_fab.backends.ros.messages import Mesh
 from compas_fab.backends.ros.messages import MotionPlanRequest
 from compas_fab.backends.ros.messages import MotionPlanResponse
 from compas_fab.backends.ros.messages import MoveItErrorCodes
 from compas_fab.backends.ros.messages import MultiDOFJointState
 from compas_fab.backends.ros.messages import OrientationConstraint
+from compas_fab.backends.ros.messages import PlanningScene
 from compas_fab.backends.ros.messages import PlanningSceneComponents
+from compas_fab.backends.ros.messages import PlanningSceneWorld
 from compas_fab.backends.ros.messages import Pose
 from compas_fab.backends.ros.messages import PoseStamped
 from compas_fab.backends.ros.messages import PositionConstraint
@@ -36,22 +45,33 @@ from compas_fab.backends.ros.messages import RobotState
 from compas_fab.backends.ros.messages import TrajectoryConstraints
 from compas_fab.backends.ros.planner_backend import PlannerBackend
 from compas_fab.backends.ros.planner_backend import ServiceDescription
+from compas_fab.backends.ros.planning_scene_mirror import PlanningSceneMirror
+from compas_fab.backends.ros.request_templates import EncodedMsg
+from compas_fab.backends.ros.request_templates import RequestTemplateCache
+from compas_fab.backends.ros.request_templates import pose_msg
 from compas_fab.robots import Configuration
 from compas_fab.robots import Duration
 from compas_fab.robots import JointTrajectory
 from compas_fab.robots import JointTrajectoryPoint
+from compas_fab.robots.plan_cache import canonical_hash
+from compas_fab.robots.plan_cache import mesh_hash
+
 
+def convert_trajectory_points(joint_trajectory, types):
+    """Convert the points of a ROS joint trajectory message into :class:`JointTrajectoryPoint` instances.
 
-def convert_trajectory_points(points, types):
+    The values are read directly from the received message, without decoding
+    intermediate ROS point messages first.
+    """
     result = []
 
-    for pt in points:
-        jtp = JointTrajectoryPoint(values=pt.positions,
+    for positions, velocities, accelerations, effort, secs, nsecs in joint_trajectory.iter_point_values():
+        jtp = JointTrajectoryPoint(values=positions,
                                    types=types,
-                                   velocities=pt.velocities,
-                                   accelerations=pt.accelerations,
-                                   effort=pt.effort,
-                                   time_from_start=Duration(pt.time_from_start.secs, pt.time_from_start.nsecs))
+                                   velocities=velocities,
+                                   accelerations=accelerations,
+                                   effort=effort,
+                                   time_from_start=Duration(secs, nsecs))
 
         result.append(jtp)
 
@@ -65,6 +85,83 @@ def validate_response(response):
                        int(response.error_code))
 
 
+def validate_apply_planning_scene_response(response):
+    """Raise an exception if the planning scene could not be applied."""
+    if not response.success:
+        raise RosError('Failed to apply the planning scene', MoveItErrorCodes.FAILURE)
+
+
+def collision_object_from_collision_meshes(collision_meshes, operation=CollisionObject.ADD):
+    """Create one collision object from collision meshes sharing the same id."""
+    collision_object = CollisionObject.from_collision_mesh(collision_meshes[0])
+    for collision_mesh in collision_meshes[1:]:
+        collision_object.meshes.append(Mesh.from_mesh(collision_mesh.mesh))
+        collision_object.mesh_poses.append(Pose.from_frame(collision_mesh.frame))
+
+    if operation == CollisionObject.MOVE:
+        # Only the poses are needed to move an object
+        collision_object.meshes = []
+
+    collision_object.operation = operation
+    return collision_object
+
+
+def group_collision_meshes_by_id(collision_meshes):
+    """Group collision meshes by id, keeping the order of their first appearance."""
+    groups = []
+    index = {}
+    for collision_mesh in collision_meshes or []:
+        if collision_mesh.id not in index:
+            index[collision_mesh.id] = len(groups)
+            groups.append([])
+        groups[index[collision_mesh.id]].append(collision_mesh)
+    return groups
+
+
+# Shapes of a collision object message, with the key of their poses
+COLLISION_OBJECT_SHAPES = (('primitives', 'primitive_poses'), ('meshes', 'mesh_poses'), ('planes', 'plane_poses'))
+
+
+def collision_object_state(msg, state=None):
+    """Build the state of a collision object after applying a collision object message.
+
+    The state holds the hash and the pose of every shape of the object, its
+    frame and, for attached collision objects, their link and touch links.
+    ``APPEND`` messages add their shapes to the given ``state``, ``MOVE``
+    messages replace the poses of its shapes, in order.
+    """
+    co = msg.get('object', msg)
+    operation = co['operation']
+    if state is None or operation not in (CollisionObject.APPEND, CollisionObject.MOVE):
+        state = dict(frame_id=None, attached=None, shapes=dict((name, []) for name, _ in COLLISION_OBJECT_SHAPES))
+
+    shapes = dict((name, list(state['shapes'][name])) for name, _ in COLLISION_OBJECT_SHAPES)
+    for name, poses in COLLISION_OBJECT_SHAPES:
+        if operation == CollisionObject.MOVE:
+            for i, pose in enumerate(co[poses][:len(shapes[name])]):
+                shapes[name][i] = (shapes[name][i][0], pose)
+        else:
+            shapes[name].extend((canonical_hash(shape), pose) for shape, pose in zip(co[name], co[poses]))
+
+    attached = state['attached']
+    if 'object' in msg and operation != CollisionObject.MOVE:
+        attached = dict((key, value) for key, value in msg.items() if key != 'object')
+
+    return dict(frame_id=co['header']['frame_id'] if operation != CollisionObject.MOVE else state['frame_id'],
+                attached=attached,
+                shapes=shapes)
+
+
+def collision_object_hash(state):
+    """Hash the state of a collision object, regardless of the order of its shapes."""
+    shapes = dict((name, sorted(canonical_hash(shape) for shape in state['shapes'][name])) for name, _ in COLLISION_OBJECT_SHAPES)
+    return canonical_hash(dict(frame_id=state['frame_id'], attached=state['attached'], shapes=shapes))
+
+
+# Number of attached collision objects kept encoded
+ATTACHED_COLLISION_OBJECT_CACHE_SIZE = 8
+
+
 class MoveItPlanner(PlannerBackend):
     """Implement the planner backend interface based on MoveIt!
     """
@@ -92,6 +189,15 @@ class MoveItPlanner(PlannerBackend):
                                             'GetPlanningScene',
                                             GetPlanningSceneRequest,
                                             GetPlanningSceneResponse)
+    # Returns the raw response message, to resynchronize the planning scene mirror
+    GET_PLANNING_SCENE_MSG = ServiceDescription('/get_planning_scene',
+                                                'GetPlanningScene',
+                                                GetPlanningSceneRequest)
+    APPLY_PLANNING_SCENE = ServiceDescription('/apply_planning_scene',
+                                              'ApplyPlanningScene',
+                                              ApplyPlanningSceneRequest,
+                                              ApplyPlanningSceneResponse,
+                                              validate_apply_planning_scene_response)
 
     def init_planner(self):
         self.collision_object_topic = Topic(
@@ -108,7 +214,43 @@ class MoveItPlanner(PlannerBackend):
             queue_size=None)
         self.attached_collision_object_topic.advertise()
 
+    @property
+    def planning_scene_hash(self):
+        """str: Hash of the collision objects published by this client.
+
+        It changes whenever collision meshes are added, appended, moved or
+        removed through this client, and identifies the content of the planning
+        scene, e.g. for caching plans: equal scenes have the same hash, no
+        matter in which order their shapes were added.
+        """
+        objects = getattr(self, '_planning_scene_objects', {})
+        return canonical_hash(sorted((key, state['hash']) for key, state in objects.items()))
+
+    def _track_collision_object(self, key, msg, operation):
+        if not hasattr(self, '_planning_scene_objects'):
+            self._planning_scene_objects = {}
+
+        objects = self._planning_scene_objects
+        object_id = key[1]
+
+        if operation == CollisionObject.REMOVE:
+            if object_id:
+                objects.pop(key, None)
+            else:
+                # An empty id removes all objects of the same kind
+                for k in [k for k in objects if k[0] == key[0]]:
+                    del objects[k]
+        elif operation == CollisionObject.MOVE and key not in objects:
+            # Unknown objects cannot be moved
+            return
+        else:
+            state = collision_object_state(msg, objects.get(key))
+            state['hash'] = collision_object_hash(state)
+            objects[key] = state
+
     def dispose_planner(self):
+        if getattr(self, 'planning_scene_mirror', None):
+            self.planning_scene_mirror.stop()
         if hasattr(self, 'collision_object_topic') and self.collision_object_topic:
             self.collision_object_topic.unadvertise()
         if hasattr(self, 'attached_collision_object_topic') and self.attached_collision_object_topic:
@@ -135,6 +277,79 @@ class MoveItPlanner(PlannerBackend):
 
         return ros_constraints
 
+    @property
+    def request_templates(self):
+        """:class:`RequestTemplateCache`: Templates of the requests, with
+        the parts which only depend on the robot and the group pre-encoded."""
+        if not hasattr(self, '_request_templates'):
+            self._request_templates = RequestTemplateCache()
+        return self._request_templates
+
+    def _start_state(self, base_link, start_configuration, attached_collision_meshes):
+        """Build the encoded start state of a request.
+
+        Attached collision meshes which this client already attached in the
+        planning scene are not sent again, the start state is then a diff
+        on top of the planning scene's robot state, which includes them.
+        """
+        def build():
+            header = Header(frame_id=base_link)
+            joint_state = JointState(header=header, name=list(start_configuration.joint_names))
+            return RobotState(joint_state, MultiDOFJointState(header=header)).msg
+
+        template = self.request_templates.get(('robot_state', base_link, tuple(start_configuration.joint_names)), build)
+
+        is_diff = False
+        attached_collision_objects = []
+        for acm in attached_collision_meshes or []:
+            if self.is_attached_in_planning_scene(acm):
+                is_diff = True
+            else:
+                attached_collision_objects.append(self._encode_attached_collision_mesh(acm).msg)
+
+        return template.fill({('joint_state', 'position'): list(start_configuration.values),
+                              ('attached_collision_objects', ): attached_collision_objects,
+                              ('is_diff', ): is_diff})
+
+    def is_attached_in_planning_scene(self, attached_collision_mesh):
+        """Check if this client attached the collision mesh in the planning scene.
+
+        The attached collision mesh is identified by identity, i.e. the same
+        instance must have been added, e.g. with :meth:`PlanningScene.add_attached_tool`.
+        """
+        attached = getattr(self, '_attached_in_planning_scene', {})
+        return attached.get(attached_collision_mesh.collision_mesh.id) is attached_collision_mesh
+
+    def _set_attached_in_planning_scene(self, id, attached_collision_mesh=None):
+        if not hasattr(self, '_attached_in_planning_scene'):
+            self._attached_in_planning_scene = {}
+
+        if attached_collision_mesh:
+            self._attached_in_planning_scene[id] = attached_collision_mesh
+        elif id:
+            self._attached_in_planning_scene.pop(id, None)
+        else:
+            self._attached_in_planning_scene.clear()
+
+    def _encode_attached_collision_mesh(self, attached_collision_mesh):
+        """Convert an attached collision mesh into a message, cached by content."""
+        if not hasattr(self, '_attached_collision_object_cache'):
+            self._attached_collision_object_cache = OrderedDict()
+
+        cache = self._attached_collision_object_cache
+        collision_mesh = attached_collision_mesh.collision_mesh
+        key = canonical_hash([mesh_hash(collision_mesh.mesh), collision_mesh.id, collision_mesh.frame, collision_mesh.root_name,
+                              attached_collision_mesh.link_name, attached_collision_mesh.touch_links, attached_collision_mesh.weight])
+        encoded = cache.pop(key, None)
+        if encoded is None:
+            encoded = EncodedMsg(AttachedCollisionObject.from_attached_collision_mesh(attached_collision_mesh).msg)
+
+        cache[key] = encoded
+        while len(cache) > ATTACHED_COLLISION_OBJECT_CACHE_SIZE:
+            cache.popitem(last=False)
+
+        return encoded
+
     # ==========================================================================
     # planning services
     # ==========================================================================
@@ -144,69 +359,57 @@ class MoveItPlanner(PlannerBackend):
                                  constraints=None, attempts=8, attached_collision_meshes=None):
         """Asynchronous handler of MoveIt IK service."""
         base_link = robot.model.root.name
-        header = Header(frame_id=base_link)
-        pose = Pose.from_frame(frame)
-        pose_stamped = PoseStamped(header, pose)
-        joint_state = JointState(
-            name=start_configuration.joint_names, position=start_configuration.values, header=header)
-        start_state = RobotState(
-            joint_state, MultiDOFJointState(header=header))
-        if attached_collision_meshes:
-            for acm in attached_collision_meshes:
-                aco = AttachedCollisionObject.from_attached_collision_mesh(acm)
-                start_state.attached_collision_objects.append(aco)
-
-        constraints = self._convert_constraints_to_rosmsg(constraints, header)
-
-        ik_request = PositionIKRequest(group_name=group,
-                                       robot_state=start_state,
-                                       constraints=constraints,
-                                       pose_stamped=pose_stamped,
-                                       avoid_collisions=avoid_collisions,
-                                       attempts=attempts)
+
+        def build():
+            header = Header(frame_id=base_link)
+            return GetPositionIKRequest(PositionIKRequest(group_name=group,
+                                                          pose_stamped=PoseStamped(header, Pose()),
+                                                          avoid_collisions=avoid_collisions,
+                                                          attempts=attempts)).msg
+
+        # Only the start state, the pose and the constraints change from call to call
+        template = self.request_templates.get(('ik', base_link, group, avoid_collisions, attempts), build)
+        values = {('ik_request', 'robot_state'): self._start_state(base_link, start_configuration, attached_collision_meshes).msg,
+                  ('ik_request', 'pose_stamped', 'pose'): pose_msg(frame)}
+        if constraints:
+            values[('ik_request', 'constraints')] = self._convert_constraints_to_rosmsg(constraints, Header(frame_id=base_link)).msg
 
         def convert_to_positions(response):
             callback((response.solution.joint_state.position, response.solution.joint_state.name))
 
-        self.GET_POSITION_IK(self, (ik_request, ), convert_to_positions, errback)
+        self.GET_POSITION_IK(self, template.fill(values), convert_to_positions, errback)
 
     def forward_kinematics_async(self, callback, errback, robot, configuration,
                                  group, ee_link):
         """Asynchronous handler of MoveIt FK service."""
         base_link = robot.model.root.name
-        header = Header(frame_id=base_link)
-        fk_link_names = [ee_link]
-        joint_state = JointState(
-            name=configuration.joint_names, position=configuration.values, header=header)
-        robot_state = RobotState(
-            joint_state, MultiDOFJointState(header=header))
+
+        def build():
+            header = Header(frame_id=base_link)
+            joint_state = JointState(header=header, name=list(configuration.joint_names))
+            return GetPositionFKRequest(header, [ee_link], RobotState(joint_state, MultiDOFJointState(header=header))).msg
+
+        # Only the joint positions change from call to call
+        template = self.request_templates.get(('fk', base_link, ee_link, tuple(configuration.joint_names)), build)
+        request = template.fill({('robot_state', 'joint_state', 'position'): list(configuration.values)})
 
         def convert_to_frame(response):
             callback(response.pose_stamped[0].pose.frame)
 
-        self.GET_POSITION_FK(self, (header, fk_link_names,
-                                    robot_state), convert_to_frame, errback)
+        self.GET_POSITION_FK(self, request, convert_to_frame, errback)
 
     def plan_cartesian_motion_async(self, callback, errback,
                                     robot, frames, start_configuration,
                                     group, max_step, jump_threshold,
                                     avoid_collisions, path_constraints,
-                                    attached_collision_meshes):
+                                    attached_collision_meshes, compression=None):
         """Asynchronous handler of MoveIt cartesian motion planner service."""
         base_link = robot.model.root.name  # use world coords
         ee_link = robot.get_end_effector_link_name(group)
 
         header = Header(frame_id=base_link)
-        waypoints = [Pose.from_frame(frame) for frame in frames]
-        joint_state = JointState(header=header,
-                                 name=start_configuration.joint_names,
-                                 position=start_configuration.values)
-        start_state = RobotState(joint_state, MultiDOFJointState(header=header))
-
-        if attached_collision_meshes:
-            for acm in attached_collision_meshes:
-                aco = AttachedCollisionObject.from_attached_collision_mesh(acm)
-                start_state.attached_collision_objects.append(aco)
+        waypoints = [EncodedMsg(pose_msg(frame)) for frame in frames]
+        start_state = self._start_state(base_link, start_configuration, attached_collision_meshes)
 
         path_constraints = self._convert_constraints_to_rosmsg(path_constraints, header)
 
@@ -229,7 +432,7 @@ class MoveItPlanner(PlannerBackend):
 
                 joint_types = robot.get_joint_types_by_names(trajectory.joint_names)
                 trajectory.points = convert_trajectory_points(
-                    response.solution.joint_trajectory.points, joint_types)
+                    response.solution.joint_trajectory, joint_types)
 
                 start_state = response.start_state.joint_state
                 start_state_types = robot.get_joint_types_by_names(start_state.name)
@@ -240,7 +443,7 @@ class MoveItPlanner(PlannerBackend):
             except Exception as e:
                 errback(e)
 
-        self.GET_CARTESIAN_PATH(self, request, convert_to_trajectory, errback)
+        self.GET_CARTESIAN_PATH(self, request, convert_to_trajectory, errback, compression)
 
     def plan_motion_async(self, callback, errback,
                           robot, goal_constraints, start_configuration, group,
@@ -250,27 +453,21 @@ class MoveItPlanner(PlannerBackend):
                           max_velocity_scaling_factor=1.,
                           max_acceleration_scaling_factor=1.,
                           attached_collision_meshes=None,
-                          workspace_parameters=None):
+                          workspace_parameters=None,
+                          compression=None):
         """Asynchronous handler of MoveIt motion planner service."""
 
         # http://docs.ros.org/jade/api/moveit_core/html/utils_8cpp_source.html
-        # TODO: if list of frames (goals) => receive multiple solutions?
         base_link = robot.model.root.name  # use world coords
 
         header = Header(frame_id=base_link)
-        joint_state = JointState(
-            header=header,
-            name=start_configuration.joint_names,
-            position=start_configuration.values)
-        start_state = RobotState(
-            joint_state, MultiDOFJointState(header=header))
-        if attached_collision_meshes:
-            for acm in attached_collision_meshes:
-                aco = AttachedCollisionObject.from_attached_collision_mesh(acm)
-                start_state.attached_collision_objects.append(aco)
-
-        # convert constraints
-        goal_constraints = [self._convert_constraints_to_rosmsg(goal_constraints, header)]
+        start_state = self._start_state(base_link, start_configuration, attached_collision_meshes)
+
+        # convert constraints, the planner finds a path to any of the goal constraint sets
+        if goal_constraints and isinstance(goal_constraints[0], (list, tuple)):
+            goal_constraints = [self._convert_constraints_to_rosmsg(c, header) for c in goal_constraints]
+        else:
+            goal_constraints = [self._convert_constraints_to_rosmsg(goal_constraints, header)]
         path_constraints = self._convert_constraints_to_rosmsg(path_constraints, header)
 
         if trajectory_constraints is not None:
@@ -297,7 +494,7 @@ class MoveItPlanner(PlannerBackend):
 
             joint_types = robot.get_joint_types_by_names(trajectory.joint_names)
             trajectory.points = convert_trajectory_points(
-                response.trajectory.joint_trajectory.points, joint_types)
+                response.trajectory.joint_trajectory, joint_types)
 
             start_state = response.trajectory_start.joint_state
             start_state_types = robot.get_joint_types_by_names(start_state.name)
@@ -305,21 +502,83 @@ class MoveItPlanner(PlannerBackend):
 
             callback(trajectory)
 
-        self.GET_MOTION_PLAN(self, request, convert_to_trajectory, errback)
+        self.GET_MOTION_PLAN(self, request, convert_to_trajectory, errback, compression)
 
     # ==========================================================================
     # collision objects
     # ==========================================================================
 
-    def get_planning_scene_async(self, callback, errback):
-        request = dict(components=PlanningSceneComponents(PlanningSceneComponents.SCENE_SETTINGS |
-                                                          PlanningSceneComponents.ROBOT_STATE |
-                                                          PlanningSceneComponents.ROBOT_STATE_ATTACHED_OBJECTS |
-                                                          PlanningSceneComponents.WORLD_OBJECT_NAMES |
-                                                          PlanningSceneComponents.WORLD_OBJECT_GEOMETRY |
-                                                          PlanningSceneComponents.ALLOWED_COLLISION_MATRIX |
-                                                          PlanningSceneComponents.OBJECT_COLORS))
-        self.GET_PLANNING_SCENE(self, request, callback, errback)
+    def _planning_scene_request(self):
+        return dict(components=PlanningSceneComponents(PlanningSceneComponents.SCENE_SETTINGS |
+                                                       PlanningSceneComponents.ROBOT_STATE |
+                                                       PlanningSceneComponents.ROBOT_STATE_ATTACHED_OBJECTS |
+                                                       PlanningSceneComponents.WORLD_OBJECT_NAMES |
+                                                       PlanningSceneComponents.WORLD_OBJECT_GEOMETRY |
+                                                       PlanningSceneComponents.ALLOWED_COLLISION_MATRIX |
+                                                       PlanningSceneComponents.OBJECT_COLORS))
+
+    def get_planning_scene_async(self, callback, errback, compression=None, use_mirror=True):
+        mirror = getattr(self, 'planning_scene_mirror', None)
+        if use_mirror and mirror and mirror.is_synchronized:
+            callback(mirror.scene)
+            return
+
+        self.GET_PLANNING_SCENE(self, self._planning_scene_request(), callback, errback, compression)
+
+    def monitor_planning_scene(self, topic_name='/monitored_planning_scene', resync_interval=None, compression=None):
+        """Mirror the planning scene locally from the updates of the scene monitor."""
+        mirror = getattr(self, 'planning_scene_mirror', None)
+        if mirror:
+            return mirror
+
+        def request_scene(callback, errback):
+            self.GET_PLANNING_SCENE_MSG(self, self._planning_scene_request(), callback, errback, compression)
+
+        self.planning_scene_mirror = PlanningSceneMirror(self, request_scene, topic_name, resync_interval, compression)
+        self.planning_scene_mirror.start()
+        return self.planning_scene_mirror
+
+    def apply_planning_scene_diff_async(self, callback, errback,
+                                        collision_meshes=None, moved_collision_meshes=None,
+                                        appended_collision_meshes=None,
+                                        removed_collision_mesh_ids=None,
+                                        attached_collision_meshes=None,
+                                        removed_attached_collision_mesh_ids=None):
+        """Apply changes to the planning scene in one diff message."""
+        collision_objects = []
+        attached_collision_objects = []
+
+        for id in removed_collision_mesh_ids or []:
+            collision_objects.append(CollisionObject(id=id, operation=CollisionObject.REMOVE))
+        for group in group_collision_meshes_by_id(collision_meshes):
+            collision_objects.append(collision_object_from_collision_meshes(group, CollisionObject.ADD))
+        for group in group_collision_meshes_by_id(appended_collision_meshes):
+            collision_objects.append(collision_object_from_collision_meshes(group, CollisionObject.APPEND))
+        for group in group_collision_meshes_by_id(moved_collision_meshes):
+            collision_objects.append(collision_object_from_collision_meshes(group, CollisionObject.MOVE))
+
+        for id in removed_attached_collision_mesh_ids or []:
+            aco = AttachedCollisionObject()
+            aco.object.id = id
+            aco.object.operation = CollisionObject.REMOVE
+            attached_collision_objects.append(aco)
+        for acm in attached_collision_meshes or []:
+            attached_collision_objects.append(AttachedCollisionObject.from_attached_collision_mesh(acm))
+        attached_collision_meshes = dict((acm.collision_mesh.id, acm) for acm in attached_collision_meshes or [])
+
+        scene = PlanningScene(world=PlanningSceneWorld(collision_objects=collision_objects),
+                              robot_state=RobotState(attached_collision_objects=attached_collision_objects, is_diff=True),
+                              is_diff=True)
+
+        def track_changes(response):
+            for co in collision_objects:
+                self._track_collision_object(('world', co.id), co.msg, co.operation)
+            for aco in attached_collision_objects:
+                self._track_collision_object(('attached', aco.object.id), aco.msg, aco.object.operation)
+                self._set_attached_in_planning_scene(aco.object.id, attached_collision_meshes.get(aco.object.id))
+            callback(response.success)
+
+        self.APPLY_PLANNING_SCENE(self, (scene, ), track_changes, errback)
 
     def add_collision_mesh(self, collision_mesh):
         """Add a collision mesh to the planning scene."""
@@ -342,23 +601,43 @@ class MoveItPlanner(PlannerBackend):
             self.init_planner()
 
         collision_object.operation = operation
-        self.collision_object_topic.publish(collision_object.msg)
+        msg = collision_object.msg
+        self._publish(self.collision_object_topic, msg)
+        self._track_collision_object(('world', collision_object.id), msg, operation)
 
     def add_attached_collision_mesh(self, attached_collision_mesh):
         """Add a collision mesh attached to the robot."""
         aco = AttachedCollisionObject.from_attached_collision_mesh(
             attached_collision_mesh)
         self._attached_collision_object(aco, operation=CollisionObject.ADD)
+        self._set_attached_in_planning_scene(aco.object.id, attached_collision_mesh)
 
     def remove_attached_collision_mesh(self, id):
         """Add an attached collision mesh from the robot."""
         aco = AttachedCollisionObject()
         aco.object.id = id
+        self._set_attached_in_planning_scene(id)
         return self._attached_collision_object(aco, operation=CollisionObject.REMOVE)
 
+    def _publish(self, topic, msg):
+        """Publish a message, compressed according to the client's ``publish_compression``."""
+        if getattr(self, 'publish_compression', 'none') != 'png':
+            topic.publish(msg)
+            return
+
+        if not topic.is_advertised:
+            topic.advertise()
+        self.send_on_ready(Message(png_message({'op': 'publish',
+                                                'id': 'publish:%s:%d' % (topic.name, self.id_counter),
+                                                'topic': topic.name,
+                                                'msg': msg,
+                                                'latch': topic.latch})))
+
     def _attached_collision_object(self, attached_collision_object, operation=CollisionObject.ADD):
         if not hasattr(self, 'attached_collision_object_topic') or not self.attached_collision_object_topic:
             self.init_planner()
 
         attached_collision_object.object.operation = operation
-        self.attached_collision_object_topic.publish(attached_collision_object.msg)
+        msg = attached_collision_object.msg
+        self._publish(self.attached_collision_object_topic, msg)
+        self._track_collision_object(('attached', attached_collision_object.object.id), msg, operation)
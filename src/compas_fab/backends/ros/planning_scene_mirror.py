@@ -0,0 +1,315 @@
+"""
+Internal implementation of a local mirror of MoveIt!'s planning scene
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import logging
+import threading
+import time
+
+from roslibpy import Topic
+
+from compas_fab.backends.ros.messages import CollisionObject
+from compas_fab.backends.ros.messages import PlanningScene
+
+LOGGER = logging.getLogger('compas_fab.backends.ros.planning_scene_mirror')
+
+__all__ = [
+    'PlanningSceneMirror',
+]
+
+POSE_FIELDS = ('primitive_poses', 'mesh_poses', 'plane_poses')
+SHAPE_FIELDS = ('primitives', 'meshes', 'planes') + POSE_FIELDS
+
+
+class PlanningSceneMirror(object):
+    """Local copy of the planning scene kept up to date from the scene monitor.
+
+    The mirror subscribes to the planning scene updates published by MoveIt!'s
+    planning scene monitor and applies them to a local copy of the scene. The
+    full scene is only requested from the ``/get_planning_scene`` service to
+    resynchronize: when the mirror starts, when an update cannot be applied
+    consistently, and optionally after ``resync_interval`` seconds.
+
+    Parameters
+    ----------
+    client : :class:`compas_fab.backends.RosClient`
+        The client connected to the **rosbridge**.
+    request_scene : callable
+        Function with ``callback`` and ``errback`` arguments that requests
+        the full planning scene, and invokes the callback with the raw
+        ``GetPlanningScene`` response message.
+    topic_name : str, optional
+        Topic of the planning scene updates. Defaults to ``/monitored_planning_scene``.
+    resync_interval : float, optional
+        Number of seconds after which the scene is requested again in full,
+        to recover from missed updates. Defaults to never.
+    compression : str, optional
+        Compression of the updates sent by the **rosbridge**. Defaults to the
+        client's compression.
+
+    Attributes
+    ----------
+    version : int
+        Counter incremented whenever the mirrored scene changes.
+    stats : dict
+        Counters of received ``updates``, of ``resyncs`` and of updates
+        which could not be applied, the ``inconsistencies``.
+    """
+
+    def __init__(self, client, request_scene, topic_name='/monitored_planning_scene', resync_interval=None, compression=None):
+        self.client = client
+        self.request_scene = request_scene
+        self.topic_name = topic_name
+        self.resync_interval = resync_interval
+        self.compression = compression or getattr(client, 'compression', None)
+        self.version = 0
+        self.stats = dict(updates=0, resyncs=0, inconsistencies=0)
+        self.topic = None
+
+        self._lock = threading.RLock()
+        self._synchronized = threading.Event()
+        self._resyncing = False
+        self._pending = []
+        self._last_resync = None
+        self._snapshot = None
+        self._reset({})
+
+    @property
+    def is_synchronized(self):
+        """bool: ``True`` if the mirror holds a complete copy of the scene."""
+        return self._synchronized.is_set()
+
+    @property
+    def collision_object_ids(self):
+        """list of str: Identifiers of the collision objects in the world."""
+        with self._lock:
+            return list(self._collision_objects)
+
+    @property
+    def attached_collision_object_ids(self):
+        """list of str: Identifiers of the collision objects attached to the robot."""
+        with self._lock:
+            return list(self._attached_collision_objects)
+
+    @property
+    def scene(self):
+        """:class:`compas_fab.backends.ros.messages.PlanningScene`: Snapshot
+        of the mirrored scene. It is only rebuilt when the scene has changed."""
+        with self._lock:
+            if self._snapshot is None or self._snapshot[0] != self.version:
+                self._snapshot = (self.version, PlanningScene.from_msg(self.scene_msg()))
+            return self._snapshot[1]
+
+    def start(self):
+        """Subscribe to the planning scene updates and request the full scene."""
+        if self.topic:
+            return
+
+        self.topic = Topic(self.client, self.topic_name, 'moveit_msgs/PlanningScene',
+                           compression=None if self.compression == 'none' else self.compression)
+        self.topic.subscribe(self.receive)
+        self.resync()
+
+    def stop(self):
+        """Unsubscribe from the planning scene updates."""
+        if self.topic:
+            self.topic.unsubscribe()
+            self.topic = None
+        self._synchronized.clear()
+
+    def wait_until_synchronized(self, timeout=None):
+        """Wait until the mirror holds a complete copy of the scene.
+
+        Parameters
+        ----------
+        timeout : float, optional
+            Maximum number of seconds to wait. Defaults to waiting indefinitely.
+
+        Returns
+        -------
+        bool
+            ``True`` if the mirror is synchronized.
+        """
+        return self._synchronized.wait(timeout)
+
+    def resync(self):
+        """Request the full planning scene and replace the mirrored scene with it.
+
+        Updates received while the request is in flight are applied after the
+        full scene, since they might not be included in it.
+        """
+        with self._lock:
+            if self._resyncing:
+                return
+            self._resyncing = True
+            self._pending = []
+
+        self.request_scene(self._receive_full_scene, self._resync_failed)
+
+    def _receive_full_scene(self, response):
+        with self._lock:
+            self._reset(response['scene'])
+            self._resyncing = False
+            self._last_resync = time.time()
+            self.stats['resyncs'] += 1
+
+            pending, self._pending = self._pending, []
+            consistent = all([self._apply(msg) for msg in pending])
+            self.version += 1
+            if not consistent:
+                self.stats['inconsistencies'] += 1
+
+        if consistent:
+            self._synchronized.set()
+        else:
+            self.resync()
+
+    def _resync_failed(self, error):
+        LOGGER.warning('Could not resynchronize the planning scene: %s', error)
+        with self._lock:
+            self._resyncing = False
+
+    def receive(self, msg):
+        """Apply a planning scene message received from the scene monitor.
+
+        Parameters
+        ----------
+        msg : dict
+            A ``moveit_msgs/PlanningScene`` message, either complete or a diff.
+        """
+        with self._lock:
+            self.stats['updates'] += 1
+            if self._resyncing:
+                self._pending.append(msg)
+                return
+
+            consistent = self._apply(msg)
+            self.version += 1
+            if not consistent:
+                self.stats['inconsistencies'] += 1
+                self._synchronized.clear()
+
+            stale = self.resync_interval is not None and \
+                self._last_resync is not None and time.time() - self._last_resync > self.resync_interval
+
+        # Also retry after a failed resynchronization
+        if stale or not self.is_synchronized:
+            self.resync()
+
+    def _reset(self, msg):
+        robot_state = msg.get('robot_state', {})
+        world = msg.get('world', {})
+        self._scene = dict((key, msg.get(key, default)) for key, default in (
+            ('name', ''), ('robot_model_name', ''), ('fixed_frame_transforms', []),
+            ('allowed_collision_matrix', dict(entry_names=[], entry_values=[], default_entry_names=[], default_entry_values=[])),
+            ('link_padding', []), ('link_scale', [])))
+        header = dict(seq=0, stamp=dict(secs=0, nsecs=0), frame_id='')
+        self._joint_state = robot_state.get('joint_state', dict(header=header, name=[], position=[], velocity=[], effort=[]))
+        self._multi_dof_joint_state = robot_state.get('multi_dof_joint_state', dict(header=header, joint_names=[], transforms=[], twist=[], wrench=[]))
+        self._octomap = world.get('octomap', {})
+        self._collision_objects = dict((co['id'], co) for co in world.get('collision_objects', []))
+        self._attached_collision_objects = dict((aco['object']['id'], aco) for aco in robot_state.get('attached_collision_objects', []))
+        self._object_colors = dict((color['id'], color) for color in msg.get('object_colors', []))
+
+    def _apply(self, msg):
+        """Apply a message to the mirrored scene, and return ``False`` if it is inconsistent with it."""
+        if not msg.get('is_diff'):
+            self._reset(msg)
+            return True
+
+        consistent = True
+        for key in ('name', 'robot_model_name'):
+            if msg.get(key):
+                self._scene[key] = msg[key]
+        for key in ('fixed_frame_transforms', 'link_padding', 'link_scale'):
+            if msg.get(key):
+                self._scene[key] = msg[key]
+        if msg.get('allowed_collision_matrix', {}).get('entry_names'):
+            self._scene['allowed_collision_matrix'] = msg['allowed_collision_matrix']
+        for color in msg.get('object_colors', []):
+            self._object_colors[color['id']] = color
+
+        world = msg.get('world', {})
+        for co in world.get('collision_objects', []):
+            consistent = self._apply_collision_object(co) and consistent
+        if world.get('octomap', {}).get('octomap', {}).get('data'):
+            self._octomap = world['octomap']
+
+        robot_state = msg.get('robot_state')
+        if robot_state:
+            if not robot_state.get('is_diff'):
+                self._attached_collision_objects = {}
+            self._apply_joint_state(robot_state.get('joint_state'))
+            for aco in robot_state.get('attached_collision_objects', []):
+                self._apply_attached_collision_object(aco)
+
+        return consistent
+
+    def _apply_collision_object(self, co):
+        id, operation = co['id'], co.get('operation', CollisionObject.ADD)
+        existing = self._collision_objects.get(id)
+
+        if operation == CollisionObject.REMOVE:
+            if id:
+                self._collision_objects.pop(id, None)
+            else:
+                self._collision_objects.clear()
+        elif operation == CollisionObject.APPEND and existing:
+            self._collision_objects[id] = dict(existing, **dict((field, existing.get(field, []) + co.get(field, [])) for field in SHAPE_FIELDS))
+        elif operation == CollisionObject.MOVE:
+            if not existing:
+                LOGGER.debug('Cannot move unknown collision object %s', id)
+                return False
+            self._collision_objects[id] = dict(existing, **dict((field, co[field]) for field in POSE_FIELDS if co.get(field)))
+        else:
+            self._collision_objects[id] = dict(co, operation=CollisionObject.ADD)
+
+        return True
+
+    def _apply_attached_collision_object(self, aco):
+        id, link_name = aco['object']['id'], aco.get('link_name')
+        if aco['object'].get('operation', CollisionObject.ADD) == CollisionObject.REMOVE:
+            # An empty id detaches all objects, of one link if it is given
+            for key in [key for key, item in self._attached_collision_objects.items()
+                        if key == id or (not id and (not link_name or item['link_name'] == link_name))]:
+                del self._attached_collision_objects[key]
+        else:
+            self._attached_collision_objects[id] = aco
+
+    def _apply_joint_state(self, joint_state):
+        if not joint_state or not joint_state.get('name'):
+            return
+        names = list(self._joint_state['name'])
+        positions = list(self._joint_state['position'])
+        for name, position in zip(joint_state['name'], joint_state.get('position', [])):
+            if name in names:
+                positions[names.index(name)] = position
+            else:
+                names.append(name)
+                positions.append(position)
+        self._joint_state = dict(self._joint_state, name=names, position=positions)
+
+    def scene_msg(self):
+        """Build the complete planning scene message of the mirrored scene.
+
+        Returns
+        -------
+        dict
+            A ``moveit_msgs/PlanningScene`` message. It must not be modified.
+        """
+        # Updates replace the stored items instead of modifying them,
+        # so the message can share them with the mirror
+        with self._lock:
+            msg = dict(self._scene)
+            msg['robot_state'] = dict(joint_state=self._joint_state,
+                                      multi_dof_joint_state=self._multi_dof_joint_state,
+                                      attached_collision_objects=list(self._attached_collision_objects.values()),
+                                      is_diff=False)
+            msg['object_colors'] = list(self._object_colors.values())
+            msg['world'] = dict(collision_objects=list(self._collision_objects.values()),
+                                octomap=self._octomap)
+            msg['is_diff'] = False
+            return msg
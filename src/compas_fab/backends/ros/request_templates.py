@@ -0,0 +1,125 @@
+"""
+Internal implementation of pre-encoded service request messages
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import threading
+from collections import OrderedDict
+
+__all__ = [
+    'EncodedMsg',
+    'RequestTemplate',
+    'RequestTemplateCache',
+    'pose_msg',
+]
+
+
+class EncodedMsg(object):
+    """Message encoded once and shared by several requests."""
+
+    def __init__(self, msg):
+        self.msg = msg
+
+
+def pose_msg(frame):
+    """Encode a frame as ``geometry_msgs/Pose`` message."""
+    qw, qx, qy, qz = frame.quaternion
+    x, y, z = frame.point
+    return dict(position=dict(x=x, y=y, z=z),
+                orientation=dict(x=qx, y=qy, z=qz, w=qw))
+
+
+class RequestTemplate(object):
+    """Request message of which only some fields change from call to call.
+
+    The static parts of the message, e.g. header, joint names or group name,
+    are encoded once. Filling in the template copies only the dictionaries
+    along the paths of the replaced fields, everything else is shared with
+    the template and must not be modified.
+
+    Parameters
+    ----------
+    msg : dict
+        The encoded request message.
+    """
+
+    def __init__(self, msg):
+        self.msg = msg
+
+    def fill(self, values):
+        """Build a request from the template.
+
+        Parameters
+        ----------
+        values : dict
+            Values of the varying fields, by path, i.e. the tuple of keys
+            of the field in the message.
+
+        Returns
+        -------
+        :class:`EncodedMsg`
+            The request message.
+        """
+        msg = dict(self.msg)
+        for path, value in values.items():
+            node = msg
+            for key in path[:-1]:
+                node[key] = dict(node[key])
+                node = node[key]
+            node[path[-1]] = value
+        return EncodedMsg(msg)
+
+
+class RequestTemplateCache(object):
+    """Request templates by key, built on first use.
+
+    Parameters
+    ----------
+    max_size : int, optional
+        Maximum number of templates, the least recently used are discarded.
+        Defaults to 64.
+
+    Attributes
+    ----------
+    stats : dict
+        Counters of templates reused, the ``hits``, and built, the ``misses``.
+    """
+
+    def __init__(self, max_size=64):
+        self.max_size = max_size
+        self.stats = dict(hits=0, misses=0)
+        self._templates = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, build):
+        """Get the template of a key.
+
+        Parameters
+        ----------
+        key : tuple
+            The static parts of the request.
+        build : callable
+            Function returning the encoded template message, if it is not cached.
+
+        Returns
+        -------
+        :class:`RequestTemplate`
+        """
+        with self._lock:
+            template = self._templates.pop(key, None)
+            if template is not None:
+                self.stats['hits'] += 1
+                self._templates[key] = template
+                return template
+
+        template = RequestTemplate(build())
+
+        with self._lock:
+            self.stats['misses'] += 1
+            self._templates[key] = template
+            while len(self._templates) > self.max_size:
+                self._templates.popitem(last=False)
+
+        return template
@@ -5,11 +5,16 @@ import socket
 from timeit import default_timer as timer
 
 from compas.geometry import Frame
+from compas.geometry import Transformation
 from compas.geometry import matrix_from_frame
+from compas.geometry import transform_points
 
 from compas_fab.backends.exceptions import BackendError
 from compas_fab.backends.vrep.remote_api import vrep
+from compas_fab.robots import CollisionMesh
 from compas_fab.robots import Configuration
+from compas_fab.robots.plan_cache import canonical_hash
+from compas_fab.robots.plan_cache import mesh_hash
 
 DEFAULT_SCALE = 1.
 DEFAULT_OP_MODE = vrep.simx_opmode_blocking
@@ -46,6 +51,10 @@ class VrepClient(object):
         scale (:obj:`int`): Scaling of the model. Defaults to meters (``1``).
         lua_script (:obj:`str`): Name of the LUA script on the V-REP scene.
         debug (:obj:`bool`): True to enable debug messages, False otherwise.
+        pipelined (:obj:`bool`): True to send the calls which return no result
+            without waiting for their reply, to group removals in one message,
+            and to read object poses and joint positions from streamed buffers;
+            False to wait for the reply of every call. Defaults to ``False``.
 
     Examples:
 
@@ -62,7 +71,7 @@ class VrepClient(object):
                           'prm', 'prrt', 'rrt', 'rrtconnect', 'rrtstar',
                           'sbl', 'stride', 'trrt')
 
-    def __init__(self, host='127.0.0.1', port=19997, scale=DEFAULT_SCALE, lua_script='RFL', debug=False):
+    def __init__(self, host='127.0.0.1', port=19997, scale=DEFAULT_SCALE, lua_script='RFL', debug=False, pipelined=False):
         super(VrepClient, self).__init__()
         self.client_id = None
         self.host = resolve_host(host)
@@ -70,9 +79,14 @@ class VrepClient(object):
         self.default_timeout_in_ms = -50000000
         self.thread_cycle_in_ms = 5
         self.debug = debug
+        self.pipelined = pipelined
         self.scale = float(scale)
         self.lua_script = lua_script
         self._added_handles = []
+        self._script_functions = {}
+        self._object_handles = {}
+        self._streams = set()
+        self._uploaded_meshes = {}
 
     def __enter__(self):
         # Stop existing simulation, if any
@@ -104,6 +118,10 @@ class VrepClient(object):
 
         # Objects are removed by V-REP itself when simulation stops
         self._added_handles = []
+        self._script_functions = {}
+        self._object_handles = {}
+        self._streams = set()
+        self._uploaded_meshes = {}
 
         if self.debug:
             LOG.debug('Disconnected from V-REP')
@@ -117,19 +135,120 @@ class VrepClient(object):
         """
         return self.client_id is not None and self.client_id != -1
 
+    @property
+    def _send_mode(self):
+        """Operation mode of the calls which return no result."""
+        return vrep.simx_opmode_oneshot if self.pipelined else DEFAULT_OP_MODE
+
+    def synchronize(self):
+        """Waits until V-REP processed all the calls sent so far.
+
+        In pipelined mode, calls which return no result are sent without
+        waiting for their reply. This method waits for one round trip to
+        V-REP, after which these calls have been executed and the streamed
+        values they changed have been received.
+
+        Returns:
+            int: Round trip time in milliseconds.
+        """
+        start = timer() if self.debug else None
+        _res, ping_time = vrep.simxGetPingTime(self.client_id)
+        if self.debug:
+            LOG.debug('Execution time: synchronize=%.2f', timer() - start)
+        return ping_time
+
     def get_object_handle(self, object_name):
         """Gets the object handle (identifier) for a given object name.
 
+        Handles are kept for the duration of the connection, so every name
+        is only looked up once.
+
         Args:
             object_name (:obj:`str`): Name of the object.
 
         Returns:
             int: Object handle.
         """
-        _res, handle = vrep.simxGetObjectHandle(self.client_id,
-                                                object_name,
-                                                DEFAULT_OP_MODE)
-        return handle
+        if object_name not in self._object_handles:
+            res, handle = vrep.simxGetObjectHandle(self.client_id,
+                                                   object_name,
+                                                   DEFAULT_OP_MODE)
+            if res != vrep.simx_return_ok:
+                return handle
+            self._object_handles[object_name] = handle
+
+        return self._object_handles[object_name]
+
+    def get_object_frames(self, object_handles):
+        """Gets a dictionary of the frames of objects keyed by object handle.
+
+        In pipelined mode, the poses of the objects are streamed by V-REP
+        from the first call onwards, and later calls read them from the
+        received values without a round trip.
+
+        Args:
+            object_handles (:obj:`list` of :obj:`int`): Object handles (identifiers)
+                to retrieve frames from.
+
+        Returns:
+            dict: Dictionary of :class:`Frame` in world coordinates.
+        """
+        reads = []
+        for handle in object_handles:
+            reads.append((vrep.simxGetObjectPosition, handle, -1))
+            reads.append((vrep.simxGetObjectOrientation, handle, -1))
+        values = self._read_streamed(reads)
+
+        return dict((handle, vrep_position_to_frame(position, euler_angles, self.scale))
+                    for handle, position, euler_angles in zip(object_handles, values[0::2], values[1::2]))
+
+    def get_joint_positions(self, joint_handles):
+        """Gets the positions of joints of the 3D model.
+
+        In pipelined mode, the positions are streamed by V-REP from the first
+        call onwards, and later calls read them from the received values
+        without a round trip.
+
+        Args:
+            joint_handles (:obj:`list` of :obj:`int`): Joint handles (identifiers).
+
+        Returns:
+            list: Positions of the joints, in radians for revolute joints
+            and in V-REP units for prismatic joints.
+        """
+        return self._read_streamed([(vrep.simxGetJointPosition, handle) for handle in joint_handles])
+
+    def _read_streamed(self, reads):
+        """Reads values with the ``simxGet*`` functions of the remote API.
+
+        Every read is a tuple of the function and its arguments following the
+        client id. In pipelined mode, the first read of a value starts streaming
+        it, and all values are then read from the input buffer.
+        """
+        if not self.pipelined:
+            return [self._read_value(read, DEFAULT_OP_MODE) for read in reads]
+
+        started = False
+        for read in reads:
+            if read not in self._streams:
+                read[0](self.client_id, *(read[1:] + (vrep.simx_opmode_streaming, )))
+                self._streams.add(read)
+                started = True
+        if started:
+            self.synchronize()
+
+        return [self._read_value(read, vrep.simx_opmode_buffer) for read in reads]
+
+    def _read_value(self, read, op_mode):
+        res, value = read[0](self.client_id, *(read[1:] + (op_mode, )))
+        if res == vrep.simx_return_novalue_flag and op_mode == vrep.simx_opmode_buffer:
+            self.synchronize()
+            res, value = read[0](self.client_id, *(read[1:] + (op_mode, )))
+
+        if res != vrep.simx_return_ok:
+            raise VrepError('Failed to read value of object %d' % read[1], res)
+
+        return value
 
     def get_object_matrices(self, object_handles):
         """Gets a dictionary of matrices keyed by object handle.
@@ -155,6 +274,117 @@ class VrepClient(object):
         _res, _, matrices, _, _ = self.run_child_script('getShapeMatrices', object_handles, [], [])
         return dict([(object_handles[i // 12], floats_from_vrep(matrices[i:i + 12], self.scale)) for i in range(0, len(matrices), 12)])
 
+    def get_path_object_matrices(self, robot, path, object_handles):
+        """Gets the matrices of objects for every configuration of a path, in one call.
+
+        The robot is moved through the path by the ``getPathShapeMatrices``
+        function of the scene's child script, which receives the robot index,
+        the number of configurations and the object handles as integers, the
+        joint values of all configurations as floats, and returns the 12 values
+        of the matrix of every object for every configuration. If the scene's
+        script does not define it, the robot is moved and the matrices are
+        read configuration by configuration. The function is listed in the
+        documentation of the V-REP backend, with instructions to add it to a
+        scene.
+
+        Args:
+            robot (:class:`compas_fab.robots.Robot`): Robot instance to move.
+            path (:obj:`list` of :class:`Configuration`): Configurations of the robot.
+            object_handles (:obj:`list` of :obj:`int`): Object handles (identifiers)
+                to retrieve matrices from.
+
+        Returns:
+            list: One dictionary of matrices keyed by object handle per configuration,
+            see :meth:`get_object_matrices`.
+        """
+        assert_robot(robot)
+
+        if not path:
+            return []
+
+        self.set_robot_metric(robot, [0.0] * len(path[0].values))
+
+        values = []
+        for config in path:
+            values.extend(config_to_vrep(config, self.scale))
+
+        object_handles = list(object_handles)
+        result = self._run_batched_script('getPathShapeMatrices',
+                                          [robot.model.attr['index'], len(path)] + object_handles,
+                                          values, ['robot' + robot.name])
+        matrices = result[2] if result else []
+        if result and len(matrices) == 12 * len(path) * len(object_handles):
+            size = 12 * len(object_handles)
+            return [dict([(object_handles[i // 12], floats_from_vrep(matrices[start + i:start + i + 12], self.scale))
+                          for i in range(0, size, 12)])
+                    for start in range(0, len(matrices), size)]
+
+        path_matrices = []
+        for config in path:
+            self.run_child_script('moveRobotFK', [], config_to_vrep(config, self.scale), ['robot' + robot.name])
+            path_matrices.append(self.get_object_matrices(object_handles))
+        return path_matrices
+
+    def get_shape_meshes(self, shape_handles):
+        """Gets the meshes of shapes, in one call.
+
+        The ``getShapeMeshes`` function of the scene's child script receives
+        the shape handles and returns, as integers, the number of vertex
+        coordinates and face indices of every shape followed by the face
+        indices of all shapes, and the vertex coordinates of all shapes as
+        floats. If the scene's script does not define it, the meshes are read
+        shape by shape with ``getShapeMesh``. The function is listed in the
+        documentation of the V-REP backend, with instructions to add it to a
+        scene.
+
+        Args:
+            shape_handles (:obj:`list` of :obj:`int`): Shape handles (identifiers).
+
+        Returns:
+            list: Tuples of the flat lists of vertex coordinates and of face
+            indices of every shape, in the coordinate frame of the shape.
+        """
+        shape_handles = list(shape_handles)
+        if not shape_handles:
+            return []
+
+        result = self._run_batched_script('getShapeMeshes', shape_handles, [], [])
+        if result:
+            _, ints, floats, _, _ = result
+            counts, faces = ints[:2 * len(shape_handles)], ints[2 * len(shape_handles):]
+            meshes = []
+            vertex_start, face_start = 0, 0
+            for vertex_count, face_count in zip(counts[0::2], counts[1::2]):
+                meshes.append((floats[vertex_start:vertex_start + vertex_count], faces[face_start:face_start + face_count]))
+                vertex_start += vertex_count
+                face_start += face_count
+            if vertex_start == len(floats) and face_start == len(faces):
+                return meshes
+
+        meshes = []
+        for handle in shape_handles:
+            _, faces, vertices, _, _ = self.run_child_script('getShapeMesh', [handle], [], [])
+            meshes.append((vertices, faces))
+        return meshes
+
+    def _run_batched_script(self, function_name, in_ints, in_floats, in_strings):
+        """Runs a batched function of the scene's child script.
+
+        Returns the result of the script call, or ``None`` if it failed.
+        Functions which fail on their first call are assumed to be missing in
+        the scene's script, and are not called again on this connection.
+        """
+        if self._script_functions.get(function_name) is False:
+            return None
+
+        result = self.run_child_script(function_name, in_ints, in_floats, in_strings)
+        if function_name not in self._script_functions:
+            self._script_functions[function_name] = result[0] == 0
+            if result[0] != 0:
+                LOG.info('The scene script does not support %s, calls will not be batched', function_name)
+
+        return result if result[0] == 0 else None
+
     def get_all_visible_handles(self):
         """Gets a list of object handles (identifiers) for all visible
         shapes of the 3D model.
@@ -179,11 +409,7 @@ class VrepClient(object):
         """
         assert_robot(robot)
 
-        vrep.simxCallScriptFunction(self.client_id,
-                                    self.lua_script,
-                                    CHILD_SCRIPT_TYPE, 'setTheMetric',
-                                    [robot.model.attr['index']], metric_values, [],
-                                    bytearray(), DEFAULT_OP_MODE)
+        self._send_child_script('setTheMetric', [robot.model.attr['index']], metric_values, [])
 
     def set_robot_pose(self, robot, frame):
         """Moves the robot to a given pose, specified as a frame.
@@ -233,8 +459,8 @@ class VrepClient(object):
         values = config_to_vrep(config, self.scale)
 
         self.set_robot_metric(robot, [0.0] * len(config.values))
-        self.run_child_script('moveRobotFK',
-                              [], values, ['robot' + robot.name])
+        self._send_child_script('moveRobotFK',
+                                [], values, ['robot' + robot.name])
 
     def get_robot_config(self, robot):
         """Gets the current configuration of the specified robot.
@@ -315,18 +541,108 @@ class VrepClient(object):
         return [config_from_vrep(states[i:i + joints], self.scale)
                 for i in range(0, len(states), joints)]
 
+    def inverse_kinematics_many(self, robot, goal_frames, metric_values=None, gantry_joint_limits=None, arm_joint_limits=None, max_trials=None, max_results=1):
+        """Calculates inverse kinematics to find valid robot configurations for many goal frames, in one call.
+
+        The states are searched by the ``searchRobotStatesMany`` function of
+        the scene's child script, which receives the robot index, the number
+        of trials, the maximum number of results, the number of frames and
+        the number of joints as integers, and the poses of all frames as
+        floats. It returns the number of states found for every frame as
+        integers, and the joint values of all states as floats. If the scene's
+        script does not define it, the states are searched frame by frame.
+        The function is listed in the documentation of the V-REP backend,
+        with instructions to add it to a scene.
+
+        Args:
+            robot (:class:`compas_fab.robots.Robot`): Robot instance.
+            goal_frames (:obj:`list` of :class:`Frame`): Target or goal frames.
+            metric_values (:obj:`list` of :obj:`float`): List containing one value
+                per configurable joint. Each value ranges from 0 to 1,
+                where 1 indicates the axis/joint is blocked and cannot
+                move during inverse kinematic solving.
+            gantry_joint_limits (:obj:`list` of `float`): List of 6 floats defining the upper/lower limits of
+                gantry joints. Use this if you want to restrict the area in which to search for states.
+            arm_joint_limits (:obj:`list` of `float`): List of 12 floats defining the upper/lower limits of
+                arm joints. Use this if you want to restrict the working area in which to search for states.
+            max_trials (:obj:`int`): Number of trials to run. Set to ``None``
+                to search again for the frames without valid states.
+            max_results (:obj:`int`): Maximum number of result states to return per frame.
+
+        Returns:
+            list: One list of :class:`Configuration` objects per goal frame,
+            empty if no collision-free configuration was found for the frame.
+        """
+        assert_robot(robot)
+
+        joints = len(robot.get_configurable_joints())
+        if not metric_values:
+            metric_values = [0.1] * joints
+
+        self.set_robot_metric(robot, metric_values)
+
+        states = [[] for _ in goal_frames]
+        pending = list(range(len(goal_frames)))
+        result = None
+
+        # Like for a single frame, the search is repeated at most 20 times
+        for _ in range(20):
+            if not pending:
+                break
+
+            poses = []
+            for i in pending:
+                poses.extend(frame_to_vrep_pose(goal_frames[i], self.scale))
+
+            result = self._run_batched_script('searchRobotStatesMany',
+                                              [robot.model.attr['index'], max_trials or 1, max_results, len(pending), joints],
+                                              poses, self._joint_limits_to_vrep(gantry_joint_limits, arm_joint_limits))
+            if not result:
+                break
+
+            counts, values = result[1], result[2]
+            if len(counts) != len(pending) or sum(counts) * joints != len(values):
+                raise VrepError('Unexpected number of robot states found', -1)
+
+            start = 0
+            for i, count in zip(pending, counts):
+                states[i] = values[start:start + count * joints]
+                start += count * joints
+
+            pending = [i for i in pending if not states[i]]
+            if max_trials:
+                break
+
+        if not result:
+            for i in pending:
+                try:
+                    states[i] = self._find_raw_robot_states(robot, frame_to_vrep_pose(goal_frames[i], self.scale),
+                                                            gantry_joint_limits, arm_joint_limits, max_trials, max_results)
+                except VrepError:
+                    LOG.info('No valid robot states found for frame %d', i)
+
+        LOG.info('Found valid robot states for %d of %d frames', sum(1 for frame_states in states if frame_states), len(goal_frames))
+
+        return [[config_from_vrep(frame_states[i:i + joints], self.scale) for i in range(0, len(frame_states), joints)]
+                for frame_states in states]
+
+    def _joint_limits_to_vrep(self, gantry_joint_limits, arm_joint_limits):
+        if not gantry_joint_limits and not arm_joint_limits:
+            return []
+
+        joint_limits = []
+        joint_limits.extend(floats_to_vrep(gantry_joint_limits or [], self.scale))
+        joint_limits.extend(arm_joint_limits or [])
+        return [','.join(map(str, joint_limits))]
+
     def _find_raw_robot_states(self, robot, goal_vrep_pose, gantry_joint_limits, arm_joint_limits, max_trials=None, max_results=1):
         i = 0
         final_states = []
         retry_until_success = True if not max_trials else False
+        joints = len(robot.get_configurable_joints())
 
         while True:
-            string_param_list = []
-            if gantry_joint_limits or arm_joint_limits:
-                joint_limits = []
-                joint_limits.extend(floats_to_vrep(gantry_joint_limits or [], self.scale))
-                joint_limits.extend(arm_joint_limits or [])
-                string_param_list.append(','.join(map(str, joint_limits)))
+            string_param_list = self._joint_limits_to_vrep(gantry_joint_limits, arm_joint_limits)
 
             res, _, states, _, _ = self.run_child_script('searchRobotStates',
                                                          [robot.model.attr['index'],
@@ -343,7 +659,7 @@ class VrepClient(object):
             final_states.extend(states)
 
             if len(final_states):
-                LOG.info('Found %d valid robot states', len(final_states) // 9)
+                LOG.info('Found %d valid robot states', len(final_states) // joints)
                 break
             else:
                 LOG.info('No valid robot states found, will retry.')
@@ -387,16 +703,17 @@ class VrepClient(object):
         if planner_id not in self.SUPPORTED_PLANNERS:
             raise ValueError('Unsupported planner_id. Must be one of: ' + str(self.SUPPORTED_PLANNERS))
 
+        # In pipelined mode, the metric is sent along with the first mesh
         first_start = timer() if self.debug else None
-        if collision_meshes:
-            self.add_meshes(collision_meshes)
+        self.set_robot_metric(robot, metric_values)
         if self.debug:
-            LOG.debug('Execution time: add_meshes=%.2f', timer() - first_start)
+            LOG.debug('Execution time: set_robot_metric=%.2f', timer() - first_start)
 
         start = timer() if self.debug else None
-        self.set_robot_metric(robot, metric_values)
+        if collision_meshes:
+            self._add_meshes(collision_meshes, movable=True)
         if self.debug:
-            LOG.debug('Execution time: set_robot_metric=%.2f', timer() - start)
+            LOG.debug('Execution time: add_meshes=%.2f', timer() - start)
 
         if 'target_type' not in goal:
             raise ValueError('Invalid goal type, you are using an internal function but passed incorrect args')
@@ -414,12 +731,7 @@ class VrepClient(object):
                 LOG.debug('Execution time: search_robot_states=%.2f', timer() - start)
 
         start = timer() if self.debug else None
-        string_param_list = [planner_id]
-        if gantry_joint_limits or arm_joint_limits:
-            joint_limits = []
-            joint_limits.extend(floats_to_vrep(gantry_joint_limits or [], self.scale))
-            joint_limits.extend(arm_joint_limits or [])
-            string_param_list.append(','.join(map(str, joint_limits)))
+        string_param_list = [planner_id] + self._joint_limits_to_vrep(gantry_joint_limits, arm_joint_limits)
 
         if self.debug:
             LOG.debug('About to execute path planner: planner_id=%s, trials=%d, shallow_state_search=%s, optimize_path_length=%s',
@@ -458,8 +770,9 @@ class VrepClient(object):
                 per configurable joint. Each value ranges from 0 to 1,
                 where 1 indicates the axis/joint is blocked and cannot
                 move during inverse kinematic solving.
-            collision_meshes (:obj:`list` of :class:`compas.datastructures.Mesh`): Collision meshes
-                to be taken into account when calculating the motion plan.
+            collision_meshes (:obj:`list` of :class:`compas.datastructures.Mesh` or :class:`compas_fab.robots.CollisionMesh`): Collision meshes
+                to be taken into account when calculating the motion plan. They are uploaded once
+                per connection, and the shapes uploaded for earlier plans are moved to new frames.
                 Defaults to ``None``.
             planner_id (:obj:`str`): Name of the planner to use. Defaults to ``rrtconnect``.
             trials (:obj:`int`): Number of search trials to run. Defaults to ``1``.
@@ -496,8 +809,9 @@ class VrepClient(object):
                 per configurable joint. Each value ranges from 0 to 1,
                 where 1 indicates the axis/joint is blocked and cannot
                 move during inverse kinematic solving.
-            collision_meshes (:obj:`list` of :class:`compas.datastructures.Mesh`): Collision meshes
-                to be taken into account when calculating the motion plan.
+            collision_meshes (:obj:`list` of :class:`compas.datastructures.Mesh` or :class:`compas_fab.robots.CollisionMesh`): Collision meshes
+                to be taken into account when calculating the motion plan. They are uploaded once
+                per connection, and the shapes uploaded for earlier plans are moved to new frames.
                 Defaults to ``None``.
             planner_id (:obj:`str`): Name of the planner to use. Defaults to ``rrtconnect``.
             trials (:obj:`int`): Number of search trials to run. Defaults to ``1``.
@@ -538,7 +852,9 @@ class VrepClient(object):
         """
         assert_robot(robot)
 
-        handles = self.add_meshes([building_member_mesh])
+        # Building members are attached to the robot, so they are not shared with other meshes
+        vertices, faces = building_member_mesh.to_vertices_and_faces()
+        handles = self._build_mesh(vertices, faces)
 
         if len(handles) != 1:
             raise VrepError('Expected one handle, but multiple found=' + str(handles), -1)
@@ -546,16 +862,20 @@ class VrepClient(object):
         handle = handles[0]
 
         parent_handle = self.get_object_handle('customGripper' + robot.name + '_connection')
-        vrep.simxSetObjectParent(self.client_id, handle, parent_handle, True, DEFAULT_OP_MODE)
+        vrep.simxSetObjectParent(self.client_id, handle, parent_handle, True, self._send_mode)
 
         return handle
 
     def add_meshes(self, meshes):
         """Adds meshes to the 3D scene.
 
+        A mesh with the same vertices and faces as a mesh added before, at the
+        same frame, reuses its shape instead of being uploaded again. Other
+        meshes are added as new shapes, existing shapes are never moved.
+
         Args:
-            meshes (:obj:`list` of :class:`compas.datastructures.Mesh`): List
-                of meshes to add to the current simulation scene.
+            meshes (:obj:`list` of :class:`compas.datastructures.Mesh` or :class:`compas_fab.robots.CollisionMesh`): List
+                of meshes to add to the current simulation scene. Collision meshes are placed at their frame.
 
         Returns:
             list: List of object handles (identifiers) assigned to the meshes.
@@ -563,24 +883,97 @@ class VrepClient(object):
         .. note::
             All meshes are automatically removed from the scene when the simulation ends.
         """
-        mesh_handles = []
+        return self._add_meshes(meshes)
+
+    def _add_meshes(self, meshes, movable=False):
+        """Adds meshes to the 3D scene, reusing the shapes of identical meshes.
 
+        If ``movable`` is true, the shapes of identical meshes at other frames,
+        which were also added as movable, are moved to the new frames instead
+        of uploading the meshes again.
+        """
+        items = []
         for mesh in meshes:
+            frame = Frame.worldXY()
+            if isinstance(mesh, CollisionMesh):
+                mesh, frame = mesh.mesh, mesh.frame
+
             if not mesh.is_trimesh():
                 raise ValueError('The V-REP client only supports tri-meshes')
 
-            vertices, faces = mesh.to_vertices_and_faces()
-            vrep_packing = (floats_to_vrep([item for sublist in vertices for item in sublist], self.scale) +
-                            [item for sublist in faces for item in sublist])
-            params = [[len(vertices) * 3, len(faces) * 4], vrep_packing]
-            handles = self.run_child_script('buildMesh',
-                                            params[0],
-                                            params[1],
-                                            [])[1]
-            mesh_handles.extend(handles)
-            self._added_handles.extend(handles)
+            items.append((mesh, frame, mesh_hash(mesh), canonical_hash(frame)))
+
+        # Shapes at the same frame are kept first, then movable shapes of the same mesh are moved
+        assigned = [None] * len(items)
+        used = set()
+        for i, (_, _, geometry_hash, frame_hash) in enumerate(items):
+            for entry in self._uploaded_meshes.get(geometry_hash, []):
+                if id(entry) not in used and entry['frame_hash'] == frame_hash:
+                    assigned[i] = entry
+                    used.add(id(entry))
+                    break
+
+        moves = []
+        for i, (mesh, frame, geometry_hash, frame_hash) in enumerate(items):
+            if assigned[i] is not None:
+                continue
+
+            entries = self._uploaded_meshes.get(geometry_hash, []) if movable else []
+            entry = next((entry for entry in entries if entry['movable'] and id(entry) not in used), None)
+            if entry is None:
+                vertices, faces = mesh.to_vertices_and_faces()
+                handles = self._build_mesh(transform_points(vertices, Transformation.from_frame(frame)), faces)
+                entry = dict(handles=handles, frame=frame, frame_hash=frame_hash, poses=[None] * len(handles), movable=movable)
+                self._uploaded_meshes.setdefault(geometry_hash, []).append(entry)
+            else:
+                moves.append((entry, frame, frame_hash))
+
+            assigned[i] = entry
+            used.add(id(entry))
+
+        if moves:
+            self._move_meshes(moves)
 
-        return mesh_handles
+        return [handle for entry in assigned for handle in entry['handles']]
+
+    def _build_mesh(self, vertices, faces):
+        vrep_packing = (floats_to_vrep([item for sublist in vertices for item in sublist], self.scale) +
+                        [item for sublist in faces for item in sublist])
+        params = [[len(vertices) * 3, len(faces) * 4], vrep_packing]
+        handles = self.run_child_script('buildMesh',
+                                        params[0],
+                                        params[1],
+                                        [])[1]
+        self._added_handles.extend(handles)
+        return handles
+
+    def _move_meshes(self, moves):
+        """Moves the shapes of uploaded meshes from their frame to another frame.
+
+        The pose of every shape is read once, the first time it is moved.
+        """
+        for entry, _, _ in moves:
+            for i, handle in enumerate(entry['handles']):
+                if entry['poses'][i] is None:
+                    position = self._read_value((vrep.simxGetObjectPosition, handle, -1), DEFAULT_OP_MODE)
+                    euler_angles = self._read_value((vrep.simxGetObjectOrientation, handle, -1), DEFAULT_OP_MODE)
+                    entry['poses'][i] = vrep_position_to_frame(position, euler_angles, self.scale)
+
+        # In pipelined mode, all poses are sent in one message
+        if self.pipelined:
+            vrep.simxPauseCommunication(self.client_id, True)
+
+        for entry, frame, frame_hash in moves:
+            transformation = Transformation.from_frame(frame) * Transformation.from_frame(entry['frame']).inverse()
+            for i, handle in enumerate(entry['handles']):
+                pose = Frame.from_transformation(transformation * Transformation.from_frame(entry['poses'][i]))
+                vrep.simxSetObjectPosition(self.client_id, handle, -1, floats_to_vrep(pose.point, self.scale), self._send_mode)
+                vrep.simxSetObjectOrientation(self.client_id, handle, -1, pose.euler_angles(static=False, axes='xyz'), self._send_mode)
+                entry['poses'][i] = pose
+            entry['frame'], entry['frame_hash'] = frame, frame_hash
+
+        if self.pipelined:
+            vrep.simxPauseCommunication(self.client_id, False)
 
     def remove_meshes(self, mesh_handles):
         """Removes meshes from the 3D scene.
@@ -604,17 +997,51 @@ class VrepClient(object):
             has completed, as those will be reset automatically anyway. This method is
             only useful if you need to remove objects *during* a simulation.
         """
+        # In pipelined mode, all removals are sent in one message
+        if self.pipelined:
+            vrep.simxPauseCommunication(self.client_id, True)
+        # Values of removed objects are no longer streamed
+        removed_streams = [read for read in self._streams if read[1] in object_handles]
+        for read in removed_streams:
+            read[0](self.client_id, *(read[1:] + (vrep.simx_opmode_discontinue, )))
         for handle in object_handles:
-            vrep.simxRemoveObject(self.client_id, handle, DEFAULT_OP_MODE)
+            vrep.simxRemoveObject(self.client_id, handle, self._send_mode)
+        if self.pipelined:
+            vrep.simxPauseCommunication(self.client_id, False)
 
-        self._added_handles = filter(lambda x: x not in object_handles, self._added_handles)
+        self._streams.difference_update(removed_streams)
+
+        self._added_handles = [handle for handle in self._added_handles if handle not in object_handles]
+        self._object_handles = dict((name, handle) for name, handle in self._object_handles.items() if handle not in object_handles)
+        for geometry_hash, entries in list(self._uploaded_meshes.items()):
+            self._uploaded_meshes[geometry_hash] = [entry for entry in entries if not set(entry['handles']) & set(object_handles)]
 
     def run_child_script(self, function_name, in_ints, in_floats, in_strings):
-        return vrep.simxCallScriptFunction(self.client_id,
-                                           self.lua_script,
-                                           CHILD_SCRIPT_TYPE, function_name,
-                                           in_ints, in_floats, in_strings,
-                                           bytearray(), DEFAULT_OP_MODE)
+        start = timer() if self.debug else None
+        result = vrep.simxCallScriptFunction(self.client_id,
+                                             self.lua_script,
+                                             CHILD_SCRIPT_TYPE, function_name,
+                                             in_ints, in_floats, in_strings,
+                                             bytearray(), DEFAULT_OP_MODE)
+        if self.debug:
+            LOG.debug('Execution time: %s=%.2f', function_name, timer() - start)
+        return result
+
+    def _send_child_script(self, function_name, in_ints, in_floats, in_strings):
+        """Runs a function of the scene's child script which returns no result.
+
+        In pipelined mode, the call is sent without waiting for its reply, and
+        it is executed before any later call.
+        """
+        if not self.pipelined:
+            self.run_child_script(function_name, in_ints, in_floats, in_strings)
+            return
+
+        vrep.simxCallScriptFunction(self.client_id,
+                                    self.lua_script,
+                                    CHILD_SCRIPT_TYPE, function_name,
+                                    in_ints, in_floats, in_strings,
+                                    bytearray(), vrep.simx_opmode_oneshot)
 
 
 def assert_robot(robot):
@@ -657,6 +1084,12 @@ def vrep_pose_to_frame(pose, scale):
     return Frame.from_list(floats_from_vrep(pose, scale))
 
 
+def vrep_position_to_frame(position, euler_angles, scale):
+    # V-REP orientations are Euler angles about the rotating x, y and z axes
+    return Frame.from_euler_angles(euler_angles, static=False, axes='xyz',
+                                   point=floats_from_vrep(position, scale))
+
+
 def frame_to_vrep_pose(frame, scale):
     # COMPAS FAB uses meters, just like V-REP,
     # so in general, scale should always be 1
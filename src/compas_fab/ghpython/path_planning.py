@@ -87,6 +87,11 @@ class PathVisualizer(object):
     def get_frame_meshes(self, path, frame, ctx):
         """Retrieves all meshes required to render a specific frame of a path plan.
 
+        The meshes of the scene and the matrices of all frames of a path are
+        retrieved with one call each, the first time a frame of the path is
+        requested, and kept in ``ctx``. Other frames of the same path are
+        rendered without calling the simulator again.
+
         Args:
             path (:obj:`list` of :class:`Configuration`): Represents a collision-free
                 path to a goal pose. It is the output of the path planning generated
@@ -99,31 +104,38 @@ class PathVisualizer(object):
             list: list of Rhino meshes that can be used to visualize the selected frame.
         """
         first_start = timer() if self.debug else None
-        shape_handles = self.simulator.get_all_visible_handles()
-        if self.debug:
-            LOG.debug('Execution time: get_all_visible_handles=%.2f', timer() - first_start)
+        if 'shape_handles' not in ctx:
+            ctx['shape_handles'] = self.simulator.get_all_visible_handles()
+            if self.debug:
+                LOG.debug('Execution time: get_all_visible_handles=%.2f', timer() - first_start)
+        shape_handles = ctx['shape_handles']
 
         if 'scene_meshes' not in ctx:
             ctx['scene_meshes'] = self._get_scene_meshes(shape_handles)
 
-        frame_config = path[frame]
-
-        start = timer() if self.debug else None
-        self.simulator.set_robot_config(self.robot, frame_config)
-        if self.debug:
-            LOG.debug('Execution time: set_robot_config=%.2f', timer() - start)
+        path_key = tuple(tuple(config.values) for config in path)
+        if ctx.get('path_key') != path_key:
+            start = timer() if self.debug else None
+            ctx['path_matrices'] = self.simulator.get_path_object_matrices(self.robot, path, shape_handles)
+            ctx['path_key'] = path_key
+            if self.debug:
+                LOG.debug('Execution time: get_path_object_matrices=%.2f', timer() - start)
 
         start = timer() if self.debug else None
         meshes = []
-        mesh_matrices = self.simulator.get_object_matrices(shape_handles)
-        for handle, mesh_matrix in mesh_matrices.iteritems():
+        mesh_matrices = ctx['path_matrices'][frame]
+        for handle, mesh_matrix in mesh_matrices.items():
             mesh = ctx['scene_meshes'][handle].DuplicateShallow()
             mesh.Transform(_to_xform(mesh_matrix))
             meshes.append(mesh)
 
         if self.building_member:
             gripping_config = self.building_member_pickup_config if self.building_member_pickup_config else path[0]
-            info = self._get_building_member_info(gripping_config)
+            building_member_key = (str(self.building_member), tuple(gripping_config.values))
+            if ctx.get('building_member_key') != building_member_key:
+                ctx['building_member_info'] = self._get_building_member_info(gripping_config)
+                ctx['building_member_key'] = building_member_key
+            info = ctx['building_member_info']
             mesh = info['mesh'].DuplicateShallow()
             parent_transform = _to_xform(mesh_matrices[info['parent_handle']])
             relative_transform = info['relative_transform']
@@ -144,10 +156,7 @@ class PathVisualizer(object):
 
     def _get_scene_meshes(self, shape_handles):
         start = timer() if self.debug else None
-        shape_geometry = []
-        for handle in shape_handles:
-            _, faces, vertices, _, _ = self.simulator.run_child_script('getShapeMesh', [handle], [], [])
-            shape_geometry.append((vertices, faces))
+        shape_geometry = self.simulator.get_shape_meshes(shape_handles)
 
         scene_meshes = {}
         _, _, mesh_matrices, _, _ = self.simulator.run_child_script('getShapeMatrices', shape_handles, [], [])
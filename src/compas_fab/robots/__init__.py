@@ -32,6 +32,8 @@ Path planning
     JointTrajectory
     JointTrajectoryPoint
     PathPlan
+    PlanCache
+    PlanLibrary
 
 Planning scene
 --------------
@@ -42,8 +44,48 @@ Planning scene
 
     AttachedCollisionMesh
     CollisionMesh
+    CollisionMeshPreprocessor
     PlanningScene
 
+Collision mesh preprocessing
+----------------------------
+
+Requires ``numpy`` and ``scipy``, not available on IronPython.
+
+.. autosummary::
+    :toctree: generated/
+    :nosignatures:
+
+    closest_points_on_triangles_numpy
+    mesh_convex_decomposition_numpy
+    mesh_convex_hull_numpy
+    mesh_decimate_numpy
+    mesh_hausdorff_distance_numpy
+
+Kinematics and collisions
+-------------------------
+
+Requires ``numpy`` and ``scipy``, not available on IronPython.
+
+.. autosummary::
+    :toctree: generated/
+    :nosignatures:
+
+    CollisionCheckerNumpy
+    ForwardKinematicsNumpy
+    OBBTreeNumpy
+    RobotSpheresNumpy
+    SegmentCheckerNumpy
+    SignedDistanceFieldNumpy
+    SphereTreeNumpy
+    obb_from_points_numpy
+    obb_overlap_numpy
+    octomap_boxes_numpy
+    sphere_distances_numpy
+    time_parameterization_numpy
+    timed_trajectory_numpy
+    triangle_overlap_numpy
+
 Constraints
 -----------
 
@@ -72,9 +114,13 @@ The following functions help with converting units from one system to the other.
 
 """
 
+import compas
+
 from .configuration import *          # noqa: F401,F403
 from .constraints import *            # noqa: F401,F403
 from .path_plan import *              # noqa: F401,F403
+from .plan_cache import *             # noqa: F401,F403
+from .plan_library import *           # noqa: F401,F403
 from .planning_scene import *         # noqa: F401,F403
 from .units import *                  # noqa: F401,F403
 from .robot import *                  # noqa: F401,F403
@@ -84,5 +130,15 @@ from .tool import *                   # noqa: F401,F403
 from .trajectory import *             # noqa: F401,F403
 from .wrench import *                 # noqa: F401,F403
 from .inertia import *                # noqa: F401,F403
+from .mesh_preprocessing import *     # noqa: F401,F403
+
+if not compas.IPY:
+    from .mesh_preprocessing_numpy import *  # noqa: F401,F403
+    from .kinematics_numpy import *          # noqa: F401,F403
+    from .collision_numpy import *           # noqa: F401,F403
+    from .spheres_numpy import *             # noqa: F401,F403
+    from .segments_numpy import *            # noqa: F401,F403
+    from .distance_field_numpy import *      # noqa: F401,F403
+    from .trajectory_numpy import *          # noqa: F401,F403
 
 __all__ = [name for name in dir() if not name.startswith('_')]
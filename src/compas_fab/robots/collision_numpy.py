@@ -0,0 +1,630 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import logging
+import threading
+import weakref
+
+import numpy as np
+from compas.robots.model.geometry import Box
+from compas.robots.model.geometry import Cylinder
+from compas.robots.model.geometry import Sphere
+
+from compas_fab.robots.kinematics_numpy import ForwardKinematicsNumpy
+
+LOGGER = logging.getLogger('compas_fab.robots.collision_numpy')
+
+__all__ = [
+    'CollisionCheckerNumpy',
+    'OBBTreeNumpy',
+    'obb_from_points_numpy',
+    'obb_overlap_numpy',
+    'triangle_overlap_numpy',
+]
+
+# Number of configurations checked at once, and number of pairs of boxes
+# or triangles tested at once, to bound the memory use
+CHUNK_SIZE = 1024
+BLOCK_SIZE = 65536
+
+# Triangles of a box, by indices of its corners ordered by x, y and z
+BOX_TRIANGLES = np.array([[0, 1, 3], [0, 3, 2], [4, 6, 7], [4, 7, 5], [0, 4, 5], [0, 5, 1],
+                          [2, 3, 7], [2, 7, 6], [0, 2, 6], [0, 6, 4], [1, 5, 7], [1, 7, 3]])
+
+
+def obb_from_points_numpy(points):
+    """Compute an oriented bounding box of points from their principal axes.
+
+    Parameters
+    ----------
+    points : array-like
+        XYZ coordinates of the points.
+
+    Returns
+    -------
+    tuple
+        The center, the axes as columns of a 3x3 matrix, and the half extents of the box.
+
+    Examples
+    --------
+    >>> center, axes, half_extents = obb_from_points_numpy([[0, 0, 0], [2, 0, 0], [0, 1, 0], [2, 1, 0]])
+    >>> sorted(half_extents.round(3).tolist())
+    [0.0, 0.5, 1.0]
+    """
+    points = np.asarray(points, dtype=float)
+    mean = points.mean(axis=0)
+    _, axes = np.linalg.eigh(np.cov((points - mean).T) if len(points) > 1 else np.identity(3))
+    local = (points - mean).dot(axes)
+    low, high = local.min(axis=0), local.max(axis=0)
+    return mean + axes.dot((low + high) / 2.), axes, (high - low) / 2.
+
+
+def obb_overlap_numpy(center_a, axes_a, half_a, center_b, axes_b, half_b):
+    """Test pairs of oriented bounding boxes for overlap with the separating axis theorem.
+
+    Parameters
+    ----------
+    center_a, center_b : array-like
+        Centers of the boxes, of shape ``(..., 3)``.
+    axes_a, axes_b : array-like
+        Axes of the boxes as columns, of shape ``(..., 3, 3)``.
+    half_a, half_b : array-like
+        Half extents of the boxes, of shape ``(..., 3)``.
+
+    Returns
+    -------
+    :class:`numpy.ndarray`
+        ``True`` for the pairs of boxes which overlap.
+    """
+    rotation = np.matmul(np.swapaxes(axes_a, -1, -2), axes_b)
+    # Guard against parallel edges, whose cross products are close to zero
+    absolute = np.abs(rotation) + 1e-9
+    t = np.einsum('...ji,...j->...i', axes_a, center_b - center_a)
+
+    separated = np.any(np.abs(t) > half_a + np.einsum('...ij,...j->...i', absolute, half_b), axis=-1)
+    separated |= np.any(np.abs(np.einsum('...i,...ij->...j', t, rotation)) >
+                        np.einsum('...i,...ij->...j', half_a, absolute) + half_b, axis=-1)
+
+    for i in range(3):
+        i1, i2 = (i + 1) % 3, (i + 2) % 3
+        for j in range(3):
+            j1, j2 = (j + 1) % 3, (j + 2) % 3
+            ra = half_a[..., i1] * absolute[..., i2, j] + half_a[..., i2] * absolute[..., i1, j]
+            rb = half_b[..., j1] * absolute[..., i, j2] + half_b[..., j2] * absolute[..., i, j1]
+            separated |= np.abs(t[..., i2] * rotation[..., i1, j] - t[..., i1] * rotation[..., i2, j]) > ra + rb
+
+    return ~separated
+
+
+def _transform_points(matrix, points):
+    matrix = np.asarray(matrix, dtype=float)
+    return np.asarray(points).dot(matrix[:3, :3].T) + matrix[:3, 3]
+
+
+def _frame_matrix(frame):
+    matrix = np.identity(4)
+    matrix[:3, 0] = list(frame.xaxis)
+    matrix[:3, 1] = list(frame.yaxis)
+    matrix[:3, 2] = list(frame.zaxis)
+    matrix[:3, 3] = list(frame.point)
+    return matrix
+
+
+def _mesh_triangles(mesh):
+    """Vertices of the triangles of a mesh, as array of shape ``(triangles, 3, 3)``."""
+    key_index = mesh.key_index()
+    vertices = np.array([mesh.vertex_coordinates(key) for key in mesh.vertices()], dtype=float)
+    triangles = []
+    for fkey in mesh.faces():
+        face = [key_index[key] for key in mesh.face_vertices(fkey)]
+        triangles.extend([face[0], face[i], face[i + 1]] for i in range(1, len(face) - 1))
+    return vertices[np.array(triangles, dtype=int).reshape(-1, 3)]
+
+
+def _shape_triangles(shape):
+    """Triangles of a link's collision shape, in the shape's frame."""
+    if isinstance(shape, Box):
+        extents = np.array(shape.size, dtype=float) / 2.
+    elif isinstance(shape, Cylinder):
+        extents = np.array([shape.radius, shape.radius, shape.length / 2.])
+    elif isinstance(shape, Sphere):
+        extents = np.array([shape.radius] * 3)
+    else:
+        if not getattr(shape, 'geometry', None):
+            return None
+        triangles = _mesh_triangles(shape.geometry)
+        return triangles * np.array(getattr(shape, 'scale', None) or [1., 1., 1.], dtype=float)
+
+    # Primitives are approximated by the triangles of their bounding box
+    corners = np.array([[x, y, z] for x in (-1, 1) for y in (-1, 1) for z in (-1, 1)], dtype=float) * extents
+    return corners[BOX_TRIANGLES]
+
+
+class OBBTreeNumpy(object):
+    """Hierarchy of oriented bounding boxes around the triangles of a surface.
+
+    The triangles are split in halves at the median of their centroids along
+    the longest axis of their bounding box, until there are at most
+    ``leaf_size`` triangles per box. Every box encloses its triangles
+    completely.
+
+    Parameters
+    ----------
+    triangles : array-like
+        Vertices of the triangles, of shape ``(triangles, 3, 3)``.
+    leaf_size : int, optional
+        Maximum number of triangles per leaf box. Defaults to ``4``.
+
+    Attributes
+    ----------
+    centers : :class:`numpy.ndarray`
+        Centers of the boxes, the root box first.
+    axes : :class:`numpy.ndarray`
+        Axes of the boxes, as columns of 3x3 matrices.
+    half_extents : :class:`numpy.ndarray`
+        Half extents of the boxes.
+    children : :class:`numpy.ndarray`
+        Indices of the two child boxes of each box, ``-1`` for the leaves.
+    triangles : :class:`numpy.ndarray`
+        The triangles, sorted such that the triangles of each box are consecutive.
+    triangle_ranges : :class:`numpy.ndarray`
+        Start and end index of the triangles of each box.
+
+    Examples
+    --------
+    >>> tree = OBBTreeNumpy([[[i, 0, 0], [i + 1, 0, 0], [i, 1, 0]] for i in range(8)], leaf_size=2)
+    >>> len(tree.centers), int((tree.children[:, 0] < 0).sum())
+    (7, 4)
+    """
+
+    def __init__(self, triangles, leaf_size=4):
+        triangles = np.asarray(triangles, dtype=float).reshape(-1, 3, 3)
+        boxes, children, ranges, order = [], [], [], []
+        stack = [(np.arange(len(triangles)), -1, 0)]
+
+        while stack:
+            indices, parent, side = stack.pop()
+            node = len(boxes)
+            if parent >= 0:
+                children[parent][side] = node
+            center, axes, half_extents = obb_from_points_numpy(triangles[indices].reshape(-1, 3))
+            boxes.append((center, axes, half_extents))
+            children.append([-1, -1])
+            start = len(order)
+
+            if len(indices) > leaf_size:
+                projection = triangles[indices].mean(axis=1).dot(axes[:, np.argmax(half_extents)])
+                lower = projection <= np.median(projection)
+                if lower.all() or not lower.any():
+                    lower = np.arange(len(indices)) < len(indices) // 2
+                # The triangles of the inner boxes are only sorted once their leaves are
+                ranges.append([start, start])
+                stack.extend([(indices[~lower], node, 1), (indices[lower], node, 0)])
+            else:
+                order.extend(indices)
+                ranges.append([start, len(order)])
+
+        self.centers = np.array([box[0] for box in boxes]).reshape(-1, 3)
+        self.axes = np.array([box[1] for box in boxes]).reshape(-1, 3, 3)
+        self.half_extents = np.array([box[2] for box in boxes]).reshape(-1, 3)
+        self.children = np.array(children, dtype=int).reshape(-1, 2)
+        self.triangles = triangles[np.array(order, dtype=int)]
+        self.triangle_ranges = np.array(ranges, dtype=int).reshape(-1, 2)
+
+        # Depth-first order places the triangles of each box after those of its first child
+        for node in range(len(boxes) - 1, -1, -1):
+            first, second = self.children[node]
+            if first >= 0:
+                self.triangle_ranges[node] = self.triangle_ranges[first][0], self.triangle_ranges[second][1]
+
+
+def triangle_overlap_numpy(a, b):
+    """Test pairs of triangles for intersection with the separating axis theorem.
+
+    Parameters
+    ----------
+    a, b : array-like
+        Vertices of the triangles, of shape ``(..., 3, 3)``.
+
+    Returns
+    -------
+    :class:`numpy.ndarray`
+        ``True`` for the pairs of triangles which intersect or touch.
+
+    Examples
+    --------
+    >>> a = [[0, 0, 0], [1, 0, 0], [0, 1, 0]]
+    >>> triangle_overlap_numpy([a, a], [[[0.2, 0.2, -1], [0.2, 0.2, 1], [2, 2, 1]], [[0, 0, 1], [1, 0, 1], [0, 1, 1]]]).tolist()
+    [True, False]
+    """
+    a = np.asarray(a, dtype=float)
+    b = np.asarray(b, dtype=float)
+    shape = np.broadcast(a, b).shape[:-2]
+    a, b = np.broadcast_to(a, shape + (3, 3)).reshape(-1, 3, 3), np.broadcast_to(b, shape + (3, 3)).reshape(-1, 3, 3)
+
+    edges_a = np.roll(a, -1, axis=-2) - a
+    edges_b = np.roll(b, -1, axis=-2) - b
+    normal_a = np.cross(edges_a[:, 0], edges_a[:, 1])
+    normal_b = np.cross(edges_b[:, 0], edges_b[:, 1])
+
+    # Reject the triangles entirely on one side of the plane of the other one first
+    side_b = np.matmul(b - a[:, :1], normal_a[:, :, None])[:, :, 0]
+    side_a = np.matmul(a - b[:, :1], normal_b[:, :, None])[:, :, 0]
+    candidates = ~((side_b > 0).all(axis=1) | (side_b < 0).all(axis=1) | (side_a > 0).all(axis=1) | (side_a < 0).all(axis=1))
+
+    a, b, edges_a, edges_b = a[candidates], b[candidates], edges_a[candidates], edges_b[candidates]
+    normal_a = normal_a[candidates]
+
+    # Cross products of the edges, and edge normals in the plane for coplanar triangles.
+    # Degenerate axes are zero, and never separate the triangles
+    axes = [np.cross(normal_a, edges_a[:, i]) for i in range(3)] + \
+        [np.cross(normal_a, edges_b[:, i]) for i in range(3)] + \
+        [np.cross(edges_a[:, i], edges_b[:, j]) for i in range(3) for j in range(3)]
+    axes = np.stack(axes, axis=1)
+    projection_a = np.matmul(axes, np.swapaxes(a, 1, 2))
+    projection_b = np.matmul(axes, np.swapaxes(b, 1, 2))
+    separated = (projection_a.max(axis=-1) < projection_b.min(axis=-1)) | (projection_b.max(axis=-1) < projection_a.min(axis=-1))
+
+    result = np.zeros(len(candidates), dtype=bool)
+    result[candidates] = ~separated.any(axis=-1)
+    return result.reshape(shape)
+
+
+def _expand(offsets, index):
+    """Expand ranges of items, given by start and end offsets, for each index.
+
+    Returns the position in ``index`` and the item of each expanded element.
+    """
+    starts = offsets[index, 0]
+    counts = offsets[index, 1] - starts
+    owners = np.repeat(np.arange(len(index)), counts)
+    items = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+    return owners, items
+
+
+def _blocks(counts, size):
+    """Split items into consecutive blocks of about ``size`` expanded elements, given their counts."""
+    ends = np.cumsum(counts)
+    start = 0
+    while start < len(counts):
+        stop = max(int(np.searchsorted(ends, (ends[start - 1] if start else 0) + size, side='right')), start + 1)
+        yield slice(start, stop)
+        start = stop
+
+
+# Hierarchies of the link shapes and collision meshes, shared by all checkers.
+# They are built in the coordinates of their shape or mesh, and only placed
+# by the transformations of the links or the frames of the collision meshes
+_TREES = weakref.WeakKeyDictionary()
+_TREES_LOCK = threading.Lock()
+
+
+def _cached_tree(geometry, key, build):
+    """Get a hierarchy of a shape or mesh, built on first use.
+
+    The key identifies the kind of hierarchy and its parameters, ``build``
+    returns the hierarchy, or ``None`` for shapes without geometry.
+    """
+    with _TREES_LOCK:
+        trees = _TREES.get(geometry)
+        if trees is None:
+            trees = _TREES[geometry] = {}
+        tree = trees.get(key)
+    if tree is None:
+        # Shapes without geometry are not cached, their geometry may be loaded later
+        tree = build()
+        if tree is None:
+            return None
+        with _TREES_LOCK:
+            trees[key] = tree
+    return tree
+
+
+def _obb_tree(triangles, leaf_size):
+    return OBBTreeNumpy(triangles, leaf_size) if triangles is not None else None
+
+
+def disabled_collision_pairs(robot):
+    """Pairs of links which are not checked for collisions with each other.
+
+    These are the pairs allowed to collide by the robot's semantics, see
+    :meth:`compas_fab.robots.RobotSemantics.is_collision_allowed`, or the
+    links connected by a joint for robots without semantics.
+    """
+    if robot.semantics:
+        return set(frozenset(pair) for pair in robot.semantics.iter_allowed_collision_pairs())
+
+    return set(frozenset((joint.parent.link, joint.child.link)) for joint in robot.model.joints)
+
+
+class _RobotBodiesNumpy(object):
+    """Bodies of a robot and of its scene, covered by hierarchies placed by the links of the robot.
+
+    Base of :class:`CollisionCheckerNumpy` and
+    :class:`compas_fab.robots.RobotSpheresNumpy`, which build the hierarchies
+    and descend them. The hierarchies must have the ``centers`` and
+    ``children`` of their nodes, the root first.
+    """
+
+    def _init_bodies(self, robot, link_bodies, mesh_tree, collision_meshes=None, attached_collision_meshes=None,
+                     allowed_collision_pairs=None):
+        """Concatenate the hierarchies of all bodies and select the pairs of bodies to check.
+
+        The ``link_bodies`` are ``(link name, hierarchy, offset)`` tuples,
+        ``mesh_tree`` returns the hierarchy of a mesh. Bodies without
+        hierarchy, or with an empty one, are skipped. Returns the hierarchies
+        of the bodies and the number of moving bodies, which come first.
+        """
+        self.kinematics = ForwardKinematicsNumpy(robot)
+        self.body_names = []
+
+        link_indices = dict((name, i) for i, name in enumerate(self.kinematics.link_names))
+        # The identity is appended as last link, to place the static bodies
+        static = len(link_indices)
+        bodies = []
+
+        def add_body(name, tree, link, offset, touch_links=()):
+            if tree is None or not len(tree.centers):
+                return
+            self.body_names.append(name)
+            bodies.append((tree, link, offset, set(touch_links)))
+
+        for name, tree, offset in link_bodies:
+            add_body(name, tree, link_indices[name], offset)
+
+        for acm in attached_collision_meshes or []:
+            tree = mesh_tree(acm.collision_mesh.mesh)
+            link = link_indices[acm.link_name]
+            offset = self.kinematics.initial_link_frames[link].dot(_frame_matrix(acm.collision_mesh.frame))
+            add_body(acm.collision_mesh.id, tree, link, offset, list(acm.touch_links) + [acm.link_name])
+
+        moving = len(bodies)
+
+        for collision_mesh in collision_meshes or []:
+            add_body(collision_mesh.id, mesh_tree(collision_mesh.mesh), static, _frame_matrix(collision_mesh.frame))
+
+        # The hierarchies of all bodies, concatenated, in the coordinates of their bodies
+        trees = [body[0] for body in bodies]
+        node_counts = [len(tree.centers) for tree in trees]
+        node_offsets = np.cumsum([0] + node_counts)[:-1]
+
+        self._body_links = np.array([body[1] for body in bodies], dtype=int)
+        self._body_offsets = np.array([body[2] for body in bodies], dtype=float).reshape(-1, 4, 4)
+        self._roots = node_offsets.astype(int)
+        self._centers = np.concatenate([tree.centers for tree in trees]) if trees else np.zeros((0, 3))
+        self._children = np.concatenate([np.where(tree.children < 0, -1, tree.children + offset)
+                                         for tree, offset in zip(trees, node_offsets)]) if trees else np.zeros((0, 2), dtype=int)
+        self._node_bodies = np.repeat(np.arange(len(bodies)), node_counts)
+
+        # Pairs of a moving body with another moving body or a body of the scene
+        disabled = disabled_collision_pairs(robot)
+        disabled.update(frozenset(pair) for pair in allowed_collision_pairs or [])
+        pairs = []
+        for i in range(moving):
+            for j in range(i + 1, len(bodies)):
+                names = self.body_names[i], self.body_names[j]
+                if names[0] == names[1] or frozenset(names) in disabled:
+                    continue
+                if names[1] in bodies[i][3] or names[0] in bodies[j][3]:
+                    continue
+                pairs.append((i, j))
+        self._pairs = np.array(pairs, dtype=int).reshape(-1, 2)
+        return trees, moving
+
+    @property
+    def pair_count(self):
+        """int: Number of pairs of bodies checked per configuration."""
+        return len(self._pairs)
+
+    def _placements(self, configurations):
+        """Transformations of the bodies from their coordinates to the world, per configuration."""
+        transformations = self.kinematics.link_transformations(configurations)
+        count = len(transformations)
+        transformations = np.concatenate([transformations, np.broadcast_to(np.identity(4), (count, 1, 4, 4))], axis=1)
+        return np.matmul(transformations[:, self._body_links], self._body_offsets)
+
+
+class CollisionCheckerNumpy(_RobotBodiesNumpy):
+    """Checks robot configurations for collisions, many at once.
+
+    The surfaces of the robot's links, of the attached collision meshes and of
+    the collision meshes of the scene are triangulated and covered by
+    hierarchies of oriented bounding boxes, see :class:`OBBTreeNumpy`. For all
+    configurations at once, the pairs of bodies whose axis-aligned bounding
+    boxes overlap are selected first. Their hierarchies are descended where
+    their boxes overlap, and the triangles of overlapping leaf boxes are
+    checked for intersections.
+
+    The hierarchies are built once per link shape and per mesh, and shared by
+    all checkers, such that a checker of a changed scene, e.g. with moved
+    collision meshes, is created quickly.
+
+    Parameters
+    ----------
+    robot : :class:`compas_fab.robots.Robot`
+        The robot, with its geometry loaded.
+    collision_meshes : list of :class:`compas_fab.robots.CollisionMesh`, optional
+        The collision meshes of the scene, in the world coordinate frame.
+    attached_collision_meshes : list of :class:`compas_fab.robots.AttachedCollisionMesh`, optional
+        The collision meshes attached to links of the robot.
+    allowed_collision_pairs : list of tuple, optional
+        Pairs of link names or collision mesh ids which may collide. Links
+        connected by a joint and the pairs disabled in the robot's semantics
+        are always allowed to collide.
+    leaf_size : int, optional
+        Maximum number of triangles per leaf box. Defaults to ``4``.
+
+    Attributes
+    ----------
+    kinematics : :class:`compas_fab.robots.ForwardKinematicsNumpy`
+        The forward kinematics of the robot.
+    body_names : list of str
+        Names of the bodies: link names, attached collision mesh ids and
+        collision mesh ids.
+
+    Notes
+    -----
+    Only the surfaces are checked, a body entirely inside another one is not
+    reported in collision. Box, cylinder and sphere shapes are replaced by
+    their bounding boxes. Lengths are in meters, regardless of the robot's
+    scale factor. Meshes must not be modified once they were checked, since
+    their hierarchies are reused.
+
+    Examples
+    --------
+    >>> checker = CollisionCheckerNumpy(robot)
+    >>> checker.in_collision([robot.zero_configuration().values]).tolist()
+    [False]
+    """
+
+    def __init__(self, robot, collision_meshes=None, attached_collision_meshes=None, allowed_collision_pairs=None, leaf_size=4):
+        link_bodies = []
+        for link in robot.model.links:
+            for item in link.collision:
+                shape = item.geometry.shape
+                scale = tuple(getattr(shape, 'scale', None) or [1., 1., 1.])
+                tree = _cached_tree(shape, ('obb', leaf_size, scale), lambda: _obb_tree(_shape_triangles(shape), leaf_size))
+                if tree is None:
+                    continue
+                init_transformation = getattr(item, 'init_transformation', None)
+                offset = np.identity(4) if init_transformation is None else np.array(init_transformation.matrix, dtype=float)
+                link_bodies.append((link.name, tree, offset))
+
+        if not link_bodies:
+            LOGGER.warning('The robot has no collision geometry, load its geometry to check it for collisions')
+
+        def mesh_tree(mesh):
+            return _cached_tree(mesh, ('obb', leaf_size), lambda: _obb_tree(_mesh_triangles(mesh), leaf_size))
+
+        trees, _ = self._init_bodies(robot, link_bodies, mesh_tree, collision_meshes, attached_collision_meshes,
+                                     allowed_collision_pairs)
+
+        triangle_offsets = np.cumsum([0] + [len(tree.triangles) for tree in trees])[:-1]
+        self._axes = np.concatenate([tree.axes for tree in trees]) if trees else np.zeros((0, 3, 3))
+        self._half_extents = np.concatenate([tree.half_extents for tree in trees]) if trees else np.zeros((0, 3))
+        self._volumes = np.prod(self._half_extents, axis=1)
+        self._triangle_ranges = np.concatenate([tree.triangle_ranges + offset
+                                                for tree, offset in zip(trees, triangle_offsets)]) if trees else np.zeros((0, 2), dtype=int)
+        self._triangles = np.concatenate([tree.triangles for tree in trees]) if trees else np.zeros((0, 3, 3))
+        self._triangle_bodies = np.repeat(np.arange(len(trees)), [len(tree.triangles) for tree in trees])
+
+    def _bounds(self, placements):
+        """Axis-aligned bounding boxes of the root boxes of the bodies, per configuration."""
+        rotations = placements[:, :, :3, :3]
+        centers = np.matmul(rotations, self._centers[self._roots, :, None])[..., 0] + placements[:, :, :3, 3]
+        extents = np.matmul(np.abs(np.matmul(rotations, self._axes[self._roots])), self._half_extents[self._roots, :, None])[..., 0]
+        return centers - extents, centers + extents
+
+    def _overlap(self, placements, rows, a, b):
+        """Test pairs of boxes, given by node indices, placed by the body placements of configurations."""
+        hits = np.zeros(len(rows), dtype=bool)
+        for block in _blocks(np.ones(len(rows), dtype=int), BLOCK_SIZE):
+            placement_a = placements[rows[block], self._node_bodies[a[block]]]
+            placement_b = placements[rows[block], self._node_bodies[b[block]]]
+            rotation_a, rotation_b = placement_a[:, :3, :3], placement_b[:, :3, :3]
+            hits[block] = obb_overlap_numpy(
+                np.matmul(rotation_a, self._centers[a[block], :, None])[:, :, 0] + placement_a[:, :3, 3],
+                np.matmul(rotation_a, self._axes[a[block]]), self._half_extents[a[block]],
+                np.matmul(rotation_b, self._centers[b[block], :, None])[:, :, 0] + placement_b[:, :3, 3],
+                np.matmul(rotation_b, self._axes[b[block]]), self._half_extents[b[block]])
+        return hits
+
+    def _intersect(self, placements, rows, a, b):
+        """Test the triangles of pairs of leaf boxes for intersections."""
+        hits = np.zeros(len(rows), dtype=bool)
+        counts = np.diff(self._triangle_ranges[a], axis=1)[:, 0] * np.diff(self._triangle_ranges[b], axis=1)[:, 0]
+        for block in _blocks(counts, BLOCK_SIZE):
+            first, triangles_a = _expand(self._triangle_ranges, a[block])
+            second, triangles_b = _expand(self._triangle_ranges, b[block][first])
+            owners, triangles_a = first[second], triangles_a[second]
+            block_rows = rows[block][owners]
+
+            placement_a = placements[block_rows, self._triangle_bodies[triangles_a]]
+            placement_b = placements[block_rows, self._triangle_bodies[triangles_b]]
+            intersecting = triangle_overlap_numpy(
+                np.matmul(self._triangles[triangles_a], np.swapaxes(placement_a[:, :3, :3], 1, 2)) + placement_a[:, None, :3, 3],
+                np.matmul(self._triangles[triangles_b], np.swapaxes(placement_b[:, :3, :3], 1, 2)) + placement_b[:, None, :3, 3])
+            hits[block] = np.bincount(owners[intersecting], minlength=block.stop - block.start) > 0
+        return hits
+
+    def _colliding_pairs(self, configurations, first_only=True):
+        """Indices of the configurations and of the pairs of bodies in collision."""
+        placements = self._placements(configurations)
+
+        # Broad phase: the pairs of bodies whose axis-aligned bounding boxes overlap
+        low, high = self._bounds(placements)
+        first, second = self._pairs[:, 0], self._pairs[:, 1]
+        rows, pairs = np.nonzero(np.all((low[:, first] <= high[:, second]) & (low[:, second] <= high[:, first]), axis=2))
+        count = len(placements)
+        colliding = np.zeros(len(rows), dtype=bool)
+        found = np.zeros(count, dtype=bool)
+
+        # Descend the hierarchies of all pairs of bodies at once, one level at a time
+        owners = np.arange(len(rows))
+        a, b = self._roots[self._pairs[pairs, 0]], self._roots[self._pairs[pairs, 1]]
+        while len(owners):
+            if first_only:
+                pending = ~found[rows[owners]]
+                owners, a, b = owners[pending], a[pending], b[pending]
+
+            hits = self._overlap(placements, rows[owners], a, b)
+            owners, a, b = owners[hits], a[hits], b[hits]
+
+            leaf_a, leaf_b = self._children[a, 0] < 0, self._children[b, 0] < 0
+            leaves = leaf_a & leaf_b
+            intersecting = owners[leaves][self._intersect(placements, rows[owners[leaves]], a[leaves], b[leaves])]
+            colliding[intersecting] = True
+            found[rows[intersecting]] = True
+
+            # Split the larger box of the other pairs
+            owners, a, b, leaf_a, leaf_b = owners[~leaves], a[~leaves], b[~leaves], leaf_a[~leaves], leaf_b[~leaves]
+            split_a = ~leaf_a & (leaf_b | (self._volumes[a] >= self._volumes[b]))
+            owners = np.repeat(owners, 2)
+            a = np.where(np.repeat(split_a, 2), self._children[a].ravel(), np.repeat(a, 2))
+            b = np.where(np.repeat(split_a, 2), np.repeat(b, 2), self._children[b].ravel())
+
+        return rows[colliding], pairs[colliding]
+
+    def in_collision(self, configurations):
+        """Check configurations for collisions.
+
+        Parameters
+        ----------
+        configurations : array-like
+            Values of the robot's configurable joints, see
+            :attr:`ForwardKinematicsNumpy.joint_names`, one row per configuration.
+
+        Returns
+        -------
+        :class:`numpy.ndarray`
+            ``True`` for the configurations in collision.
+        """
+        configurations = np.atleast_2d(np.asarray(configurations, dtype=float))
+        result = np.zeros(len(configurations), dtype=bool)
+        if not len(self._pairs):
+            return result
+
+        for start in range(0, len(configurations), CHUNK_SIZE):
+            rows, _ = self._colliding_pairs(configurations[start:start + CHUNK_SIZE])
+            result[start + rows] = True
+
+        return result
+
+    def collision_pairs(self, configuration):
+        """Find the pairs of bodies in collision in a configuration.
+
+        Parameters
+        ----------
+        configuration : list of float
+            Values of the robot's configurable joints.
+
+        Returns
+        -------
+        list of tuple
+            Pairs of names of the colliding bodies.
+        """
+        if not len(self._pairs):
+            return []
+        _, pairs = self._colliding_pairs(np.atleast_2d(np.asarray(configuration, dtype=float)), first_only=False)
+        return [(self.body_names[i], self.body_names[j]) for i, j in self._pairs[np.unique(pairs)]]
@@ -1,5 +1,6 @@
 import math
 import os
+import tempfile
 import time
 
 import pytest
@@ -19,6 +20,7 @@ def add_imports(doctest_namespace):
     doctest_namespace["os"] = os
     doctest_namespace["math"] = math
     doctest_namespace["time"] = time
+    doctest_namespace["tempfile"] = tempfile
     doctest_namespace["Mesh"] = Mesh
     doctest_namespace["Frame"] = Frame
     doctest_namespace["Scale"] = Scale
@@ -0,0 +1,171 @@
+"""
+Internal helpers to dispatch several planning requests concurrently.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import logging
+import threading
+import time
+
+LOGGER = logging.getLogger('compas_fab.robots.dispatch')
+
+__all__ = [
+    'dispatch_concurrently',
+    'map_concurrently',
+]
+
+FIRST_SUCCESS = 'first_success'
+BEST_WITHIN_DEADLINE = 'best_within_deadline'
+
+POLICIES = (FIRST_SUCCESS, BEST_WITHIN_DEADLINE)
+
+
+def score_path_length(trajectory):
+    """Score a trajectory by its length in joint space."""
+    return trajectory.path_length
+
+
+def score_duration(trajectory):
+    """Score a trajectory by its duration."""
+    return trajectory.time_from_start
+
+
+SCORES = {
+    'path_length': score_path_length,
+    'duration': score_duration,
+}
+
+
+def dispatch_concurrently(tasks, policy=FIRST_SUCCESS, score='path_length', deadline=None, is_success=None):
+    """Run planning tasks concurrently and select the best result.
+
+    Parameters
+    ----------
+    tasks : list of tuple
+        Pairs of a label and a callable without arguments that returns a trajectory.
+    policy : str, optional
+        ``first_success`` to return the first successful result, or
+        ``best_within_deadline`` to return the best scored result among the tasks
+        finished before the deadline. Defaults to ``first_success``.
+    score : str, optional
+        Score to minimize when selecting among several results, either
+        ``path_length`` or ``duration``. Defaults to ``path_length``.
+    deadline : float, optional
+        Maximum number of seconds to wait for the results. Defaults to
+        waiting until all tasks have finished.
+    is_success : callable, optional
+        Function to check whether a result is successful. Defaults to
+        accepting any result returned without an exception.
+
+    Returns
+    -------
+    tuple
+        The label of the selected task, its result, and a dictionary of the
+        outcome of each task by label, with ``status`` (one of ``success``,
+        ``failure``, ``error`` or ``pending``), ``result``, ``error``, ``score``
+        and ``time`` in seconds.
+    """
+    if policy not in POLICIES:
+        raise ValueError('Unsupported policy. Must be one of: ' + str(POLICIES))
+    if score not in SCORES:
+        raise ValueError('Unsupported score. Must be one of: ' + str(tuple(SCORES)))
+
+    score_function = SCORES[score]
+    condition = threading.Condition()
+    start = time.time()
+    outcomes = dict((label, dict(status='pending', result=None, error=None, score=None, time=None)) for label, _ in tasks)
+
+    def run(label, task):
+        outcome = {}
+        try:
+            result = task()
+            outcome['result'] = result
+            if is_success is None or is_success(result):
+                outcome['status'] = 'success'
+                outcome['score'] = score_function(result)
+            else:
+                outcome['status'] = 'failure'
+        except Exception as e:
+            LOGGER.debug('Task %s failed: %s', label, e)
+            outcome['status'] = 'error'
+            outcome['error'] = e
+
+        with condition:
+            outcome['time'] = time.time() - start
+            outcomes[label].update(outcome)
+            condition.notify_all()
+
+    for label, task in tasks:
+        thread = threading.Thread(target=run, args=(label, task))
+        thread.daemon = True
+        thread.start()
+
+    def successful():
+        return [label for label, _ in tasks if outcomes[label]['status'] == 'success']
+
+    def finished():
+        return all(outcome['status'] != 'pending' for outcome in outcomes.values())
+
+    with condition:
+        while not finished():
+            if policy == FIRST_SUCCESS and successful():
+                break
+            remaining = None if deadline is None else deadline - (time.time() - start)
+            if remaining is not None and remaining <= 0:
+                break
+            # Wait in slices, a wait without timeout cannot be interrupted on some platforms
+            condition.wait(min(remaining, 0.5) if remaining is not None else 0.5)
+
+        # Take a snapshot, tasks still running do not modify the returned outcomes
+        snapshot = dict((label, dict(outcome)) for label, outcome in outcomes.items())
+        labels = successful()
+
+    if not labels:
+        errors = [snapshot[label]['error'] for label, _ in tasks if snapshot[label]['error']]
+        if errors:
+            raise errors[0]
+        raise Exception('None of the planning requests succeeded within the deadline')
+
+    if policy == FIRST_SUCCESS:
+        best = min(labels, key=lambda label: snapshot[label]['time'])
+    else:
+        best = min(labels, key=lambda label: snapshot[label]['score'])
+
+    return best, snapshot[best]['result'], snapshot
+
+
+def map_concurrently(tasks):
+    """Run tasks concurrently and wait for all of them to finish.
+
+    Parameters
+    ----------
+    tasks : list of callable
+        Callables without arguments.
+
+    Returns
+    -------
+    list of tuple
+        Pairs of result and exception of each task, in the same order as the tasks.
+    """
+    outcomes = [(None, None)] * len(tasks)
+
+    def run(index, task):
+        try:
+            outcomes[index] = (task(), None)
+        except Exception as e:
+            LOGGER.debug('Task %d failed: %s', index, e)
+            outcomes[index] = (None, e)
+
+    threads = []
+    for index, task in enumerate(tasks):
+        thread = threading.Thread(target=run, args=(index, task))
+        thread.daemon = True
+        thread.start()
+        threads.append(thread)
+
+    for thread in threads:
+        thread.join()
+
+    return outcomes
@@ -0,0 +1,405 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import base64
+import logging
+import os
+import struct
+
+import numpy as np
+from scipy.ndimage import binary_fill_holes
+from scipy.ndimage import distance_transform_edt
+
+from compas_fab.robots.collision_numpy import _frame_matrix
+from compas_fab.robots.collision_numpy import _mesh_triangles
+from compas_fab.robots.collision_numpy import _transform_points
+from compas_fab.robots.plan_cache import canonical_hash
+from compas_fab.robots.spheres_numpy import _subdivide
+
+LOGGER = logging.getLogger('compas_fab.robots.distance_field_numpy')
+
+__all__ = [
+    'SignedDistanceFieldNumpy',
+    'octomap_boxes_numpy',
+]
+
+# Prefix of the files storing distance fields, followed by the hash of the scene
+FIELD_FILENAME = 'distance_field_{}.npz'
+
+# Depth of octomap octrees, whose keys are offset to be positive
+OCTOMAP_DEPTH = 16
+OCTOMAP_KEY_OFFSET = 1 << (OCTOMAP_DEPTH - 1)
+
+
+def _octomap_bytes(data):
+    """Serialized octree of an ``octomap_msgs/Octomap``, received as list of ``int8`` or base64 string."""
+    if data is None:
+        return bytearray()
+    if isinstance(data, (bytes, bytearray)):
+        return bytearray(data)
+    if isinstance(data, str):
+        return bytearray(base64.b64decode(data))
+    return bytearray(value & 0xFF for value in data)
+
+
+def _octomap_leaves(data, binary):
+    """Keys of the lowest corners and depths of the occupied leaves of a serialized octree.
+
+    Nodes are serialized depth first. In the binary format, every inner node
+    is written as two bytes holding two bits per child: ``01`` for a free
+    leaf, ``10`` for an occupied leaf and ``11`` for an inner node. In the
+    full format, every node is written as its ``float`` log-odds occupancy
+    followed by a byte of flags of its existing children.
+    """
+    leaves = []
+    if not data:
+        return leaves
+
+    offset = 0
+    stack = [((0, 0, 0), 0)]
+    while stack:
+        corner, depth = stack.pop()
+        size = 1 << (OCTOMAP_DEPTH - depth - 1)
+        corners = [tuple(corner[axis] + size * ((i >> axis) & 1) for axis in range(3)) for i in range(8)]
+        inner = []
+
+        if binary:
+            flags = data[offset] | (data[offset + 1] << 8)
+            offset += 2
+            for i in range(8):
+                state = (flags >> (2 * i)) & 3
+                if state == 2:
+                    leaves.append((corners[i], depth + 1))
+                elif state == 3:
+                    inner.append((corners[i], depth + 1))
+        else:
+            value, = struct.unpack_from('<f', data, offset)
+            flags = data[offset + 4]
+            offset += 5
+            if not flags:
+                if value > 0:
+                    leaves.append((corner, depth))
+                continue
+            inner = [(corners[i], depth + 1) for i in range(8) if flags & (1 << i)]
+
+        # Children are read in order, after the complete subtree of their previous sibling
+        stack.extend(reversed(inner))
+
+    return leaves
+
+
+def _pose_matrix(pose):
+    """Transformation matrix of a ``geometry_msgs/Pose``."""
+    matrix = np.identity(4)
+    if not pose:
+        return matrix
+    position, orientation = pose.get('position', {}), pose.get('orientation', {})
+    x, y, z, w = [float(orientation.get(key, 1. if key == 'w' else 0.)) for key in 'xyzw']
+    norm = np.sqrt(x * x + y * y + z * z + w * w) or 1.
+    x, y, z, w = x / norm, y / norm, z / norm, w / norm
+    matrix[:3, :3] = [[1 - 2 * (y * y + z * z), 2 * (x * y - z * w), 2 * (x * z + y * w)],
+                      [2 * (x * y + z * w), 1 - 2 * (x * x + z * z), 2 * (y * z - x * w)],
+                      [2 * (x * z - y * w), 2 * (y * z + x * w), 1 - 2 * (x * x + y * y)]]
+    matrix[:3, 3] = [float(position.get(key, 0.)) for key in 'xyz']
+    return matrix
+
+
+def octomap_boxes_numpy(octomap):
+    """Compute the occupied boxes of an octomap.
+
+    Parameters
+    ----------
+    octomap : dict or :class:`compas_fab.backends.ros.messages.OctomapWithPose`
+        An ``octomap_msgs/OctomapWithPose`` or ``octomap_msgs/Octomap``
+        message, or its dictionary, e.g. the ``octomap`` of the ``world`` of
+        a planning scene. Octrees in the binary and in the full format are
+        supported.
+
+    Returns
+    -------
+    tuple of :class:`numpy.ndarray`
+        Lowest corners of the boxes in the octree's frame, and their sizes.
+        The corners of all boxes are placed by the transformation matrix,
+        the third item, of the octree's origin pose.
+    """
+    octomap = getattr(octomap, 'msg', octomap)
+    origin = octomap.get('origin') if 'octomap' in octomap else None
+    octomap = octomap.get('octomap', octomap)
+    if octomap.get('id', 'OcTree') not in ('OcTree', 'OcTreeStamped'):
+        raise ValueError('Unsupported octree type: {}'.format(octomap.get('id')))
+
+    resolution = float(octomap.get('resolution', 0.))
+    leaves = _octomap_leaves(_octomap_bytes(octomap.get('data')), octomap.get('binary', False))
+
+    keys = np.array([corner for corner, _ in leaves], dtype=float).reshape(-1, 3)
+    sizes = np.array([1 << (OCTOMAP_DEPTH - depth) for _, depth in leaves], dtype=float)
+    return (keys - OCTOMAP_KEY_OFFSET) * resolution, sizes * resolution, _pose_matrix(getattr(origin, 'msg', origin))
+
+
+class SignedDistanceFieldNumpy(object):
+    """Voxel occupancy grid and signed distance field of the static content of a scene.
+
+    The triangles of the collision meshes are rasterized into the voxels of
+    a regular grid, closed meshes are filled, and the occupied boxes of
+    octomaps are filled as a whole. The Euclidean distance transform of the
+    grid then gives the distance of every voxel center to the closest
+    occupied voxel center, negative inside of occupied space. Distances of
+    any number of points are interpolated from the eight surrounding voxel
+    centers at once, at a constant cost per point.
+
+    Parameters
+    ----------
+    collision_meshes : list of :class:`compas_fab.robots.CollisionMesh`, optional
+        The collision meshes of the scene, in the world coordinate frame.
+    octomaps : list of dict, optional
+        ``octomap_msgs/OctomapWithPose`` messages or their dictionaries, see
+        :func:`octomap_boxes_numpy`.
+    resolution : float, optional
+        Edge length of the voxels. Defaults to ``0.02``.
+    padding : float, optional
+        Free space around the content of the scene covered by the grid.
+        Defaults to ``0.2``.
+    bounds : tuple, optional
+        Lowest and highest corner of the grid, e.g. the workspace of the
+        robot. Content outside of the bounds is ignored. Defaults to the
+        bounding box of the content plus the padding.
+    directory : str, optional
+        Directory where the grid is stored, in a file named after the hash
+        of the scene. A grid stored for the same scene and parameters is
+        loaded instead of computed. Defaults to computing the grid without
+        storing it.
+
+    Attributes
+    ----------
+    scene_hash : str
+        Hash of the content of the scene and the parameters of the grid.
+    origin : :class:`numpy.ndarray`
+        Center of the first voxel.
+    resolution : float
+        Edge length of the voxels.
+    occupancy : :class:`numpy.ndarray`
+        ``True`` for the occupied voxels, of shape ``(nx, ny, nz)``.
+    field : :class:`numpy.ndarray`
+        Signed distances of the voxel centers, of the same shape.
+
+    Notes
+    -----
+    Lengths are in meters. Distances are accurate to about the resolution,
+    distances of points outside of the grid are bounded from below by their
+    distance to the grid plus the free space at its border.
+
+    Examples
+    --------
+    >>> field = SignedDistanceFieldNumpy([collision_mesh], resolution=0.05)
+    >>> field.distances([[0., 0., 2.]])     # doctest: +SKIP
+    array([1.2])
+    """
+
+    def __init__(self, collision_meshes=None, octomaps=None, resolution=0.02, padding=0.2, bounds=None, directory=None):
+        collision_meshes = list(collision_meshes or [])
+        octomaps = [getattr(octomap, 'msg', octomap) for octomap in octomaps or []]
+        self.resolution = float(resolution)
+        self.scene_hash = canonical_hash(dict(collision_meshes=collision_meshes, octomaps=octomaps,
+                                              resolution=self.resolution, padding=padding, bounds=bounds))
+
+        filename = os.path.join(directory, FIELD_FILENAME.format(self.scene_hash)) if directory else None
+        if filename and self._load(filename):
+            return
+
+        surfaces, points, boxes = self._content(collision_meshes, octomaps)
+        self._grid(np.concatenate(surfaces + [points]), boxes, padding, bounds)
+        self._rasterize(surfaces, points, boxes)
+        self._transform()
+
+        if filename:
+            self._store(filename)
+
+    def _content(self, collision_meshes, octomaps):
+        """Points sampled on the triangles of each mesh, closer than half a voxel, points
+        sampled in rotated octomap boxes, and the corners of the other octomap boxes."""
+        surfaces = []
+        for collision_mesh in collision_meshes:
+            triangles = _mesh_triangles(collision_mesh.mesh)
+            triangles = _transform_points(_frame_matrix(collision_mesh.frame), triangles)
+            triangles = _subdivide(triangles, self.resolution / 2.)
+            surfaces.append(np.concatenate([triangles.reshape(-1, 3), triangles.mean(axis=1)]))
+
+        points = []
+
+        boxes = []
+        for octomap in octomaps:
+            corners, sizes, matrix = octomap_boxes_numpy(octomap)
+            if not np.allclose(matrix[:3, :3], np.identity(3)):
+                # Rotated octrees are rasterized from points on their boxes
+                steps = np.ceil(sizes / (self.resolution / 2.)).astype(int)
+                for corner, size, count in zip(corners, sizes, steps):
+                    grid = np.stack(np.meshgrid(*[np.linspace(0., size, count + 1)] * 3, indexing='ij'), axis=-1)
+                    points.append(_transform_points(matrix, grid.reshape(-1, 3) + corner))
+                continue
+            boxes.append(np.concatenate([corners + matrix[:3, 3], corners + matrix[:3, 3] + sizes[:, None]], axis=1))
+
+        points = np.concatenate(points) if points else np.zeros((0, 3))
+        boxes = np.concatenate(boxes) if boxes else np.zeros((0, 6))
+        return surfaces, points, boxes
+
+    def _grid(self, points, boxes, padding, bounds):
+        if bounds is not None:
+            lower, upper = np.array(bounds[0], dtype=float), np.array(bounds[1], dtype=float)
+        else:
+            extents = np.concatenate([points, boxes[:, :3], boxes[:, 3:]])
+            if not len(extents):
+                extents = np.zeros((1, 3))
+            lower, upper = extents.min(axis=0) - padding, extents.max(axis=0) + padding
+
+        shape = np.maximum(np.ceil((upper - lower) / self.resolution).astype(int) + 1, 1)
+        self.origin = lower
+        self.occupancy = np.zeros(shape, dtype=bool)
+
+    def _voxels(self, points):
+        shape = np.array(self.occupancy.shape)
+        indices = np.round((points - self.origin) / self.resolution).astype(int)
+        return indices[np.all((indices >= 0) & (indices < shape), axis=1)]
+
+    def _rasterize(self, surfaces, points, boxes):
+        shape = np.array(self.occupancy.shape)
+
+        # Closed surfaces are filled one by one, free space enclosed by several meshes stays free
+        for surface in surfaces:
+            indices = self._voxels(surface)
+            if not len(indices):
+                continue
+            low, high = np.maximum(indices.min(axis=0) - 1, 0), np.minimum(indices.max(axis=0) + 2, shape)
+            solid = np.zeros(high - low, dtype=bool)
+            solid[tuple((indices - low).T)] = True
+            window = tuple(slice(a, b) for a, b in zip(low, high))
+            self.occupancy[window] |= binary_fill_holes(solid)
+
+        # Points of rotated octomaps and the boxes of octomaps are solid already
+        self.occupancy[tuple(self._voxels(points).T)] = True
+
+        lowest = np.maximum(np.ceil((boxes[:, :3] - self.origin) / self.resolution - 1e-9).astype(int), 0)
+        highest = np.minimum(np.floor((boxes[:, 3:] - self.origin) / self.resolution + 1e-9).astype(int), shape - 1)
+        centers = np.round(((boxes[:, :3] + boxes[:, 3:]) / 2. - self.origin) / self.resolution).astype(int)
+        for low, high, center in zip(lowest, highest, centers):
+            # Boxes smaller than a voxel occupy the voxel of their center
+            low, high = np.where(high < low, center, low), np.where(high < low, center, high)
+            if np.any(high < 0) or np.any(low >= shape):
+                continue
+            low, high = np.maximum(low, 0), np.minimum(high, shape - 1)
+            self.occupancy[low[0]:high[0] + 1, low[1]:high[1] + 1, low[2]:high[2] + 1] = True
+
+    def _transform(self):
+        occupied = np.argwhere(self.occupancy)
+        if not len(occupied):
+            self.field = np.full(self.occupancy.shape, np.inf)
+            self._margin = np.inf
+            return
+
+        outside = distance_transform_edt(~self.occupancy, sampling=self.resolution)
+        inside = distance_transform_edt(self.occupancy, sampling=self.resolution)
+        self.field = outside - inside
+        self._margin = self.resolution * min(occupied.min(), (np.array(self.occupancy.shape) - 1 - occupied.max(axis=0)).min())
+
+    def _load(self, filename):
+        if not os.path.isfile(filename):
+            return False
+        try:
+            with np.load(filename) as data:
+                self.origin = data['origin']
+                self.field = data['field'].astype(float)
+                self.occupancy = np.unpackbits(data['occupancy'])[:self.field.size].reshape(self.field.shape).astype(bool)
+                self._margin = float(data['margin'])
+        except (IOError, KeyError, ValueError):
+            LOGGER.warning('Ignoring invalid distance field file: %s', filename)
+            return False
+        return True
+
+    def _store(self, filename):
+        directory = os.path.dirname(filename)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        np.savez_compressed(filename, origin=self.origin, field=self.field.astype(np.float32),
+                            occupancy=np.packbits(self.occupancy), margin=self._margin)
+
+    @property
+    def shape(self):
+        """tuple: Number of voxels along the axes."""
+        return self.occupancy.shape
+
+    def _indices(self, points):
+        points = np.atleast_2d(np.asarray(points, dtype=float))
+        return (points - self.origin) / self.resolution
+
+    def occupied(self, points):
+        """Check if points are in occupied voxels.
+
+        Parameters
+        ----------
+        points : array-like
+            Points of shape ``(n, 3)``.
+
+        Returns
+        -------
+        :class:`numpy.ndarray`
+            ``True`` for the points in occupied voxels, ``False`` outside of the grid.
+        """
+        indices = np.round(self._indices(points)).astype(int)
+        inside = np.all((indices >= 0) & (indices < self.shape), axis=1)
+        result = np.zeros(len(indices), dtype=bool)
+        result[inside] = self.occupancy[tuple(indices[inside].T)]
+        return result
+
+    def distances(self, points):
+        """Compute the signed distances of points to the occupied space.
+
+        Parameters
+        ----------
+        points : array-like
+            Points of shape ``(n, 3)``.
+
+        Returns
+        -------
+        :class:`numpy.ndarray`
+            Distances of the points, negative inside of occupied space.
+        """
+        indices = self._indices(points)
+        upper = np.array(self.shape) - 1
+        clamped = np.clip(indices, 0, upper)
+        outside = np.linalg.norm(indices - clamped, axis=1) * self.resolution
+
+        # Trilinear interpolation of the eight surrounding voxel centers
+        low = np.minimum(np.floor(clamped).astype(int), np.maximum(upper - 1, 0))
+        weights = clamped - low
+        high = np.minimum(low + 1, upper)
+        distances = np.zeros(len(indices))
+        for corner in range(8):
+            select = [(corner >> axis) & 1 for axis in range(3)]
+            index = np.where(select, high, low)
+            weight = np.prod(np.where(select, weights, 1. - weights), axis=1)
+            values = self.field[tuple(index.T)]
+            distances += np.where(weight > 0, weight * values, 0.)
+
+        return np.where(outside > 0, outside + self._margin, distances)
+
+    def gradients(self, points):
+        """Compute the gradients of the signed distances at points, by central differences.
+
+        Parameters
+        ----------
+        points : array-like
+            Points of shape ``(n, 3)``.
+
+        Returns
+        -------
+        :class:`numpy.ndarray`
+            Gradients of shape ``(n, 3)``, pointing away from the occupied space.
+        """
+        points = np.atleast_2d(np.asarray(points, dtype=float))
+        step = self.resolution / 2.
+        offsets = np.identity(3) * step
+        shifted = np.concatenate([points[:, None] + offsets, points[:, None] - offsets], axis=1)
+        distances = self.distances(shifted.reshape(-1, 3)).reshape(len(points), 2, 3)
+        with np.errstate(invalid='ignore'):
+            gradients = (distances[:, 0] - distances[:, 1]) / (2. * step)
+        return np.nan_to_num(gradients)
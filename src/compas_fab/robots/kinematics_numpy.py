@@ -0,0 +1,164 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import numpy as np
+from compas.geometry import Transformation
+from compas.robots import Joint
+
+__all__ = [
+    'ForwardKinematicsNumpy',
+]
+
+REVOLUTE_TYPES = (Joint.REVOLUTE, Joint.CONTINUOUS)
+
+
+class ForwardKinematicsNumpy(object):
+    """Forward kinematics of a robot for many configurations at once.
+
+    The transformations of the links are computed with vectorized operations
+    over all configurations, which makes it suitable for sampling-based
+    planning and collision checking.
+
+    Parameters
+    ----------
+    robot : :class:`compas_fab.robots.Robot`
+        The robot.
+
+    Attributes
+    ----------
+    joint_names : list of str
+        Names of the configurable joints, in the order of the configuration values.
+    link_names : list of str
+        Names of the links, parents before children.
+    initial_link_frames : :class:`numpy.ndarray`
+        Frames of the links in the zero configuration, as transformations
+        from the link to the world.
+
+    Notes
+    -----
+    As in :meth:`compas.robots.RobotModel.compute_transformations`, the link
+    transformations map the geometry of the robot in its zero configuration
+    onto its geometry in the given configuration. Lengths are in meters,
+    regardless of the robot's scale factor.
+
+    Examples
+    --------
+    >>> fk = ForwardKinematicsNumpy(robot)
+    >>> transformations = fk.link_transformations([[0.] * len(fk.joint_names)] * 10)
+    >>> transformations.shape == (10, len(fk.link_names), 4, 4)
+    True
+    """
+
+    def __init__(self, robot):
+        self.joint_names = robot.get_configurable_joint_names()
+        self.link_names = []
+
+        scale = 1. / robot.scale_factor
+        indices = dict((name, i) for i, name in enumerate(self.joint_names))
+
+        # Joints as tuples of parent joint, type, axis, point, value index, mimic factors and limits
+        self._joints = []
+        self._link_joints = []
+        self.initial_link_frames = []
+        joints = []
+
+        def add_link(link, parent):
+            self.link_names.append(link.name)
+            self._link_joints.append(parent)
+            if parent < 0:
+                self.initial_link_frames.append(np.identity(4))
+            else:
+                joint = joints[parent]
+                frame = joint.origin.copy()
+                frame.point = frame.point * scale
+                self.initial_link_frames.append(np.array(Transformation.from_frame(frame).matrix))
+
+            for joint in link.joints:
+                index = indices.get(joint.name)
+                multiplier, offset = 1., 0.
+                if index is None and joint.mimic and joint.mimic.joint in indices:
+                    index = indices[joint.mimic.joint]
+                    multiplier, offset = joint.mimic.multiplier, joint.mimic.offset
+
+                configurable = index is not None and joint.type in REVOLUTE_TYPES + (Joint.PRISMATIC, )
+                lower, upper = -np.inf, np.inf
+                if configurable and joint.type != Joint.CONTINUOUS and joint.limit:
+                    lower, upper = joint.limit.lower, joint.limit.upper
+                    if joint.type == Joint.PRISMATIC:
+                        lower, upper = lower * scale, upper * scale
+
+                axis = np.array(list(joint.axis.vector), dtype=float)
+                if configurable:
+                    axis /= np.linalg.norm(axis)
+
+                joints.append(joint)
+                self._joints.append((parent,
+                                     joint.type if configurable else Joint.FIXED,
+                                     axis,
+                                     np.array(list(joint.origin.point), dtype=float) * scale,
+                                     index, multiplier, offset, lower, upper))
+
+                if joint.child_link:
+                    add_link(joint.child_link, len(self._joints) - 1)
+
+        add_link(robot.model.root, -1)
+        self.initial_link_frames = np.array(self.initial_link_frames)
+
+    def link_transformations(self, configurations):
+        """Compute the transformations of all links.
+
+        Parameters
+        ----------
+        configurations : array-like
+            Joint values of the configurable joints, one row per configuration.
+
+        Returns
+        -------
+        :class:`numpy.ndarray`
+            Transformations as array of shape ``(configurations, links, 4, 4)``.
+        """
+        values = np.atleast_2d(np.asarray(configurations, dtype=float))
+        count = len(values)
+        identity = np.broadcast_to(np.identity(4), (count, 4, 4))
+
+        transformations = []
+        for parent, type, axis, point, index, multiplier, offset, lower, upper in self._joints:
+            parent_transformation = identity if parent < 0 else transformations[parent]
+            if type == Joint.FIXED:
+                transformations.append(parent_transformation)
+                continue
+
+            position = np.clip(multiplier * values[:, index] + offset, lower, upper)
+            motion = np.zeros((count, 4, 4))
+            motion[:, 3, 3] = 1.
+
+            if type == Joint.PRISMATIC:
+                motion[:, :3, :3] = np.identity(3)
+                motion[:, :3, 3] = position[:, None] * axis
+            else:
+                # Rotation about the axis through the joint's origin
+                k = np.array([[0., -axis[2], axis[1]], [axis[2], 0., -axis[0]], [-axis[1], axis[0], 0.]])
+                rotation = np.identity(3) + np.sin(position)[:, None, None] * k + (1. - np.cos(position))[:, None, None] * k.dot(k)
+                motion[:, :3, :3] = rotation
+                motion[:, :3, 3] = point - rotation.dot(point)
+
+            transformations.append(np.matmul(parent_transformation, motion))
+
+        links = [identity if joint < 0 else transformations[joint] for joint in self._link_joints]
+        return np.stack(links, axis=1)
+
+    def link_frames(self, configurations):
+        """Compute the frames of all links, as transformations from the link to the world.
+
+        Parameters
+        ----------
+        configurations : array-like
+            Joint values of the configurable joints, one row per configuration.
+
+        Returns
+        -------
+        :class:`numpy.ndarray`
+            Frames as array of shape ``(configurations, links, 4, 4)``.
+        """
+        return np.matmul(self.link_transformations(configurations), self.initial_link_frames)
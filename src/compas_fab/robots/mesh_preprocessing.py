@@ -0,0 +1,220 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import json
+import logging
+import os
+import threading
+
+from compas.datastructures import Mesh
+
+from compas_fab.robots.plan_cache import canonical_hash
+from compas_fab.robots.plan_cache import mesh_hash
+from compas_fab.robots.planning_scene import AttachedCollisionMesh
+from compas_fab.robots.planning_scene import CollisionMesh
+
+LOGGER = logging.getLogger('compas_fab.robots.mesh_preprocessing')
+
+__all__ = [
+    'CollisionMeshPreprocessor',
+]
+
+
+class CollisionMeshPreprocessor(object):
+    """Simplifies collision meshes before they are added to the planning scene.
+
+    Collision checking time grows with the number of faces of the collision
+    objects, while the scanned or designed meshes added to the planning scene
+    are often much denser than needed. The preprocessor replaces them by a
+    coarser approximation, assigned to :attr:`PlanningScene.preprocessor`.
+    Results are cached by the hash of the mesh and the preprocessing parameters,
+    so adding the same geometry again does not recompute it.
+
+    Parameters
+    ----------
+    method : str, optional
+        ``decimate`` for a quadric-based decimation within ``target_error``,
+        ``convex_hull`` for the convex hull, or ``convex_decomposition`` for
+        the joined convex hulls of an approximate convex decomposition.
+        Defaults to ``decimate``.
+    target_error : float, optional
+        Maximum deviation of the decimated mesh from the original surface,
+        in meters. Defaults to 5 mm.
+    max_concavity : float, optional
+        Maximum concavity of the parts of a convex decomposition, in meters.
+        Defaults to 2 cm.
+    max_parts : int, optional
+        Maximum number of parts of a convex decomposition. Defaults to 16.
+    compute_error : bool, optional
+        ``True`` to report the Hausdorff distance between the original and
+        the simplified mesh. Defaults to ``True``.
+    cache_path : str, optional
+        Directory to persist the simplified meshes. Defaults to caching them
+        in memory only.
+
+    Attributes
+    ----------
+    reports : dict
+        The report of the last simplification of each collision mesh by id,
+        with the ``method``, the number of faces ``faces_before`` and
+        ``faces_after``, the ``face_reduction`` ratio, the ``hausdorff_error``
+        (``None`` if not computed) and whether it was ``cached``.
+
+    Notes
+    -----
+    Only available on CPython, the simplification requires ``numpy`` and ``scipy``.
+
+    Examples
+    --------
+    >>> preprocessor = CollisionMeshPreprocessor('convex_hull')
+    >>> mesh = Mesh.from_stl(compas_fab.get('planning_scene/cone.stl'))
+    >>> cm = preprocessor.process(CollisionMesh(mesh, 'cone'))
+    >>> preprocessor.reports['cone']['faces_after'] <= preprocessor.reports['cone']['faces_before']
+    True
+    """
+
+    METHODS = ('decimate', 'convex_hull', 'convex_decomposition')
+
+    def __init__(self, method='decimate', target_error=0.005, max_concavity=0.02, max_parts=16,
+                 compute_error=True, cache_path=None):
+        if method not in self.METHODS:
+            raise ValueError('Unsupported method. Must be one of: ' + str(self.METHODS))
+
+        self.method = method
+        self.target_error = target_error
+        self.max_concavity = max_concavity
+        self.max_parts = max_parts
+        self.compute_error = compute_error
+        self.cache_path = cache_path
+        self.reports = {}
+        self._cache = {}
+        self._counters = dict(hits=0, misses=0)
+        self._lock = threading.Lock()
+
+        if cache_path and not os.path.isdir(cache_path):
+            os.makedirs(cache_path)
+
+    @property
+    def parameters(self):
+        """dict: The parameters which affect the simplified mesh."""
+        parameters = dict(method=self.method, compute_error=self.compute_error)
+        if self.method == 'decimate':
+            parameters['target_error'] = self.target_error
+        elif self.method == 'convex_decomposition':
+            parameters.update(max_concavity=self.max_concavity, max_parts=self.max_parts)
+        return parameters
+
+    @property
+    def stats(self):
+        """dict: Counters of cache ``hits`` and ``misses``."""
+        return dict(self._counters)
+
+    def key(self, mesh):
+        """Compute the cache key of the simplification of a mesh.
+
+        Parameters
+        ----------
+        mesh : :class:`compas.datastructures.Mesh`
+
+        Returns
+        -------
+        str
+        """
+        return canonical_hash(dict(mesh=mesh_hash(mesh), parameters=self.parameters))
+
+    def _cached(self, key):
+        if key in self._cache:
+            return self._cache[key]
+        if self.cache_path:
+            try:
+                with open(os.path.join(self.cache_path, key + '.json'), 'r') as f:
+                    return json.load(f)
+            except (IOError, OSError, ValueError):
+                pass
+        return None
+
+    def _store(self, key, entry):
+        self._cache[key] = entry
+        if self.cache_path:
+            with open(os.path.join(self.cache_path, key + '.json'), 'w') as f:
+                json.dump(entry, f)
+
+    def simplify(self, mesh):
+        """Simplify a mesh.
+
+        Parameters
+        ----------
+        mesh : :class:`compas.datastructures.Mesh`
+            The mesh to simplify.
+
+        Returns
+        -------
+        tuple
+            The simplified :class:`compas.datastructures.Mesh` and its report.
+        """
+        from compas_fab.robots import mesh_preprocessing_numpy as processing
+
+        key = self.key(mesh)
+        with self._lock:
+            entry = self._cached(key)
+
+        if entry is None:
+            vertices, faces = mesh.to_vertices_and_faces()
+            if self.method == 'decimate':
+                simplified = processing.mesh_decimate_numpy(vertices, faces, self.target_error)
+            elif self.method == 'convex_hull':
+                simplified = processing.mesh_convex_hull_numpy(vertices, faces)
+            else:
+                simplified = processing.mesh_convex_decomposition_numpy(vertices, faces, self.max_concavity, self.max_parts)
+
+            error = None
+            if self.compute_error:
+                error = processing.mesh_hausdorff_distance_numpy(vertices, faces, *simplified)
+
+            faces_before = len(faces)
+            faces_after = len(simplified[1])
+            report = dict(method=self.method, faces_before=faces_before, faces_after=faces_after,
+                          face_reduction=1. - faces_after / faces_before if faces_before else 0.,
+                          hausdorff_error=error)
+            entry = dict(vertices=simplified[0], faces=simplified[1], report=report)
+
+            with self._lock:
+                self._store(key, entry)
+                self._counters['misses'] += 1
+            cached = False
+        else:
+            with self._lock:
+                self._counters['hits'] += 1
+            cached = True
+
+        report = dict(entry['report'], cached=cached)
+        return Mesh.from_vertices_and_faces(entry['vertices'], entry['faces']), report
+
+    def process(self, collision_mesh):
+        """Simplify a collision mesh or an attached collision mesh.
+
+        The given object is not modified.
+
+        Parameters
+        ----------
+        collision_mesh : :class:`compas_fab.robots.CollisionMesh` or :class:`compas_fab.robots.AttachedCollisionMesh`
+            The collision mesh to simplify.
+
+        Returns
+        -------
+        :class:`compas_fab.robots.CollisionMesh` or :class:`compas_fab.robots.AttachedCollisionMesh`
+            A copy of the collision mesh with the simplified mesh.
+        """
+        if isinstance(collision_mesh, AttachedCollisionMesh):
+            attached_collision_mesh = collision_mesh
+            collision_mesh = self.process(attached_collision_mesh.collision_mesh)
+            return AttachedCollisionMesh(collision_mesh, attached_collision_mesh.link_name,
+                                         list(attached_collision_mesh.touch_links), attached_collision_mesh.weight)
+
+        mesh, report = self.simplify(collision_mesh.mesh)
+        self.reports[collision_mesh.id] = report
+        LOGGER.info('Simplified collision mesh %s from %d to %d faces (%s), Hausdorff error: %s',
+                    collision_mesh.id, report['faces_before'], report['faces_after'], report['method'], report['hausdorff_error'])
+
+        return CollisionMesh(mesh, collision_mesh.id, collision_mesh.frame.copy(), collision_mesh.root_name)
@@ -0,0 +1,413 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import numpy as np
+from scipy.spatial import ConvexHull
+from scipy.spatial import QhullError
+from scipy.spatial import cKDTree
+
+__all__ = [
+    'closest_points_on_triangles_numpy',
+    'mesh_convex_decomposition_numpy',
+    'mesh_convex_hull_numpy',
+    'mesh_decimate_numpy',
+    'mesh_hausdorff_distance_numpy',
+]
+
+# Maximum number of point-triangle pairs evaluated at once
+CHUNK_SIZE = 2 ** 20
+
+
+def _triangles(faces):
+    """Fan triangulation of the faces of a mesh, as an array of vertex indices."""
+    if isinstance(faces, np.ndarray) and faces.ndim == 2 and faces.shape[1] == 3:
+        return faces
+    triangles = []
+    for face in faces:
+        for i in range(1, len(face) - 1):
+            triangles.append((face[0], face[i], face[i + 1]))
+    return np.array(triangles, dtype=int).reshape(-1, 3)
+
+
+def _compact(vertices, triangles):
+    """Remove the vertices which are not referenced by any triangle."""
+    used, triangles = np.unique(triangles, return_inverse=True)
+    return vertices[used], triangles.reshape(-1, 3)
+
+
+def closest_points_on_triangles_numpy(points, a, b, c):
+    """Compute the closest points on triangles.
+
+    All arguments are arrays of 3D points which are broadcast against each other,
+    e.g. ``n x 1 x 3`` points and ``1 x m x 3`` triangle corners to compute the
+    closest points of all pairs.
+
+    Parameters
+    ----------
+    points : array
+        Query points.
+    a, b, c : array
+        Corners of the triangles.
+
+    Returns
+    -------
+    array
+        The closest point on the triangle to each query point.
+
+    Examples
+    --------
+    >>> closest_points_on_triangles_numpy([0.5, 0.5, 1.], [0, 0, 0], [1, 0, 0], [0, 1, 0]).tolist()
+    [0.5, 0.5, 0.0]
+    """
+    p, a, b, c = np.broadcast_arrays(*[np.asarray(x, dtype=float) for x in (points, a, b, c)])
+    ab = b - a
+    ac = c - a
+    ap = p - a
+    bp = p - b
+    cp = p - c
+
+    def dot(u, v):
+        return np.einsum('...i,...i->...', u, v)
+
+    d1, d2 = dot(ab, ap), dot(ac, ap)
+    d3, d4 = dot(ab, bp), dot(ac, bp)
+    d5, d6 = dot(ab, cp), dot(ac, cp)
+    va = d3 * d6 - d5 * d4
+    vb = d5 * d2 - d1 * d6
+    vc = d1 * d4 - d3 * d2
+
+    def ratio(numerator, denominator):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.nan_to_num(numerator / denominator)[..., None]
+
+    # Voronoi regions of the triangle, the first matching region wins,
+    # so they are applied from the last to the first
+    result = a + ab * ratio(vb, va + vb + vc) + ac * ratio(vc, va + vb + vc)
+    edge_bc = (va <= 0) & (d4 - d3 >= 0) & (d5 - d6 >= 0)
+    result = np.where(edge_bc[..., None], b + (c - b) * ratio(d4 - d3, (d4 - d3) + (d5 - d6)), result)
+    edge_ac = (vb <= 0) & (d2 >= 0) & (d6 <= 0)
+    result = np.where(edge_ac[..., None], a + ac * ratio(d2, d2 - d6), result)
+    result = np.where(((d6 >= 0) & (d5 <= d6))[..., None], c, result)
+    edge_ab = (vc <= 0) & (d1 >= 0) & (d3 <= 0)
+    result = np.where(edge_ab[..., None], a + ab * ratio(d1, d1 - d3), result)
+    result = np.where(((d3 >= 0) & (d4 <= d3))[..., None], b, result)
+    result = np.where(((d1 <= 0) & (d2 <= 0))[..., None], a, result)
+    return result
+
+
+def _surface_samples(vertices, triangles, samples):
+    """Vertices, edge midpoints and centroids, completed by random points on coarse meshes."""
+    random = np.random.RandomState(0)
+    corners = vertices[triangles]
+    points = np.vstack((vertices, (corners + np.roll(corners, 1, axis=1)).reshape(-1, 3) / 2., corners.mean(axis=1)))
+    if len(points) > samples:
+        return points[random.choice(len(points), samples, replace=False)]
+
+    areas = np.linalg.norm(np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0]), axis=1)
+    if not areas.sum():
+        return points
+    chosen = random.choice(len(triangles), samples - len(points), p=areas / areas.sum())
+    u, v = random.rand(2, len(chosen), 1)
+    flip = (u + v) > 1
+    u, v = np.where(flip, 1 - u, u), np.where(flip, 1 - v, v)
+    a, b, c = corners[chosen, 0], corners[chosen, 1], corners[chosen, 2]
+    return np.vstack((points, a + u * (b - a) + v * (c - a)))
+
+
+def _distances_to_surface(points, vertices, triangles, neighbors=16):
+    corners = vertices[triangles]
+    distances = np.empty(len(points))
+
+    if len(points) * len(triangles) <= CHUNK_SIZE * 4:
+        # Exact, all pairs of points and triangles in chunks
+        step = max(1, CHUNK_SIZE // len(triangles))
+        for start in range(0, len(points), step):
+            chunk = points[start:start + step, None, :]
+            closest = closest_points_on_triangles_numpy(chunk, corners[None, :, 0], corners[None, :, 1], corners[None, :, 2])
+            distances[start:start + step] = np.linalg.norm(closest - chunk, axis=-1).min(axis=1)
+        return distances
+
+    # Dense meshes have small triangles, the nearest centroids are good candidates
+    _, candidates = cKDTree(corners.mean(axis=1)).query(points, k=min(neighbors, len(triangles)))
+    candidates = candidates.reshape(len(points), -1)
+    closest = closest_points_on_triangles_numpy(points[:, None, :], corners[candidates, 0], corners[candidates, 1], corners[candidates, 2])
+    return np.linalg.norm(closest - points[:, None, :], axis=-1).min(axis=1)
+
+
+def mesh_hausdorff_distance_numpy(vertices_a, faces_a, vertices_b, faces_b, samples=2048):
+    """Estimate the symmetric Hausdorff distance between two meshes.
+
+    The distance is evaluated from sample points on each mesh, i.e. vertices,
+    edge midpoints, face centroids and random points, to the surface of the
+    other one.
+
+    Parameters
+    ----------
+    vertices_a, faces_a : list
+        Vertices and faces of the first mesh.
+    vertices_b, faces_b : list
+        Vertices and faces of the second mesh.
+    samples : int, optional
+        Maximum number of sample points taken on each mesh. Defaults to 2048.
+
+    Returns
+    -------
+    float
+    """
+    va, ta = np.asarray(vertices_a, dtype=float), _triangles(faces_a)
+    vb, tb = np.asarray(vertices_b, dtype=float), _triangles(faces_b)
+    if not len(ta) or not len(tb):
+        return float('inf') if len(ta) or len(tb) else 0.
+
+    a_to_b = _distances_to_surface(_surface_samples(va, ta, samples), vb, tb).max()
+    b_to_a = _distances_to_surface(_surface_samples(vb, tb, samples), va, ta).max()
+    return float(max(a_to_b, b_to_a))
+
+
+def _convex_hull(points):
+    hull = ConvexHull(points)
+    triangles = hull.simplices.copy()
+    # Orient the triangles outwards, along the normals of the facets
+    corners = points[triangles]
+    normals = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+    flip = np.einsum('ij,ij->i', normals, hull.equations[:, :3]) < 0
+    triangles[flip] = triangles[flip][:, ::-1]
+    return _compact(points, triangles) + (hull.equations, )
+
+
+def _planar_convex_hull(points):
+    """Convex hull of points in a plane, as a triangle fan."""
+    centroid = points.mean(axis=0)
+    _, _, axes = np.linalg.svd(points - centroid)
+    hull = ConvexHull((points - centroid).dot(axes[:2].T))
+    boundary = hull.vertices
+    triangles = np.array([[boundary[0], boundary[i], boundary[i + 1]] for i in range(1, len(boundary) - 1)])
+    return _compact(points, triangles)
+
+
+def mesh_convex_hull_numpy(vertices, faces):
+    """Compute the convex hull of a mesh.
+
+    Parameters
+    ----------
+    vertices : list
+        Vertices of the mesh.
+    faces : list
+        Faces of the mesh.
+
+    Returns
+    -------
+    tuple
+        Vertices and triangular faces of the hull, with outward normals.
+        The polygonal hull in the plane of the mesh if it is flat.
+
+    Examples
+    --------
+    >>> vertices, faces = mesh_convex_hull_numpy([[0, 0, 0], [1, 0, 0], [0, 1, 0], [0, 0, 1], [.1, .1, .1]],
+    ...                                          [[0, 1, 2], [0, 1, 3], [0, 2, 3], [1, 2, 3]])
+    >>> len(vertices), len(faces)
+    (4, 4)
+    """
+    vertices = np.asarray(vertices, dtype=float)
+    triangles = _triangles(faces)
+    points = vertices[np.unique(triangles)]
+    try:
+        hull_vertices, hull_triangles, _ = _convex_hull(points)
+    except QhullError:
+        try:
+            hull_vertices, hull_triangles = _planar_convex_hull(points)
+        except QhullError:
+            hull_vertices, hull_triangles = _compact(vertices, triangles)
+    return hull_vertices.tolist(), hull_triangles.tolist()
+
+
+def _accumulate(labels, values, count):
+    """Sum the rows of values with the same label."""
+    return np.stack([np.bincount(labels, weights=column, minlength=count) for column in values.T], axis=1)
+
+
+def _cluster_vertices(vertices, triangles, cell_size):
+    """Vertex clustering on a grid, placing each cluster at the minimum of its error quadric."""
+    origin = vertices.min(axis=0)
+    cells = np.floor((vertices - origin) / cell_size).astype(np.int64)
+    cells, labels = np.unique(cells, axis=0, return_inverse=True)
+    labels = labels.reshape(-1)
+    count = len(cells)
+
+    # Plane quadrics of the triangles, weighted by area
+    corners = vertices[triangles]
+    normals = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+    areas = np.linalg.norm(normals, axis=1)
+    normals = normals / np.where(areas > 0, areas, 1.)[:, None]
+    offsets = -np.einsum('ij,ij->i', normals, corners[:, 0])
+    A = np.einsum('i,ij,ik->ijk', areas, normals, normals)
+    b = (areas * offsets)[:, None] * normals
+
+    corner_labels = labels[triangles].reshape(-1)
+    cluster_A = _accumulate(corner_labels, np.repeat(A.reshape(-1, 9), 3, axis=0), count).reshape(-1, 3, 3)
+    cluster_b = _accumulate(corner_labels, np.repeat(b, 3, axis=0), count)
+
+    # Boundary edges are kept in place by the planes perpendicular to their triangles
+    edges = np.concatenate([triangles[:, [0, 1]], triangles[:, [1, 2]], triangles[:, [2, 0]]])
+    _, edge_index, edge_count = np.unique(np.sort(edges, axis=1), axis=0, return_index=True, return_counts=True)
+    boundary = edge_index[edge_count == 1]
+    if len(boundary):
+        start, end = vertices[edges[boundary, 0]], vertices[edges[boundary, 1]]
+        directions = end - start
+        planes = np.cross(directions, normals[boundary % len(triangles)])
+        lengths = np.linalg.norm(planes, axis=1)
+        weights = np.einsum('ij,ij->i', directions, directions)
+        planes = planes / np.where(lengths > 0, lengths, 1.)[:, None]
+        boundary_A = np.einsum('i,ij,ik->ijk', weights, planes, planes).reshape(-1, 9)
+        boundary_b = (weights * -np.einsum('ij,ij->i', planes, start))[:, None] * planes
+        boundary_labels = labels[edges[boundary]].T.reshape(-1)
+        cluster_A += _accumulate(boundary_labels, np.tile(boundary_A, (2, 1)), count).reshape(-1, 3, 3)
+        cluster_b += _accumulate(boundary_labels, np.tile(boundary_b, (2, 1)), count)
+    means = _accumulate(labels, vertices, count) / np.bincount(labels, minlength=count)[:, None]
+
+    # Minimize the quadric around the mean, ignoring the degenerate directions
+    # (e.g. along the plane of a flat region) as in Lindstrom's out-of-core simplification
+    eigenvalues, eigenvectors = np.linalg.eigh(cluster_A)
+    largest = eigenvalues.max(axis=1, keepdims=True)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        inverse = np.where(eigenvalues > 1e-3 * largest, 1. / eigenvalues, 0.)
+    residual = -np.einsum('kij,kj->ki', cluster_A, means) - cluster_b
+    delta = np.einsum('kij,kj->ki', eigenvectors, inverse * np.einsum('kji,kj->ki', eigenvectors, residual))
+    lower = origin + cells * cell_size
+    positions = np.clip(means + delta, lower - .5 * cell_size, lower + 1.5 * cell_size)
+
+    # Collapse the triangles, dropping degenerate and duplicate ones
+    collapsed = labels[triangles]
+    valid = (collapsed[:, 0] != collapsed[:, 1]) & (collapsed[:, 1] != collapsed[:, 2]) & (collapsed[:, 0] != collapsed[:, 2])
+    collapsed = collapsed[valid]
+    if len(collapsed):
+        _, unique = np.unique(np.sort(collapsed, axis=1), axis=0, return_index=True)
+        collapsed = collapsed[np.sort(unique)]
+    return _compact(positions, collapsed)
+
+
+def mesh_decimate_numpy(vertices, faces, target_error, max_iterations=12):
+    """Decimate a mesh to a target error with quadric-based vertex clustering.
+
+    The vertices are clustered on a grid and each cluster is replaced by the
+    point minimizing the quadric error of the planes of its triangles. The
+    coarsest grid whose result deviates less than the target error from the
+    original mesh, in terms of Hausdorff distance, is searched by halving the
+    cell size, starting from a quarter of the bounding box.
+
+    Parameters
+    ----------
+    vertices : list
+        Vertices of the mesh.
+    faces : list
+        Faces of the mesh.
+    target_error : float
+        Maximum deviation from the original surface.
+    max_iterations : int, optional
+        Maximum number of grid refinements. Defaults to 12.
+
+    Returns
+    -------
+    tuple
+        Vertices and triangular faces of the decimated mesh. The original mesh,
+        triangulated, if the target error could not be reached.
+
+    Examples
+    --------
+    >>> vertices = [[x, y, 0] for x in range(11) for y in range(11)]
+    >>> faces = [[11 * i + j, 11 * (i + 1) + j, 11 * (i + 1) + j + 1, 11 * i + j + 1] for i in range(10) for j in range(10)]
+    >>> vertices, faces = mesh_decimate_numpy(vertices, faces, 0.01)
+    >>> len(faces) < 200
+    True
+    """
+    vertices = np.asarray(vertices, dtype=float)
+    triangles = _triangles(faces)
+    result = None
+
+    def decimate(cell_size):
+        decimated = _cluster_vertices(vertices, triangles, cell_size)
+        if len(decimated[1]) and mesh_hausdorff_distance_numpy(vertices, triangles, *decimated) <= target_error:
+            return decimated
+        return None
+
+    cell_size = np.linalg.norm(vertices.max(axis=0) - vertices.min(axis=0)) / 4.
+    for _ in range(max_iterations):
+        if cell_size <= 0:
+            break
+        result = decimate(cell_size)
+        if result is not None:
+            # One more step between the successful and the failed cell size
+            result = decimate(cell_size * 2 ** .5) or result
+            break
+        cell_size /= 2.
+
+    if result is None or len(result[1]) >= len(triangles):
+        result = _compact(vertices, triangles)
+    return result[0].tolist(), result[1].tolist()
+
+
+def _concavity(points, equations):
+    """Largest depth of the points below the facets of their convex hull."""
+    concavity = 0.
+    step = max(1, CHUNK_SIZE // len(equations))
+    for start in range(0, len(points), step):
+        depths = -(points[start:start + step].dot(equations[:, :3].T) + equations[:, 3])
+        concavity = max(concavity, depths.min(axis=1).max())
+    return concavity
+
+
+def mesh_convex_decomposition_numpy(vertices, faces, max_concavity, max_parts=16):
+    """Compute an approximate convex decomposition of a mesh.
+
+    The faces are split recursively by planes through the median of their
+    centroids, along the direction of largest extent, until the concavity of
+    each part, i.e. the depth of its surface below its convex hull, is below
+    ``max_concavity``. The convex hulls of the parts are joined in one mesh.
+
+    Parameters
+    ----------
+    vertices : list
+        Vertices of the mesh.
+    faces : list
+        Faces of the mesh.
+    max_concavity : float
+        Maximum concavity of the parts.
+    max_parts : int, optional
+        Maximum number of convex parts. Defaults to 16.
+
+    Returns
+    -------
+    tuple
+        Vertices and triangular faces of the joined convex parts.
+    """
+    vertices = np.asarray(vertices, dtype=float)
+    triangles = _triangles(faces)
+    centroids = vertices[triangles].mean(axis=1)
+
+    queue = [np.arange(len(triangles))]
+    parts = []
+    while queue:
+        part = queue.pop(0)
+        points = np.vstack((vertices[np.unique(triangles[part])], centroids[part]))
+        try:
+            hull_vertices, hull_triangles, equations = _convex_hull(points)
+        except QhullError:
+            # Flat or degenerate part, kept as it is
+            parts.append(_compact(vertices, triangles[part]))
+            continue
+
+        if len(parts) + len(queue) + 2 <= max_parts and len(part) > 1 and _concavity(points, equations) > max_concavity:
+            part_centroids = centroids[part]
+            axis = np.argmax(part_centroids.max(axis=0) - part_centroids.min(axis=0))
+            below = part_centroids[:, axis] <= np.median(part_centroids[:, axis])
+            if below.any() and not below.all():
+                queue.extend((part[below], part[~below]))
+                continue
+
+        parts.append((hull_vertices, hull_triangles))
+
+    offsets = np.cumsum([0] + [len(part_vertices) for part_vertices, _ in parts])
+    joined_vertices = np.vstack([part_vertices for part_vertices, _ in parts])
+    joined_triangles = np.vstack([part_triangles + offset for (_, part_triangles), offset in zip(parts, offsets)])
+    return joined_vertices.tolist(), joined_triangles.tolist()
@@ -0,0 +1,420 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from contextlib import contextmanager
+from xml.etree import ElementTree
+
+import compas
+from compas.datastructures import Mesh
+
+from compas_fab.robots.trajectory import JointTrajectory
+
+try:
+    import sqlite3
+except ImportError:
+    compas.raise_if_ironpython()
+
+LOGGER = logging.getLogger('compas_fab.robots.plan_cache')
+
+__all__ = [
+    'PlanCache',
+]
+
+HASH_PRECISION = 9
+
+# Planners which always return the same solution for the same request
+DETERMINISTIC_PLANNERS = ('CHOMP', )
+
+# Attributes of planned trajectories which are stored along with them
+TRAJECTORY_ATTRIBUTES = ('planning_time', 'goal_index', 'goal_outcomes', 'chunk_fractions')
+
+# Number of hashes of the meshes of requests kept, e.g. of attached tools
+MAX_CACHED_MESHES = 64
+
+
+def _canonical(value, mesh_hasher=None):
+    """Convert a value into a structure of JSON types with a stable encoding.
+
+    Meshes are replaced by their hash computed by ``mesh_hasher``, if given.
+    """
+    if mesh_hasher and isinstance(value, Mesh):
+        return mesh_hasher(value)
+    if value is None or isinstance(value, (bool, int, str)) or type(value).__name__ in ('unicode', 'long'):
+        return value
+    if isinstance(value, float):
+        return round(value, HASH_PRECISION)
+    if isinstance(value, (list, tuple)):
+        return [_canonical(item, mesh_hasher) for item in value]
+    if isinstance(value, dict):
+        return dict((str(key), _canonical(item, mesh_hasher)) for key, item in value.items())
+    if hasattr(value, 'to_data'):
+        return _canonical(value.to_data(), mesh_hasher)
+    if hasattr(value, 'data'):
+        return _canonical(value.data, mesh_hasher)
+    if hasattr(value, '__dict__'):
+        attributes = dict((key, item) for key, item in vars(value).items() if not key.startswith('_'))
+        attributes['__type__'] = type(value).__name__
+        return _canonical(attributes, mesh_hasher)
+
+    return str(value)
+
+
+def canonical_hash(value, mesh_hasher=None):
+    """Compute a hash of a value that is stable across processes.
+
+    Floats are rounded, and objects are reduced to their data representation
+    (or their public attributes), so that equal requests hash equally.
+
+    Parameters
+    ----------
+    value : object
+        Value to hash, e.g. a dictionary of request parameters.
+    mesh_hasher : callable, optional
+        Function returning the hash of a mesh, to hash meshes of the value
+        by it instead of by their vertices and faces.
+
+    Returns
+    -------
+    str
+        Hexadecimal SHA-1 digest.
+    """
+    encoded = json.dumps(_canonical(value, mesh_hasher), sort_keys=True, separators=(',', ':'))
+    return hashlib.sha1(encoded.encode('utf8')).hexdigest()
+
+
+def mesh_hash(mesh):
+    """Compute a hash of the vertices and faces of a mesh.
+
+    Parameters
+    ----------
+    mesh : :class:`compas.datastructures.Mesh`
+
+    Returns
+    -------
+    str
+        Hexadecimal SHA-1 digest.
+    """
+    vertices, faces = mesh.to_vertices_and_faces()
+    return canonical_hash([vertices, faces])
+
+
+def robot_description_hash(robot):
+    """Compute a hash of the kinematic, collision and semantic description of a robot.
+
+    The hash is kept on the robot as long as its model and its semantics
+    are the same objects, changes made to them in place are not noticed.
+    """
+    memo = getattr(robot, '_description_hash', None)
+    if memo and memo[0] is robot.model and memo[1] is robot.semantics:
+        return memo[2]
+
+    description_hash = _robot_description_hash(robot)
+    robot._description_hash = (robot.model, robot.semantics, description_hash)
+    return description_hash
+
+
+def _robot_description_hash(robot):
+    model = robot.model
+    joints = []
+    for joint in model.joints:
+        joints.append(dict(name=joint.name, type=joint.type,
+                           parent=joint.parent.link if joint.parent else None,
+                           child=joint.child.link if joint.child else None,
+                           origin=joint.origin,
+                           axis=[joint.axis.x, joint.axis.y, joint.axis.z] if joint.axis else None,
+                           limit=[joint.limit.lower, joint.limit.upper] if joint.limit else None))
+    links = []
+    for link in model.links:
+        collision = []
+        for item in link.collision:
+            # Skip loaded meshes, the description of the shape is enough
+            shape = dict((key, value) for key, value in vars(item.geometry.shape).items() if key != 'meshes')
+            collision.append((item.origin, shape))
+        links.append(dict(name=link.name, collision=collision))
+
+    description = dict(name=model.name, joints=joints, links=links, semantics=None)
+    if robot.semantics:
+        description['semantics'] = ElementTree.tostring(robot.semantics.root).decode('utf8')
+
+    return canonical_hash(description)
+
+
+class PlanCache(object):
+    """Persistent cache of planned trajectories.
+
+    The cache is placed in front of :meth:`Robot.plan_motion` and
+    :meth:`Robot.plan_cartesian_motion` by assigning it to :attr:`Robot.plan_cache`.
+    Requests are identified by a hash of the robot description, the planning
+    scene, the start configuration, the constraints, the attached collision
+    meshes and the planner parameters. The index is stored in a SQLite database
+    and the trajectories as compressed files in the cache directory.
+
+    Parameters
+    ----------
+    path : str
+        Directory of the cache. It is created if it does not exist.
+    max_size : int, optional
+        Maximum size in bytes of the stored trajectories. The least recently used
+        entries are evicted when it is exceeded. Defaults to 256 MB.
+    cache_stochastic_planners : bool, optional
+        ``True`` to cache results of sampling-based planners (e.g. ``RRT``),
+        whose solutions differ between planner executions. Defaults to ``False``,
+        i.e. only cartesian paths and deterministic planners are cached.
+
+    Notes
+    -----
+    The planning scene is only considered if the client keeps track of it,
+    i.e. if it provides a ``planning_scene_hash`` attribute. Changes made to
+    the planning scene by other clients are not noticed. Meshes of requests,
+    e.g. of attached collision meshes, are hashed once, so they are expected
+    not to be modified in place afterwards. Partial results, whose
+    ``fraction`` is smaller than ``1``, are not cached.
+
+    Examples
+    --------
+    >>> cache = PlanCache(os.path.join(tempfile.mkdtemp(), 'plans'))
+    >>> robot.plan_cache = cache
+    >>> cache.stats['hits']
+    0
+    """
+
+    def __init__(self, path, max_size=256 * 1024 * 1024, cache_stochastic_planners=False):
+        self.path = path
+        self.max_size = max_size
+        self.cache_stochastic_planners = cache_stochastic_planners
+        self._lock = threading.Lock()
+        self._counters = dict(hits=0, misses=0, stores=0, evictions=0, skipped=0)
+        self._mesh_hashes = OrderedDict()
+
+        if not os.path.isdir(path):
+            os.makedirs(path)
+
+        with self._database() as db:
+            db.execute('CREATE TABLE IF NOT EXISTS plans ('
+                       'key TEXT PRIMARY KEY, method TEXT, size INTEGER, '
+                       'created REAL, last_access REAL, hits INTEGER DEFAULT 0)')
+
+    @contextmanager
+    def _database(self):
+        db = sqlite3.connect(os.path.join(self.path, 'index.sqlite'))
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def _blob_path(self, key):
+        return os.path.join(self.path, key[:2], key + '.json.z')
+
+    @property
+    def stats(self):
+        """dict: Counters of ``hits``, ``misses``, ``stores``, ``evictions`` and
+        ``skipped`` (non cacheable) requests since the cache was created, and the
+        current number of ``entries`` and their ``size`` in bytes."""
+        with self._database() as db:
+            entries, size = db.execute('SELECT COUNT(*), TOTAL(size) FROM plans').fetchone()
+
+        stats = dict(self._counters)
+        stats['entries'] = entries
+        stats['size'] = int(size)
+        return stats
+
+    def is_cacheable(self, method, planner_id=None):
+        """Check if the results of a planning request can be cached.
+
+        Parameters
+        ----------
+        method : str
+            Name of the planning method, e.g. ``plan_motion``.
+        planner_id : str, optional
+            Name of the planner used.
+
+        Returns
+        -------
+        bool
+        """
+        if method != 'plan_motion' or self.cache_stochastic_planners:
+            return True
+        return planner_id in DETERMINISTIC_PLANNERS
+
+    def key(self, method, robot, **request):
+        """Compute the key of a planning request.
+
+        Parameters
+        ----------
+        method : str
+            Name of the planning method, e.g. ``plan_motion``.
+        robot : :class:`compas_fab.robots.Robot`
+            The robot to plan for.
+        request : dict
+            Arguments of the planning request, as sent to the client.
+
+        Returns
+        -------
+        str
+        """
+        return canonical_hash(dict(method=method,
+                                   robot=robot_description_hash(robot),
+                                   scene=getattr(robot.client, 'planning_scene_hash', None),
+                                   request=request), self._mesh_hash)
+
+    def _mesh_hash(self, mesh):
+        with self._lock:
+            entry = self._mesh_hashes.pop(id(mesh), None)
+            # The entry holds a reference to the mesh, but it may have been discarded since
+            if entry is None or entry[0] is not mesh:
+                entry = (mesh, mesh_hash(mesh))
+            self._mesh_hashes[id(mesh)] = entry
+            while len(self._mesh_hashes) > MAX_CACHED_MESHES:
+                self._mesh_hashes.popitem(last=False)
+        return entry[1]
+
+    def get(self, key):
+        """Retrieve a trajectory from the cache.
+
+        Parameters
+        ----------
+        key : str
+            Key of the planning request.
+
+        Returns
+        -------
+        :class:`compas_fab.robots.JointTrajectory` or ``None``
+            The cached trajectory, ``None`` if it is not in the cache. The
+            ``planning_time``, ``goal_index``, ``goal_outcomes`` and
+            ``chunk_fractions`` attributes are restored if the stored trajectory
+            had them, ``planning_time`` being the time of the original plan.
+            Errors of goal outcomes are restored as strings.
+        """
+        with self._lock:
+            try:
+                with open(self._blob_path(key), 'rb') as f:
+                    data = json.loads(zlib.decompress(f.read()).decode('utf8'))
+                trajectory_data, attributes = data['trajectory'], data['attributes']
+            except (IOError, OSError, ValueError, KeyError, TypeError, zlib.error):
+                self._counters['misses'] += 1
+                return None
+
+            with self._database() as db:
+                db.execute('UPDATE plans SET last_access = ?, hits = hits + 1 WHERE key = ?', (time.time(), key))
+
+            self._counters['hits'] += 1
+
+        trajectory = JointTrajectory.from_data(trajectory_data)
+        for name, value in attributes.items():
+            setattr(trajectory, name, value)
+
+        return trajectory
+
+    def put(self, key, trajectory, method=None):
+        """Store a trajectory in the cache.
+
+        Parameters
+        ----------
+        key : str
+            Key of the planning request.
+        trajectory : :class:`compas_fab.robots.JointTrajectory`
+            The planned trajectory.
+        method : str, optional
+            Name of the planning method, stored for reference.
+        """
+        attributes = dict((name, getattr(trajectory, name)) for name in TRAJECTORY_ATTRIBUTES if hasattr(trajectory, name))
+        data = dict(trajectory=trajectory.to_data(), attributes=attributes)
+        blob = zlib.compress(json.dumps(data, default=str).encode('utf8'))
+        blob_path = self._blob_path(key)
+
+        with self._lock:
+            if not os.path.isdir(os.path.dirname(blob_path)):
+                os.makedirs(os.path.dirname(blob_path))
+            with open(blob_path, 'wb') as f:
+                f.write(blob)
+
+            now = time.time()
+            with self._database() as db:
+                db.execute('INSERT OR REPLACE INTO plans (key, method, size, created, last_access) VALUES (?, ?, ?, ?, ?)',
+                           (key, method, len(blob), now, now))
+            self._counters['stores'] += 1
+
+            self._evict()
+
+    def _evict(self):
+        with self._database() as db:
+            total, = db.execute('SELECT TOTAL(size) FROM plans').fetchone()
+            if total <= self.max_size:
+                return
+
+            evicted = []
+            for key, size in db.execute('SELECT key, size FROM plans ORDER BY last_access ASC').fetchall():
+                if total <= self.max_size:
+                    break
+                evicted.append(key)
+                total -= size
+
+            db.executemany('DELETE FROM plans WHERE key = ?', [(key, ) for key in evicted])
+
+        for key in evicted:
+            try:
+                os.remove(self._blob_path(key))
+            except OSError:
+                LOGGER.warning('Could not remove cached trajectory %s', key)
+
+        self._counters['evictions'] += len(evicted)
+
+    def clear(self):
+        """Remove all entries from the cache."""
+        with self._lock:
+            with self._database() as db:
+                keys = [row[0] for row in db.execute('SELECT key FROM plans').fetchall()]
+                db.execute('DELETE FROM plans')
+
+            for key in keys:
+                try:
+                    os.remove(self._blob_path(key))
+                except OSError:
+                    pass
+
+    def plan(self, method, robot, planner, **request):
+        """Return the cached result of a planning request, or plan and store it.
+
+        ``planner`` is invoked with the ``robot`` and the ``request`` arguments
+        in case of a cache miss, or if the request is not cacheable. Results
+        which reach only a ``fraction`` of the request are not stored.
+
+        Parameters
+        ----------
+        method : str
+            Name of the planning method, e.g. ``plan_motion``.
+        robot : :class:`compas_fab.robots.Robot`
+            The robot to plan for.
+        planner : callable
+            Planning function, e.g. the client's ``plan_motion``.
+        request : dict
+            Arguments of the planning request.
+
+        Returns
+        -------
+        :class:`compas_fab.robots.JointTrajectory`
+        """
+        if not self.is_cacheable(method, request.get('planner_id')):
+            with self._lock:
+                self._counters['skipped'] += 1
+            return planner(robot=robot, **request)
+
+        key = self.key(method, robot, **request)
+        trajectory = self.get(key)
+
+        if trajectory is None:
+            trajectory = planner(robot=robot, **request)
+            if trajectory.fraction is None or trajectory.fraction >= 1.:
+                self.put(key, trajectory, method)
+
+        return trajectory
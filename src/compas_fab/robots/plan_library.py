@@ -0,0 +1,354 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import json
+import logging
+import math
+import threading
+import zlib
+
+from compas_fab.robots.configuration import Configuration
+from compas_fab.robots.constraints import Constraint
+from compas_fab.robots.constraints import JointConstraint
+from compas_fab.robots.plan_cache import robot_description_hash
+
+LOGGER = logging.getLogger('compas_fab.robots.plan_library')
+
+__all__ = [
+    'PlanLibrary',
+]
+
+
+def _distance(a, b):
+    return math.sqrt(sum((x - y) ** 2 for x, y in zip(a, b)))
+
+
+def _interpolate(a, b, t):
+    return [x + (y - x) * t for x, y in zip(a, b)]
+
+
+class PlanLibrary(object):
+    """Library of planned motions, reused for similar motion requests.
+
+    The library is placed in front of :meth:`Robot.plan_motion` by assigning
+    it to :attr:`Robot.plan_library`. Successful motions to joint goals are
+    stored with their start and goal configurations. For a new request, the
+    stored path whose start and goal are nearest to the requested ones is
+    retrieved, connected to the requested start and goal, and checked for
+    collisions in the current scene. Only its invalid segments are planned
+    again, between the valid waypoints around them. Requests without a
+    similar stored path are planned from scratch and stored.
+
+    Parameters
+    ----------
+    max_distance : float, optional
+        Maximum distance in joint space between the requested and the
+        stored start, plus the one between the goals, for a path to be
+        reused. Defaults to ``1.0``.
+    max_entries : int, optional
+        Maximum number of paths per robot and planning group, the oldest are
+        discarded. Defaults to ``1000``.
+    resolution : float, optional
+        Maximum distance in joint space between the configurations checked
+        for collisions along a path. Defaults to ``0.05``.
+    checker : callable, optional
+        Function which receives the robot and the attached collision meshes
+        of the request, and returns an object with an ``in_collision``
+        method checking many configurations at once, e.g. a
+        :class:`compas_fab.robots.CollisionCheckerNumpy` of the current scene.
+        Defaults to the ``collision_checker`` of the repair client, if it
+        has one. Without a checker of the scene, stored paths are not
+        reused, and all requests are planned by the planner.
+    repair_client : object, optional
+        Client planning the motions around invalid segments, e.g. a
+        :class:`compas_fab.backends.LocalClient` holding the same scene.
+        Defaults to the robot's client.
+    repair_time : float, optional
+        Planning time in seconds allowed to repair one invalid part of a
+        path. Defaults to ``0.5``.
+
+    Attributes
+    ----------
+    stats : dict
+        Counters of requests answered with a stored path unchanged, the
+        ``hits``, or after ``repairs`` of some segments, of ``misses`` and of
+        paths ``stored``, and the number of ``repaired_segments``.
+
+    Notes
+    -----
+    Only requests with joint goal constraints of all joints of the group,
+    without path constraints, are handled by the library. Checking the
+    stored paths requires ``numpy``.
+
+    Examples
+    --------
+    >>> library = PlanLibrary(max_distance=0.5)
+    >>> robot.plan_library = library
+    >>> library.stats['hits']
+    0
+    """
+
+    def __init__(self, max_distance=1., max_entries=1000, resolution=0.05, checker=None, repair_client=None, repair_time=0.5):
+        self.max_distance = max_distance
+        self.max_entries = max_entries
+        self.resolution = resolution
+        self.checker = checker
+        self.repair_client = repair_client
+        self.repair_time = repair_time
+        self.stats = dict(hits=0, repairs=0, misses=0, stored=0, repaired_segments=0)
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(entries) for entries in self._entries.values())
+
+    # ==========================================================================
+    # storage
+    # ==========================================================================
+
+    def store(self, robot, group, joint_names, path):
+        """Store a path.
+
+        Parameters
+        ----------
+        robot : :class:`compas_fab.robots.Robot`
+            The robot.
+        group : str
+            The planning group.
+        joint_names : list of str
+            Names of the joints of the group, in the order of the path values.
+        path : list of list of float
+            Joint values of the waypoints, in meters and radians.
+        """
+        key = (robot_description_hash(robot), group, tuple(joint_names))
+        path = [list(values) for values in path]
+        with self._lock:
+            entries = self._entries.setdefault(key, [])
+            entries.append(path)
+            del entries[:-self.max_entries]
+            self.stats['stored'] += 1
+
+    def nearest(self, robot, group, joint_names, start, goal):
+        """Find the stored path nearest to a start and a goal.
+
+        Stored paths are also considered in reverse.
+
+        Returns
+        -------
+        tuple
+            The path and the sum of the distances of its start and goal to
+            the requested ones, or ``(None, None)`` if there is no stored path.
+        """
+        key = (robot_description_hash(robot), group, tuple(joint_names))
+        best, best_distance = None, None
+        with self._lock:
+            entries = list(self._entries.get(key, []))
+
+        for path in entries:
+            for candidate in (path, path[::-1]):
+                distance = _distance(candidate[0], start) + _distance(candidate[-1], goal)
+                if best_distance is None or distance < best_distance:
+                    best, best_distance = candidate, distance
+
+        return best, best_distance
+
+    def save(self, path):
+        """Save the stored paths to a file.
+
+        Parameters
+        ----------
+        path : str
+            Path of the file.
+        """
+        with self._lock:
+            data = [dict(robot=key[0], group=key[1], joint_names=list(key[2]), paths=entries)
+                    for key, entries in self._entries.items()]
+        with open(path, 'wb') as f:
+            f.write(zlib.compress(json.dumps(data).encode('utf8')))
+
+    def load(self, path):
+        """Add the paths saved in a file to the library.
+
+        Parameters
+        ----------
+        path : str
+            Path of the file written by :meth:`save`.
+        """
+        with open(path, 'rb') as f:
+            data = json.loads(zlib.decompress(f.read()).decode('utf8'))
+        with self._lock:
+            for item in data:
+                entries = self._entries.setdefault((item['robot'], item['group'], tuple(item['joint_names'])), [])
+                entries.extend(item['paths'])
+                del entries[:-self.max_entries]
+
+    # ==========================================================================
+    # planning
+    # ==========================================================================
+
+    def plan(self, planner, robot, **request):
+        """Plan a motion by reusing a stored path, or with the planner.
+
+        Parameters
+        ----------
+        planner : callable
+            Planning function, e.g. the client's ``plan_motion``, invoked with
+            the ``robot`` and the ``request`` arguments when no stored path
+            can be reused.
+        robot : :class:`compas_fab.robots.Robot`
+            The robot to plan for.
+        request : dict
+            Arguments of the motion planning request, in meters and radians.
+
+        Returns
+        -------
+        :class:`compas_fab.robots.JointTrajectory`
+        """
+        group = request.get('group')
+        joint_names = robot.get_configurable_joint_names(group)
+        goal = self._joint_goal(request, joint_names)
+        if goal is None:
+            return planner(robot=robot, **request)
+
+        start_configuration = request['start_configuration']
+        start_values = dict(zip(start_configuration.joint_names, start_configuration.values))
+        start = [start_values[name] for name in joint_names]
+
+        stored, distance = self.nearest(robot, group, joint_names, start, goal)
+        trajectory = None
+        if stored is not None and distance <= self.max_distance:
+            checker = self._checker(robot, request.get('attached_collision_meshes'))
+            if checker is None:
+                LOGGER.warning('Stored paths are not reused, there is no collision checker of the current scene')
+            else:
+                try:
+                    trajectory = self._reuse(checker, robot, joint_names, [start] + stored + [goal], request)
+                except Exception as e:
+                    LOGGER.debug('Could not reuse the stored path: %s', e)
+
+        if trajectory is None:
+            with self._lock:
+                self.stats['misses'] += 1
+            trajectory = planner(robot=robot, **request)
+            if (trajectory.fraction is None or trajectory.fraction >= 1.) and set(joint_names) <= set(trajectory.joint_names):
+                indices = [trajectory.joint_names.index(name) for name in joint_names]
+                self.store(robot, group, joint_names, [[point.values[i] for i in indices] for point in trajectory.points])
+
+        return trajectory
+
+    @staticmethod
+    def _joint_goal(request, joint_names):
+        """Values of a goal given by joint constraints of all joints, ``None`` for other goals."""
+        goal_constraints = request.get('goal_constraints')
+        if request.get('path_constraints') or not goal_constraints or isinstance(goal_constraints[0], (list, tuple)):
+            return None
+        if any(constraint.type != Constraint.JOINT for constraint in goal_constraints):
+            return None
+        values = dict((constraint.joint_name, constraint.value) for constraint in goal_constraints)
+        if any(name not in values for name in joint_names):
+            return None
+        return [values[name] for name in joint_names]
+
+    def _reuse(self, checker, robot, joint_names, waypoints, request):
+        """Check a path and repair its invalid segments, ``None`` if its start or goal is invalid."""
+        start_configuration = request['start_configuration']
+        indices = [start_configuration.joint_names.index(name) for name in joint_names]
+
+        # Drop the waypoints which coincide with their predecessor, e.g. the start of the stored path
+        path = [waypoints[0]]
+        for values in waypoints[1:]:
+            if _distance(values, path[-1]) > 1e-9:
+                path.append(values)
+        if len(path) < 2:
+            path.append(waypoints[-1])
+
+        # All configurations along the path, checked at once
+        configurations, owners = [], []
+        for index, (a, b) in enumerate(zip(path[:-1], path[1:])):
+            steps = max(int(math.ceil(_distance(a, b) / self.resolution)), 1)
+            for step in range(steps + 1):
+                full = list(start_configuration.values)
+                for i, value in zip(indices, _interpolate(a, b, step / steps)):
+                    full[i] = value
+                configurations.append(full)
+                owners.append((index, step, steps))
+
+        collisions = checker.in_collision(configurations)
+        waypoint_valid = [True] * len(path)
+        segment_valid = [True] * (len(path) - 1)
+        for (index, step, steps), collision in zip(owners, collisions):
+            if collision:
+                segment_valid[index] = False
+                if step == 0:
+                    waypoint_valid[index] = False
+                elif step == steps:
+                    waypoint_valid[index + 1] = False
+
+        if not waypoint_valid[0] or not waypoint_valid[-1]:
+            return None
+
+        # Plan again between the valid waypoints around each run of invalid segments
+        result = [path[0]]
+        repaired = 0
+        index = 0
+        while index < len(path) - 1:
+            if segment_valid[index]:
+                result.append(path[index + 1])
+                index += 1
+                continue
+            end = next(i for i in range(index + 1, len(path)) if waypoint_valid[i])
+            result.extend(self._repair(robot, joint_names, indices, result[-1], path[end], request)[1:])
+            repaired += end - index
+            index = end
+
+        with self._lock:
+            if repaired:
+                self.stats['repairs'] += 1
+                self.stats['repaired_segments'] += repaired
+            else:
+                self.stats['hits'] += 1
+
+        return self._trajectory(robot, joint_names, result, request)
+
+    def _checker(self, robot, attached_collision_meshes):
+        """Collision checker of the current scene, ``None`` if there is none."""
+        if self.checker:
+            return self.checker(robot, attached_collision_meshes)
+        client = self.repair_client or robot.client
+        if hasattr(client, 'collision_checker'):
+            return client.collision_checker(robot, attached_collision_meshes)
+        return None
+
+    def _repair(self, robot, joint_names, indices, start, goal, request):
+        """Plan a motion between two waypoints, and return its joint values."""
+        start_configuration = request['start_configuration']
+        values = list(start_configuration.values)
+        for i, value in zip(indices, start):
+            values[i] = value
+
+        repair_request = dict(request)
+        repair_request['start_configuration'] = Configuration(values, start_configuration.types, start_configuration.joint_names)
+        repair_request['goal_constraints'] = [JointConstraint(name, value, 1e-3, 1e-3) for name, value in zip(joint_names, goal)]
+        repair_request['allowed_planning_time'] = self.repair_time
+        repair_request['num_planning_attempts'] = 1
+        if isinstance(request.get('planner_id'), (list, tuple)):
+            repair_request['planner_id'] = request['planner_id'][0]
+
+        client = self.repair_client or robot.client
+        trajectory = client.plan_motion(robot=robot, **repair_request)
+        if trajectory.fraction is not None and trajectory.fraction < 1.:
+            raise Exception('The repair of a segment failed')
+
+        positions = [dict(zip(trajectory.joint_names, point.values)) for point in trajectory.points]
+        return [start] + [[point[name] for name in joint_names] for point in positions[1:-1]] + [goal]
+
+    @staticmethod
+    def _trajectory(robot, joint_names, path, request):
+        """Time a path within the velocity and acceleration limits of the joints."""
+        from compas_fab.robots.trajectory_numpy import timed_trajectory_numpy
+
+        return timed_trajectory_numpy(robot, joint_names, path, request['start_configuration'].copy(),
+                                      request.get('max_velocity_scaling_factor') or 1.,
+                                      request.get('max_acceleration_scaling_factor') or 1.)
@@ -2,9 +2,14 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+from contextlib import contextmanager
+
 from compas.geometry import Frame
 from compas.geometry import Scale
 
+from compas_fab.robots.plan_cache import canonical_hash
+from compas_fab.robots.plan_cache import mesh_hash
+
 __all__ = [
     'CollisionMesh',
     'AttachedCollisionMesh',
@@ -89,17 +94,248 @@ class AttachedCollisionMesh(object):
 class PlanningScene(object):
     """Represents the planning scene.
 
+    The planning scene keeps a local model of the collision meshes it added
+    to the backend, with their ids, geometry and frames. Changes made inside
+    a :meth:`batch` are only applied to the local model, and sent to the
+    backend in a single diff when the batch ends. The geometry of two meshes
+    is only hashed when a diff needs to compare them, once per mesh object,
+    so meshes are expected not to be modified in place once added, except
+    by the ``scale`` option. Objects which the planning scene did not add
+    itself are removed, or appended to, explicitly.
+
     Attributes
     ----------
     robot : :class:`compas_fab.robots.Robot`
         A reference to the robot in the planning scene.
+    preprocessor : :class:`compas_fab.robots.CollisionMeshPreprocessor`, optional
+        Simplifies the collision meshes before they are added to the scene.
+        Defaults to adding them unchanged.
 
     Examples
     --------
+    >>> scene = PlanningScene(robot)
+    >>> mesh = Mesh.from_stl(compas_fab.get('planning_scene/floor.stl'))
+    >>> with scene.batch():                                 # doctest: +SKIP
+    ...     scene.add_collision_mesh(CollisionMesh(mesh, 'floor'))
     """
 
-    def __init__(self, robot):
+    def __init__(self, robot, preprocessor=None):
         self.robot = robot
+        self.preprocessor = preprocessor
+        self._batch_depth = 0
+        # Local model of the scene: the objects as they should be,
+        # and the signatures of the objects as they were last synchronized
+        self._collision_meshes = {}
+        self._attached_collision_meshes = {}
+        self._synced_collision_meshes = {}
+        self._synced_attached_collision_meshes = {}
+        # Changes of a batch to objects which may exist in the backend without
+        # having been added by this instance, and the ids of objects of which
+        # only some of the meshes are known, because they were appended to
+        self._removed_collision_mesh_ids = []
+        self._removed_attached_collision_mesh_ids = []
+        self._appended_collision_meshes = {}
+        self._partial_collision_mesh_ids = set()
+        # Geometry hashes computed by diffs, keyed by the id of the mesh object
+        self._mesh_hashes = {}
+
+    @property
+    def collision_mesh_ids(self):
+        """list of str: Identifiers of the collision meshes in the local model."""
+        return list(self._collision_meshes)
+
+    @property
+    def attached_collision_mesh_ids(self):
+        """list of str: Identifiers of the attached collision meshes in the local model."""
+        return list(self._attached_collision_meshes)
+
+    @property
+    def collision_meshes(self):
+        """list of :class:`compas_fab.robots.CollisionMesh`: Collision meshes in the local model."""
+        return [collision_mesh for entries in self._collision_meshes.values() for collision_mesh in entries]
+
+    @property
+    def attached_collision_meshes(self):
+        """list of :class:`compas_fab.robots.AttachedCollisionMesh`: Attached collision meshes in the local model."""
+        return list(self._attached_collision_meshes.values())
+
+    @property
+    def is_batching(self):
+        """bool: ``True`` if changes are collected in a batch."""
+        return self._batch_depth > 0
+
+    @contextmanager
+    def batch(self):
+        """Collect changes to the planning scene and apply them at once.
+
+        Changes made inside the context are applied to the local model only.
+        When the context exits, they are sent to the backend in a single diff
+        (see :meth:`sync`). If an exception is raised inside the context, the
+        local model is rolled back and nothing is sent. Batches can be nested,
+        only the outermost one sends the changes.
+
+        Examples
+        --------
+        >>> scene = PlanningScene(robot)
+        >>> mesh = Mesh.from_stl(compas_fab.get('planning_scene/cone.stl'))
+        >>> with scene.batch():                             # doctest: +SKIP
+        ...     scene.add_collision_mesh(CollisionMesh(mesh, 'cone1'))
+        ...     scene.add_collision_mesh(CollisionMesh(mesh, 'cone2'))
+        """
+        snapshot = (dict((k, list(v)) for k, v in self._collision_meshes.items()),
+                    dict(self._attached_collision_meshes),
+                    list(self._removed_collision_mesh_ids),
+                    list(self._removed_attached_collision_mesh_ids),
+                    dict((k, list(v)) for k, v in self._appended_collision_meshes.items()),
+                    set(self._partial_collision_mesh_ids))
+        self._batch_depth += 1
+        try:
+            yield self
+        except Exception:
+            (self._collision_meshes, self._attached_collision_meshes,
+             self._removed_collision_mesh_ids, self._removed_attached_collision_mesh_ids,
+             self._appended_collision_meshes, self._partial_collision_mesh_ids) = snapshot
+            raise
+        finally:
+            self._batch_depth -= 1
+
+        if not self.is_batching:
+            self.sync()
+
+    def diff(self):
+        """Compute the changes between the local model and the backend.
+
+        Returns
+        -------
+        dict
+            Dictionary with the ``collision_meshes`` to add, the
+            ``moved_collision_meshes`` whose geometry is unchanged, the
+            ``appended_collision_meshes`` to append to objects not added by
+            the planning scene, the ``removed_collision_mesh_ids``, the
+            ``attached_collision_meshes`` to add and the
+            ``removed_attached_collision_mesh_ids``.
+        """
+        diff = dict(collision_meshes=[], moved_collision_meshes=[], appended_collision_meshes=[],
+                    removed_collision_mesh_ids=[], attached_collision_meshes=[], removed_attached_collision_mesh_ids=[])
+
+        for id, collision_meshes in self._collision_meshes.items():
+            if id in self._appended_collision_meshes:
+                diff['appended_collision_meshes'].extend(self._appended_collision_meshes[id])
+                continue
+            signature = self._collision_mesh_signature(collision_meshes)
+            synced = self._synced_collision_meshes.get(id)
+            if synced and self._same_geometry(synced['geometry'], signature['geometry']):
+                if synced['frames'] != signature['frames']:
+                    diff['moved_collision_meshes'].extend(collision_meshes)
+            else:
+                diff['collision_meshes'].extend(collision_meshes)
+
+        for id in list(self._synced_collision_meshes) + self._removed_collision_mesh_ids:
+            if id not in self._collision_meshes and id not in diff['removed_collision_mesh_ids']:
+                diff['removed_collision_mesh_ids'].append(id)
+
+        for id, attached_collision_mesh in self._attached_collision_meshes.items():
+            signature = self._attached_collision_mesh_signature(attached_collision_mesh)
+            synced = self._synced_attached_collision_meshes.get(id)
+            if not synced or synced['frames'] != signature['frames'] or not self._same_geometry(synced['geometry'], signature['geometry']):
+                diff['attached_collision_meshes'].append(attached_collision_mesh)
+
+        for id in list(self._synced_attached_collision_meshes) + self._removed_attached_collision_mesh_ids:
+            if id not in self._attached_collision_meshes and id not in diff['removed_attached_collision_mesh_ids']:
+                diff['removed_attached_collision_mesh_ids'].append(id)
+
+        return diff
+
+    def sync(self):
+        """Send the changes of the local model to the backend in a single diff.
+
+        Objects whose geometry is unchanged but were moved, only have their
+        frames updated.
+
+        Returns
+        -------
+        dict
+            The applied diff, see :meth:`diff`.
+        """
+        self.ensure_client()
+
+        diff = self.diff()
+        if any(diff.values()):
+            self.client.apply_planning_scene_diff(**diff)
+        self._mark_synced()
+
+        return diff
+
+    def _collision_mesh_signature(self, collision_meshes):
+        # The geometry keeps the mesh objects, they are only hashed if a diff compares different objects
+        geometry = [(collision_mesh.mesh, collision_mesh.root_name) for collision_mesh in collision_meshes]
+        frames = canonical_hash([collision_mesh.frame for collision_mesh in collision_meshes])
+        return dict(geometry=geometry, frames=frames)
+
+    def _attached_collision_mesh_signature(self, attached_collision_mesh):
+        collision_mesh = attached_collision_mesh.collision_mesh
+        frames = canonical_hash([collision_mesh.frame, attached_collision_mesh.link_name,
+                                 attached_collision_mesh.touch_links, attached_collision_mesh.weight])
+        return dict(geometry=[(collision_mesh.mesh, collision_mesh.root_name)], frames=frames)
+
+    def _same_geometry(self, geometry, other):
+        if geometry is None or other is None or len(geometry) != len(other):
+            return False
+        for (mesh, root_name), (other_mesh, other_root_name) in zip(geometry, other):
+            if root_name != other_root_name:
+                return False
+            if mesh is not other_mesh and self._mesh_hash(mesh) != self._mesh_hash(other_mesh):
+                return False
+        return True
+
+    def _mesh_hash(self, mesh):
+        entry = self._mesh_hashes.get(id(mesh))
+        if entry is None:
+            # The mesh is kept with its hash, so that its id is not reused
+            entry = self._mesh_hashes[id(mesh)] = (mesh, mesh_hash(mesh))
+        return entry[1]
+
+    def _prune_mesh_hashes(self):
+        """Only keep the hashes of the meshes still in the scene."""
+        meshes = [collision_mesh.mesh for collision_mesh in self.collision_meshes]
+        meshes.extend(acm.collision_mesh.mesh for acm in self.attached_collision_meshes)
+        self._mesh_hashes = dict((id(mesh), self._mesh_hashes[id(mesh)]) for mesh in meshes if id(mesh) in self._mesh_hashes)
+
+    def _mesh_modified(self, mesh):
+        """Forget the hash of a mesh modified in place, and send its geometry again."""
+        self._mesh_hashes.pop(id(mesh), None)
+        for synced in list(self._synced_collision_meshes.values()) + list(self._synced_attached_collision_meshes.values()):
+            if any(synced_mesh is mesh for synced_mesh, _ in synced['geometry'] or []):
+                synced['geometry'] = None
+
+    def _forget_changes(self, id):
+        """Forget the recorded changes of an object which is replaced or removed as a whole."""
+        self._partial_collision_mesh_ids.discard(id)
+        self._appended_collision_meshes.pop(id, None)
+        if id in self._removed_collision_mesh_ids:
+            self._removed_collision_mesh_ids.remove(id)
+
+    def _mark_synced(self, ids=None, attached_ids=None):
+        if ids is None and attached_ids is None:
+            self._synced_collision_meshes = {}
+            self._synced_attached_collision_meshes = {}
+            ids = list(self._collision_meshes)
+            attached_ids = list(self._attached_collision_meshes)
+            self._removed_collision_mesh_ids = []
+            self._removed_attached_collision_mesh_ids = []
+            self._appended_collision_meshes = {}
+            self._prune_mesh_hashes()
+
+        for id in ids or []:
+            self._synced_collision_meshes.pop(id, None)
+            if id in self._collision_meshes:
+                self._synced_collision_meshes[id] = self._collision_mesh_signature(self._collision_meshes[id])
+
+        for id in attached_ids or []:
+            self._synced_attached_collision_meshes.pop(id, None)
+            if id in self._attached_collision_meshes:
+                attached_collision_mesh = self._attached_collision_meshes[id]
+                self._synced_attached_collision_meshes[id] = self._attached_collision_mesh_signature(attached_collision_mesh)
 
     @property
     def client(self):
@@ -115,6 +351,8 @@ class PlanningScene(object):
         """Adds a collision mesh to the planning scene.
 
         If the object with the same name previously existed, it is replaced.
+        If a :attr:`preprocessor` is set, a simplified copy of the collision
+        mesh is added instead.
 
         Parameters
         ----------
@@ -143,8 +381,17 @@ class PlanningScene(object):
         if scale:
             scale_factor = 1. / self.robot.scale_factor
             collision_mesh.scale(scale_factor)
+            self._mesh_modified(collision_mesh.mesh)
+
+        if self.preprocessor:
+            collision_mesh = self.preprocessor.process(collision_mesh)
 
-        self.client.add_collision_mesh(collision_mesh)
+        self._collision_meshes[collision_mesh.id] = [collision_mesh]
+        self._forget_changes(collision_mesh.id)
+
+        if not self.is_batching:
+            self.client.add_collision_mesh(collision_mesh)
+            self._mark_synced([collision_mesh.id])
 
     def remove_collision_mesh(self, id):
         """Removes a collision object from the planning scene.
@@ -164,7 +411,15 @@ class PlanningScene(object):
         >>> scene.remove_collision_mesh('floor')           # doctest: +SKIP
         """
         self.ensure_client()
-        self.robot.client.remove_collision_mesh(id)
+
+        self._collision_meshes.pop(id, None)
+        self._forget_changes(id)
+
+        if not self.is_batching:
+            self.robot.client.remove_collision_mesh(id)
+            self._mark_synced([id])
+        else:
+            self._removed_collision_mesh_ids.append(id)
 
     def append_collision_mesh(self, collision_mesh, scale=False):
         """Appends a collision mesh that already exists in the planning scene.
@@ -197,12 +452,32 @@ class PlanningScene(object):
         if scale:
             scale_factor = 1. / self.robot.scale_factor
             collision_mesh.scale(scale_factor)
-
-        self.robot.client.append_collision_mesh(collision_mesh)
+            self._mesh_modified(collision_mesh.mesh)
+
+        if self.preprocessor:
+            collision_mesh = self.preprocessor.process(collision_mesh)
+
+        id = collision_mesh.id
+        # Objects unknown to the local model may exist in the backend, they are appended to
+        partial = id in self._partial_collision_mesh_ids or (id not in self._collision_meshes and
+                                                             id not in self._synced_collision_meshes and
+                                                             id not in self._removed_collision_mesh_ids)
+        if partial:
+            self._partial_collision_mesh_ids.add(id)
+            if self.is_batching:
+                self._appended_collision_meshes.setdefault(id, []).append(collision_mesh)
+        self._collision_meshes.setdefault(id, []).append(collision_mesh)
+
+        if not self.is_batching:
+            self.robot.client.append_collision_mesh(collision_mesh)
+            self._mark_synced([collision_mesh.id])
 
     def add_attached_collision_mesh(self, attached_collision_mesh, scale=False):
         """Adds an attached collision object to the planning scene.
 
+        If a :attr:`preprocessor` is set, a simplified copy of the collision
+        mesh is attached instead.
+
         Parameters
         ----------
         attached_collision_mesh : :class:`compas_fab.robots.AttachedCollisionMesh`
@@ -229,8 +504,19 @@ class PlanningScene(object):
         if scale:
             scale_factor = 1. / self.robot.scale_factor
             attached_collision_mesh.collision_mesh.scale(scale_factor)
+            self._mesh_modified(attached_collision_mesh.collision_mesh.mesh)
 
-        self.client.add_attached_collision_mesh(attached_collision_mesh)
+        if self.preprocessor:
+            attached_collision_mesh = self.preprocessor.process(attached_collision_mesh)
+
+        id = attached_collision_mesh.collision_mesh.id
+        self._attached_collision_meshes[id] = attached_collision_mesh
+        if id in self._removed_attached_collision_mesh_ids:
+            self._removed_attached_collision_mesh_ids.remove(id)
+
+        if not self.is_batching:
+            self.client.add_attached_collision_mesh(attached_collision_mesh)
+            self._mark_synced(attached_ids=[id])
 
     def remove_attached_collision_mesh(self, id):
         """Removes an attached collision object from the planning scene.
@@ -250,7 +536,14 @@ class PlanningScene(object):
         >>> scene.remove_attached_collision_mesh('tip')   # doctest: +SKIP
         """
         self.ensure_client()
-        self.client.remove_attached_collision_mesh(id)
+
+        self._attached_collision_meshes.pop(id, None)
+
+        if not self.is_batching:
+            self.client.remove_attached_collision_mesh(id)
+            self._mark_synced(attached_ids=[id])
+        elif id not in self._removed_attached_collision_mesh_ids:
+            self._removed_attached_collision_mesh_ids.append(id)
 
     def attach_collision_mesh_to_robot_end_effector(self, collision_mesh, scale=False, group=None):
         """Attaches a collision mesh to the robot's end-effector.
@@ -296,6 +589,7 @@ class PlanningScene(object):
         if scale:
             scale_factor = 1. / self.robot.scale_factor
             collision_mesh.scale(scale_factor)
+            self._mesh_modified(collision_mesh.mesh)
 
         ee_link_name = self.robot.get_end_effector_link_name(group)
         touch_links = [ee_link_name]
@@ -304,6 +598,12 @@ class PlanningScene(object):
 
     def add_attached_tool(self):
         """Adds the robot's attached tool to the planning scene if set.
+
+        Until the tool is detached or attached again, planning requests do not
+        include the tool's geometry anymore, but refer to the attached tool
+        of the planning scene. This does not apply if the scene has a
+        :attr:`preprocessor`, since the planning scene then holds a simplified
+        copy of the tool.
         """
         self.ensure_client()
         if self.robot.attached_tool:
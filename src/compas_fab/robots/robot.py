@@ -2,8 +2,10 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import functools
 import logging
 import random
+import threading
 
 from compas.geometry import Frame
 from compas.geometry import Sphere
@@ -16,8 +18,14 @@ from compas_fab.robots.constraints import Constraint
 from compas_fab.robots.constraints import JointConstraint
 from compas_fab.robots.constraints import OrientationConstraint
 from compas_fab.robots.constraints import PositionConstraint
+from compas_fab.robots.dispatch import BEST_WITHIN_DEADLINE
+from compas_fab.robots.dispatch import dispatch_concurrently
+from compas_fab.robots.dispatch import map_concurrently
 
 from compas_fab.robots.planning_scene import AttachedCollisionMesh
+from compas_fab.robots.time_ import Duration
+from compas_fab.robots.trajectory import JointTrajectory
+from compas_fab.robots.trajectory import JointTrajectoryPoint
 
 LOGGER = logging.getLogger('compas_fab.robots.robot')
 
@@ -25,6 +33,58 @@ __all__ = [
     'Robot',
 ]
 
+# Planning parameters handled by the robot itself, which identify cached plans
+# but are not passed to the planners
+ROBOT_PLANNING_PARAMETERS = ('goal_dispatch', 'race_policy', 'race_score', 'race_deadline')
+
+# Minimum number of points of a stitched cartesian path checked for joint jumps, as in MoveIt!
+MIN_POINTS_FOR_JUMP_THRESHOLD = 10
+
+
+def _merge_joint_values(configuration, joint_names, values):
+    """Return a copy of the configuration with the values of the given joints replaced."""
+    joint_values = dict(zip(joint_names, values))
+    merged = configuration.copy()
+    merged.values = [joint_values.get(name, value) for name, value in zip(merged.joint_names, merged.values)]
+    return merged
+
+
+def _joint_distance(a, b):
+    """Sum of the differences of the joint values of two points."""
+    return sum(abs(x - y) for x, y in zip(a.values, b.values))
+
+
+def _stitch_index(points, trajectory, tolerance):
+    """Find the point of the trajectory where it joins the end of the points without a jump.
+
+    The closest point to the end of the points is chosen among those whose
+    joint values all differ by at most ``tolerance``, ``None`` if there is none.
+    """
+    if not trajectory or not trajectory.points:
+        return None
+    if not points:
+        return 0
+
+    candidates = [(_joint_distance(points[-1], point), index) for index, point in enumerate(trajectory.points)
+                  if all(abs(a - b) <= tolerance for a, b in zip(points[-1].values, point.values))]
+    return min(candidates)[1] if candidates else None
+
+
+def _find_joint_jump(points, start, jump_threshold):
+    """Find the first step from ``start`` on whose joint distance exceeds ``jump_threshold`` times the mean step.
+
+    Like MoveIt!, short paths are not checked, their mean step is not significant.
+    """
+    if not jump_threshold or len(points) < MIN_POINTS_FOR_JUMP_THRESHOLD:
+        return None
+
+    steps = [_joint_distance(a, b) for a, b in zip(points[:-1], points[1:])]
+    threshold = jump_threshold * sum(steps) / len(steps)
+    for index in range(max(start, 1), len(points)):
+        if steps[index - 1] > threshold:
+            return index
+    return None
+
 
 class Robot(object):
     """Represents a robot.
@@ -46,6 +106,20 @@ class Robot(object):
     client : optional
         The backend client to use for communication,
         e.g. :class:`compas_fab.backends.RosClient`
+    plan_cache : :class:`compas_fab.robots.PlanCache`, optional
+        Cache of planned trajectories used by :meth:`plan_motion` and
+        :meth:`plan_cartesian_motion`. Defaults to ``None``.
+    plan_library : :class:`compas_fab.robots.PlanLibrary`, optional
+        Library of planned motions reused and repaired by :meth:`plan_motion`
+        for similar requests. Defaults to ``None``.
+    planner_stats : dict
+        Statistics of the planners raced in :meth:`plan_motion`, by planner id:
+        number of ``races``, ``wins``, ``failures`` and ``timeouts``.
+    local_cache_directory : str, optional
+        Directory where the robot description is cached, set by
+        :meth:`compas_fab.backends.RosClient.load_robot`. Data derived from the
+        description, e.g. the spheres of :class:`RobotSpheresNumpy`, is stored
+        there as well. Defaults to ``None``.
     """
 
     def __init__(self, model, artist=None, semantics=None, client=None):
@@ -55,6 +129,11 @@ class Robot(object):
         self.artist = artist  # setter and getter (because of scale)
         self.semantics = semantics
         self.client = client  # setter and getter ?
+        self.plan_cache = None
+        self.plan_library = None
+        self.planner_stats = {}
+        self.local_cache_directory = None
+        self._planner_stats_lock = threading.Lock()
 
     @property
     def artist(self):
@@ -550,6 +629,18 @@ class Robot(object):
                 configuration.joint_names = joint_names
         return configuration, configuration.scaled(1. / self.scale_factor)
 
+    def _scaled_constraints(self, constraints):
+        """Scale constraints to meters, copying only those which change."""
+        if self.scale_factor == 1.:
+            return list(constraints)
+
+        scaled = []
+        for c in constraints:
+            if c.type != Constraint.JOINT or self.get_joint_by_name(c.joint_name).is_scalable():
+                c = c.scaled(1. / self.scale_factor)
+            scaled.append(c)
+        return scaled
+
     # ==========================================================================
     # transformations, coordinate frames
     # ==========================================================================
@@ -726,6 +817,13 @@ class Robot(object):
         -------
         None
 
+        Notes
+        -----
+        The tool is sent along with every planning request. To send it only once,
+        add it to the planning scene with :meth:`PlanningScene.add_attached_tool`
+        after attaching it: requests then refer to the attached tool of the
+        planning scene instead of carrying its geometry.
+
         Examples
         --------
         >>> mesh = Mesh.from_stl(compas_fab.get('planning_scene/cone.stl'))
@@ -1012,10 +1110,8 @@ class Robot(object):
         frame_WCF_scaled.point /= self.scale_factor  # must be in meters
 
         if self.attached_tool:
-            if attached_collision_meshes:
-                attached_collision_meshes.append(self.attached_tool.attached_collision_mesh)
-            else:
-                attached_collision_meshes = [self.attached_tool.attached_collision_mesh]
+            # Do not modify the given list, it might be reused for several requests
+            attached_collision_meshes = list(attached_collision_meshes or []) + [self.attached_tool.attached_collision_mesh]
 
         # The returned joint names might be more than the requested ones if there are passive joints present
         joint_positions, joint_names = self.client.inverse_kinematics(self,
@@ -1106,7 +1202,9 @@ class Robot(object):
                               max_step=0.01, jump_threshold=1.57,
                               avoid_collisions=True, group=None,
                               path_constraints=None,
-                              attached_collision_meshes=None):
+                              attached_collision_meshes=None,
+                              chunk_size=None, chunk_retries=1,
+                              stitch_tolerance=1e-3, chunk_overlap=1):
         """Calculates a cartesian motion path (linear in tool space).
 
         Parameters
@@ -1137,11 +1235,31 @@ class Robot(object):
             violates these constraints. Defaults to None.
         attached_collision_meshes: list of :class:`compas_fab.robots.AttachedCollisionMesh`
             Defaults to None.
+        chunk_size: int, optional
+            If passed, paths with more frames are split into chunks of this
+            number of frames, which are planned concurrently and stitched
+            together. Each chunk starts from an inverse kinematics solution of
+            the frame before its first frame, and is stitched to the previous
+            chunk where it reaches the end of it, within the frames they
+            overlap. The stitched path is checked for joint jumps with the
+            ``jump_threshold``, and ends before the chunk of the first jump.
+            Defaults to None.
+        chunk_retries: int, optional
+            Number of times a chunk is planned again if it fails, or if it cannot
+            be stitched to the previous chunk. The retries start exactly from the
+            end of the previous chunk. Defaults to 1.
+        stitch_tolerance: float, optional
+            Maximum difference of any joint value where two chunks are stitched
+            together. Defaults to 0.001.
+        chunk_overlap: int, optional
+            Number of frames at the end of a chunk which the next chunk plans
+            as well, at least 1 and less than ``chunk_size``. Defaults to 1.
 
         Returns
         -------
         :class:`compas_fab.robots.JointTrajectory`
-            The calculated trajectory.
+            The calculated trajectory. When planned in chunks, its ``chunk_fractions``
+            attribute contains the fraction of each chunk that was calculated.
 
         Examples
         --------
@@ -1172,36 +1290,30 @@ class Robot(object):
         for frame in frames_WCF:
             frames_WCF_scaled.append(Frame(frame.point * 1. / self.scale_factor, frame.xaxis, frame.yaxis))
 
-        if path_constraints:
-            path_constraints_WCF_scaled = []
-            for c in path_constraints:
-                cp = c.copy()
-                if c.type == Constraint.JOINT:
-                    joint = self.get_joint_by_name(c.joint_name)
-                    if joint.is_scalable():
-                        cp.scale(1. / self.scale_factor)
-                else:
-                    cp.scale(1. / self.scale_factor)
-                path_constraints_WCF_scaled.append(cp)
-        else:
-            path_constraints_WCF_scaled = None
+        path_constraints_WCF_scaled = self._scaled_constraints(path_constraints) if path_constraints else None
 
         if self.attached_tool:
-            if attached_collision_meshes:
-                attached_collision_meshes.append(self.attached_tool.attached_collision_mesh)
-            else:
-                attached_collision_meshes = [self.attached_tool.attached_collision_mesh]
-
-        trajectory = self.client.plan_cartesian_motion(
-            robot=self,
-            frames=frames_WCF_scaled,
-            start_configuration=start_configuration_scaled,
-            group=group,
-            max_step=max_step_scaled,
-            jump_threshold=jump_threshold,
-            avoid_collisions=avoid_collisions,
-            path_constraints=path_constraints_WCF_scaled,
-            attached_collision_meshes=attached_collision_meshes)
+            # Do not modify the given list, it might be reused for several requests
+            attached_collision_meshes = list(attached_collision_meshes or []) + [self.attached_tool.attached_collision_mesh]
+
+        kwargs = dict(group=group,
+                      max_step=max_step_scaled,
+                      jump_threshold=jump_threshold,
+                      avoid_collisions=avoid_collisions,
+                      path_constraints=path_constraints_WCF_scaled,
+                      attached_collision_meshes=attached_collision_meshes)
+
+        if chunk_size and len(frames_WCF_scaled) > chunk_size:
+            trajectory = self._plan_cartesian_motion_chunked(
+                frames_WCF_scaled, start_configuration_scaled, chunk_size, chunk_retries, stitch_tolerance, chunk_overlap,
+                **kwargs)
+        else:
+            trajectory = self._plan(
+                'plan_cartesian_motion',
+                self.client.plan_cartesian_motion,
+                frames=frames_WCF_scaled,
+                start_configuration=start_configuration_scaled,
+                **kwargs)
 
         # Scale everything back to robot's scale
         for pt in trajectory.points:
@@ -1216,7 +1328,9 @@ class Robot(object):
                     num_planning_attempts=1, allowed_planning_time=2.,
                     max_velocity_scaling_factor=1.,
                     max_acceleration_scaling_factor=1.,
-                    attached_collision_meshes=None):
+                    attached_collision_meshes=None,
+                    race_policy='first_success', race_score='path_length',
+                    race_deadline=None, goal_dispatch='request'):
         """Calculates a motion path.
 
         Parameters
@@ -1227,6 +1341,8 @@ class Robot(object):
             for each joint, such that the goal configuration is included,
             or defining a volume in space, to which a specific robot link (e.g.
             the end-effector) is required to move to.
+            A list of constraint sets can also be passed for equivalent goals,
+            e.g. symmetric grasps, of which the planned path has to satisfy one.
         start_configuration: :class:`compas_fab.robots.Configuration`, optional
             The robot's full configuration, i.e. values for all configurable
             joints of the entire robot, at the starting position. Defaults to
@@ -1238,8 +1354,11 @@ class Robot(object):
             Optional constraints that can be imposed along the solution path.
             Note that path calculation won't work if the start_configuration
             violates these constraints. Defaults to None.
-        planner_id: str
+        planner_id: str or list of str
             The name of the algorithm used for path planning. Defaults to 'RRT'.
+            If a list of names is passed, the request is sent with each of the
+            planners concurrently, and the result is selected according to the
+            ``race_policy``.
         num_planning_attempts: int, optional
             Normally, if one motion plan is needed, one motion plan is computed.
             However, for algorithms that use randomization in their execution
@@ -1255,12 +1374,39 @@ class Robot(object):
             Defaults to 1.
         attached_collision_meshes: list of :class:`compas_fab.robots.AttachedCollisionMesh`
             Defaults to None.
+        race_policy: str, optional
+            Selection of the result when racing several planners: ``first_success``
+            returns the first solution found, ``best_within_deadline`` returns the
+            best scored solution found until the ``race_deadline``, or until all
+            planners finished. Defaults to ``first_success``.
+        race_score: str, optional
+            Score to minimize when racing several planners, either ``path_length``
+            (in joint space) or ``duration``. Defaults to ``path_length``.
+        race_deadline: float, optional
+            Number of seconds to wait for the planners when racing. Defaults to
+            waiting until all planners finished.
+        goal_dispatch: str, optional
+            How to plan for a list of goal constraint sets: ``request`` sends all
+            of them in one request, and the planner returns a path to any of them.
+            ``concurrent`` sends one request per goal concurrently, and selects
+            the result with the ``race_policy`` and ``race_score``, waiting at most
+            ``race_deadline`` seconds. Defaults to ``request``.
 
         Returns
         -------
         :class:`compas_fab.robots.JointTrajectory`
             The calculated trajectory.
 
+        Notes
+        -----
+        The results of planner races are recorded in :attr:`planner_stats`.
+
+        When planning for several goals concurrently, the returned trajectory
+        has a ``goal_index`` attribute with the index of the goal it reaches,
+        and a ``goal_outcomes`` attribute with the outcome of each goal: its
+        ``status`` (``success``, ``error`` or ``pending``), ``score``,
+        ``time`` and ``error``.
+
         Examples
         --------
         >>> # Example with position and orientation constraints
@@ -1287,11 +1433,6 @@ class Robot(object):
         <class 'compas_fab.robots.trajectory.JointTrajectory'>
         """
 
-        # TODO: for the motion plan request a list of possible goal constraints
-        # can be passed, from which the planner will try to find a path that
-        # satisfies at least one of the specified goal constraints. For now only
-        # one set of goal constraints is supported.
-
         # TODO: add workspace_parameters
 
         self.ensure_client()
@@ -1302,40 +1443,40 @@ class Robot(object):
         # that all configurable joints of the whole robot are defined for planning.
         start_configuration, start_configuration_scaled = self._check_full_configuration_and_scale(start_configuration)
 
-        goal_constraints_WCF_scaled = []
-        for c in goal_constraints:
-            cp = c.copy()
-            if c.type == Constraint.JOINT:
-                joint = self.get_joint_by_name(c.joint_name)
-                if joint.is_scalable():
-                    cp.scale(1. / self.scale_factor)
-            else:
-                cp.scale(1. / self.scale_factor)
-            goal_constraints_WCF_scaled.append(cp)
+        # A list of goal constraint sets can be passed, of which at least one has to be satisfied
+        multiple_goals = bool(goal_constraints) and isinstance(goal_constraints[0], (list, tuple))
+        goal_constraint_sets = goal_constraints if multiple_goals else [goal_constraints]
+
+        goal_constraint_sets_WCF_scaled = [self._scaled_constraints(goal_constraint_set) for goal_constraint_set in goal_constraint_sets]
 
         # Transform path constraints to RCF and scale
-        if path_constraints:
-            path_constraints_WCF_scaled = []
-            for c in path_constraints:
-                cp = c.copy()
-                if c.type == Constraint.JOINT:
-                    joint = self.get_joint_by_name(c.joint_name)
-                    if joint.is_scalable():
-                        cp.scale(1. / self.scale_factor)
-                else:
-                    cp.scale(1. / self.scale_factor)
-                path_constraints_WCF_scaled.append(cp)
-        else:
-            path_constraints_WCF_scaled = None
+        path_constraints_WCF_scaled = self._scaled_constraints(path_constraints) if path_constraints else None
 
         if self.attached_tool:
-            if attached_collision_meshes:
-                attached_collision_meshes.append(self.attached_tool.attached_collision_mesh)
-            else:
-                attached_collision_meshes = [self.attached_tool.attached_collision_mesh]
+            # Do not modify the given list, it might be reused for several requests
+            attached_collision_meshes = list(attached_collision_meshes or []) + [self.attached_tool.attached_collision_mesh]
+
+        if isinstance(planner_id, (list, tuple)):
+            planner = functools.partial(self._race_planners, race_policy, race_score, race_deadline)
+        else:
+            planner = self.client.plan_motion
+
+        if not multiple_goals:
+            goal_constraints_WCF_scaled = goal_constraint_sets_WCF_scaled[0]
+        elif goal_dispatch == 'request':
+            goal_constraints_WCF_scaled = goal_constraint_sets_WCF_scaled
+        elif goal_dispatch == 'concurrent':
+            goal_constraints_WCF_scaled = goal_constraint_sets_WCF_scaled
+            planner = functools.partial(self._plan_goals_concurrently, planner, race_policy, race_score, race_deadline)
+        else:
+            raise ValueError('Unsupported goal dispatch. Must be one of: request, concurrent')
+
+        if self.plan_library is not None:
+            planner = functools.partial(self.plan_library.plan, planner)
 
-        trajectory = self.client.plan_motion(
-            robot=self,
+        trajectory = self._plan(
+            'plan_motion',
+            planner,
             goal_constraints=goal_constraints_WCF_scaled,
             start_configuration=start_configuration_scaled,
             group=group,
@@ -1347,7 +1488,11 @@ class Robot(object):
             max_velocity_scaling_factor=max_velocity_scaling_factor,
             max_acceleration_scaling_factor=max_acceleration_scaling_factor,
             attached_collision_meshes=attached_collision_meshes,
-            workspace_parameters=None)
+            workspace_parameters=None,
+            goal_dispatch=goal_dispatch if multiple_goals else None,
+            race_policy=race_policy,
+            race_score=race_score,
+            race_deadline=race_deadline)
 
         # Scale everything back to robot's scale
         for pt in trajectory.points:
@@ -1357,6 +1502,388 @@ class Robot(object):
 
         return trajectory
 
+    def smooth_trajectory(self, trajectory, max_velocity_scaling_factor=1., attached_collision_meshes=None,
+                          timeout=0.05, seed=None, client=None):
+        """Shorten a planned trajectory with collision-free shortcuts, and time it again.
+
+        Parameters
+        ----------
+        trajectory : :class:`compas_fab.robots.JointTrajectory`
+            The trajectory, e.g. returned by :meth:`plan_motion`.
+        max_velocity_scaling_factor : float, optional
+            Factor scaling the maximum joint velocities when timing the
+            smoothed path. Defaults to ``1``.
+        attached_collision_meshes : list of :class:`compas_fab.robots.AttachedCollisionMesh`, optional
+            Defaults to None.
+        timeout : float, optional
+            Time in seconds spent shortening the path. Defaults to ``0.05``.
+        seed : int, optional
+            Seed of the random shortcuts.
+        client : object, optional
+            Client checking the shortcuts for collisions, e.g. a
+            :class:`compas_fab.backends.LocalClient` holding the same scene
+            as the planner of the trajectory. Defaults to the robot's client.
+
+        Returns
+        -------
+        :class:`compas_fab.robots.JointTrajectory`
+            The smoothed trajectory, with a ``smoothing_report`` of the
+            reductions of its path length and duration.
+        """
+        client = client or self.client
+        if not hasattr(client, 'smooth_trajectory'):
+            raise Exception('The client cannot smooth trajectories, e.g. use a LocalClient')
+
+        if self.attached_tool:
+            attached_collision_meshes = list(attached_collision_meshes or []) + [self.attached_tool.attached_collision_mesh]
+
+        points = []
+        for point in trajectory.points:
+            point = JointTrajectoryPoint.from_data(point.data)
+            point.scale(1. / self.scale_factor)
+            points.append(point)
+        trajectory_scaled = JointTrajectory(points, trajectory.joint_names,
+                                            trajectory.start_configuration.scaled(1. / self.scale_factor),
+                                            trajectory.fraction)
+
+        smoothed = client.smooth_trajectory(robot=self, trajectory=trajectory_scaled,
+                                            max_velocity_scaling_factor=max_velocity_scaling_factor,
+                                            attached_collision_meshes=attached_collision_meshes,
+                                            timeout=timeout, seed=seed)
+
+        for point in smoothed.points:
+            point.scale(self.scale_factor)
+        smoothed.start_configuration.scale(self.scale_factor)
+
+        return smoothed
+
+    def in_collision(self, configuration, scene=None, attached_collision_meshes=None):
+        """Check if the robot is in collision in a configuration.
+
+        The robot is checked in-process, without a backend, against its own
+        links, the attached collision meshes and the collision meshes of the
+        scene, see :class:`compas_fab.robots.CollisionCheckerNumpy`.
+
+        Parameters
+        ----------
+        configuration : :class:`compas_fab.robots.Configuration`
+            The full configuration of the robot.
+        scene : :class:`compas_fab.robots.PlanningScene` or list of :class:`compas_fab.robots.CollisionMesh`, optional
+            The scene, or its collision meshes in meters. A client with a local
+            planning scene, e.g. a :class:`compas_fab.backends.LocalClient`, is
+            accepted as well. Defaults to checking for self-collisions only.
+        attached_collision_meshes : list of :class:`compas_fab.robots.AttachedCollisionMesh`, optional
+            Collision meshes attached to the robot, in addition to the
+            attached tool and those of the scene. Defaults to None.
+
+        Returns
+        -------
+        bool
+            ``True`` if the robot is in collision.
+
+        Notes
+        -----
+        This requires ``numpy`` and the robot's geometry to be loaded.
+
+        Examples
+        --------
+        >>> robot.in_collision(robot.zero_configuration())     # doctest: +SKIP
+        False
+        """
+        return self.in_collision_many([configuration], scene, attached_collision_meshes)[0]
+
+    def in_collision_many(self, configurations, scene=None, attached_collision_meshes=None):
+        """Check if the robot is in collision in many configurations at once.
+
+        Parameters
+        ----------
+        configurations : list of :class:`compas_fab.robots.Configuration`
+            Full configurations of the robot.
+        scene : :class:`compas_fab.robots.PlanningScene` or list of :class:`compas_fab.robots.CollisionMesh`, optional
+            The scene, see :meth:`in_collision`.
+        attached_collision_meshes : list of :class:`compas_fab.robots.AttachedCollisionMesh`, optional
+            Defaults to None.
+
+        Returns
+        -------
+        list of bool
+            ``True`` for the configurations in collision.
+        """
+        checker = self._collision_checker(scene, attached_collision_meshes)
+        return checker.in_collision(self._checker_values(checker, configurations)).tolist()
+
+    def trajectory_in_collision(self, trajectory, scene=None, attached_collision_meshes=None):
+        """Check the motions between consecutive points of a trajectory for collisions.
+
+        Unlike checking the points only, the whole straight joint space motion
+        between two points is checked, with steps adapted to the distances of
+        the robot to itself and to the scene, see
+        :class:`compas_fab.robots.SegmentCheckerNumpy`.
+
+        Parameters
+        ----------
+        trajectory : :class:`compas_fab.robots.JointTrajectory`
+            The trajectory. Joints not in the trajectory keep their values of
+            its start configuration.
+        scene : :class:`compas_fab.robots.PlanningScene` or list of :class:`compas_fab.robots.CollisionMesh`, optional
+            The scene, see :meth:`in_collision`.
+        attached_collision_meshes : list of :class:`compas_fab.robots.AttachedCollisionMesh`, optional
+            Defaults to None.
+
+        Returns
+        -------
+        list of bool
+            ``True`` for the segments in collision, one less than the points.
+
+        Examples
+        --------
+        >>> trajectory = robot.plan_motion(goal_constraints, start_configuration)   # doctest: +SKIP
+        >>> any(robot.trajectory_in_collision(trajectory, scene))                    # doctest: +SKIP
+        False
+        """
+        checker = self._collision_checker(scene, attached_collision_meshes, continuous=True)
+
+        configurations = self._trajectory_configurations(trajectory)
+        if len(configurations) < 2:
+            return []
+        return checker.trajectory_in_collision(self._checker_values(checker, configurations)).tolist()
+
+    def clearance_profile(self, trajectory, scene=None, attached_collision_meshes=None, max_distance=1.):
+        """Compute the clearance between the robot and the scene along a trajectory.
+
+        The distances of the links and attached collision meshes to the
+        collision meshes of the scene are computed for all points at once, see
+        :meth:`compas_fab.robots.RobotSpheresNumpy.clearance_profile`.
+
+        Parameters
+        ----------
+        trajectory : :class:`compas_fab.robots.JointTrajectory`
+            The trajectory, see :meth:`trajectory_in_collision`.
+        scene : :class:`compas_fab.robots.PlanningScene` or list of :class:`compas_fab.robots.CollisionMesh`
+            The scene, see :meth:`in_collision`.
+        attached_collision_meshes : list of :class:`compas_fab.robots.AttachedCollisionMesh`, optional
+            Defaults to None.
+        max_distance : float, optional
+            Largest clearance reported, in the units of the robot. Defaults to ``1``.
+
+        Returns
+        -------
+        dict
+            The ``minimum`` clearance, the clearance of every point in
+            ``points``, the clearance of every link and attached collision
+            mesh per point in ``links``, and the names of the ``closest``
+            link and collision mesh per point, in the units of the robot.
+
+        Examples
+        --------
+        >>> profile = robot.clearance_profile(trajectory, scene)     # doctest: +SKIP
+        >>> profile['minimum'] > 0.05                               # doctest: +SKIP
+        True
+        """
+        spheres = self._collision_checker(scene, attached_collision_meshes, continuous=True).spheres
+        configurations = self._checker_values(spheres, self._trajectory_configurations(trajectory))
+        profile = spheres.clearance_profile(configurations, max_distance / self.scale_factor)
+
+        profile['minimum'] *= self.scale_factor
+        profile['points'] = [distance * self.scale_factor for distance in profile['points']]
+        for name, distances in profile['links'].items():
+            profile['links'][name] = [distance * self.scale_factor for distance in distances]
+        return profile
+
+    def _trajectory_configurations(self, trajectory):
+        """Full configurations of the points of a trajectory."""
+        start, _ = self._check_full_configuration_and_scale(trajectory.start_configuration)
+        joint_names = trajectory.joint_names or start.joint_names
+        configurations = []
+        for point in trajectory.points:
+            configuration = start.copy()
+            named_values = dict(zip(joint_names, point.values))
+            configuration.values = [named_values.get(name, value) for name, value in zip(start.joint_names, start.values)]
+            configurations.append(configuration)
+        return configurations
+
+    def _checker_values(self, checker, configurations):
+        """Values of the joints of a checker, in meters, of full configurations."""
+        values = []
+        for configuration in configurations:
+            _, configuration_scaled = self._check_full_configuration_and_scale(configuration)
+            named_values = dict(zip(configuration_scaled.joint_names, configuration_scaled.values))
+            values.append([named_values.get(name, 0.) for name in checker.kinematics.joint_names])
+        return values
+
+    def _collision_checker(self, scene, attached_collision_meshes, continuous=False):
+        """Create a collision checker of the robot in a scene, of configurations or of segments."""
+        from compas_fab.robots.collision_numpy import CollisionCheckerNumpy
+        from compas_fab.robots.segments_numpy import SegmentCheckerNumpy
+
+        attached_collision_meshes = list(attached_collision_meshes or [])
+        if self.attached_tool:
+            attached_collision_meshes.append(self.attached_tool.attached_collision_mesh)
+
+        factory = 'segment_checker' if continuous else 'collision_checker'
+        if hasattr(scene, factory):
+            return getattr(scene, factory)(self, attached_collision_meshes)
+
+        collision_meshes = scene or []
+        if hasattr(scene, 'attached_collision_meshes'):
+            collision_meshes = scene.collision_meshes
+            attached_collision_meshes.extend(scene.attached_collision_meshes)
+
+        # The attached tool may also be attached in the scene
+        attached = dict((acm.collision_mesh.id, acm) for acm in attached_collision_meshes)
+        attached_collision_meshes = [acm for acm in attached_collision_meshes if attached.pop(acm.collision_mesh.id, None)]
+
+        checker_class = SegmentCheckerNumpy if continuous else CollisionCheckerNumpy
+        return checker_class(self, collision_meshes, attached_collision_meshes)
+
+    def _plan(self, method, planner, **kwargs):
+        """Invoke a planner, through the plan cache if there is one.
+
+        The ``ROBOT_PLANNING_PARAMETERS`` are part of the cache key, but are
+        not passed to the planner.
+        """
+        def plan(**request):
+            for name in ROBOT_PLANNING_PARAMETERS:
+                request.pop(name, None)
+            return planner(**request)
+
+        if not self.plan_cache:
+            return plan(robot=self, **kwargs)
+        return self.plan_cache.plan(method, self, plan, **kwargs)
+
+    def _plan_cartesian_motion_chunked(self, frames, start_configuration, chunk_size, chunk_retries, stitch_tolerance,
+                                       chunk_overlap, **kwargs):
+        """Plan a cartesian motion in overlapping chunks concurrently, and stitch them together."""
+        if chunk_size < 2:
+            raise ValueError('The chunk size must be at least 2 frames')
+        if not 1 <= chunk_overlap < chunk_size:
+            raise ValueError('The chunk overlap must be at least 1 frame and less than the chunk size')
+
+        # The first frames of every chunk but the first one are the last frames of the previous chunk
+        starts = list(range(0, len(frames), chunk_size))
+        overlaps = [0] + [chunk_overlap] * (len(starts) - 1)
+        chunks = [frames[start - overlap:start + chunk_size] for start, overlap in zip(starts, overlaps)]
+
+        def plan_chunk(index, configuration=None):
+            chunk_frames = chunks[index]
+            if configuration is None:
+                # Start from the frame before the chunk
+                positions, names = self.client.inverse_kinematics(self, frames[starts[index] - overlaps[index] - 1],
+                                                                  kwargs['group'], start_configuration,
+                                                                  kwargs['avoid_collisions'], kwargs['path_constraints'], 8,
+                                                                  kwargs['attached_collision_meshes'])
+                configuration = _merge_joint_values(start_configuration, names, positions)
+            else:
+                # Start exactly from the end of the previous chunk, without planning the overlap again
+                chunk_frames = chunk_frames[overlaps[index]:]
+
+            chunk = self._plan('plan_cartesian_motion', self.client.plan_cartesian_motion,
+                               frames=chunk_frames, start_configuration=configuration, **kwargs)
+            return chunk, len(chunk_frames), len(chunk_frames) - len(chunks[index]) + overlaps[index]
+
+        tasks = [functools.partial(plan_chunk, 0, start_configuration)]
+        tasks.extend(functools.partial(plan_chunk, index) for index in range(1, len(chunks)))
+        outcomes = map_concurrently(tasks)
+
+        points = []
+        joint_names = []
+        chunk_fractions = []
+        reached_frames = 0.
+        end_configuration = start_configuration
+        complete = True
+
+        def seam(chunk):
+            """Index of the point where the chunk is stitched, ``None`` if it cannot be stitched without a jump."""
+            index = _stitch_index(points, chunk, stitch_tolerance)
+            if index is None:
+                return None
+            stitched = points + chunk.points[index + 1 if points else 0:]
+            if _find_joint_jump(stitched, len(points), kwargs['jump_threshold']) is not None:
+                LOGGER.debug('The chunk jumps in joint space where it is stitched')
+                return None
+            return index
+
+        for index, (outcome, _) in enumerate(outcomes):
+            chunk, chunk_frames, overlap = outcome or (None, 0, 0)
+            if complete:
+                attempts = 0
+                while (not chunk or chunk.fraction < 1. or seam(chunk) is None) and attempts < chunk_retries:
+                    attempts += 1
+                    LOGGER.debug('Planning chunk %d again, attempt %d', index, attempts)
+                    try:
+                        chunk, chunk_frames, overlap = plan_chunk(index, end_configuration)
+                    except Exception as e:
+                        LOGGER.debug('Chunk %d failed: %s', index, e)
+                        chunk = None
+
+            chunk_fractions.append(chunk.fraction if chunk else 0.)
+
+            start = seam(chunk) if complete and chunk else None
+            if start is None:
+                complete = False
+                continue
+
+            # The point of the seam is the last point of the previous chunk
+            offset = points[-1].time_from_start.seconds if points else 0.
+            start_time = chunk.points[start].time_from_start.seconds
+            for point in chunk.points[start + 1 if points else 0:]:
+                seconds = offset + point.time_from_start.seconds - start_time
+                point.time_from_start = Duration(int(seconds), round((seconds - int(seconds)) * 1e9))
+                points.append(point)
+
+            joint_names = joint_names or chunk.joint_names
+            end_configuration = _merge_joint_values(end_configuration, chunk.joint_names, chunk.points[-1].values)
+            reached_frames += max(0., chunk.fraction * chunk_frames - overlap)
+            complete = chunk.fraction >= 1.
+
+        trajectory = JointTrajectory(points, joint_names, start_configuration, reached_frames / len(frames))
+        trajectory.chunk_fractions = chunk_fractions
+
+        return trajectory
+
+    def _race_planners(self, policy, score, deadline, robot, planner_id, **kwargs):
+        """Send a motion planning request with several planners concurrently."""
+        tasks = []
+        for name in planner_id:
+            tasks.append((name, functools.partial(self.client.plan_motion, robot=robot, planner_id=name, **kwargs)))
+
+        winner, trajectory, outcomes = dispatch_concurrently(tasks, policy, score, deadline)
+
+        # Races of goals planned concurrently update the statistics concurrently
+        with self._planner_stats_lock:
+            for name, outcome in outcomes.items():
+                stats = self.planner_stats.setdefault(name, dict(races=0, wins=0, failures=0, timeouts=0))
+                stats['races'] += 1
+                if name == winner:
+                    stats['wins'] += 1
+                elif outcome['status'] in ('error', 'failure'):
+                    stats['failures'] += 1
+                elif outcome['status'] == 'pending' and policy == BEST_WITHIN_DEADLINE:
+                    stats['timeouts'] += 1
+
+        LOGGER.debug('Planner %s won the race among %s', winner, planner_id)
+
+        return trajectory
+
+    def _plan_goals_concurrently(self, planner, policy, score, deadline, robot, goal_constraints, **kwargs):
+        """Send one motion planning request per goal constraint set concurrently."""
+        tasks = []
+        for index, goal_constraint_set in enumerate(goal_constraints):
+            tasks.append((index, functools.partial(planner, robot=robot, goal_constraints=goal_constraint_set, **kwargs)))
+
+        goal_index, trajectory, outcomes = dispatch_concurrently(tasks, policy, score, deadline)
+
+        trajectory.goal_index = goal_index
+        trajectory.goal_outcomes = []
+        for index in range(len(goal_constraints)):
+            outcome = outcomes[index]
+            trajectory.goal_outcomes.append(dict(status=outcome['status'],
+                                                 score=outcome['score'],
+                                                 time=outcome['time'],
+                                                 error=outcome['error']))
+
+        return trajectory
+
     def transformed_frames(self, configuration, group=None):
         """Returns the robot's transformed frames."""
         if not len(configuration.joint_names):
@@ -0,0 +1,306 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import numpy as np
+from compas.robots import Joint
+
+from compas_fab.robots.collision_numpy import CollisionCheckerNumpy
+from compas_fab.robots.spheres_numpy import CHUNK_SIZE
+from compas_fab.robots.spheres_numpy import RobotSpheresNumpy
+from compas_fab.robots.spheres_numpy import sphere_distances_numpy
+
+__all__ = [
+    'SegmentCheckerNumpy',
+]
+
+# Gap between spheres above which their hierarchies are not descended to find larger advances
+MAX_DISTANCE = 0.1
+
+
+class SegmentCheckerNumpy(object):
+    """Checks straight joint space motions for collisions, many at once.
+
+    Instead of checking configurations at a fixed resolution along a
+    segment, the segment is traversed by conservative advancement: the
+    distances between all pairs of bodies are bounded from below with
+    :class:`RobotSpheresNumpy`, and the motion of every body along the
+    segment is bounded from above by the changes of the joint values times
+    the distances of the body from the joint axes. The configuration is
+    advanced as far as no pair of bodies can close its gap, such that large
+    steps are taken far from obstacles and small ones close to them.
+
+    Where the spheres of a pair are closer than the ``tolerance``, the
+    configuration is checked exactly with :class:`CollisionCheckerNumpy`, and
+    advanced such that the gap of the pair changes by at most the
+    ``tolerance``. Only these steps are not certified, their resolution is a
+    length on the bodies rather than a joint space distance.
+
+    Parameters
+    ----------
+    robot : :class:`compas_fab.robots.Robot`
+        The robot, with its geometry loaded.
+    collision_meshes : list of :class:`compas_fab.robots.CollisionMesh`, optional
+        The collision meshes of the scene, in the world coordinate frame.
+    attached_collision_meshes : list of :class:`compas_fab.robots.AttachedCollisionMesh`, optional
+        The collision meshes attached to links of the robot.
+    leaf_radius : float, optional
+        Maximum radius of the leaf spheres. Defaults to ``0.01``.
+    tolerance : float, optional
+        Distance below which the spheres do not certify a pair of bodies as
+        separate. Defaults to ``0.005``.
+
+    Attributes
+    ----------
+    spheres : :class:`compas_fab.robots.RobotSpheresNumpy`
+        The distance bounds of the bodies.
+    checker : :class:`compas_fab.robots.CollisionCheckerNumpy`
+        The exact collision checker.
+    stats : dict
+        Counters of the ``segments`` checked, of the ``steps`` of all
+        segments, and of the ``exact_checks`` of configurations.
+
+    Notes
+    -----
+    Lengths are in meters, regardless of the robot's scale factor.
+
+    Examples
+    --------
+    >>> checker = SegmentCheckerNumpy(robot)
+    >>> zero = [0.] * len(checker.kinematics.joint_names)
+    >>> checker.segments_in_collision([zero], [[0.1] * len(zero)]).tolist()
+    [False]
+    """
+
+    def __init__(self, robot, collision_meshes=None, attached_collision_meshes=None, leaf_radius=0.01, tolerance=0.005):
+        self.spheres = RobotSpheresNumpy(robot, collision_meshes, attached_collision_meshes, leaf_radius=leaf_radius)
+        self.checker = CollisionCheckerNumpy(robot, collision_meshes, attached_collision_meshes)
+        self.tolerance = tolerance
+        self.stats = dict(segments=0, steps=0, exact_checks=0)
+        self._motion_bounds()
+
+    @property
+    def kinematics(self):
+        """:class:`compas_fab.robots.ForwardKinematicsNumpy`: The forward kinematics of the robot."""
+        return self.spheres.kinematics
+
+    def _motion_bounds(self):
+        """Coefficients bounding the motion of every sphere by the changes of the joint values.
+
+        A point rotating about the axis of a joint moves at most the angle
+        times its distance from a point on the axis. Along the chain of a
+        link, the distance of the point from the axis of each joint is bounded
+        by its distance from the origin of the closest joint, and the
+        distances between consecutive joint origins, which rotations do not
+        change. Prismatic joints move all points by their change, and lengthen
+        the chain by their extension. The joints moving both bodies of a pair
+        move them together.
+        """
+        spheres = self.spheres
+        joints = self.kinematics._joints
+        configurable = [i for i, joint in enumerate(joints) if joint[1] != Joint.FIXED]
+        columns = dict((joint, column) for column, joint in enumerate(configurable))
+
+        self._joint_indices = np.array([joints[i][4] for i in configurable], dtype=int)
+        self._joint_multipliers = np.array([joints[i][5] for i in configurable], dtype=float)
+        self._joint_offsets = np.array([joints[i][6] for i in configurable], dtype=float)
+        self._prismatic = np.array([joints[i][1] == Joint.PRISMATIC for i in configurable], dtype=bool)
+
+        bodies = len(spheres.body_names)
+        # Joints moving each body, lengths of the chain from the closest joint, and prismatic joints within
+        self._moving = np.zeros((bodies, len(configurable)), dtype=bool)
+        self._lengths = np.zeros((bodies, len(configurable)))
+        self._chains = np.zeros((bodies, len(configurable), len(configurable)))
+        # Distance of every sphere's surface from the origin of the closest joint
+        self._near = np.zeros(len(spheres._radii))
+
+        static = len(self.kinematics.link_names)
+        for body, (link, offset) in enumerate(zip(spheres._body_links, spheres._body_offsets)):
+            chain = []
+            joint = self.kinematics._link_joints[link] if link != static else -1
+            while joint >= 0:
+                if joint in columns:
+                    chain.append(joint)
+                joint = joints[joint][0]
+            if not chain:
+                continue
+
+            nodes = spheres._node_bodies == body
+            centers = spheres._centers[nodes].dot(offset[:3, :3].T) + offset[:3, 3]
+            self._near[nodes] = np.linalg.norm(centers - joints[chain[0]][3], axis=1) + spheres._radii[nodes]
+
+            length = 0.
+            for position, joint in enumerate(chain):
+                column = columns[joint]
+                if position:
+                    length += np.linalg.norm(joints[chain[position - 1]][3] - joints[joint][3])
+                self._moving[body, column] = True
+                self._lengths[body, column] = length
+                if self._prismatic[column]:
+                    for outer in chain[position + 1:]:
+                        self._chains[body, columns[outer], column] = 1.
+
+        pairs = spheres._pairs
+        self._pair_joints = [self._moving[pairs[:, 0]] & ~self._moving[pairs[:, 1]],
+                             self._moving[pairs[:, 1]] & ~self._moving[pairs[:, 0]]]
+
+    def _rates(self, starts, ends):
+        """Coefficients of the motion of the spheres of each side of each pair along the segments.
+
+        The motion of a sphere relative to the other body of its pair is at
+        most its distance from the closest joint times the first coefficient,
+        plus the second coefficient. Both are arrays of shape ``(segments, pairs, 2)``.
+        """
+        start_values = starts[:, self._joint_indices] * self._joint_multipliers + self._joint_offsets
+        end_values = ends[:, self._joint_indices] * self._joint_multipliers + self._joint_offsets
+        changes = np.abs(end_values - start_values)
+        extensions = np.where(self._prismatic, np.maximum(np.abs(start_values), np.abs(end_values)), 0.)
+
+        revolute = np.where(self._prismatic, 0., changes)
+        lengths = self._lengths + np.einsum('bjk,sk->sbj', self._chains, extensions)
+        offsets = lengths * revolute[:, None] + np.where(self._prismatic, changes, 0.)[:, None]
+
+        pairs = self.spheres._pairs
+        factors = np.zeros((len(starts), len(pairs), 2))
+        terms = np.zeros((len(starts), len(pairs), 2))
+        for side, joints in enumerate(self._pair_joints):
+            factors[:, :, side] = revolute.dot(joints.T)
+            terms[:, :, side] = np.einsum('spj,pj->sp', offsets[:, pairs[:, side]], joints)
+        return factors, terms
+
+    def _steps(self, configurations, factors, terms, remaining):
+        """Safe advances of the segments, and whether spheres closer than the tolerance were found.
+
+        The hierarchies of all pairs are descended where the gap between
+        their spheres divided by their motion may limit the advance more
+        than the smallest advance found so far, gaps below the tolerance
+        counting as the tolerance. A pair of spheres is not descended further
+        if it allows at least half of that advance, or if its gap is larger
+        than :data:`MAX_DISTANCE`. Spheres closer than the tolerance are
+        descended to the leaves, to find whether the configuration is close.
+        """
+        spheres = self.spheres
+        placements = spheres._placements(configurations)
+        best = np.array(remaining, dtype=float)
+        close = np.zeros(len(best), dtype=bool)
+        rows, columns = [index.ravel() for index in np.indices((len(best), len(spheres._pairs)))]
+        a, b = spheres._roots[spheres._pairs[columns, 0]], spheres._roots[spheres._pairs[columns, 1]]
+
+        while len(rows):
+            placement_a = placements[rows, spheres._node_bodies[a]]
+            placement_b = placements[rows, spheres._node_bodies[b]]
+            centers_a = np.einsum('nij,nj->ni', placement_a[:, :3, :3], spheres._centers[a]) + placement_a[:, :3, 3]
+            centers_b = np.einsum('nij,nj->ni', placement_b[:, :3, :3], spheres._centers[b]) + placement_b[:, :3, 3]
+            distances = sphere_distances_numpy(centers_a, spheres._radii[a], centers_b, spheres._radii[b])
+            motions = (self._near[a] * factors[rows, columns, 0] + terms[rows, columns, 0] +
+                       self._near[b] * factors[rows, columns, 1] + terms[rows, columns, 1])
+
+            leaves = (spheres._children[a, 0] < 0) & (spheres._children[b, 0] < 0)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                advances = np.maximum(distances, self.tolerance) / motions
+            advances[motions == 0] = np.inf
+            near = distances < self.tolerance
+            close[rows[leaves & near]] = True
+
+            # Spheres closer than the tolerance are descended until their configuration is marked as close
+            keep = (advances < best[rows]) | (near & ~close[rows])
+            rows, columns, a, b = rows[keep], columns[keep], a[keep], b[keep]
+            advances, distances, leaves = advances[keep], distances[keep], leaves[keep]
+
+            done = leaves | (distances >= MAX_DISTANCE) | ((advances >= best[rows] / 2.) & (distances >= self.tolerance))
+            np.minimum.at(best, rows[done], advances[done])
+
+            pending = ~done
+            rows, columns, a, b = rows[pending], columns[pending], a[pending], b[pending]
+            split_a = np.repeat((spheres._children[a, 0] >= 0) &
+                                ((spheres._children[b, 0] < 0) | (spheres._radii[a] >= spheres._radii[b])), 2)
+            rows, columns, a, b = np.repeat(rows, 2), np.repeat(columns, 2), np.repeat(a, 2), np.repeat(b, 2)
+            sides = np.arange(len(a)) % 2
+            a = np.where(split_a, spheres._children[a, sides], a)
+            b = np.where(split_a, b, spheres._children[b, sides])
+
+        return best, close
+
+    def segments_in_collision(self, starts, ends):
+        """Check straight joint space motions for collisions.
+
+        Parameters
+        ----------
+        starts : array-like
+            Values of the robot's configurable joints at the start of each
+            segment, see :attr:`ForwardKinematicsNumpy.joint_names`.
+        ends : array-like
+            Values of the robot's configurable joints at the end of each segment.
+
+        Returns
+        -------
+        :class:`numpy.ndarray`
+            ``True`` for the segments in collision.
+        """
+        return ~np.isnan(self.first_collisions(starts, ends))
+
+    def trajectory_in_collision(self, configurations):
+        """Check the segments between consecutive configurations for collisions.
+
+        Parameters
+        ----------
+        configurations : array-like
+            Values of the robot's configurable joints, one row per point of
+            the trajectory.
+
+        Returns
+        -------
+        :class:`numpy.ndarray`
+            ``True`` for the segments in collision, one less than the configurations.
+        """
+        configurations = np.atleast_2d(np.asarray(configurations, dtype=float))
+        return self.segments_in_collision(configurations[:-1], configurations[1:])
+
+    def first_collisions(self, starts, ends):
+        """Find the first configurations in collision along straight joint space motions.
+
+        Parameters
+        ----------
+        starts : array-like
+            Values of the robot's configurable joints at the start of each segment.
+        ends : array-like
+            Values of the robot's configurable joints at the end of each segment.
+
+        Returns
+        -------
+        :class:`numpy.ndarray`
+            Parameter between ``0`` and ``1`` of the first collision found
+            along each segment, ``nan`` for the segments free of collisions.
+        """
+        starts = np.atleast_2d(np.asarray(starts, dtype=float))
+        ends = np.atleast_2d(np.asarray(ends, dtype=float))
+        factors, terms = self._rates(starts, ends)
+
+        result = np.full(len(starts), np.nan)
+        parameters = np.zeros(len(starts))
+        pending = np.arange(len(starts))
+        self.stats['segments'] += len(starts)
+
+        # All pending segments are advanced at once, until they reach their end or a collision
+        while len(pending):
+            self.stats['steps'] += len(pending)
+            t = parameters[pending, None]
+            configurations = starts[pending] * (1. - t) + ends[pending] * t
+            steps, close = np.zeros(len(pending)), np.zeros(len(pending), dtype=bool)
+            for chunk in range(0, len(pending), CHUNK_SIZE):
+                rows = pending[chunk:chunk + CHUNK_SIZE]
+                steps[chunk:chunk + CHUNK_SIZE], close[chunk:chunk + CHUNK_SIZE] = self._steps(
+                    configurations[chunk:chunk + CHUNK_SIZE], factors[rows], terms[rows], 1. - parameters[rows])
+
+            # Configurations with spheres closer than the tolerance are checked exactly
+            if close.any():
+                self.stats['exact_checks'] += int(close.sum())
+                colliding = np.zeros(len(pending), dtype=bool)
+                colliding[close] = self.checker.in_collision(configurations[close])
+                result[pending[colliding]] = parameters[pending[colliding]]
+                steps[colliding] = np.nan
+
+            parameters[pending] += steps
+            pending = pending[parameters[pending] < 1.]
+
+        return result
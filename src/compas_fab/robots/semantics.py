@@ -15,6 +15,14 @@ class RobotSemantics(object):
     The semantic model is based on the
     `Semantic Robot Description Format` (`SRDF`_).
 
+    The pairs of links which are never checked for collisions, the pairs
+    listed as ``disable_collisions`` and the links connected by a joint, are
+    kept as a bitset per link. More pairs can be allowed to collide at
+    runtime, e.g. the touch links of attached collision meshes, see
+    :meth:`allow_collision` and :meth:`allow_touch_links`. The
+    :attr:`version` counts these changes, e.g. to rebuild cached collision
+    checkers.
+
     References
     ----------
 
@@ -30,7 +38,10 @@ class RobotSemantics(object):
         self._group_dict = {}
         self.main_group = None
         self.urdf_robot = urdf_robot
+        self.disabled_collisions = self.__get_disabled_collisions()
+        self.version = 0
         self.__source_attributes()
+        self.__source_allowed_collisions()
 
     @classmethod
     def from_srdf_file(cls, file, urdf_robot):
@@ -128,6 +139,137 @@ class RobotSemantics(object):
     def __get_end_effectors(self):
         return [ee.attrib['parent_link'] for ee in self.root.findall('end_effector')]
 
+    def __get_disabled_collisions(self):
+        return [(dc.attrib['link1'], dc.attrib['link2']) for dc in self.root.findall('disable_collisions')]
+
+    def __source_allowed_collisions(self):
+        # One bit per link or collision mesh, set for the names it may collide with
+        self._collision_names = []
+        self._collision_indices = {}
+        self._allowed_collisions = []
+        for link in self.urdf_robot.links:
+            self.__get_collision_index(link.name)
+        for joint in self.urdf_robot.joints:
+            self.allow_collision(joint.parent.link, joint.child.link)
+        for link1, link2 in self.disabled_collisions:
+            self.allow_collision(link1, link2)
+
+    def __get_collision_index(self, name):
+        index = self._collision_indices.get(name)
+        if index is None:
+            index = self._collision_indices[name] = len(self._collision_names)
+            self._collision_names.append(name)
+            self._allowed_collisions.append(0)
+        return index
+
+    def allow_collision(self, name1, name2):
+        """Allows two links, or a link and a collision mesh, to collide.
+
+        Parameters
+        ----------
+        name1 : str
+            Name of a link, or id of a collision mesh.
+        name2 : str
+            Name of a link, or id of a collision mesh.
+        """
+        index1 = self.__get_collision_index(name1)
+        index2 = self.__get_collision_index(name2)
+        if self._allowed_collisions[index1] >> index2 & 1:
+            return
+        self._allowed_collisions[index1] |= 1 << index2
+        self._allowed_collisions[index2] |= 1 << index1
+        self.version += 1
+
+    def disallow_collision(self, name1, name2):
+        """Checks two links, or a link and a collision mesh, for collisions again.
+
+        Parameters
+        ----------
+        name1 : str
+            Name of a link, or id of a collision mesh.
+        name2 : str
+            Name of a link, or id of a collision mesh.
+        """
+        index1 = self._collision_indices.get(name1)
+        index2 = self._collision_indices.get(name2)
+        if index1 is None or index2 is None or not self._allowed_collisions[index1] >> index2 & 1:
+            return
+        self._allowed_collisions[index1] &= ~(1 << index2)
+        self._allowed_collisions[index2] &= ~(1 << index1)
+        self.version += 1
+
+    def allow_touch_links(self, attached_collision_mesh):
+        """Allows an attached collision mesh to collide with the link it is attached to and its touch links.
+
+        Parameters
+        ----------
+        attached_collision_mesh : :class:`compas_fab.robots.AttachedCollisionMesh`
+            The attached collision mesh.
+        """
+        name = attached_collision_mesh.collision_mesh.id
+        for link_name in [attached_collision_mesh.link_name] + list(attached_collision_mesh.touch_links):
+            self.allow_collision(name, link_name)
+
+    def is_collision_allowed(self, name1, name2):
+        """Checks if two links, or a link and a collision mesh, are allowed to collide.
+
+        Parameters
+        ----------
+        name1 : str
+            Name of a link, or id of a collision mesh.
+        name2 : str
+            Name of a link, or id of a collision mesh.
+
+        Returns
+        -------
+        bool
+            ``True`` if the pair is not checked for collisions.
+        """
+        index1 = self._collision_indices.get(name1)
+        index2 = self._collision_indices.get(name2)
+        if index1 is None or index2 is None:
+            return False
+        return bool(self._allowed_collisions[index1] >> index2 & 1)
+
+    def iter_allowed_collision_pairs(self):
+        """Iterates over the pairs of names which are allowed to collide.
+
+        Yields
+        ------
+        tuple of str
+            Names of the links or collision meshes of an allowed pair.
+        """
+        for index, allowed in enumerate(self._allowed_collisions):
+            # Each pair once, from the row of its first name
+            allowed = allowed >> (index + 1) << (index + 1)
+            while allowed:
+                lowest = allowed & -allowed
+                yield self._collision_names[index], self._collision_names[lowest.bit_length() - 1]
+                allowed ^= lowest
+
+    def iter_collision_pairs(self, names=None):
+        """Iterates over the pairs of links, or collision meshes, which must be checked for collisions.
+
+        Parameters
+        ----------
+        names : list of str, optional
+            Names of links or ids of collision meshes. Defaults to the names
+            of all links of the robot.
+
+        Yields
+        ------
+        tuple of str
+            Names of a pair which is not allowed to collide.
+        """
+        if names is None:
+            names = [link.name for link in self.urdf_robot.links]
+        indices = [self._collision_indices.get(name) for name in names]
+        for position, (name, index) in enumerate(zip(names, indices)):
+            allowed = self._allowed_collisions[index] if index is not None else 0
+            for other_name, other_index in zip(names[position + 1:], indices[position + 1:]):
+                if other_index is None or not allowed >> other_index & 1:
+                    yield name, other_name
+
     def get_end_effector_link_name(self, group=None):
         if not group:
             group = self.main_group_name
@@ -0,0 +1,587 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import json
+import logging
+import os
+from collections import OrderedDict
+
+import numpy as np
+
+from compas_fab.robots.collision_numpy import _RobotBodiesNumpy
+from compas_fab.robots.collision_numpy import _cached_tree
+from compas_fab.robots.collision_numpy import _mesh_triangles
+from compas_fab.robots.collision_numpy import _shape_triangles
+from compas_fab.robots.collision_numpy import _transform_points
+from compas_fab.robots.plan_cache import robot_description_hash
+
+LOGGER = logging.getLogger('compas_fab.robots.spheres_numpy')
+
+__all__ = [
+    'RobotSpheresNumpy',
+    'SphereTreeNumpy',
+    'sphere_distances_numpy',
+]
+
+# Name of the file storing the sphere trees in the directory of a cached robot description
+SPHERES_FILENAME = 'robot_spheres.json'
+
+# Number of configurations whose distances are computed at once, to bound the memory use
+CHUNK_SIZE = 256
+
+# Fraction of the distance of two bodies within which their closest spheres are not descended further
+RELATIVE_TOLERANCE = 0.05
+
+
+def sphere_distances_numpy(centers_a, radii_a, centers_b, radii_b):
+    """Compute the distances between the surfaces of pairs of spheres.
+
+    Parameters
+    ----------
+    centers_a, centers_b : array-like
+        Centers of the spheres, of shape ``(..., 3)``.
+    radii_a, radii_b : array-like
+        Radii of the spheres, of shape ``(...)``.
+
+    Returns
+    -------
+    :class:`numpy.ndarray`
+        Distances, negative for overlapping spheres.
+
+    Examples
+    --------
+    >>> sphere_distances_numpy([[0, 0, 0], [0, 0, 0]], [1., 1.], [[3, 0, 0], [1, 0, 0]], [1., 1.]).tolist()
+    [1.0, -1.0]
+    """
+    difference = np.asarray(centers_a, dtype=float) - np.asarray(centers_b, dtype=float)
+    return np.sqrt(np.sum(difference ** 2, axis=-1)) - np.asarray(radii_a, dtype=float) - np.asarray(radii_b, dtype=float)
+
+
+def _subdivide(triangles, max_edge):
+    """Split triangles at the midpoints of their edges until no edge is longer than ``max_edge``."""
+    while len(triangles):
+        long_edges = np.linalg.norm(triangles - np.roll(triangles, -1, axis=1), axis=2).max(axis=1) > max_edge
+        if not long_edges.any():
+            break
+        a, b, c = triangles[long_edges, 0], triangles[long_edges, 1], triangles[long_edges, 2]
+        ab, bc, ca = (a + b) / 2., (b + c) / 2., (c + a) / 2.
+        split = [np.stack(vertices, axis=1) for vertices in ((a, ab, ca), (ab, b, bc), (ca, bc, c), (ab, bc, ca))]
+        triangles = np.concatenate([triangles[~long_edges]] + split)
+    return triangles
+
+
+def _link_triangles(link):
+    """Triangles of all collision shapes of a link, or ``None`` if their geometry is not loaded."""
+    triangles = []
+    for item in link.collision:
+        shape_triangles = _shape_triangles(item.geometry.shape)
+        if shape_triangles is None:
+            continue
+        init_transformation = getattr(item, 'init_transformation', None)
+        if init_transformation is not None:
+            shape_triangles = _transform_points(np.array(init_transformation.matrix, dtype=float), shape_triangles)
+        triangles.append(shape_triangles)
+    return np.concatenate(triangles) if triangles else None
+
+
+def _sphere_tree(triangles, leaf_radius):
+    return SphereTreeNumpy(triangles, leaf_radius) if triangles is not None else None
+
+
+class SphereTreeNumpy(object):
+    """Hierarchy of spheres covering the triangles of a surface.
+
+    Triangles with edges longer than the ``leaf_radius`` are subdivided
+    first. The triangles are then split in halves at the median of their
+    centroids along the longest side of their bounding box, until the sphere
+    around them is not larger than the ``leaf_radius``. Every sphere encloses
+    the vertices of its triangles, and thereby the triangles, such that the
+    spheres of each level of the hierarchy cover the whole surface.
+
+    Parameters
+    ----------
+    triangles : array-like, optional
+        Vertices of the triangles, of shape ``(triangles, 3, 3)``.
+    leaf_radius : float, optional
+        Maximum radius of the leaf spheres, i.e. the approximation error of
+        the surface. Defaults to ``0.01``.
+
+    Attributes
+    ----------
+    centers : :class:`numpy.ndarray`
+        Centers of the spheres, the root sphere first.
+    radii : :class:`numpy.ndarray`
+        Radii of the spheres.
+    points : :class:`numpy.ndarray`
+        A point of the surface in each sphere.
+    children : :class:`numpy.ndarray`
+        Indices of the two child spheres of each sphere, ``-1`` for the leaves.
+
+    Examples
+    --------
+    >>> tree = SphereTreeNumpy([[[0, 0, 0], [1, 0, 0], [0, 1, 0]]], leaf_radius=0.25)
+    >>> bool(tree.radii[tree.children[:, 0] < 0].max() <= 0.25)
+    True
+    """
+
+    def __init__(self, triangles=None, leaf_radius=0.01):
+        self.leaf_radius = leaf_radius
+        triangles = np.asarray(triangles if triangles is not None else [], dtype=float).reshape(-1, 3, 3)
+        triangles = _subdivide(triangles, leaf_radius)
+        centroids = triangles.mean(axis=1)
+        triangle_lows, triangle_highs = triangles.min(axis=1), triangles.max(axis=1)
+
+        # The triangles of a sphere are a range of ``order``, the spheres are built one level at a time
+        order = np.arange(len(triangles))
+        starts, counts = np.zeros(1, dtype=int), np.array([len(triangles)])
+        parents, sides = np.array([-1]), np.array([0])
+        centers, radii, points, links = [], [], [], []
+        while len(triangles) and len(starts):
+            offsets = np.cumsum(counts) - counts
+            spheres = np.repeat(np.arange(len(starts)), counts)
+            positions = np.repeat(starts - offsets, counts) + np.arange(counts.sum())
+            indices = order[positions]
+            low = np.minimum.reduceat(triangle_lows[indices], offsets)
+            high = np.maximum.reduceat(triangle_highs[indices], offsets)
+            center = (low + high) / 2.
+            squared = np.sum((triangles[indices] - center[spheres, None]) ** 2, axis=2).max(axis=1)
+            radius = np.sqrt(np.maximum.reduceat(squared, offsets))
+
+            nodes = sum(len(level) for level in radii) + np.arange(len(starts))
+            centers.append(center)
+            radii.append(radius)
+            links.append((parents, sides))
+
+            # Spheres are split at the median of the centroids along the longest side of their box
+            split = (counts > 1) & (radius > leaf_radius)
+            keys = centroids[indices, np.argmax(high - low, axis=1)[spheres]]
+            permutation = np.lexsort((keys, spheres))
+            order[positions] = indices[permutation]
+            points.append(centroids[order[starts + counts // 2]])
+
+            halves = counts[split] // 2
+            starts = np.concatenate([starts[split], starts[split] + halves])
+            counts = np.concatenate([halves, counts[split] - halves])
+            parents = np.concatenate([nodes[split], nodes[split]])
+            sides = np.repeat([0, 1], len(halves))
+
+        self.centers = np.concatenate(centers) if centers else np.zeros((0, 3))
+        self.radii = np.concatenate(radii) if radii else np.zeros(0)
+        self.points = np.concatenate(points) if points else np.zeros((0, 3))
+        self.children = np.full((len(self.radii), 2), -1, dtype=int)
+        if links:
+            parents, sides = [np.concatenate(values) for values in zip(*links)]
+            self.children[parents[1:], sides[1:]] = np.arange(1, len(parents))
+
+    @property
+    def data(self):
+        """dict : The data representing the hierarchy."""
+        return {
+            'leaf_radius': self.leaf_radius,
+            'centers': self.centers.tolist(),
+            'radii': self.radii.tolist(),
+            'points': self.points.tolist(),
+            'children': self.children.tolist(),
+        }
+
+    @classmethod
+    def from_data(cls, data):
+        """Construct a hierarchy from its data representation.
+
+        Parameters
+        ----------
+        data : :obj:`dict`
+            The data dictionary.
+
+        Returns
+        -------
+        :class:`SphereTreeNumpy`
+            The constructed hierarchy.
+        """
+        tree = cls(leaf_radius=data['leaf_radius'])
+        tree.centers = np.array(data['centers'], dtype=float).reshape(-1, 3)
+        tree.radii = np.array(data['radii'], dtype=float)
+        tree.points = np.array(data['points'], dtype=float).reshape(-1, 3)
+        tree.children = np.array(data['children'], dtype=int).reshape(-1, 2)
+        return tree
+
+
+class RobotSpheresNumpy(_RobotBodiesNumpy):
+    """Computes distances of a robot to itself and to a scene, many configurations at once.
+
+    The surfaces of the robot's links, of the attached collision meshes and
+    of the collision meshes of the scene are covered by hierarchies of
+    spheres, see :class:`SphereTreeNumpy`. For all configurations at once,
+    the hierarchies of each pair of bodies are descended where their spheres
+    may contain closer points than the closest points of the surfaces found
+    so far, up to a maximum distance.
+
+    Since the spheres enclose the surfaces, the reported distances are never
+    larger than the distances of the surfaces, and at most twice the
+    ``leaf_radius`` smaller, or a few percent of distances larger than the
+    default ``max_distance``. Spheres are much cheaper to compare than boxes
+    and triangles, which makes them a fast first check of many
+    configurations, before the configurations which may collide are checked
+    exactly, e.g. with :class:`compas_fab.robots.CollisionCheckerNumpy`.
+
+    Parameters
+    ----------
+    robot : :class:`compas_fab.robots.Robot`
+        The robot, with its geometry loaded.
+    collision_meshes : list of :class:`compas_fab.robots.CollisionMesh`, optional
+        The collision meshes of the scene, in the world coordinate frame.
+    attached_collision_meshes : list of :class:`compas_fab.robots.AttachedCollisionMesh`, optional
+        The collision meshes attached to links of the robot.
+    allowed_collision_pairs : list of tuple, optional
+        Pairs of link names or collision mesh ids whose distances are not
+        computed. Links connected by a joint and the pairs disabled in the
+        robot's semantics are always skipped.
+    leaf_radius : float, optional
+        Maximum radius of the leaf spheres. Defaults to ``0.01``.
+    directory : str, optional
+        Directory where the hierarchies of the links are stored. Hierarchies
+        stored for the same robot description and leaf radius are loaded
+        instead of built. Defaults to the robot's ``local_cache_directory``,
+        set by :meth:`compas_fab.backends.RosClient.load_robot`, or to
+        building them without storing them if it is not set.
+
+    Attributes
+    ----------
+    kinematics : :class:`compas_fab.robots.ForwardKinematicsNumpy`
+        The forward kinematics of the robot.
+    body_names : list of str
+        Names of the bodies: link names, attached collision mesh ids and
+        collision mesh ids.
+    pair_names : list of tuple
+        Names of the pairs of bodies whose distances are computed.
+
+    Notes
+    -----
+    Lengths are in meters, regardless of the robot's scale factor. The
+    hierarchies of the scene's meshes are shared with other instances, meshes
+    must not be modified once they were used.
+
+    Examples
+    --------
+    >>> spheres = RobotSpheresNumpy(robot)
+    >>> spheres.may_collide([robot.zero_configuration().values]).tolist()
+    [False]
+    """
+
+    def __init__(self, robot, collision_meshes=None, attached_collision_meshes=None, allowed_collision_pairs=None,
+                 leaf_radius=0.01, directory=None):
+        self.leaf_radius = leaf_radius
+        if directory is None:
+            directory = robot.local_cache_directory
+
+        link_trees = self._load(robot, directory) if directory else None
+        if link_trees is None:
+            link_trees = self._link_trees(robot)
+            if directory and link_trees:
+                self._store(robot, directory, link_trees)
+        link_bodies = [(name, tree, np.identity(4)) for name, tree in link_trees]
+
+        def mesh_tree(mesh):
+            return _cached_tree(mesh, ('spheres', leaf_radius), lambda: _sphere_tree(_mesh_triangles(mesh), leaf_radius))
+
+        trees, moving = self._init_bodies(robot, link_bodies, mesh_tree, collision_meshes, attached_collision_meshes,
+                                          allowed_collision_pairs)
+
+        self._radii = np.concatenate([tree.radii for tree in trees]) if trees else np.zeros(0)
+        self._points = np.concatenate([tree.points for tree in trees]) if trees else np.zeros((0, 3))
+        self._scene_pairs = self._pairs[:, 1] >= moving
+        self.pair_names = [(self.body_names[i], self.body_names[j]) for i, j in self._pairs]
+
+    def _link_trees(self, robot):
+        """Hierarchies of the links, covering all collision shapes of a link, shared by all instances."""
+        link_trees = []
+        for link in robot.model.links:
+            scales = tuple(tuple(getattr(item.geometry.shape, 'scale', None) or [1., 1., 1.]) for item in link.collision)
+            tree = _cached_tree(link, ('spheres', self.leaf_radius, scales), lambda: _sphere_tree(_link_triangles(link), self.leaf_radius))
+            if tree is not None:
+                link_trees.append((link.name, tree))
+
+        if not link_trees:
+            LOGGER.warning('The robot has no collision geometry, load its geometry to compute distances')
+        return link_trees
+
+    def _load(self, robot, directory):
+        filename = os.path.join(directory, SPHERES_FILENAME)
+        if not os.path.isfile(filename):
+            return None
+        try:
+            with open(filename, 'r') as f:
+                data = json.load(f)
+        except ValueError:
+            LOGGER.warning('Ignoring invalid sphere file: %s', filename)
+            return None
+        if data.get('robot') != robot_description_hash(robot) or data.get('leaf_radius') != self.leaf_radius:
+            return None
+        return [(link['name'], SphereTreeNumpy.from_data(link['tree'])) for link in data['links']]
+
+    def _store(self, robot, directory, link_trees):
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        data = {
+            'robot': robot_description_hash(robot),
+            'leaf_radius': self.leaf_radius,
+            'links': [{'name': name, 'tree': tree.data} for name, tree in link_trees],
+        }
+        with open(os.path.join(directory, SPHERES_FILENAME), 'w') as f:
+            json.dump(data, f)
+
+    def _distances(self, configurations, pairs, max_distance, first_only=False, seeds=None):
+        """Distances of the given pairs of bodies, of shape ``(configurations, pairs)``, and their closest spheres.
+
+        The spheres of each pair contain points of the surfaces, their
+        distance bounds the distance of the surfaces from below and from
+        above. Pairs of spheres which cannot be closer than the closest
+        points found so far are dropped, pairs whose lower bound is within
+        the ``leaf_radius`` of it, or within :data:`RELATIVE_TOLERANCE` of
+        larger distances, are not descended further. With
+        ``first_only``, the descent of a configuration stops at the first
+        lower bound below ``max_distance``. The ``seeds``, pairs of spheres
+        per configuration and pair of bodies, e.g. the closest spheres of a
+        similar configuration, give the first closest points.
+        """
+        placements = self._placements(configurations)
+        shape = len(placements), len(pairs)
+        upper = np.full(shape, np.inf)
+        lower = np.full(shape, float(max_distance))
+        closest = np.full(shape + (2, ), -1, dtype=int)
+        tolerance = self.leaf_radius
+
+        def surface_distances(placement_a, placement_b, a, b):
+            points_a = np.einsum('nij,nj->ni', placement_a[:, :3, :3], self._points[a]) + placement_a[:, :3, 3]
+            points_b = np.einsum('nij,nj->ni', placement_b[:, :3, :3], self._points[b]) + placement_b[:, :3, 3]
+            return np.sqrt(np.sum((points_a - points_b) ** 2, axis=1))
+
+        if seeds is not None:
+            rows, columns = np.nonzero(np.all(seeds >= 0, axis=2))
+            a, b = seeds[rows, columns, 0], seeds[rows, columns, 1]
+            upper[rows, columns] = surface_distances(placements[rows, self._node_bodies[a]], placements[rows, self._node_bodies[b]], a, b)
+            closest[rows, columns] = seeds[rows, columns]
+
+        rows, columns = [index.ravel() for index in np.indices(shape)]
+        a = self._roots[self._pairs[pairs[columns], 0]]
+        b = self._roots[self._pairs[pairs[columns], 1]]
+
+        # Descend the hierarchies of all pairs of bodies at once, one level at a time
+        while len(rows):
+            placement_a = placements[rows, self._node_bodies[a]]
+            placement_b = placements[rows, self._node_bodies[b]]
+            centers_a = np.einsum('nij,nj->ni', placement_a[:, :3, :3], self._centers[a]) + placement_a[:, :3, 3]
+            centers_b = np.einsum('nij,nj->ni', placement_b[:, :3, :3], self._centers[b]) + placement_b[:, :3, 3]
+            distances = sphere_distances_numpy(centers_a, self._radii[a], centers_b, self._radii[b])
+            surfaces = surface_distances(placement_a, placement_b, a, b)
+            np.minimum.at(upper, (rows, columns), surfaces)
+            found = surfaces <= upper[rows, columns]
+            closest[rows[found], columns[found]] = np.stack([a[found], b[found]], axis=1)
+
+            closer = distances < np.minimum(upper[rows, columns], lower[rows, columns])
+            rows, columns, a, b, distances = rows[closer], columns[closer], a[closer], b[closer], distances[closer]
+
+            within = distances >= upper[rows, columns] - np.maximum(tolerance, RELATIVE_TOLERANCE * upper[rows, columns])
+            done = within | ((self._children[a, 0] < 0) & (self._children[b, 0] < 0))
+            np.minimum.at(lower, (rows[done], columns[done]), distances[done])
+
+            pending = ~done
+            if first_only:
+                pending &= ~np.any(lower < max_distance, axis=1)[rows]
+            rows, columns, a, b = rows[pending], columns[pending], a[pending], b[pending]
+
+            # The larger sphere of each pair is replaced by its children
+            split_a = np.repeat((self._children[a, 0] >= 0) & ((self._children[b, 0] < 0) | (self._radii[a] >= self._radii[b])), 2)
+            rows, columns, a, b = np.repeat(rows, 2), np.repeat(columns, 2), np.repeat(a, 2), np.repeat(b, 2)
+            sides = np.arange(len(a)) % 2
+            a = np.where(split_a, self._children[a, sides], a)
+            b = np.where(split_a, b, self._children[b, sides])
+
+        return np.minimum(lower, upper), closest
+
+    def _chunked(self, configurations, pairs, max_distance, reduce, first_only=False):
+        configurations = np.atleast_2d(np.asarray(configurations, dtype=float))
+        results = [reduce(self._distances(configurations[start:start + CHUNK_SIZE], pairs, max_distance, first_only)[0])
+                   for start in range(0, len(configurations), CHUNK_SIZE)]
+        return np.concatenate(results) if results else reduce(np.zeros((0, len(pairs))))
+
+    def distances(self, configurations, max_distance=0.1):
+        """Compute the distances of all pairs of bodies, up to a maximum distance.
+
+        Parameters
+        ----------
+        configurations : array-like
+            Values of the robot's configurable joints, see
+            :attr:`ForwardKinematicsNumpy.joint_names`, one row per configuration.
+        max_distance : float, optional
+            Distance above which the hierarchies of a pair of bodies are not
+            descended, and ``max_distance`` is reported. Larger distances
+            require more spheres to be compared. Defaults to ``0.1``.
+
+        Returns
+        -------
+        :class:`numpy.ndarray`
+            Distances of the pairs of bodies, see :attr:`pair_names`, of shape
+            ``(configurations, pairs)``, negative where spheres overlap.
+        """
+        return self._chunked(configurations, np.arange(len(self._pairs)), max_distance, lambda distances: distances)
+
+    def path_distances(self, configurations, pairs=None, max_distance=1., warm_start=True):
+        """Compute the distances of all pairs of bodies along a path of configurations.
+
+        The configurations are computed coarse to fine, every configuration
+        of a level at once: first every ``2 ** k``-th configuration, then
+        those halfway between them, and so on. The closest spheres of each
+        pair of bodies of the previous configuration of a coarser level are
+        checked first, which bounds the distance of the pair from the start
+        and prunes most spheres of consecutive, similar configurations.
+
+        Parameters
+        ----------
+        configurations : array-like
+            Values of the robot's configurable joints, one row per
+            configuration, in the order of the path.
+        pairs : list of int, optional
+            Indices of the pairs of bodies, see :attr:`pair_names`. Defaults
+            to all pairs.
+        max_distance : float, optional
+            Largest distance reported. Defaults to ``1``.
+        warm_start : bool, optional
+            ``False`` to compute all configurations independently. Defaults to ``True``.
+
+        Returns
+        -------
+        :class:`numpy.ndarray`
+            Distances of the pairs of bodies, of shape ``(configurations, pairs)``.
+        """
+        configurations = np.atleast_2d(np.asarray(configurations, dtype=float))
+        count = len(configurations)
+        pairs = np.arange(len(self._pairs)) if pairs is None else np.asarray(pairs, dtype=int)
+        distances = np.zeros((count, len(pairs)))
+        closest = np.full((count, len(pairs), 2), -1, dtype=int)
+
+        stride = 1
+        while warm_start and stride * 2 < count:
+            stride *= 2
+        indices = np.arange(0, count, stride)
+        while len(indices):
+            # The configurations of a level follow one configuration of the coarser levels
+            seeds = closest[np.maximum(indices - stride, 0)] if warm_start else None
+            for start in range(0, len(indices), CHUNK_SIZE):
+                chunk = indices[start:start + CHUNK_SIZE]
+                distances[chunk], closest[chunk] = self._distances(
+                    configurations[chunk], pairs, max_distance, seeds=seeds[start:start + CHUNK_SIZE] if warm_start else None)
+            indices = np.arange(stride // 2, count, stride) if stride > 1 else indices[:0]
+            stride //= 2
+
+        return distances
+
+    def clearance_profile(self, configurations, max_distance=1.):
+        """Compute the clearance between the robot and the scene along a path of configurations.
+
+        Distant pairs of bodies are culled by their largest spheres, and the
+        closest spheres of each pair are tracked along the path, see
+        :meth:`path_distances`. The clearance is never larger than the
+        distance of the surfaces, and smaller by at most twice the
+        ``leaf_radius`` or a few percent.
+
+        Parameters
+        ----------
+        configurations : array-like
+            Values of the robot's configurable joints, one row per
+            configuration, in the order of the path.
+        max_distance : float, optional
+            Largest clearance reported. Defaults to ``1``.
+
+        Returns
+        -------
+        dict
+            The ``minimum`` clearance, the clearance of every configuration
+            in ``points``, the clearance of every link and attached collision
+            mesh per configuration in ``links``, and the names of the
+            ``closest`` body of the robot and collision mesh per
+            configuration, ``None`` if they are farther than the maximum
+            distance. Clearances are negative where the robot may be in
+            collision.
+        """
+        configurations = np.atleast_2d(np.asarray(configurations, dtype=float))
+        pairs = np.flatnonzero(self._scene_pairs)
+        distances = self.path_distances(configurations, pairs, max_distance)
+        names = [self.pair_names[pair] for pair in pairs]
+
+        links = OrderedDict()
+        for column, (body, _) in enumerate(names):
+            clearances = links.get(body)
+            links[body] = distances[:, column] if clearances is None else np.minimum(clearances, distances[:, column])
+
+        # Without collision meshes closer than the maximum distance, there is no closest pair
+        distances = np.concatenate([np.full((len(configurations), 1), float(max_distance)), distances], axis=1)
+        names.insert(0, None)
+        return dict(minimum=float(distances.min()),
+                    points=distances.min(axis=1).tolist(),
+                    links=OrderedDict((body, clearances.tolist()) for body, clearances in links.items()),
+                    closest=[names[column] for column in distances.argmin(axis=1)])
+
+    def self_distances(self, configurations, max_distance=0.1):
+        """Compute the smallest distance between the bodies of the robot and its attached collision meshes.
+
+        Parameters
+        ----------
+        configurations : array-like
+            Values of the robot's configurable joints, one row per configuration.
+        max_distance : float, optional
+            Largest distance reported. Defaults to ``0.1``.
+
+        Returns
+        -------
+        :class:`numpy.ndarray`
+            Smallest distance per configuration.
+        """
+        return self._smallest(configurations, np.flatnonzero(~self._scene_pairs), max_distance)
+
+    def scene_distances(self, configurations, max_distance=0.1):
+        """Compute the smallest distance between the robot and the collision meshes of the scene.
+
+        Parameters
+        ----------
+        configurations : array-like
+            Values of the robot's configurable joints, one row per configuration.
+        max_distance : float, optional
+            Largest distance reported. Defaults to ``0.1``.
+
+        Returns
+        -------
+        :class:`numpy.ndarray`
+            Smallest distance per configuration.
+        """
+        return self._smallest(configurations, np.flatnonzero(self._scene_pairs), max_distance)
+
+    def _smallest(self, configurations, pairs, max_distance):
+        def reduce(distances):
+            return np.min(distances, axis=1, initial=float(max_distance))
+        return self._chunked(configurations, pairs, max_distance, reduce)
+
+    def may_collide(self, configurations, margin=0.):
+        """Find the configurations which may be in collision.
+
+        The configurations which are not reported are free of collisions,
+        with a clearance of at least the ``margin``. The descent of a
+        configuration stops at the first pair of leaf spheres closer than the
+        margin.
+
+        Parameters
+        ----------
+        configurations : array-like
+            Values of the robot's configurable joints, one row per configuration.
+        margin : float, optional
+            Minimum clearance between the bodies. Defaults to ``0``.
+
+        Returns
+        -------
+        :class:`numpy.ndarray`
+            ``True`` for the configurations whose spheres are closer than the margin.
+        """
+        def reduce(distances):
+            return np.any(distances < margin, axis=1)
+        return self._chunked(configurations, np.arange(len(self._pairs)), margin, reduce, first_only=True)
@@ -200,6 +200,16 @@ class JointTrajectory(Trajectory):
             self.start_configuration = Configuration.from_data(data.get('start_configuration'))
         self.fraction = data.get('fraction')
 
+    @property
+    def path_length(self):
+        """Length of the trajectory in joint space, i.e. the sum of the euclidean
+        distances between the joint values of consecutive points.
+        """
+        length = 0.
+        for previous, point in zip(self.points[:-1], self.points[1:]):
+            length += sum((b - a) ** 2 for a, b in zip(previous.values, point.values)) ** 0.5
+        return length
+
     @property
     def time_from_start(self):
         """Effectively, time from start for the last point in the trajectory.
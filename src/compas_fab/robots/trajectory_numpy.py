@@ -0,0 +1,135 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import numpy as np
+from compas.robots import Joint
+
+from compas_fab.robots.time_ import Duration
+from compas_fab.robots.trajectory import JointTrajectory
+from compas_fab.robots.trajectory import JointTrajectoryPoint
+
+__all__ = [
+    'time_parameterization_numpy',
+    'timed_trajectory_numpy',
+]
+
+# Acceleration limit of joints, in m/s^2 or rad/s^2, as URDF does not define any.
+# This is the default of MoveIt!'s time parameterization as well.
+DEFAULT_MAX_ACCELERATION = 1.
+
+# Minimum duration of a segment, in seconds
+MIN_DURATION = 1e-3
+
+# Maximum number of passes stretching the segments around too large accelerations
+MAX_PASSES = 100
+
+
+def time_parameterization_numpy(path, max_velocities, max_accelerations=None,
+                                velocity_scaling_factor=1., acceleration_scaling_factor=1.):
+    """Time each segment of a path such that no joint exceeds its maximum velocity and acceleration.
+
+    The path starts and ends at rest. The accelerations are estimated at the
+    waypoints from the mean velocities of the segments around them, and the
+    segments around too large accelerations are stretched until no joint
+    exceeds its limit.
+
+    Parameters
+    ----------
+    path : :class:`numpy.ndarray`
+        The configurations of the path.
+    max_velocities : list of float
+        Maximum velocity of each joint.
+    max_accelerations : list of float, optional
+        Maximum acceleration of each joint. Defaults to only limiting the
+        velocities.
+    velocity_scaling_factor : float, optional
+        Factor scaling the maximum velocities. Defaults to ``1``.
+    acceleration_scaling_factor : float, optional
+        Factor scaling the maximum accelerations. Defaults to ``1``.
+
+    Returns
+    -------
+    tuple of :class:`numpy.ndarray`
+        The time from start, and the joint velocities, of each configuration.
+    """
+    path = np.asarray(path, dtype=float)
+    joint_velocities = np.zeros_like(path)
+    if len(path) < 2:
+        return np.zeros(len(path)), joint_velocities
+
+    deltas = np.diff(path, axis=0)
+    velocities = np.asarray(max_velocities, dtype=float) * velocity_scaling_factor
+    durations = np.maximum(np.max(np.abs(deltas) / velocities, axis=1), MIN_DURATION)
+
+    if max_accelerations is not None:
+        accelerations = np.asarray(max_accelerations, dtype=float) * acceleration_scaling_factor
+        # Starting and stopping at rest, the first and last segments reach twice their mean velocity
+        for index in (0, -1):
+            durations[index] = max(durations[index], np.max(np.sqrt(2. * np.abs(deltas[index]) / accelerations)))
+
+        for _ in range(MAX_PASSES):
+            mean_velocities = deltas / durations[:, None]
+            changes = np.abs(np.diff(mean_velocities, axis=0)) / ((durations[:-1] + durations[1:]) / 2.)[:, None]
+            ratios = np.max(changes / accelerations, axis=1) if len(changes) else np.zeros(0)
+            if not len(ratios) or ratios.max() <= 1. + 1e-9:
+                break
+            # Stretching both segments around a waypoint by the square root of the ratio meets the limit there
+            stretch = np.ones(len(durations))
+            factors = np.sqrt(np.maximum(ratios, 1.))
+            stretch[:-1] = np.maximum(stretch[:-1], factors)
+            stretch[1:] = np.maximum(stretch[1:], factors)
+            durations *= stretch
+
+    times = np.concatenate([[0.], np.cumsum(durations)])
+
+    # Central differences inside, and zero velocity at both ends
+    if len(path) > 2:
+        joint_velocities[1:-1] = (path[2:] - path[:-2]) / (times[2:] - times[:-2])[:, None]
+    return times, joint_velocities
+
+
+def timed_trajectory_numpy(robot, joint_names, path, start_configuration,
+                           max_velocity_scaling_factor=1., max_acceleration_scaling_factor=1., fraction=1.):
+    """Create a trajectory along a path, timed within the joint limits of the robot.
+
+    The velocity limits are those of the robot model, the acceleration
+    limits are :data:`DEFAULT_MAX_ACCELERATION`.
+
+    Parameters
+    ----------
+    robot : :class:`compas_fab.robots.Robot`
+        The robot.
+    joint_names : list of str
+        Names of the joints, in the order of the path values.
+    path : :class:`numpy.ndarray`
+        The configurations of the path, in meters and radians.
+    start_configuration : :class:`compas_fab.robots.Configuration`
+        Start configuration of the trajectory.
+    max_velocity_scaling_factor : float, optional
+        Factor scaling the maximum velocities. Defaults to ``1``.
+    max_acceleration_scaling_factor : float, optional
+        Factor scaling the maximum accelerations. Defaults to ``1``.
+    fraction : float, optional
+        Fraction of the requested trajectory. Defaults to ``1``.
+
+    Returns
+    -------
+    :class:`compas_fab.robots.JointTrajectory`
+    """
+    path = np.asarray(path, dtype=float)
+    max_velocities, max_accelerations = [], []
+    for name in joint_names:
+        joint = robot.get_joint_by_name(name)
+        scale = 1. / robot.scale_factor if joint.type == Joint.PRISMATIC else 1.
+        velocity = joint.limit.velocity if joint.limit and joint.limit.velocity else 1.
+        max_velocities.append(velocity * scale)
+        max_accelerations.append(DEFAULT_MAX_ACCELERATION * scale)
+
+    times, velocities = time_parameterization_numpy(path, max_velocities, max_accelerations,
+                                                    max_velocity_scaling_factor, max_acceleration_scaling_factor)
+    joint_types = robot.get_joint_types_by_names(joint_names)
+    points = [JointTrajectoryPoint(values=list(values), types=joint_types, velocities=list(point_velocities),
+                                   time_from_start=Duration(int(t), int(round((t - int(t)) * 1e9))))
+              for values, point_velocities, t in zip(path.tolist(), velocities.tolist(), times.tolist())]
+    return JointTrajectory(points, list(joint_names), start_configuration, fraction=fraction)
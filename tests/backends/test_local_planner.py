@@ -0,0 +1,208 @@
+import numpy as np
+import pytest
+from compas.datastructures import Mesh
+from compas.geometry import Box
+from compas.geometry import Frame
+from compas.geometry import Sphere
+
+from compas_fab.backends import BackendError
+from compas_fab.backends import LocalClient
+from compas_fab.backends import RosClient
+from compas_fab.backends.local.planners_numpy import ConfigurationSpace
+from compas_fab.backends.local.planners_numpy import LazyPRM
+from compas_fab.backends.local.planners_numpy import shortcut_path
+from compas_fab.robots import AttachedCollisionMesh
+from compas_fab.robots import CollisionMesh
+from compas_fab.robots import PositionConstraint
+from compas_fab.robots.ur5 import Robot
+
+
+@pytest.fixture(scope='module')
+def client():
+    with LocalClient() as client:
+        robot = Robot(client, load_geometry=True)
+        box = Box(Frame.worldXY(), 0.1, 0.3, 1.5)
+        wall = Mesh.from_vertices_and_faces(box.vertices, box.faces)
+        client.add_collision_mesh(CollisionMesh(wall, 'wall', Frame([0.6, 0, 0.3], [1, 0, 0], [0, 1, 0])))
+        client.robot = robot
+        yield client
+
+
+def configuration(robot, values):
+    config = robot.zero_configuration()
+    config.values = values
+    return config
+
+
+def assert_collision_free(client, trajectory):
+    values = np.array([point.values for point in trajectory.points])
+    steps = np.concatenate([np.linspace(a, b, 50) for a, b in zip(values[:-1], values[1:])])
+    assert not client.collision_checker(client.robot).in_collision(steps).any()
+
+
+@pytest.mark.parametrize('planner_id', ['RRTConnect', 'LazyPRM'])
+def test_plan_motion_around_obstacle(client, planner_id):
+    robot = client.robot
+    start = configuration(robot, [-1.2, -1.2, 1.2, 0, 0, 0])
+    goal = configuration(robot, [1.2, -1.2, 1.2, 0, 0, 0])
+
+    trajectory = robot.plan_motion(robot.constraints_from_configuration(goal, [0.01], [0.01]), start,
+                                   planner_id=planner_id, allowed_planning_time=10.)
+
+    assert trajectory.fraction == 1.
+    assert np.allclose(trajectory.points[0].values, start.values)
+    assert np.allclose(trajectory.points[-1].values, goal.values)
+    assert len(trajectory.points) > 2
+    assert trajectory.start_configuration.joint_names == robot.get_configurable_joint_names()
+    times = [point.time_from_start.seconds for point in trajectory.points]
+    assert times == sorted(times) and times[-1] > 0
+    assert_collision_free(client, trajectory)
+
+
+def test_plan_motion_to_any_goal(client):
+    robot = client.robot
+    start = configuration(robot, [-1.2, -1.2, 1.2, 0, 0, 0])
+    blocked = robot.constraints_from_configuration(configuration(robot, [0, -1.2, 1.2, 0, 0, 0]), [0.01], [0.01])
+    free = robot.constraints_from_configuration(configuration(robot, [-1.0, -1.2, 1.2, 0, 0, 0]), [0.01], [0.01])
+
+    trajectory = robot.plan_motion([blocked, free], start)
+
+    assert np.allclose(trajectory.points[-1].values, [-1.0, -1.2, 1.2, 0, 0, 0])
+
+
+def test_plan_motion_errors(client):
+    robot = client.robot
+    start = configuration(robot, [-1.2, -1.2, 1.2, 0, 0, 0])
+    blocked = configuration(robot, [0, -1.2, 1.2, 0, 0, 0])
+
+    with pytest.raises(BackendError):
+        robot.plan_motion(robot.constraints_from_configuration(blocked, [0.01], [0.01]), start)
+    with pytest.raises(BackendError):
+        robot.plan_motion([PositionConstraint.from_sphere('ee_link', Sphere([0.5, 0, 0.5], 0.01))], start)
+    with pytest.raises(BackendError):
+        robot.plan_motion(robot.constraints_from_configuration(start, [0.01], [0.01]), start, planner_id='KPIECE')
+
+
+def test_planning_scene_hash_changes(client):
+    before = client.planning_scene_hash
+    client.append_collision_mesh(CollisionMesh(Mesh.from_vertices_and_faces([[2, 2, 0], [3, 2, 0], [2, 3, 0]], [[0, 1, 2]]), 'wall'))
+    after = client.planning_scene_hash
+    client.apply_planning_scene_diff(removed_collision_mesh_ids=['floor'])
+
+    assert before != after
+    assert client.planning_scene_hash == after
+
+    client.apply_planning_scene_diff(appended_collision_meshes=[CollisionMesh(Mesh.from_vertices_and_faces([[2, 2, 1], [3, 2, 1], [2, 3, 1]], [[0, 1, 2]]), 'wall')])
+    assert client.planning_scene_hash != after
+
+
+def test_meshes_hashed_once(client, monkeypatch):
+    from compas_fab.backends.local import planner
+    hashed = []
+    monkeypatch.setattr(planner, 'mesh_hash', lambda mesh: hashed.append(mesh) or str(len(hashed)))
+
+    with LocalClient() as local:
+        mesh = Mesh.from_vertices_and_faces([[2, 2, 0], [3, 2, 0], [2, 3, 0]], [[0, 1, 2]])
+        tool = AttachedCollisionMesh(CollisionMesh(mesh.copy(), 'tool'), 'ee_link')
+        local.add_collision_mesh(CollisionMesh(mesh, 'a'))
+        local.add_collision_mesh(CollisionMesh(mesh, 'b'))
+        local.add_attached_collision_mesh(tool)
+        assert len(hashed) == 2
+
+        checker = local.collision_checker(client.robot, [tool])
+        local.remove_collision_mesh('b')
+        assert local.collision_checker(client.robot, [tool]) is not checker
+        assert local.collision_checker(client.robot, [tool]) is local.collision_checker(client.robot, [tool])
+        assert len(hashed) == 2
+
+
+def test_forward_kinematics(client):
+    robot = client.robot
+    config = configuration(robot, [0.3, -1.2, 1.2, 0.4, 0.5, 0.6])
+    frame = robot.forward_kinematics(config)
+    expected = robot.model.forward_kinematics(dict(zip(config.joint_names, config.values)), robot.get_end_effector_link_name())
+
+    assert np.allclose(list(frame.point), list(expected.point))
+
+
+def test_ros_client_with_local_planner():
+    client = RosClient(planner_backend='local')
+    assert hasattr(client, 'collision_checker')
+    assert client.planning_scene_hash == LocalClient().planning_scene_hash
+
+
+def test_smooth_trajectory(client):
+    robot = client.robot
+    start = configuration(robot, [-1.2, -1.2, 1.2, 0, 0, 0])
+    goal = configuration(robot, [1.2, -1.2, 1.2, 0, 0, 0])
+    trajectory = robot.plan_motion(robot.constraints_from_configuration(goal, [0.01], [0.01]), start,
+                                   num_planning_attempts=1, allowed_planning_time=10.)
+
+    smoothed = robot.smooth_trajectory(trajectory, timeout=0.2, seed=0)
+    report = smoothed.smoothing_report
+
+    assert np.allclose(smoothed.points[0].values, start.values)
+    assert np.allclose(smoothed.points[-1].values, goal.values)
+    assert report['smoothed_path_length'] <= report['path_length']
+    assert np.isclose(report['smoothed_path_length'], smoothed.path_length)
+    assert np.isclose(report['smoothed_duration'], smoothed.points[-1].time_from_start.seconds)
+    assert report['duration_reduction'] >= 0.
+    assert_collision_free(client, smoothed)
+
+
+def test_shortcut_free_detour(client):
+    robot = client.robot
+    checker = client.collision_checker(robot)
+    space = ConfigurationSpace(checker, checker.kinematics.joint_names, [0.] * 6, [-np.pi] * 6, [np.pi] * 6)
+    detour = np.array([[-1.2, -1.2, 1.2, 0, 0, 0], [-1.4, -1.6, 1.6, 0.5, 0, 0], [-1.6, -1.2, 1.2, 0, 0, 0]])
+
+    path = shortcut_path(space, detour, timeout=1., seed=0)
+
+    assert np.allclose(path, detour[[0, -1]])
+
+
+def test_checkers_follow_allowed_collisions(client):
+    robot = client.robot
+    blocked = configuration(robot, [0, -1.2, 1.2, 0, 0, 0])
+    pairs = client.collision_checker(robot).collision_pairs(blocked.values)
+    assert robot.in_collision(blocked, client) is True
+
+    for pair in pairs:
+        robot.semantics.allow_collision(*pair)
+    try:
+        assert robot.in_collision(blocked, client) is False
+    finally:
+        for pair in pairs:
+            robot.semantics.disallow_collision(*pair)
+    assert robot.in_collision(blocked, client) is True
+
+
+class DiscSpace(object):
+    """Unit square with a disc obstacle in its center."""
+    dimension = 2
+
+    def sample(self, count, rng):
+        return rng.uniform(0, 1, (count, 2))
+
+    def is_valid(self, values):
+        return np.linalg.norm(np.atleast_2d(values) - 0.5, axis=1) > 0.3
+
+    def motions_valid(self, starts, ends):
+        t = np.linspace(0, 1, 20)[:, None, None]
+        points = starts[None] + t * (ends - starts)[None]
+        return np.array([self.is_valid(motion).all() for motion in np.transpose(points, (1, 0, 2))])
+
+
+def test_lazy_prm_updates_adjacency():
+    roadmap = LazyPRM(DiscSpace(), batch_size=200, seed=0)
+    path = roadmap.solve([0.05, 0.5], [[0.95, 0.5]], timeout=10.)
+    assert path is not None and DiscSpace().motions_valid(path[:-1], path[1:]).all()
+
+    # The adjacency only keeps the edges and nodes not known to be invalid
+    adjacency = {}
+    for (a, b), valid in roadmap.edges.items():
+        if valid >= 0 and roadmap.node_valid[a] >= 0 and roadmap.node_valid[b] >= 0:
+            adjacency.setdefault(a, set()).add(b)
+            adjacency.setdefault(b, set()).add(a)
+    assert dict((node, neighbors) for node, neighbors in roadmap.adjacency.items() if neighbors) == adjacency
+    assert (roadmap.node_valid == -1).any() or -1 in roadmap.edges.values()
@@ -0,0 +1,129 @@
+import pytest
+
+from compas_fab.backends.ros.messages import ROSmsg
+from compas_fab.backends.ros.planner_backend import RequestCoalescer
+from compas_fab.backends.ros.planner_backend import ServiceDescription
+
+
+class FakeClient(object):
+    compression = 'png'
+    id_counter = 1
+
+    def __init__(self):
+        self.request_coalescer = RequestCoalescer()
+        self.calls = []
+
+    def call_async_service(self, message, callback, errback):
+        self.calls.append((message, callback, errback))
+
+
+class EchoRequest(ROSmsg):
+    def __init__(self, value=0):
+        self.value = value
+
+
+class EchoResponse(ROSmsg):
+    def __init__(self, value=0):
+        self.value = value
+
+    @classmethod
+    def from_msg(cls, msg):
+        return cls(msg['value'])
+
+
+ECHO = ServiceDescription('/echo', 'Echo', EchoRequest, EchoResponse)
+ECHO_MSG = ServiceDescription('/echo', 'Echo', EchoRequest)
+
+
+def test_identical_requests_are_coalesced():
+    client = FakeClient()
+    results = []
+
+    ECHO(client, dict(value=1), results.append, None)
+    ECHO(client, dict(value=1), results.append, None)
+    ECHO(client, dict(value=2), results.append, None)
+
+    assert len(client.calls) == 2
+    assert client.request_coalescer.in_flight == 2
+    assert client.request_coalescer.stats == dict(requests=3, coalesced=1, calls=2)
+
+    _, callback, _ = client.calls[0]
+    callback({'value': 10})
+
+    assert [r.value for r in results] == [10, 10]
+    assert client.request_coalescer.in_flight == 1
+
+    # Once resolved, the same request is sent again
+    ECHO(client, dict(value=1), results.append, None)
+    assert len(client.calls) == 3
+
+
+def test_errors_reach_all_coalesced_requests():
+    client = FakeClient()
+    errors = []
+
+    ECHO(client, dict(value=1), None, errors.append)
+    ECHO(client, dict(value=1), None, errors.append)
+
+    _, _, errback = client.calls[0]
+    errback('failed')
+
+    assert errors == ['failed', 'failed']
+    assert client.request_coalescer.in_flight == 0
+
+
+def test_responses_are_decoded_per_service():
+    client = FakeClient()
+    results, messages = [], []
+
+    ECHO(client, dict(value=1), results.append, None)
+    ECHO_MSG(client, dict(value=1), messages.append, None)
+    assert len(client.calls) == 2
+
+    for _, callback, _ in client.calls:
+        callback({'value': 10})
+
+    assert [r.value for r in results] == [10] and messages == [{'value': 10}]
+
+
+def test_missing_callbacks_are_skipped():
+    client = FakeClient()
+    errors = []
+
+    ECHO(client, dict(value=1), None, None)
+    ECHO(client, dict(value=1), None, errors.append)
+
+    _, _, errback = client.calls[0]
+    errback('failed')
+    assert errors == ['failed']
+
+    ECHO(client, dict(value=1), None, None)
+    client.calls[-1][1]({'value': 10})
+    assert client.request_coalescer.in_flight == 0
+
+
+def test_cbor_requires_binary_messages():
+    client = FakeClient()
+    client.factory = type('Factory', (object, ), dict(_proto=object()))()
+
+    with pytest.raises(ValueError):
+        ECHO(client, dict(value=1), None, None, compression='cbor')
+    assert not client.calls
+
+
+def test_failing_callback_does_not_block_other_waiters():
+    client = FakeClient()
+    results, errors = [], []
+
+    def fail(response):
+        raise ValueError('callback failed')
+
+    ECHO(client, dict(value=1), fail, None)
+    ECHO(client, dict(value=1), results.append, None)
+    client.calls[0][1]({'value': 10})
+    assert [r.value for r in results] == [10]
+
+    ECHO(client, dict(value=2), None, fail)
+    ECHO(client, dict(value=2), None, errors.append)
+    client.calls[1][2]('error')
+    assert errors == ['error']
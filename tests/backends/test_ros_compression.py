@@ -0,0 +1,97 @@
+import base64
+import json
+import math
+import struct
+import zlib
+
+import compas
+import pytest
+
+from compas_fab.backends.ros.compression import decode_cbor
+from compas_fab.backends.ros.compression import decode_png
+from compas_fab.backends.ros.compression import enable_compression
+from compas_fab.backends.ros import compression
+from compas_fab.backends.ros.compression import validate_compression
+
+
+def png_chunk(chunk_type, data):
+    return struct.pack('>I', len(data)) + chunk_type + data + struct.pack('>I', zlib.crc32(chunk_type + data) & 0xffffffff)
+
+
+def encode_png(text, filter_type):
+    """Encode a string the same way the rosbridge does, filtering rows with ``filter_type``."""
+    data = text.encode('utf8')
+    width = int(math.floor(math.sqrt(len(data) / 3.)))
+    height = int(math.ceil((len(data) / 3.) / width))
+    data += b'\n' * (width * height * 3 - len(data))
+    stride = width * 3
+
+    raw = bytearray()
+    for row in range(height):
+        line = bytearray(data[row * stride:(row + 1) * stride])
+        raw.append(filter_type)
+        if filter_type == 1:
+            line = bytearray([(line[i] - (line[i - 3] if i >= 3 else 0)) & 0xff for i in range(stride)])
+        raw.extend(line)
+
+    png = b'\x89PNG\r\n\x1a\n'
+    png += png_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+    png += png_chunk(b'IDAT', zlib.compress(bytes(raw)))
+    png += png_chunk(b'IEND', b'')
+    return base64.b64encode(png)
+
+
+@pytest.mark.parametrize('filter_type', [0, 1])
+def test_decode_png(filter_type):
+    message = json.dumps({'op': 'service_response', 'values': {'fraction': 1.0, 'points': list(range(50))}})
+    assert decode_png(encode_png(message, filter_type)) == message
+
+
+def test_encode_png():
+    message = json.dumps({'op': 'publish', 'topic': '/collision_object', 'msg': {'vertices': list(range(50))}})
+    png = compression.encode_png(message)
+    assert decode_png(png) == message
+    # The image has the size of the images of the rosbridge
+    assert base64.b64decode(png)[8:33] == base64.b64decode(encode_png(message, 0))[8:33]
+
+
+def test_decode_cbor():
+    payload = bytearray()
+    payload += b'\xa3'                                  # map with 3 items
+    payload += b'\x62op' + b'\x60'                      # 'op': ''
+    payload += b'\x66result' + b'\xf5'                  # 'result': True
+    payload += b'\x66values' + b'\xa2'                  # 'values': map with 2 items
+    payload += b'\x68fraction' + b'\xfb' + struct.pack('>d', 0.5)
+    payload += b'\x69positions' + b'\xd8\x56\x50' + struct.pack('<2d', 1.5, -2.)   # tag 86, 16 bytes
+    message = decode_cbor(payload)
+    assert message == {'op': '', 'result': True, 'values': {'fraction': 0.5, 'positions': [1.5, -2.]}}
+
+
+def test_decode_cbor_indefinite_and_negative():
+    payload = b'\x9f\x20\x38\x63\x7f\x61a\x61b\xff\xff'
+    assert decode_cbor(payload) == [-1, -100, 'ab']
+
+
+class FakeProtocol(object):
+    def __init__(self, binary):
+        self.handlers = {}
+        if binary:
+            self.onMessage = lambda payload, isBinary: None
+
+    def register_message_handlers(self, operation, handler):
+        self.handlers[operation] = handler
+
+
+def test_validate_cbor_compression(monkeypatch):
+    validate_compression('cbor')
+    validate_compression('cbor', enable_compression(FakeProtocol(binary=True)))
+    validate_compression('png', enable_compression(FakeProtocol(binary=False)))
+
+    with pytest.raises(ValueError):
+        validate_compression('cbor', enable_compression(FakeProtocol(binary=False)))
+    with pytest.raises(ValueError):
+        validate_compression('cbor', FakeProtocol(binary=True))
+
+    monkeypatch.setattr(compas, 'IPY', True)
+    with pytest.raises(ValueError):
+        validate_compression('cbor')
@@ -0,0 +1,46 @@
+from compas_fab.backends.ros.messages import JointTrajectory
+from compas_fab.backends.ros.messages import Mesh
+
+
+def trajectory_msg():
+    return {
+        'header': {'seq': 0, 'stamp': {'secs': 0, 'nsecs': 0}, 'frame_id': '/world'},
+        'joint_names': ['joint_1', 'joint_2'],
+        'points': [
+            {'positions': [0., 0.], 'velocities': [0., 0.], 'accelerations': [], 'effort': [],
+             'time_from_start': {'secs': 0, 'nsecs': 0}},
+            {'positions': [0.5, 1.], 'velocities': [0.1, 0.2], 'accelerations': [], 'effort': [],
+             'time_from_start': {'secs': 1, 'nsecs': 500}},
+        ]
+    }
+
+
+def test_joint_trajectory_points_are_decoded_lazily():
+    trajectory = JointTrajectory.from_msg(trajectory_msg())
+    assert trajectory._points is None
+
+    values = list(trajectory.iter_point_values())
+    assert values[1] == ([0.5, 1.], [0.1, 0.2], [], [], 1, 500)
+    assert trajectory._points is None
+
+    assert trajectory.points[1].positions == [0.5, 1.]
+    assert trajectory.points[1].time_from_start.nsecs == 500
+    assert list(trajectory.iter_point_values()) == values
+
+
+def test_joint_trajectory_msg_roundtrip():
+    msg = trajectory_msg()
+    assert JointTrajectory.from_msg(msg).msg['points'] == msg['points']
+
+
+def test_mesh_geometry_is_decoded_lazily():
+    msg = {'triangles': [{'vertex_indices': [0, 1, 2]}],
+           'vertices': [{'x': 0., 'y': 0., 'z': 0.}, {'x': 1., 'y': 0., 'z': 0.}, {'x': 0., 'y': 1., 'z': 0.}]}
+    mesh = Mesh.from_msg(msg)
+    assert mesh.mesh.number_of_faces() == 1
+    assert mesh._vertices is None and mesh._triangles is None
+    assert mesh.msg == msg
+
+    assert mesh.vertices[1].x == 1.
+    assert mesh.triangles[0].vertex_indices == [0, 1, 2]
+    assert mesh.msg == msg
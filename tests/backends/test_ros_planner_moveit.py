@@ -0,0 +1,233 @@
+import json
+
+import compas_fab
+from compas.datastructures import Mesh
+from compas.geometry import Frame
+from roslibpy import Topic
+
+from compas_fab.backends.ros.compression import decode_png
+from compas_fab.backends.ros.messages import CollisionObject
+from compas_fab.backends.ros.messages import GetPositionFKRequest
+from compas_fab.backends.ros.messages import GetPositionIKRequest
+from compas_fab.backends.ros.messages import Header
+from compas_fab.backends.ros.messages import JointState
+from compas_fab.backends.ros.messages import MultiDOFJointState
+from compas_fab.backends.ros.messages import Pose
+from compas_fab.backends.ros.messages import PoseStamped
+from compas_fab.backends.ros.messages import PositionIKRequest
+from compas_fab.backends.ros.messages import RobotState
+from compas_fab.backends.ros.planner_backend_moveit import MoveItPlanner
+from compas_fab.backends.ros.planner_backend_moveit import collision_object_from_collision_meshes
+from compas_fab.robots import AttachedCollisionMesh
+from compas_fab.robots import CollisionMesh
+from compas_fab.robots import Configuration
+
+
+class FakeTopic(object):
+    def __init__(self):
+        self.messages = []
+
+    def publish(self, message):
+        self.messages.append(message)
+
+
+def planner():
+    planner = MoveItPlanner()
+    planner.collision_object_topic = FakeTopic()
+    planner.attached_collision_object_topic = FakeTopic()
+    return planner
+
+
+def test_planning_scene_hash():
+    mesh = Mesh.from_vertices_and_faces([[0, 0, 0], [1, 0, 0], [0, 1, 0]], [[0, 1, 2]])
+    a, b = planner(), planner()
+    empty = a.planning_scene_hash
+
+    a.add_collision_mesh(CollisionMesh(mesh, 'floor'))
+    b.add_collision_mesh(CollisionMesh(mesh, 'floor'))
+    assert a.planning_scene_hash == b.planning_scene_hash != empty
+
+    b.add_collision_mesh(CollisionMesh(mesh, 'floor', Frame([0, 0, 1], [1, 0, 0], [0, 1, 0])))
+    assert a.planning_scene_hash != b.planning_scene_hash
+
+    a.remove_collision_mesh('floor')
+    assert a.planning_scene_hash == empty
+
+
+def test_planning_scene_hash_follows_content():
+    mesh = Mesh.from_vertices_and_faces([[0, 0, 0], [1, 0, 0], [0, 1, 0]], [[0, 1, 2]])
+    frames = [Frame([0, 0, z], [1, 0, 0], [0, 1, 0]) for z in (0, 1, 2)]
+    a, b = planner(), planner()
+
+    # Meshes appended in another order
+    a.add_collision_mesh(CollisionMesh(mesh, 'wall', frames[0]))
+    a.append_collision_mesh(CollisionMesh(mesh, 'wall', frames[1]))
+    b.add_collision_mesh(CollisionMesh(mesh, 'wall', frames[1]))
+    b.append_collision_mesh(CollisionMesh(mesh, 'wall', frames[0]))
+    assert a.planning_scene_hash == b.planning_scene_hash
+
+    # Moved away and back to the original pose
+    before = a.planning_scene_hash
+    a._collision_object(collision_object_from_collision_meshes([CollisionMesh(mesh, 'wall', frames[2]),
+                                                                CollisionMesh(mesh, 'wall', frames[1])],
+                                                               CollisionObject.MOVE), CollisionObject.MOVE)
+    assert a.planning_scene_hash != before
+    a._collision_object(collision_object_from_collision_meshes([CollisionMesh(mesh, 'wall', frames[0]),
+                                                                CollisionMesh(mesh, 'wall', frames[1])],
+                                                               CollisionObject.MOVE), CollisionObject.MOVE)
+    assert a.planning_scene_hash == before
+
+    # Attached collision meshes
+    a.add_attached_collision_mesh(AttachedCollisionMesh(CollisionMesh(mesh, 'tool'), 'ee_link'))
+    b.add_attached_collision_mesh(AttachedCollisionMesh(CollisionMesh(mesh, 'tool'), 'ee_link'))
+    assert a.planning_scene_hash == b.planning_scene_hash
+    b.add_attached_collision_mesh(AttachedCollisionMesh(CollisionMesh(mesh, 'tool'), 'tool0'))
+    assert a.planning_scene_hash != b.planning_scene_hash
+
+
+class SendingPlanner(MoveItPlanner):
+    publish_compression = 'png'
+    id_counter = 1
+
+    def __init__(self):
+        self.sent = []
+
+    def send_on_ready(self, message):
+        self.sent.append(message)
+
+
+def test_published_messages_are_compressed():
+    mesh = Mesh.from_stl(compas_fab.get('planning_scene/cone.stl'))
+    plain, compressed = planner(), SendingPlanner()
+    compressed.collision_object_topic = Topic(compressed, '/collision_object', 'moveit_msgs/CollisionObject')
+
+    plain.add_collision_mesh(CollisionMesh(mesh, 'cone'))
+    compressed.add_collision_mesh(CollisionMesh(mesh, 'cone'))
+
+    advertise, publish = compressed.sent
+    assert advertise['op'] == 'advertise'
+    assert publish['op'] == 'png'
+    message = json.loads(decode_png(publish['data']))
+    assert (message['op'], message['topic']) == ('publish', '/collision_object')
+    assert message['msg'] == json.loads(json.dumps(plain.collision_object_topic.messages[0]))
+    assert len(publish['data']) * 2 < len(json.dumps(message))
+    assert compressed.planning_scene_hash == plain.planning_scene_hash
+
+
+class RecordingPlanner(MoveItPlanner):
+    compression = 'png'
+    id_counter = 1
+
+    def __init__(self):
+        self.messages = []
+
+    def call_async_service(self, message, callback, errback):
+        self.messages.append(message)
+        callback({'success': True})
+
+
+def test_apply_planning_scene_diff():
+    mesh = Mesh.from_vertices_and_faces([[0, 0, 0], [1, 0, 0], [0, 1, 0]], [[0, 1, 2]])
+    planner = RecordingPlanner()
+    results = []
+
+    planner.apply_planning_scene_diff_async(results.append, None,
+                                            collision_meshes=[CollisionMesh(mesh, 'a'), CollisionMesh(mesh, 'a')],
+                                            moved_collision_meshes=[CollisionMesh(mesh, 'b')],
+                                            appended_collision_meshes=[CollisionMesh(mesh, 'd')],
+                                            removed_collision_mesh_ids=['c'])
+
+    assert results == [True]
+    scene = planner.messages[0]['args']['scene']
+    assert scene['is_diff'] and scene['robot_state']['is_diff']
+
+    removed, added, appended, moved = scene['world']['collision_objects']
+    assert (removed['id'], removed['operation']) == ('c', 1)
+    assert (added['id'], added['operation'], len(added['meshes'])) == ('a', 0, 2)
+    assert (appended['id'], appended['operation'], len(appended['meshes'])) == ('d', 2, 1)
+    assert (moved['id'], moved['operation'], len(moved['meshes']), len(moved['mesh_poses'])) == ('b', 3, 0, 1)
+
+
+def test_attached_tool_sent_once():
+    mesh = Mesh.from_stl(compas_fab.get('planning_scene/cone.stl'))
+    acm = AttachedCollisionMesh(CollisionMesh(mesh, 'tool'), 'ee_link')
+    configuration = Configuration([0., 0.], [0, 0], ['joint_1', 'joint_2'])
+    a = planner()
+
+    start_state = a._start_state('world', configuration, [acm]).msg
+    assert not start_state['is_diff']
+    assert a._start_state('world', configuration, [acm]).msg['attached_collision_objects'][0] is start_state['attached_collision_objects'][0]
+    full_size = len(str(start_state))
+
+    a.add_attached_collision_mesh(acm)
+    start_state = a._start_state('world', configuration, [acm]).msg
+    assert start_state['is_diff'] and not start_state['attached_collision_objects']
+    assert len(str(start_state)) * 10 < full_size
+
+    # Another instance with the same id is not the attached one
+    other = AttachedCollisionMesh(CollisionMesh(mesh, 'tool'), 'ee_link')
+    assert not a.is_attached_in_planning_scene(other)
+
+    a.remove_attached_collision_mesh('tool')
+    assert not a._start_state('world', configuration, [acm]).msg['is_diff']
+
+
+def test_attached_collision_objects_cached_by_content():
+    mesh = Mesh.from_vertices_and_faces([[0, 0, 0], [1, 0, 0], [0, 1, 0]], [[0, 1, 2]])
+    acm = AttachedCollisionMesh(CollisionMesh(mesh, 'tool'), 'ee_link')
+    a = planner()
+
+    encoded = a._encode_attached_collision_mesh(acm)
+    assert a._encode_attached_collision_mesh(AttachedCollisionMesh(CollisionMesh(mesh.copy(), 'tool'), 'ee_link')) is encoded
+
+    # Changes made in place are encoded again
+    acm.touch_links.append('wrist_link')
+    assert a._encode_attached_collision_mesh(acm).msg['touch_links'] == ['ee_link', 'wrist_link']
+    acm.collision_mesh.frame = Frame([0, 0, 1], [1, 0, 0], [0, 1, 0])
+    assert a._encode_attached_collision_mesh(acm).msg['object']['mesh_poses'][0]['position']['z'] == 1
+    mesh.vertex_attribute(0, 'z', 2.)
+    assert a._encode_attached_collision_mesh(acm).msg['object']['meshes'][0]['vertices'][0]['z'] == 2
+
+
+class FakeLink(object):
+    name = 'base_link'
+
+
+class FakeRobot(object):
+    class model(object):
+        root = FakeLink()
+
+
+class RecordingServicePlanner(MoveItPlanner):
+    compression = 'png'
+    id_counter = 1
+
+    def __init__(self):
+        self.messages = []
+
+    def call_async_service(self, message, callback, errback):
+        self.messages.append(message)
+
+
+def test_request_templates():
+    configuration = Configuration([0.1, 0.2], [0, 0], ['joint_1', 'joint_2'])
+    frame = Frame([0.3, 0.1, 0.5], [1, 0, 0], [0, 1, 0])
+    header = Header(frame_id='base_link')
+    joint_state = JointState(header=header, name=configuration.joint_names, position=configuration.values)
+    robot_state = RobotState(joint_state, MultiDOFJointState(header=header))
+    a = RecordingServicePlanner()
+
+    for _ in range(2):
+        a.inverse_kinematics_async(None, None, FakeRobot(), frame, 'manipulator', configuration)
+        a.forward_kinematics_async(None, None, FakeRobot(), configuration, 'manipulator', 'tool0')
+
+    ik_request = PositionIKRequest(group_name='manipulator', robot_state=robot_state, pose_stamped=PoseStamped(header, Pose.from_frame(frame)))
+    fk_request = GetPositionFKRequest(header, ['tool0'], robot_state)
+    assert a.messages[0]['args'] == a.messages[2]['args'] == GetPositionIKRequest(ik_request).msg
+    assert a.messages[1]['args'] == a.messages[3]['args'] == fk_request.msg
+    assert a.request_templates.stats == dict(hits=3, misses=3)
+
+    # The templates are not modified
+    a.forward_kinematics_async(None, None, FakeRobot(), Configuration([0.3, 0.4], [0, 0], ['joint_1', 'joint_2']), 'manipulator', 'tool0')
+    assert a.messages[-1]['args']['robot_state']['joint_state']['position'] == [0.3, 0.4]
+    assert a.messages[1]['args']['robot_state']['joint_state']['position'] == [0.1, 0.2]
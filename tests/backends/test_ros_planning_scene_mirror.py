@@ -0,0 +1,119 @@
+from compas_fab.backends.ros.messages import CollisionObject
+from compas_fab.backends.ros.messages import JointState
+from compas_fab.backends.ros.planner_backend_moveit import MoveItPlanner
+from compas_fab.backends.ros.planning_scene_mirror import PlanningSceneMirror
+
+
+class FakeService(object):
+    def __init__(self):
+        self.requests = []
+
+    def __call__(self, callback, errback):
+        self.requests.append((callback, errback))
+
+    def respond(self, scene):
+        callback, _ = self.requests.pop(0)
+        callback({'scene': scene})
+
+
+def collision_object(id, operation=CollisionObject.ADD, meshes=1):
+    return dict(id=id, operation=operation, header=dict(seq=0, stamp=dict(secs=0, nsecs=0), frame_id='world'),
+                type=dict(key='', db=''), primitives=[], primitive_poses=[],
+                meshes=[dict(vertices=[], triangles=[])] * meshes,
+                mesh_poses=[dict(position=dict(x=0, y=0, z=0), orientation=dict(x=0, y=0, z=0, w=1))] * meshes,
+                planes=[], plane_poses=[])
+
+
+def diff(collision_objects=(), attached_collision_objects=(), joint_state=None):
+    robot_state = dict(attached_collision_objects=list(attached_collision_objects), is_diff=True,
+                       joint_state=joint_state or dict(name=[], position=[]))
+    return dict(world=dict(collision_objects=list(collision_objects)), robot_state=robot_state, is_diff=True)
+
+
+def full_scene(*ids):
+    return dict(name='scene', robot_model_name='ur5', is_diff=False,
+                world=dict(collision_objects=[collision_object(id) for id in ids]),
+                robot_state=dict(joint_state=JointState(name=['a', 'b'], position=[0., 0.]).msg, attached_collision_objects=[], is_diff=False))
+
+
+def test_updates_received_during_resync_are_applied_after_the_full_scene():
+    service = FakeService()
+    mirror = PlanningSceneMirror(None, service)
+    mirror.resync()
+
+    mirror.receive(diff([collision_object('box')]))
+    assert not mirror.is_synchronized
+
+    service.respond(full_scene('floor'))
+    assert mirror.is_synchronized
+    assert sorted(mirror.collision_object_ids) == ['box', 'floor']
+    assert mirror.version == 1
+    assert mirror.stats['resyncs'] == 1
+
+
+def test_diffs_update_the_snapshot():
+    service = FakeService()
+    mirror = PlanningSceneMirror(None, service)
+    mirror.resync()
+    service.respond(full_scene('floor', 'wall'))
+    snapshot = mirror.scene
+    assert mirror.scene is snapshot
+
+    tool = dict(link_name='ee_link', object=collision_object('tool'), touch_links=['ee_link'], weight=1.)
+    mirror.receive(diff([collision_object('wall', CollisionObject.REMOVE),
+                         collision_object('floor', CollisionObject.APPEND)],
+                        [tool], dict(name=['b'], position=[1.5])))
+
+    scene = mirror.scene
+    assert scene is not snapshot
+    assert mirror.version == 2
+    assert [co.id for co in scene.world.collision_objects] == ['floor']
+    assert len(scene.world.collision_objects[0].meshes) == 2
+    assert len(snapshot.world.collision_objects[0].meshes) == 1
+    assert [aco.object.id for aco in scene.robot_state.attached_collision_objects] == ['tool']
+    assert scene.robot_state.joint_state.position == [0., 1.5]
+
+    tool = dict(link_name='ee_link', object=collision_object('', CollisionObject.REMOVE, meshes=0))
+    mirror.receive(diff(attached_collision_objects=[tool]))
+    assert mirror.attached_collision_object_ids == []
+    assert not service.requests
+
+
+def test_inconsistent_update_triggers_resync():
+    service = FakeService()
+    mirror = PlanningSceneMirror(None, service)
+    mirror.resync()
+    service.respond(full_scene())
+
+    mirror.receive(diff([collision_object('unknown', CollisionObject.MOVE)]))
+    assert not mirror.is_synchronized
+    assert mirror.stats['inconsistencies'] == 1
+    assert len(service.requests) == 1
+
+    service.respond(full_scene('unknown'))
+    assert mirror.is_synchronized
+    assert mirror.collision_object_ids == ['unknown']
+
+
+class RecordingPlanner(MoveItPlanner):
+    compression = 'none'
+    id_counter = 1
+
+    def __init__(self):
+        self.messages = []
+
+    def call_async_service(self, message, callback, errback):
+        self.messages.append(message)
+
+
+def test_get_planning_scene_uses_synchronized_mirror():
+    planner = RecordingPlanner()
+    service = FakeService()
+    planner.planning_scene_mirror = PlanningSceneMirror(planner, service)
+    planner.planning_scene_mirror.resync()
+    service.respond(full_scene('floor'))
+
+    results = []
+    planner.get_planning_scene_async(results.append, None)
+    assert [co.id for co in results[0].world.collision_objects] == ['floor']
+    assert not planner.messages
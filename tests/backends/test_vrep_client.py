@@ -0,0 +1,292 @@
+import math
+
+import pytest
+
+from compas.datastructures import Mesh
+from compas.geometry import Frame
+
+from compas_fab.backends import VrepClient
+from compas_fab.backends.vrep.remote_api import vrep
+from compas_fab.robots import CollisionMesh
+from compas_fab.robots import Configuration
+from compas_fab.robots import rfl
+
+
+class FakeScript(object):
+    """Child script of a scene, optionally without the batched functions."""
+
+    def __init__(self, batched=True):
+        self.batched = batched
+        self.calls = []
+        self.config = None
+        self.meshes = {1: ([0., 0., 0., 1., 0., 0., 0., 1., 0.], [0, 1, 2]), 2: ([0., 0., 1.] * 4, [0, 1, 2, 0, 2, 3])}
+
+    def __call__(self, function_name, in_ints, in_floats, in_strings):
+        self.calls.append(function_name)
+        self.floats = in_floats
+        if function_name in ('getPathShapeMatrices', 'getShapeMeshes', 'searchRobotStatesMany') and not self.batched:
+            return 8, [], [], [], bytearray()
+        return getattr(self, function_name)(in_ints, in_floats, in_strings)
+
+    def _matrices(self, handles):
+        return [value for handle in handles for value in [handle] * 3 + [self.config[0]] + [0.] * 8]
+
+    def moveRobotFK(self, ints, floats, strings):
+        self.config = floats
+        return 0, [], [], [], bytearray()
+
+    def getShapeMatrices(self, ints, floats, strings):
+        return 0, [], self._matrices(ints), [], bytearray()
+
+    def getPathShapeMatrices(self, ints, floats, strings):
+        joints, handles = len(floats) // ints[1], ints[2:]
+        matrices = []
+        for i in range(0, len(floats), joints):
+            self.config = floats[i:i + joints]
+            matrices.extend(self._matrices(handles))
+        return 0, [], matrices, [], bytearray()
+
+    def _states(self, pose, max_results):
+        # Only poses in front of the robot are reachable
+        return ([pose[3]] + [0.] * 8) * max_results if pose[3] >= 0 else []
+
+    def searchRobotStates(self, ints, floats, strings):
+        return 0, [], self._states(floats, ints[2]), [], bytearray()
+
+    def searchRobotStatesMany(self, ints, floats, strings):
+        counts, states = [], []
+        for i in range(0, len(floats), 16):
+            frame_states = self._states(floats[i:i + 16], ints[2])
+            counts.append(len(frame_states) // ints[4])
+            states.extend(frame_states)
+        return 0, counts, states, [], bytearray()
+
+    def buildMesh(self, ints, floats, strings):
+        self.built = getattr(self, 'built', 10) + 1
+        return 0, [self.built], [], [], bytearray()
+
+    def searchRobotPath(self, ints, floats, strings):
+        return 0, [], floats, [], bytearray()
+
+    def getShapeMesh(self, ints, floats, strings):
+        vertices, faces = self.meshes[ints[0]]
+        return 0, faces, vertices, [], bytearray()
+
+    def getShapeMeshes(self, ints, floats, strings):
+        counts, faces, vertices = [], [], []
+        for handle in ints:
+            counts.extend([len(self.meshes[handle][0]), len(self.meshes[handle][1])])
+            vertices.extend(self.meshes[handle][0])
+            faces.extend(self.meshes[handle][1])
+        return 0, counts + faces, vertices, [], bytearray()
+
+
+class FakeRemoteApi(object):
+    """Functions of the remote API, recording the operation mode of every call."""
+
+    def __init__(self):
+        self.calls = []
+        self.streams = set()
+
+    def simxCallScriptFunction(self, client_id, script, script_type, function_name, ints, floats, strings, buffer, mode):
+        self.calls.append((function_name, mode))
+        return 0, [], [0.] * 9, [], bytearray()
+
+    def simxGetObjectHandle(self, client_id, name, mode):
+        self.calls.append(('simxGetObjectHandle', mode))
+        return 0, len(name)
+
+    def simxRemoveObject(self, client_id, handle, mode):
+        self.calls.append(('simxRemoveObject', mode))
+        return 0
+
+    def simxPauseCommunication(self, client_id, enable):
+        self.calls.append(('simxPauseCommunication', enable))
+        return 0
+
+    def simxSetObjectPosition(self, client_id, handle, relative_to, position, mode):
+        self.calls.append(('simxSetObjectPosition', handle, position))
+        return 0
+
+    def simxSetObjectOrientation(self, client_id, handle, relative_to, euler_angles, mode):
+        self.calls.append(('simxSetObjectOrientation', handle, euler_angles))
+        return 0
+
+    def simxGetPingTime(self, client_id):
+        self.calls.append(('simxGetPingTime', None))
+        self.received = set(self.streams)
+        return 0, 1
+
+    def _read(self, name, handle, mode, value):
+        self.calls.append((name, mode))
+        if mode == vrep.simx_opmode_streaming:
+            self.streams.add((name, handle))
+        if mode == vrep.simx_opmode_discontinue:
+            self.streams.discard((name, handle))
+        if mode == vrep.simx_opmode_buffer and (name, handle) not in self.received:
+            return vrep.simx_return_novalue_flag, None
+        return 0, value
+
+    def simxGetObjectPosition(self, client_id, handle, relative_to, mode):
+        return self._read('simxGetObjectPosition', handle, mode, [handle, 0., 0.])
+
+    def simxGetObjectOrientation(self, client_id, handle, relative_to, mode):
+        return self._read('simxGetObjectOrientation', handle, mode, [0., 0., math.pi / 2])
+
+
+@pytest.fixture
+def client(monkeypatch):
+    client = VrepClient()
+    monkeypatch.setattr(client, 'run_child_script', FakeScript())
+    monkeypatch.setattr(client, 'set_robot_metric', lambda robot, values: None)
+    return client
+
+
+@pytest.fixture
+def path():
+    return [Configuration.from_prismatic_and_revolute_values([x, 0., 0.], [0.] * 6) for x in (1., 2., 3.)]
+
+
+@pytest.mark.parametrize('batched', [True, False])
+def test_get_path_object_matrices(client, path, batched):
+    client.run_child_script.batched = batched
+    matrices = client.get_path_object_matrices(rfl.Robot('A'), path, [1, 2])
+
+    assert [frame[2][:4] for frame in matrices] == [[2, 2, 2, 1], [2, 2, 2, 2], [2, 2, 2, 3]]
+    assert client.run_child_script.calls.count('getShapeMatrices') == (0 if batched else 3)
+
+
+@pytest.mark.parametrize('batched', [True, False])
+def test_get_shape_meshes(client, batched):
+    client.run_child_script.batched = batched
+    meshes = client.get_shape_meshes([2, 1])
+    assert meshes == [client.run_child_script.meshes[2], client.run_child_script.meshes[1]]
+
+    # A scene without the batched function is only asked once
+    client.get_shape_meshes([1])
+    assert client.run_child_script.calls.count('getShapeMeshes') == (2 if batched else 1)
+
+
+@pytest.fixture
+def remote_api(monkeypatch):
+    remote_api = FakeRemoteApi()
+    for name in ('simxCallScriptFunction', 'simxGetObjectHandle', 'simxRemoveObject', 'simxPauseCommunication',
+                 'simxGetPingTime', 'simxGetObjectPosition', 'simxGetObjectOrientation',
+                 'simxSetObjectPosition', 'simxSetObjectOrientation'):
+        monkeypatch.setattr(vrep, name, getattr(remote_api, name))
+    return remote_api
+
+
+@pytest.mark.parametrize('pipelined', [True, False])
+def test_calls_without_result(remote_api, path, pipelined):
+    client = VrepClient(pipelined=pipelined)
+    client.set_robot_config(rfl.Robot('A'), path[0])
+    client.get_robot_config(rfl.Robot('A'))
+
+    mode = vrep.simx_opmode_oneshot if pipelined else vrep.simx_opmode_blocking
+    assert remote_api.calls == [('setTheMetric', mode), ('moveRobotFK', mode), ('getRobotState', vrep.simx_opmode_blocking)]
+
+
+def test_object_handles(remote_api):
+    client = VrepClient(pipelined=True)
+    assert client.get_object_handle('gripper') == client.get_object_handle('gripper') == 7
+    assert remote_api.calls.count(('simxGetObjectHandle', vrep.simx_opmode_blocking)) == 1
+
+    # Removals are sent in one message, and the removed objects are looked up again
+    client.remove_objects([7, 8])
+    assert remote_api.calls[-4:] == [('simxPauseCommunication', True),
+                                     ('simxRemoveObject', vrep.simx_opmode_oneshot),
+                                     ('simxRemoveObject', vrep.simx_opmode_oneshot),
+                                     ('simxPauseCommunication', False)]
+    client.get_object_handle('gripper')
+    assert remote_api.calls.count(('simxGetObjectHandle', vrep.simx_opmode_blocking)) == 2
+
+
+@pytest.mark.parametrize('pipelined', [True, False])
+def test_get_object_frames(remote_api, pipelined):
+    client = VrepClient(pipelined=pipelined)
+    for _ in range(3):
+        frames = client.get_object_frames([1, 2])
+        assert frames[2].point == [2, 0, 0]
+        assert frames[2].xaxis.dot([0, 1, 0]) == pytest.approx(1)
+
+    reads = [mode for name, mode in remote_api.calls if name == 'simxGetObjectPosition']
+    if pipelined:
+        # Values are streamed from the first call onwards
+        assert reads == [vrep.simx_opmode_streaming] * 2 + [vrep.simx_opmode_buffer] * 6
+        assert remote_api.calls.count(('simxGetPingTime', None)) == 1
+    else:
+        assert reads == [vrep.simx_opmode_blocking] * 6
+
+
+def test_remove_objects_discontinues_streams(remote_api):
+    client = VrepClient(pipelined=True)
+    client.get_object_frames([1, 2])
+    client.remove_objects([2])
+
+    discontinued = [name for name, mode in remote_api.calls if mode == vrep.simx_opmode_discontinue]
+    assert sorted(discontinued) == ['simxGetObjectOrientation', 'simxGetObjectPosition']
+    assert remote_api.streams == {('simxGetObjectPosition', 1), ('simxGetObjectOrientation', 1)}
+    assert all(read[1] == 1 for read in client._streams)
+
+
+@pytest.mark.parametrize('batched', [True, False])
+def test_inverse_kinematics_many(client, batched):
+    client.run_child_script.batched = batched
+    frames = [Frame([x, 0, 0], [1, 0, 0], [0, 1, 0]) for x in (1., -1., 2.)]
+    configs = client.inverse_kinematics_many(rfl.Robot('A'), frames, max_trials=1, max_results=2)
+
+    assert [[config.values[0] for config in frame_configs] for frame_configs in configs] == [[1., 1.], [], [2., 2.]]
+    assert client.run_child_script.calls.count('searchRobotStatesMany') == 1
+    assert client.run_child_script.calls.count('searchRobotStates') == (0 if batched else 23)
+
+
+def test_inverse_kinematics_many_retries(client):
+    frames = [Frame([x, 0, 0], [1, 0, 0], [0, 1, 0]) for x in (1., -1.)]
+    configs = client.inverse_kinematics_many(rfl.Robot('A'), frames)
+
+    # Only the frame without valid states is searched again
+    assert [len(frame_configs) for frame_configs in configs] == [1, 0]
+    assert client.run_child_script.calls.count('searchRobotStatesMany') == 20
+    assert len(client.run_child_script.floats) == 16
+
+
+@pytest.fixture
+def tetrahedron():
+    return Mesh.from_vertices_and_faces([[0, 0, 0], [1, 0, 0], [0, 1, 0], [0, 0, 1]], [[0, 1, 2], [0, 1, 3], [1, 2, 3], [0, 2, 3]])
+
+
+def test_add_meshes_once(client, remote_api, tetrahedron):
+    frames = [Frame([x, 0, 0], [1, 0, 0], [0, 1, 0]) for x in (1., 2., 3.)]
+    assert client.add_meshes([CollisionMesh(tetrahedron, 'a', frames[0]), CollisionMesh(tetrahedron, 'b', frames[1])]) == [11, 12]
+    assert client.add_meshes([CollisionMesh(tetrahedron, 'a', frames[0]), CollisionMesh(tetrahedron, 'b', frames[1])]) == [11, 12]
+    assert client.run_child_script.calls.count('buildMesh') == 2
+
+    # Meshes at other frames are added, existing shapes are not moved
+    assert client.add_meshes([CollisionMesh(tetrahedron, 'c', frames[2])]) == [13]
+    assert client.add_meshes([tetrahedron, tetrahedron]) == [14, 15]
+    assert not remote_api.calls
+
+    # Removed meshes are uploaded again
+    client.remove_meshes([12])
+    assert client.add_meshes([CollisionMesh(tetrahedron, 'b', frames[1])]) == [16]
+    assert client.run_child_script.calls.count('buildMesh') == 6
+
+
+def test_plan_motion_moves_meshes(client, remote_api, path, tetrahedron):
+    robot = rfl.Robot('A')
+    frames = [Frame([x, 0, 0], [1, 0, 0], [0, 1, 0]) for x in (1., 2., 3.)]
+    user_handles = client.add_meshes([CollisionMesh(tetrahedron, 'user', frames[0])])
+    for _ in range(2):
+        client.plan_motion_to_config(robot, path[1:], collision_meshes=[CollisionMesh(tetrahedron, 'a', frames[0]),
+                                                                        CollisionMesh(tetrahedron, 'b', frames[1])])
+    assert client.run_child_script.calls.count('buildMesh') == 2
+
+    # The shape at the same frame is kept, the other shape uploaded for planning is moved
+    client.plan_motion_to_config(robot, path[1:], collision_meshes=[CollisionMesh(tetrahedron, 'a', frames[0]),
+                                                                    CollisionMesh(tetrahedron, 'c', frames[2])])
+    assert client.run_child_script.calls.count('buildMesh') == 2
+    moves = [call for call in remote_api.calls if call[0].startswith('simxSet')]
+    assert [call[:2] for call in moves] == [('simxSetObjectPosition', 12), ('simxSetObjectOrientation', 12)]
+    assert moves[0][2] == pytest.approx([13, 0, 0]) and moves[1][2] == pytest.approx([0, 0, math.pi / 2])
+    assert user_handles == [11] and 11 not in [call[1] for call in moves]
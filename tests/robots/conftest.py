@@ -0,0 +1,125 @@
+import os
+import time
+
+import pytest
+from compas.datastructures import Mesh
+from compas.geometry import Box
+from compas.geometry import Frame
+from compas.robots import RobotModel
+
+from compas_fab.robots import CollisionMesh
+from compas_fab.robots import Configuration
+from compas_fab.robots import Duration
+from compas_fab.robots import JointTrajectory
+from compas_fab.robots import JointTrajectoryPoint
+from compas_fab.robots import Robot
+from compas_fab.robots import RobotSemantics
+from compas_fab.robots.ur5 import Robot as Ur5Robot
+
+BASE_FOLDER = os.path.dirname(__file__)
+
+
+def _box_mesh(x, y, z):
+    box = Box(Frame.worldXY(), x, y, z)
+    return Mesh.from_vertices_and_faces(box.vertices, box.faces)
+
+
+class FakeClient(object):
+    """Planning client of the panda robot.
+
+    Motions go from the start configuration to the value of the first goal
+    constraint, or, if ``planners`` are given, to the path length of the
+    planner, which is a ``(planning time, path length)`` tuple by planner id.
+    Cartesian motions map the position of every frame to the first three
+    joint values, flipping the fourth one at ``flipped_frames`` and stopping
+    at ``failing_frames``, which are given by their x coordinate.
+    """
+
+    def __init__(self, planners=None, flipped_frames=(), failing_frames=()):
+        self.planners = planners
+        self.flipped_frames = flipped_frames
+        self.failing_frames = failing_frames
+        self.planning_scene_hash = 'empty'
+        self.motion_requests = []
+        self.cartesian_requests = []
+
+    @property
+    def calls(self):
+        return len(self.motion_requests) + len(self.cartesian_requests)
+
+    def plan_motion(self, robot, goal_constraints, start_configuration, planner_id=None, **kwargs):
+        self.motion_requests.append(goal_constraints)
+
+        if self.planners is not None:
+            if planner_id not in self.planners:
+                raise Exception('Unknown planner')
+            planning_time, value = self.planners[planner_id]
+            time.sleep(planning_time)
+        else:
+            if isinstance(goal_constraints[0], list):
+                goal_constraints = goal_constraints[0]
+            value = goal_constraints[0].value
+            if value < 0:
+                raise Exception('Goal not reachable')
+
+        start = JointTrajectoryPoint(list(start_configuration.values), start_configuration.types)
+        end = JointTrajectoryPoint([value] + start_configuration.values[1:], start_configuration.types)
+        return JointTrajectory([start, end], start_configuration.joint_names, start_configuration, fraction=1.)
+
+    def inverse_kinematics(self, robot, frame, group, start_configuration, *args):
+        values = self.values(frame)
+        if frame.point.x in self.flipped_frames:
+            values[3] += 1.
+        return values, start_configuration.joint_names[:len(values)]
+
+    def values(self, frame):
+        return [frame.point.x, frame.point.y, frame.point.z, 0., 0., 0., 0.]
+
+    def plan_cartesian_motion(self, robot, frames, start_configuration, **kwargs):
+        self.cartesian_requests.append((frames[0].point.x, start_configuration.values[3]))
+        types = start_configuration.types[:7]
+        points = [JointTrajectoryPoint(start_configuration.values[:7], types, time_from_start=Duration(0, 0))]
+        for i, frame in enumerate(frames):
+            if frame.point.x in self.failing_frames:
+                break
+            values = self.values(frame)
+            values[3] = start_configuration.values[3]
+            points.append(JointTrajectoryPoint(values, types, time_from_start=Duration(i + 1, 0)))
+
+        fraction = (len(points) - 1) / float(len(frames))
+        return JointTrajectory(points, start_configuration.joint_names[:7], start_configuration, fraction)
+
+
+@pytest.fixture
+def client_options():
+    """Options of the :class:`FakeClient` of the ``robot`` fixture."""
+    return {}
+
+
+@pytest.fixture
+def robot(client_options):
+    model = RobotModel.from_urdf_file(os.path.join(BASE_FOLDER, 'fixtures', 'panda.urdf'))
+    semantics = RobotSemantics.from_srdf_file(os.path.join(BASE_FOLDER, 'fixtures', 'panda_semantics.srdf'), model)
+    return Robot(model, semantics=semantics, client=FakeClient(**client_options))
+
+
+@pytest.fixture
+def start_configuration(robot):
+    joints = robot.model.get_configurable_joints()
+    return Configuration([0.] * len(joints), [joint.type for joint in joints], [joint.name for joint in joints])
+
+
+@pytest.fixture(scope='session')
+def box_mesh():
+    """Factory of box meshes centered at the origin, by size along x, y and z."""
+    return _box_mesh
+
+
+@pytest.fixture(scope='module')
+def ur5():
+    return Ur5Robot(load_geometry=True)
+
+
+@pytest.fixture(scope='module')
+def wall(box_mesh):
+    return CollisionMesh(box_mesh(0.1, 0.3, 1.5), 'wall', Frame([0.6, 0, 0.3], [1, 0, 0], [0, 1, 0]))
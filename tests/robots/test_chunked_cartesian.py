@@ -0,0 +1,66 @@
+import pytest
+from compas.geometry import Frame
+
+
+@pytest.fixture
+def frames():
+    return [Frame([float(i), 0.2, 0.3], [1, 0, 0], [0, 1, 0]) for i in range(1, 11)]
+
+
+def test_chunks_are_stitched(robot, start_configuration, frames):
+    trajectory = robot.plan_cartesian_motion(frames, start_configuration, chunk_size=4)
+
+    assert trajectory.fraction == 1.
+    assert trajectory.chunk_fractions == [1., 1., 1.]
+    assert len(robot.client.cartesian_requests) == 3
+    assert [point.values[0] for point in trajectory.points] == [0.] + [float(i) for i in range(1, 11)]
+    assert [point.time_from_start.seconds for point in trajectory.points] == list(range(11))
+    # Every chunk but the first one starts one frame before the end of the previous one
+    assert [request[0] for request in robot.client.cartesian_requests] == [1., 4., 8.]
+
+
+def test_chunk_overlap(robot, start_configuration, frames):
+    trajectory = robot.plan_cartesian_motion(frames, start_configuration, chunk_size=4, chunk_overlap=2)
+
+    assert trajectory.fraction == 1.
+    assert [request[0] for request in robot.client.cartesian_requests] == [1., 3., 7.]
+    assert [point.values[0] for point in trajectory.points] == [0.] + [float(i) for i in range(1, 11)]
+
+    with pytest.raises(ValueError):
+        robot.plan_cartesian_motion(frames, start_configuration, chunk_size=4, chunk_overlap=4)
+
+
+# The IK solution the second chunk starts from is in another branch
+@pytest.mark.parametrize('client_options', [dict(flipped_frames=(3., ))])
+def test_discontinuous_chunk_is_planned_again(robot, start_configuration, frames):
+    trajectory = robot.plan_cartesian_motion(frames, start_configuration, chunk_size=4)
+
+    assert trajectory.fraction == 1.
+    assert len(robot.client.cartesian_requests) == 4
+    assert robot.client.cartesian_requests[-1] == (5., 0.)
+    assert all(point.values[3] == 0. for point in trajectory.points)
+
+
+@pytest.mark.parametrize('client_options', [dict(failing_frames=(7., ))])
+def test_failed_chunk(robot, start_configuration, frames):
+    trajectory = robot.plan_cartesian_motion(frames, start_configuration, chunk_size=4)
+
+    assert trajectory.chunk_fractions == [1., 0.5, 1.]
+    assert trajectory.fraction == pytest.approx(0.6)
+    assert trajectory.points[-1].values[0] == 6.
+
+
+# The second chunk is in another branch, which the loose tolerance does not notice
+@pytest.mark.parametrize('client_options', [dict(flipped_frames=(5., ))])
+def test_joint_jumps_end_the_path(robot, start_configuration, frames):
+    trajectory = robot.plan_cartesian_motion(frames, start_configuration, chunk_size=6, chunk_retries=0, stitch_tolerance=1.5)
+
+    assert trajectory.chunk_fractions == [1., 1.]
+    assert trajectory.fraction == pytest.approx(0.6)
+    assert [point.values[0] for point in trajectory.points] == [0.] + [float(i) for i in range(1, 7)]
+
+    # Without jump threshold, the jump is kept
+    trajectory = robot.plan_cartesian_motion(frames, start_configuration, chunk_size=6, chunk_retries=0, stitch_tolerance=1.5,
+                                             jump_threshold=0.)
+    assert trajectory.fraction == 1.
+    assert trajectory.points[-1].values[3] == 1.
@@ -0,0 +1,98 @@
+import numpy as np
+from compas.geometry import Frame
+
+from compas_fab.robots import AttachedCollisionMesh
+from compas_fab.robots import CollisionCheckerNumpy
+from compas_fab.robots import CollisionMesh
+from compas_fab.robots import ForwardKinematicsNumpy
+from compas_fab.robots import OBBTreeNumpy
+from compas_fab.robots import obb_overlap_numpy
+from compas_fab.robots import triangle_overlap_numpy
+from compas_fab.robots import collision_numpy
+
+
+def test_forward_kinematics_matches_model(ur5):
+    fk = ForwardKinematicsNumpy(ur5)
+    np.random.seed(0)
+    configurations = np.random.uniform(-np.pi, np.pi, (5, len(fk.joint_names)))
+    frames = fk.link_frames(configurations)
+
+    for configuration, link_frames in zip(configurations, frames):
+        joint_state = dict(zip(fk.joint_names, configuration))
+        for link_name in ('forearm_link', 'ee_link'):
+            frame = ur5.model.forward_kinematics(joint_state, link_name)
+            matrix = link_frames[fk.link_names.index(link_name)]
+            assert np.allclose(matrix[:3, 3], list(frame.point))
+            assert np.allclose(matrix[:3, 0], list(frame.xaxis))
+            assert np.allclose(matrix[:3, 1], list(frame.yaxis))
+
+
+def test_obb_overlap():
+    axes = np.identity(3)
+    half = np.array([0.5, 0.5, 0.5])
+    rotated = np.array([[np.cos(0.7), -np.sin(0.7), 0], [np.sin(0.7), np.cos(0.7), 0], [0, 0, 1]])
+    overlaps = obb_overlap_numpy(np.zeros((3, 3)), np.array([axes] * 3), np.array([half] * 3),
+                                 np.array([[0.9, 0, 0], [1.1, 0, 0], [1.15, 0.2, 0]]), np.array([axes, axes, rotated]), np.array([half] * 3))
+    assert overlaps.tolist() == [True, False, True]
+
+
+def test_triangle_overlap_coplanar():
+    a = [[0, 0, 0], [1, 0, 0], [0, 1, 0]]
+    overlapping = [[0.2, 0.2, 0], [2, 0.2, 0], [0.2, 2, 0]]
+    separate = [[1, 1, 0], [2, 1, 0], [1, 2, 0]]
+    assert triangle_overlap_numpy([a, a], [overlapping, separate]).tolist() == [True, False]
+
+
+def test_obb_tree_encloses_triangles():
+    triangles = np.random.RandomState(0).uniform(-1, 1, (50, 3, 3))
+    tree = OBBTreeNumpy(triangles, leaf_size=4)
+
+    assert sorted(map(tuple, tree.triangles.reshape(-1, 9))) == sorted(map(tuple, triangles.reshape(-1, 9)))
+    assert tree.triangle_ranges[0].tolist() == [0, 50]
+    for node in range(len(tree.centers)):
+        start, end = tree.triangle_ranges[node]
+        local = (tree.triangles[start:end].reshape(-1, 3) - tree.centers[node]).dot(tree.axes[node])
+        assert np.all(np.abs(local) <= tree.half_extents[node] + 1e-9)
+        if tree.children[node, 0] < 0:
+            assert end - start <= 4
+
+
+def test_self_collisions(ur5):
+    checker = CollisionCheckerNumpy(ur5)
+
+    assert checker.collision_pairs([0.] * 6) == []
+    # The elbow folded back on the upper arm
+    assert checker.in_collision([[0.] * 6, [0., 0., 3.1, 0., 0., 0.]]).tolist() == [False, True]
+
+
+def test_scene_and_attached_collisions(ur5, wall, box_mesh):
+    tool = AttachedCollisionMesh(CollisionMesh(box_mesh(0.4, 0.05, 0.05), 'tool', Frame([0.21, 0, 0], [1, 0, 0], [0, 1, 0])), 'ee_link')
+    checker = CollisionCheckerNumpy(ur5, [wall], [tool])
+
+    configurations = [[-1.2, -1.2, 1.2, 0, 0, 0], [0, -1.2, 1.2, 0, 0, 0], [-2.42, 2.82, -0.31, 0.49, -0.58, -1.65]]
+    assert checker.in_collision(configurations).tolist() == [False, True, True]
+    assert ('forearm_link', 'wall') in checker.collision_pairs(configurations[1])
+    assert checker.collision_pairs(configurations[2]) == [('tool', 'wall')]
+    # Only the tool collides, but not with the link it is attached to
+    assert CollisionCheckerNumpy(ur5, [wall]).in_collision(configurations[2]).tolist() == [False]
+
+    allowed = [('forearm_link', 'wall'), ('wrist_1_link', 'wall'), ('wrist_2_link', 'wall')]
+    assert CollisionCheckerNumpy(ur5, [wall], [tool], allowed_collision_pairs=allowed).pair_count == checker.pair_count - len(allowed)
+
+
+def test_robot_in_collision(ur5, box_mesh):
+    # A new mesh, whose hierarchies are not cached yet
+    wall = CollisionMesh(box_mesh(0.1, 0.3, 1.5), 'wall', Frame([0.6, 0, 0.3], [1, 0, 0], [0, 1, 0]))
+    free, blocked = ur5.zero_configuration(), ur5.zero_configuration()
+    free.values = [-1.2, -1.2, 1.2, 0, 0, 0]
+    blocked.values = [0, -1.2, 1.2, 0, 0, 0]
+
+    assert ur5.in_collision(free, [wall]) is False
+    assert ur5.in_collision(blocked, [wall]) is True
+    assert ur5.in_collision(blocked) is False
+    assert ur5.in_collision_many([free, blocked], [wall]) == [False, True]
+
+    # Moving the wall reuses its hierarchy, only its frame changes
+    moved = CollisionMesh(wall.mesh, 'wall', Frame([-0.6, 0, 0.3], [1, 0, 0], [0, 1, 0]))
+    assert ur5.in_collision_many([free, blocked], [moved]) == [False, False]
+    assert list(collision_numpy._TREES[wall.mesh]) == [('obb', 4)]
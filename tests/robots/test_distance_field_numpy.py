@@ -0,0 +1,95 @@
+import os
+import struct
+
+import numpy as np
+import pytest
+from compas.geometry import Frame
+
+from compas_fab.robots import CollisionMesh
+from compas_fab.robots import SignedDistanceFieldNumpy
+from compas_fab.robots import distance_field_numpy
+from compas_fab.robots import octomap_boxes_numpy
+
+RESOLUTION = 0.02
+
+# Octree of a single occupied leaf at depth 14, the cube between the origin and four voxels of the octree
+BINARY_OCTREE = [0x00, 0xC0] + [0x03, 0x00] * 12 + [0x02, 0x00]
+FULL_OCTREE = struct.pack('<fB', 1., 0x80) + struct.pack('<fB', 1., 0x01) * 13 + struct.pack('<fB', 1., 0x00)
+
+
+def box_distances(points, lower, upper):
+    outside = np.linalg.norm(np.maximum(0, np.maximum(lower - points, points - upper)), axis=1)
+    inside = np.minimum(points - lower, upper - points).min(axis=1)
+    return np.where(outside > 0, outside, -inside)
+
+
+def test_distances_of_a_mesh(wall):
+    field = SignedDistanceFieldNumpy([wall], resolution=RESOLUTION)
+    points = np.random.RandomState(0).uniform([-0.5, -1, -1], [1.5, 1, 1.5], (10000, 3))
+    distances = field.distances(points)
+    truth = box_distances(points, [0.55, -0.15, -0.45], [0.65, 0.15, 1.05])
+
+    # Points outside of the grid are bounded from below
+    inside = np.all((points > field.origin) & (points < field.origin + (np.array(field.shape) - 1) * RESOLUTION), axis=1)
+    assert np.all(np.abs(distances - truth)[inside] <= RESOLUTION + 1e-9)
+    assert np.all(distances[~inside] <= truth[~inside] + RESOLUTION)
+
+    assert field.occupied([[0.6, 0, 0.3], [1, 0, 0.3]]).tolist() == [True, False]
+    assert np.allclose(field.gradients([[1, 0, 0.3]]), [[1, 0, 0]])
+
+
+def test_space_enclosed_by_several_meshes_is_free(box_mesh):
+    # A closed cell of one meter made of six walls
+    walls = []
+    for axis in range(3):
+        for side in (-0.5, 0.5):
+            size, point = [1.1, 1.1, 1.1], [0., 0., 0.]
+            size[axis], point[axis] = 0.1, side
+            walls.append(CollisionMesh(box_mesh(*size), 'wall', Frame(point, [1, 0, 0], [0, 1, 0])))
+
+    field = SignedDistanceFieldNumpy(walls, resolution=0.05)
+    assert field.distances([[0., 0., 0.]])[0] == pytest.approx(0.45, abs=0.05)
+    assert field.distances([[0.5, 0., 0.]])[0] < 0
+
+
+def test_octomap_boxes():
+    corners, sizes, matrix = octomap_boxes_numpy(dict(binary=True, id='OcTree', resolution=0.05, data=BINARY_OCTREE))
+    assert corners.tolist() == [[0, 0, 0]] and sizes.tolist() == [0.2]
+
+    origin = dict(position=dict(x=1., y=0., z=0.), orientation=dict(x=0., y=0., z=0., w=1.))
+    octomap = dict(binary=False, id='OcTree', resolution=0.05, data=list(bytearray(FULL_OCTREE)))
+    corners, sizes, matrix = octomap_boxes_numpy(dict(octomap=octomap, origin=origin))
+    assert corners.tolist() == [[0, 0, 0]] and sizes.tolist() == [0.2]
+    assert matrix[:3, 3].tolist() == [1, 0, 0]
+
+    with pytest.raises(ValueError):
+        octomap_boxes_numpy(dict(binary=True, id='ColorOcTree', resolution=0.05, data=BINARY_OCTREE))
+
+
+def test_distances_of_an_octomap():
+    origin = dict(position=dict(x=1., y=0., z=0.), orientation=dict(x=0., y=0., z=0., w=1.))
+    octomap = dict(binary=True, id='OcTree', resolution=0.05, data=BINARY_OCTREE)
+    field = SignedDistanceFieldNumpy(octomaps=[dict(octomap=octomap, origin=origin)], resolution=RESOLUTION)
+
+    points = [[1.1, 0.1, 0.1], [1.1, 0.1, 0.6], [0.5, 0.1, 0.1]]
+    assert field.occupied(points).tolist() == [True, False, False]
+    assert np.allclose(field.distances(points)[1:], [0.4, 0.5], atol=RESOLUTION)
+
+
+def test_store_and_load(wall, tmpdir, monkeypatch):
+    directory = str(tmpdir)
+    field = SignedDistanceFieldNumpy([wall], resolution=RESOLUTION, directory=directory)
+    assert os.listdir(directory) == [distance_field_numpy.FIELD_FILENAME.format(field.scene_hash)]
+
+    def rasterize(self, surfaces, points, boxes):
+        raise AssertionError('The stored field should be loaded')
+
+    monkeypatch.setattr(SignedDistanceFieldNumpy, '_rasterize', rasterize)
+    loaded = SignedDistanceFieldNumpy([wall], resolution=RESOLUTION, directory=directory)
+    assert np.array_equal(loaded.occupancy, field.occupancy)
+    assert np.allclose(loaded.distances([[1, 0, 0.3]]), field.distances([[1, 0, 0.3]]))
+
+    # Another scene is computed again
+    moved = CollisionMesh(wall.mesh, 'wall', Frame([-0.6, 0, 0.3], [1, 0, 0], [0, 1, 0]))
+    with pytest.raises(AssertionError):
+        SignedDistanceFieldNumpy([moved], resolution=RESOLUTION, directory=directory)
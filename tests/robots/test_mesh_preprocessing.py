@@ -0,0 +1,103 @@
+import numpy as np
+import pytest
+from compas.datastructures import Mesh
+
+from compas_fab.robots import AttachedCollisionMesh
+from compas_fab.robots import CollisionMesh
+from compas_fab.robots import CollisionMeshPreprocessor
+from compas_fab.robots import PlanningScene
+from compas_fab.robots import closest_points_on_triangles_numpy
+from compas_fab.robots import mesh_convex_decomposition_numpy
+from compas_fab.robots import mesh_convex_hull_numpy
+from compas_fab.robots import mesh_hausdorff_distance_numpy
+
+
+class FakeClient(object):
+    def __init__(self):
+        self.added = []
+
+    def add_collision_mesh(self, collision_mesh):
+        self.added.append(collision_mesh)
+
+    def add_attached_collision_mesh(self, attached_collision_mesh):
+        self.added.append(attached_collision_mesh.collision_mesh)
+
+
+class FakeRobot(object):
+    root_name = 'world'
+    scale_factor = 1.
+
+    def __init__(self):
+        self.client = FakeClient()
+
+
+def grid(size=10):
+    vertices = [[x / float(size), y / float(size), 0] for x in range(size + 1) for y in range(size + 1)]
+    faces = [[(size + 1) * i + j, (size + 1) * (i + 1) + j, (size + 1) * (i + 1) + j + 1, (size + 1) * i + j + 1]
+             for i in range(size) for j in range(size)]
+    return Mesh.from_vertices_and_faces(vertices, faces)
+
+
+def box(offset=0.):
+    vertices = [[x + offset, y, z] for x in (0, 1) for y in (0, 1) for z in (0, 1)]
+    faces = [[0, 1, 3, 2], [4, 6, 7, 5], [0, 4, 5, 1], [2, 3, 7, 6], [0, 2, 6, 4], [1, 5, 7, 3]]
+    return vertices, faces
+
+
+def test_closest_points_on_triangles():
+    points = [[0.2, 0.2, 1.], [-1., -1., 0.], [0.5, -1., 0.], [1., 1., 0.]]
+    closest = closest_points_on_triangles_numpy(points, [0, 0, 0], [1, 0, 0], [0, 1, 0])
+    assert np.allclose(closest, [[0.2, 0.2, 0.], [0., 0., 0.], [0.5, 0., 0.], [0.5, 0.5, 0.]])
+
+
+def test_convex_hull_and_decomposition():
+    vertices, faces = box()
+    other_vertices, other_faces = box(offset=3.)
+    vertices += other_vertices
+    faces += [[index + 8 for index in face] for face in other_faces]
+
+    hull_vertices, hull_faces = mesh_convex_hull_numpy(vertices, faces)
+    assert len(hull_vertices) == 8
+    assert mesh_hausdorff_distance_numpy(vertices, faces, hull_vertices, hull_faces) > 0.5
+
+    parts_vertices, parts_faces = mesh_convex_decomposition_numpy(vertices, faces, max_concavity=0.01)
+    assert len(parts_faces) == 24
+    assert mesh_hausdorff_distance_numpy(vertices, faces, parts_vertices, parts_faces) == pytest.approx(0.)
+
+
+def test_decimation_within_target_error_and_cached():
+    preprocessor = CollisionMeshPreprocessor('decimate', target_error=0.001)
+    mesh = grid()
+
+    collision_mesh = preprocessor.process(CollisionMesh(mesh, 'plate'))
+    report = preprocessor.reports['plate']
+    assert report['faces_before'] == 100
+    assert report['faces_after'] < 200
+    assert report['hausdorff_error'] <= 0.001
+    assert not report['cached']
+    assert collision_mesh.mesh.number_of_faces() == report['faces_after']
+    assert mesh.number_of_faces() == 100
+
+    preprocessor.process(CollisionMesh(grid(), 'copy'))
+    assert preprocessor.reports['copy']['cached']
+    assert preprocessor.stats == dict(hits=1, misses=1)
+
+
+def test_persistent_cache(tmpdir):
+    CollisionMeshPreprocessor('convex_hull', cache_path=str(tmpdir)).process(CollisionMesh(grid(), 'plate'))
+    preprocessor = CollisionMeshPreprocessor('convex_hull', cache_path=str(tmpdir))
+    preprocessor.process(CollisionMesh(grid(), 'plate'))
+    assert preprocessor.reports['plate']['cached']
+
+
+def test_planning_scene_adds_simplified_meshes():
+    scene = PlanningScene(FakeRobot(), preprocessor=CollisionMeshPreprocessor('convex_hull'))
+    vertices, faces = box()
+    scene.add_collision_mesh(CollisionMesh(grid(), 'plate'))
+    scene.add_attached_collision_mesh(AttachedCollisionMesh(CollisionMesh(Mesh.from_vertices_and_faces(vertices, faces), 'tool'), 'ee_link'))
+
+    plate, tool = scene.client.added
+    assert plate.mesh.number_of_faces() == 2
+    assert tool.mesh.number_of_faces() == 12
+    assert tool.root_name == 'ee_link'
+    assert sorted(scene.preprocessor.reports) == ['plate', 'tool']
@@ -0,0 +1,39 @@
+import pytest
+
+from compas_fab.robots import JointConstraint
+from compas_fab.robots import PlanCache
+
+
+@pytest.fixture
+def goals():
+    return [[JointConstraint('panda_joint1', value)] for value in (2., -1., 0.5)]
+
+
+def test_goals_in_one_request(robot, start_configuration, goals):
+    robot.plan_motion(goals, start_configuration)
+
+    assert len(robot.client.motion_requests) == 1
+    assert [c[0].value for c in robot.client.motion_requests[0]] == [2., -1., 0.5]
+
+
+def test_goals_dispatched_concurrently(robot, start_configuration, goals):
+    trajectory = robot.plan_motion(goals, start_configuration, goal_dispatch='concurrent', race_policy='best_within_deadline')
+
+    assert len(robot.client.motion_requests) == 3
+    assert trajectory.goal_index == 2
+    assert trajectory.path_length == pytest.approx(0.5)
+    assert [outcome['status'] for outcome in trajectory.goal_outcomes] == ['success', 'error', 'success']
+    assert trajectory.goal_outcomes[0]['score'] == pytest.approx(2.)
+
+
+def test_goal_dispatch_is_part_of_cache_key(tmpdir, robot, start_configuration, goals):
+    robot.plan_cache = PlanCache(str(tmpdir), cache_stochastic_planners=True)
+
+    robot.plan_motion(goals, start_configuration)
+    trajectory = robot.plan_motion(goals, start_configuration, goal_dispatch='concurrent')
+    assert len(robot.client.motion_requests) == 4
+    assert trajectory.goal_index in (0, 2)
+
+    cached = robot.plan_motion(goals, start_configuration, goal_dispatch='concurrent')
+    assert len(robot.client.motion_requests) == 4
+    assert cached.goal_index == trajectory.goal_index
@@ -0,0 +1,116 @@
+from compas.geometry import Frame
+
+from compas_fab.robots import AttachedCollisionMesh
+from compas_fab.robots import CollisionMesh
+
+from compas_fab.robots import JointConstraint
+from compas_fab.robots import JointTrajectory
+from compas_fab.robots import PlanCache
+from compas_fab.robots import plan_cache
+
+
+def test_cartesian_motion_is_cached(tmpdir, robot, start_configuration):
+    robot.plan_cache = PlanCache(str(tmpdir))
+    frames = [Frame([0.3, 0.1, 0.5], [1, 0, 0], [0, 1, 0])]
+
+    first = robot.plan_cartesian_motion(frames, start_configuration)
+    second = robot.plan_cartesian_motion(frames, start_configuration)
+
+    assert robot.client.calls == 1
+    assert second.points[0].values == first.points[0].values
+    assert second.start_configuration.joint_names == start_configuration.joint_names
+
+    robot.client.planning_scene_hash = 'changed'
+    robot.plan_cartesian_motion(frames, start_configuration)
+    assert robot.client.calls == 2
+
+    stats = robot.plan_cache.stats
+    assert (stats['hits'], stats['misses'], stats['stores'], stats['entries']) == (1, 2, 2, 2)
+
+    # The index persists across instances
+    cache = PlanCache(str(tmpdir))
+    assert cache.stats['entries'] == 2
+
+
+def test_partial_results_are_not_cached(tmpdir, robot, start_configuration):
+    robot.plan_cache = PlanCache(str(tmpdir))
+    robot.client.failing_frames = (0.4, )
+    frames = [Frame([x, 0.1, 0.5], [1, 0, 0], [0, 1, 0]) for x in (0.3, 0.4)]
+
+    assert robot.plan_cartesian_motion(frames, start_configuration).fraction == 0.5
+    robot.plan_cartesian_motion(frames, start_configuration)
+
+    assert robot.client.calls == 2
+    assert robot.plan_cache.stats['entries'] == 0
+
+
+def test_meshes_of_requests_are_hashed_once(tmpdir, robot, start_configuration, box_mesh, monkeypatch):
+    hashed = []
+    monkeypatch.setattr(plan_cache, 'mesh_hash', lambda mesh: hashed.append(mesh) or 'box')
+    robot.plan_cache = PlanCache(str(tmpdir))
+    tool = AttachedCollisionMesh(CollisionMesh(box_mesh(0.1, 0.1, 0.1), 'tool'), 'panda_hand')
+    frames = [Frame([0.3, 0.1, 0.5], [1, 0, 0], [0, 1, 0])]
+
+    for _ in range(3):
+        robot.plan_cartesian_motion(frames, start_configuration, attached_collision_meshes=[tool])
+
+    assert robot.client.calls == 1
+    assert len(hashed) == 1
+
+
+def test_stochastic_planners_are_opt_in(tmpdir, robot, start_configuration):
+    goal = [JointConstraint('panda_joint1', 0.5)]
+
+    robot.plan_cache = PlanCache(str(tmpdir))
+    robot.plan_motion(goal, start_configuration, planner_id='RRT')
+    robot.plan_motion(goal, start_configuration, planner_id='RRT')
+    assert robot.client.calls == 2
+    assert robot.plan_cache.stats['skipped'] == 2
+
+    robot.plan_cache = PlanCache(str(tmpdir), cache_stochastic_planners=True)
+    robot.plan_motion(goal, start_configuration, planner_id='RRT')
+    robot.plan_motion(goal, start_configuration, planner_id='RRT')
+    robot.plan_motion(goal, start_configuration, planner_id='PRM')
+    assert robot.client.calls == 4
+
+
+def test_eviction(tmpdir, robot, start_configuration):
+    robot.plan_cache = PlanCache(str(tmpdir), max_size=1)
+    frames = [Frame([0.3, 0.1, 0.5], [1, 0, 0], [0, 1, 0])]
+
+    robot.plan_cartesian_motion(frames, start_configuration)
+    robot.plan_cartesian_motion(frames, start_configuration)
+
+    stats = robot.plan_cache.stats
+    assert stats['evictions'] == 2
+    assert stats['entries'] == 0
+    assert robot.client.calls == 2
+
+
+def test_trajectory_attributes_are_cached(tmpdir, start_configuration):
+    cache = PlanCache(str(tmpdir))
+    trajectory = JointTrajectory([], start_configuration.joint_names, start_configuration, fraction=1.)
+    trajectory.planning_time = 0.5
+    trajectory.goal_index = 1
+    trajectory.goal_outcomes = [dict(status='error', score=None, time=0.1, error=ValueError('unreachable')),
+                                dict(status='success', score=2., time=0.2, error=None)]
+    trajectory.chunk_fractions = [1., 0.5]
+    cache.put('key', trajectory)
+
+    cached = cache.get('key')
+    assert (cached.planning_time, cached.goal_index, cached.chunk_fractions) == (0.5, 1, [1., 0.5])
+    assert cached.goal_outcomes[0]['error'] == 'unreachable'
+    assert cached.goal_outcomes[1] == trajectory.goal_outcomes[1]
+
+    # Attributes that were not set are not restored
+    cache.put('other', JointTrajectory([], start_configuration.joint_names, start_configuration, fraction=1.))
+    assert not hasattr(cache.get('other'), 'goal_index')
+
+
+def test_robot_description_hash_is_kept(robot, monkeypatch):
+    first = plan_cache.robot_description_hash(robot)
+    monkeypatch.setattr(plan_cache, '_robot_description_hash', lambda robot: 'changed')
+    assert plan_cache.robot_description_hash(robot) == first
+
+    robot.semantics = None
+    assert plan_cache.robot_description_hash(robot) == 'changed'
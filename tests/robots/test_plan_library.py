@@ -0,0 +1,133 @@
+import os
+
+import numpy as np
+import pytest
+from compas.geometry import Sphere
+
+from compas_fab.backends import LocalClient
+from compas_fab.robots import PlanLibrary
+from compas_fab.robots import PositionConstraint
+from compas_fab.robots.ur5 import Robot
+
+
+@pytest.fixture(scope='module')
+def robot(wall):
+    with LocalClient() as client:
+        robot = Robot(client, load_geometry=True)
+        client.add_collision_mesh(wall)
+        yield robot
+
+
+@pytest.fixture
+def library(robot):
+    library = PlanLibrary()
+    robot.plan_library = library
+    yield library
+    robot.plan_library = None
+
+
+def configuration(robot, values):
+    config = robot.zero_configuration()
+    config.values = values
+    return config
+
+
+def plan(robot, start, goal, **kwargs):
+    goal_constraints = robot.constraints_from_configuration(configuration(robot, goal), [0.01], [0.01])
+    return robot.plan_motion(goal_constraints, configuration(robot, start), allowed_planning_time=10., **kwargs)
+
+
+def assert_collision_free(robot, trajectory):
+    values = np.array([point.values for point in trajectory.points])
+    steps = np.concatenate([np.linspace(a, b, 50) for a, b in zip(values[:-1], values[1:])])
+    assert not robot.client.collision_checker(robot).in_collision(steps).any()
+
+
+def test_store_and_reuse(robot, library):
+    first = plan(robot, [-1.2, -1.2, 1.2, 0, 0, 0], [1.2, -1.2, 1.2, 0, 0, 0])
+    assert library.stats['misses'] == 1
+    assert len(library) == 1
+
+    second = plan(robot, [-1.1, -1.2, 1.2, 0, 0, 0], [1.25, -1.2, 1.2, 0, 0, 0])
+    assert library.stats['hits'] == 1
+    assert len(library) == 1
+    assert np.allclose(second.points[0].values, [-1.1, -1.2, 1.2, 0, 0, 0])
+    assert np.allclose(second.points[-1].values, [1.25, -1.2, 1.2, 0, 0, 0])
+    # The stored path is connected to the requested start and goal
+    assert np.allclose(second.points[1].values, first.points[0].values)
+    assert np.allclose(second.points[2].values, first.points[1].values)
+    assert_collision_free(robot, second)
+
+    # Stored paths are reused in reverse as well
+    third = plan(robot, [1.2, -1.2, 1.2, 0, 0, 0], [-1.2, -1.2, 1.2, 0, 0, 0])
+    assert library.stats['hits'] == 2
+    assert np.allclose(third.points[1].values, first.points[-2].values)
+    assert_collision_free(robot, third)
+
+
+def test_repair_invalid_segments(robot, library):
+    start, goal = [-1.2, -1.2, 1.2, 0, 0, 0], [1.2, -1.2, 1.2, 0, 0, 0]
+    library.repair_time = 10.
+    library.store(robot, robot.main_group_name, robot.get_configurable_joint_names(), [start, goal])
+
+    # The direct motion sweeps the arm through the wall, it is planned again around it
+    trajectory = plan(robot, start, goal)
+
+    assert library.stats['repairs'] == 1
+    assert library.stats['repaired_segments'] == 1
+    assert library.stats['misses'] == 0
+    assert len(trajectory.points) > 2
+    assert_collision_free(robot, trajectory)
+
+
+def test_unrelated_requests_are_planned(robot, library):
+    plan(robot, [-1.2, -1.2, 1.2, 0, 0, 0], [1.2, -1.2, 1.2, 0, 0, 0])
+    plan(robot, [-1.2, -1.2, 1.2, 0, 0, 0], [-1.2, -2.0, 2.0, 0, 0, 0])
+    assert library.stats['misses'] == 2
+
+    with pytest.raises(Exception):
+        robot.plan_motion([PositionConstraint.from_sphere('ee_link', Sphere([0.5, 0, 0.5], 0.01))],
+                          configuration(robot, [-1.2, -1.2, 1.2, 0, 0, 0]))
+    assert library.stats['misses'] == 2
+
+
+def test_save_and_load(robot, library, tmpdir):
+    plan(robot, [-1.2, -1.2, 1.2, 0, 0, 0], [1.2, -1.2, 1.2, 0, 0, 0])
+    filename = os.path.join(str(tmpdir), 'library.bin')
+    library.save(filename)
+
+    loaded = PlanLibrary()
+    loaded.load(filename)
+    path, distance = loaded.nearest(robot, robot.main_group_name, robot.get_configurable_joint_names(),
+                                    [-1.2, -1.2, 1.2, 0, 0, 0], [1.2, -1.2, 1.2, 0, 0, 0])
+
+    assert len(loaded) == 1
+    assert distance < 0.05
+    assert len(path) > 2
+
+
+def test_stored_paths_need_a_checker_of_the_scene(robot, library):
+    start, goal = [-1.2, -1.2, 1.2, 0, 0, 0], [1.2, -1.2, 1.2, 0, 0, 0]
+    # The direct motion sweeps the arm through the wall, which a repair client without checker cannot see
+    library.repair_client = object()
+    library.store(robot, robot.main_group_name, robot.get_configurable_joint_names(), [start, goal])
+
+    trajectory = plan(robot, start, goal)
+
+    assert library.stats['hits'] == 0
+    assert library.stats['misses'] == 1
+    assert_collision_free(robot, trajectory)
+
+
+def test_reused_paths_are_timed_within_acceleration_limits(robot, library):
+    plan(robot, [-1.2, -1.2, 1.2, 0, 0, 0], [1.2, -1.2, 1.2, 0, 0, 0])
+    trajectory = plan(robot, [-1.1, -1.2, 1.2, 0, 0, 0], [1.25, -1.2, 1.2, 0, 0, 0], max_acceleration_scaling_factor=0.5)
+    assert library.stats['hits'] == 1
+
+    values = np.array([point.values for point in trajectory.points])
+    times = np.array([point.time_from_start.seconds for point in trajectory.points])
+    velocities = np.diff(values, axis=0) / np.diff(times)[:, None]
+    # Accelerating from rest, and between the segments, within half the default limit
+    assert np.all(np.abs(velocities[0]) <= np.sqrt(2 * 0.5 * np.abs(values[1] - values[0])) + 1e-6)
+    changes = np.abs(np.diff(velocities, axis=0)) / ((np.diff(times)[:-1] + np.diff(times)[1:]) / 2)[:, None]
+    assert np.all(changes <= 0.5 + 1e-6)
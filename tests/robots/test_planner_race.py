@@ -0,0 +1,59 @@
+import pytest
+
+from compas_fab.robots import JointConstraint
+
+# planner id: (planning time, path length)
+PLANNERS = {
+    'RRTConnect': (0.01, 3.),
+    'PRMstar': (0.2, 1.),
+    'BiTRRT': (0.1, 2.),
+}
+
+
+@pytest.fixture
+def client_options():
+    return dict(planners=PLANNERS)
+
+
+def test_first_success(robot, start_configuration):
+    goal = [JointConstraint('panda_joint1', 0.5)]
+    trajectory = robot.plan_motion(goal, start_configuration, planner_id=['PRMstar', 'RRTConnect', 'Unknown'])
+
+    assert trajectory.path_length == pytest.approx(3.)
+    assert robot.planner_stats['RRTConnect']['wins'] == 1
+    assert robot.planner_stats['Unknown']['failures'] == 1
+    assert robot.planner_stats['PRMstar']['wins'] == 0
+
+
+def test_best_within_deadline(robot, start_configuration):
+    goal = [JointConstraint('panda_joint1', 0.5)]
+    planners = ['PRMstar', 'RRTConnect', 'BiTRRT']
+
+    trajectory = robot.plan_motion(goal, start_configuration, planner_id=planners, race_policy='best_within_deadline')
+    assert trajectory.path_length == pytest.approx(1.)
+
+    trajectory = robot.plan_motion(goal, start_configuration, planner_id=planners, race_policy='best_within_deadline', race_deadline=0.15)
+    assert trajectory.path_length == pytest.approx(2.)
+
+    assert robot.planner_stats['PRMstar'] == dict(races=2, wins=1, failures=0, timeouts=1)
+    assert robot.planner_stats['BiTRRT']['wins'] == 1
+
+
+def test_all_planners_fail(robot, start_configuration):
+    goal = [JointConstraint('panda_joint1', 0.5)]
+    with pytest.raises(Exception):
+        robot.plan_motion(goal, start_configuration, planner_id=['Unknown', 'Other'])
+
+
+def test_concurrent_goals_with_races(robot, start_configuration):
+    goals = [[JointConstraint('panda_joint1', value)] for value in (0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8)]
+    planners = ['RRTConnect', 'BiTRRT', 'Unknown']
+
+    for _ in range(3):
+        robot.plan_motion(goals, start_configuration, planner_id=planners, goal_dispatch='concurrent',
+                          race_policy='best_within_deadline')
+
+    races = 3 * len(goals)
+    assert robot.planner_stats['RRTConnect'] == dict(races=races, wins=0, failures=0, timeouts=0)
+    assert robot.planner_stats['BiTRRT'] == dict(races=races, wins=races, failures=0, timeouts=0)
+    assert robot.planner_stats['Unknown'] == dict(races=races, wins=0, failures=races, timeouts=0)
@@ -0,0 +1,138 @@
+import pytest
+from compas.datastructures import Mesh
+from compas.geometry import Frame
+
+from compas_fab.robots import AttachedCollisionMesh
+from compas_fab.robots import CollisionMesh
+from compas_fab.robots import PlanningScene
+
+
+class FakeClient(object):
+    def __init__(self):
+        self.calls = []
+
+    def add_collision_mesh(self, collision_mesh):
+        self.calls.append(('add', collision_mesh.id))
+
+    def remove_collision_mesh(self, id):
+        self.calls.append(('remove', id))
+
+    def apply_planning_scene_diff(self, **diff):
+        self.calls.append(('diff', diff))
+
+
+class FakeRobot(object):
+    root_name = 'world'
+    scale_factor = 1.
+
+    def __init__(self):
+        self.client = FakeClient()
+
+
+def box(size=1.):
+    return Mesh.from_vertices_and_faces([[0, 0, 0], [size, 0, 0], [0, size, 0], [0, 0, size]],
+                                        [[0, 1, 2], [0, 1, 3], [0, 2, 3], [1, 2, 3]])
+
+
+@pytest.fixture
+def scene():
+    return PlanningScene(FakeRobot())
+
+
+def test_batch_sends_one_diff(scene):
+    with scene.batch():
+        scene.add_collision_mesh(CollisionMesh(box(), 'a'))
+        scene.add_collision_mesh(CollisionMesh(box(), 'b'))
+        scene.add_attached_collision_mesh(AttachedCollisionMesh(CollisionMesh(box(), 'tool'), 'ee_link'))
+
+    calls = scene.client.calls
+    assert len(calls) == 1
+    operation, diff = calls[0]
+    assert operation == 'diff'
+    assert sorted(cm.id for cm in diff['collision_meshes']) == ['a', 'b']
+    assert [acm.collision_mesh.id for acm in diff['attached_collision_meshes']] == ['tool']
+
+    # Nothing changed, nothing is sent
+    with scene.batch():
+        scene.add_collision_mesh(CollisionMesh(box(), 'a'))
+    assert len(calls) == 1
+
+
+def test_moved_objects_are_not_sent_again(scene):
+    scene.add_collision_mesh(CollisionMesh(box(), 'a'))
+    scene.add_collision_mesh(CollisionMesh(box(), 'b'))
+    assert scene.client.calls == [('add', 'a'), ('add', 'b')]
+
+    with scene.batch():
+        scene.add_collision_mesh(CollisionMesh(box(), 'a', Frame([1, 0, 0], [1, 0, 0], [0, 1, 0])))
+        scene.add_collision_mesh(CollisionMesh(box(2.), 'b'))
+        scene.remove_collision_mesh('c')
+
+    _, diff = scene.client.calls[-1]
+    assert [cm.id for cm in diff['moved_collision_meshes']] == ['a']
+    assert [cm.id for cm in diff['collision_meshes']] == ['b']
+    # Objects not added by the scene are removed as well
+    assert diff['removed_collision_mesh_ids'] == ['c']
+
+
+def test_objects_not_added_by_the_scene(scene):
+    with scene.batch():
+        scene.append_collision_mesh(CollisionMesh(box(), 'a'))
+        scene.append_collision_mesh(CollisionMesh(box(2.), 'a'))
+        scene.remove_attached_collision_mesh('tool')
+
+    _, diff = scene.client.calls[-1]
+    assert [cm.id for cm in diff['appended_collision_meshes']] == ['a', 'a']
+    assert diff['collision_meshes'] == []
+    assert diff['removed_attached_collision_mesh_ids'] == ['tool']
+
+    # Further meshes are appended as well, as the other meshes of the object are unknown
+    with scene.batch():
+        scene.append_collision_mesh(CollisionMesh(box(3.), 'a'))
+    _, diff = scene.client.calls[-1]
+    assert len(diff['appended_collision_meshes']) == 1 and diff['collision_meshes'] == []
+
+    # Removed and appended again, the object only consists of the new mesh
+    with scene.batch():
+        scene.remove_collision_mesh('a')
+        scene.append_collision_mesh(CollisionMesh(box(), 'a'))
+    _, diff = scene.client.calls[-1]
+    assert [cm.id for cm in diff['collision_meshes']] == ['a']
+    assert diff['appended_collision_meshes'] == [] and diff['removed_collision_mesh_ids'] == []
+
+
+def test_batch_rolls_back_on_error(scene):
+    scene.add_collision_mesh(CollisionMesh(box(), 'a'))
+
+    with pytest.raises(ValueError):
+        with scene.batch():
+            scene.remove_collision_mesh('a')
+            scene.add_collision_mesh(CollisionMesh(box(), 'b'))
+            raise ValueError()
+
+    assert scene.collision_mesh_ids == ['a']
+    assert scene.client.calls == [('add', 'a')]
+    assert not any(scene.diff().values())
+
+
+def test_meshes_are_hashed_lazily(scene, monkeypatch):
+    from compas_fab.robots import planning_scene
+    hashed = []
+    monkeypatch.setattr(planning_scene, 'mesh_hash', lambda mesh: hashed.append(mesh) or len(mesh.to_vertices_and_faces()[0]))
+
+    mesh = box()
+    scene.add_collision_mesh(CollisionMesh(mesh, 'a'))
+    scene.add_collision_mesh(CollisionMesh(box(), 'b'))
+    assert hashed == []
+
+    # The same mesh object is not hashed, other objects are hashed once
+    with scene.batch():
+        scene.add_collision_mesh(CollisionMesh(mesh, 'a', Frame([1, 0, 0], [1, 0, 0], [0, 1, 0])))
+        scene.add_collision_mesh(CollisionMesh(box(), 'b'))
+    assert len(hashed) == 2
+    assert [cm.id for cm in scene.client.calls[-1][1]['moved_collision_meshes']] == ['a']
+
+    # Meshes scaled in place are sent again
+    with scene.batch():
+        scene.add_collision_mesh(CollisionMesh(mesh, 'a', Frame([1, 0, 0], [1, 0, 0], [0, 1, 0])), scale=True)
+    assert [cm.id for cm in scene.client.calls[-1][1]['collision_meshes']] == ['a']
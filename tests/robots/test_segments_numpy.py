@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from compas_fab.robots import JointTrajectory
+from compas_fab.robots import JointTrajectoryPoint
+from compas_fab.robots import SegmentCheckerNumpy
+
+LEAF_RADIUS = 0.02
+
+
+@pytest.fixture(scope='module')
+def checker(ur5, wall):
+    return SegmentCheckerNumpy(ur5, [wall], leaf_radius=LEAF_RADIUS)
+
+
+def test_sweeping_through_the_wall(checker):
+    # Both ends are free, the pan joint sweeps the arm through the wall
+    starts = [[-1.2, -1.2, 1.2, 0, 0, 0], [-1.2, -1.2, 1.2, 0, 0, 0]]
+    ends = [[1.2, -1.2, 1.2, 0, 0, 0], [-2.4, -1.2, 1.2, 0, 0, 0]]
+    assert not checker.checker.in_collision(starts + ends).any()
+    assert checker.segments_in_collision(starts, ends).tolist() == [True, False]
+
+    parameters = checker.first_collisions(starts, ends)
+    assert 0 < parameters[0] < 0.5 and np.isnan(parameters[1])
+    first = np.multiply(starts[0], 1 - parameters[0]) + np.multiply(ends[0], parameters[0])
+    assert checker.checker.in_collision(first).tolist() == [True]
+
+
+def test_matches_dense_sampling(checker):
+    random = np.random.RandomState(1)
+    configurations = random.uniform(-3, 3, (60, 6))
+    free = configurations[~checker.checker.in_collision(configurations)]
+    starts, ends = free[:8], free[:8] + (free[8:16] - free[:8]) * 0.3
+
+    parameters = np.linspace(0, 1, 200)[None, :, None]
+    dense = (starts[:, None] * (1 - parameters) + ends[:, None] * parameters).reshape(-1, 6)
+    colliding = checker.checker.in_collision(dense).reshape(len(starts), -1).any(axis=1)
+
+    checker.stats.update(segments=0, steps=0)
+    assert checker.segments_in_collision(starts, ends).tolist() == colliding.tolist()
+    assert checker.stats['segments'] == 8
+    assert checker.stats['steps'] < dense.shape[0]
+
+
+def test_trajectory_in_collision(ur5, checker, wall):
+    configurations = [[-2.4, -1.2, 1.2, 0, 0, 0], [-1.2, -1.2, 1.2, 0, 0, 0], [1.2, -1.2, 1.2, 0, 0, 0]]
+    assert checker.trajectory_in_collision(configurations).tolist() == [False, True]
+
+    trajectory = JointTrajectory([JointTrajectoryPoint(values, [0] * 6) for values in configurations],
+                                 ur5.get_configurable_joint_names(), ur5.zero_configuration())
+    assert ur5.trajectory_in_collision(trajectory, [wall]) == [False, True]
+    assert ur5.trajectory_in_collision(trajectory) == [False, False]
+
+
+def test_robot_clearance_profile(ur5, wall):
+    configurations = [[-2.4, -1.2, 1.2, 0, 0, 0], [-1.2, -1.2, 1.2, 0, 0, 0], [0, -1.2, 1.2, 0, 0, 0]]
+    trajectory = JointTrajectory([JointTrajectoryPoint(values, [0] * 6) for values in configurations],
+                                 ur5.get_configurable_joint_names(), ur5.zero_configuration())
+    profile = ur5.clearance_profile(trajectory, [wall], max_distance=0.5)
+    assert profile['points'][1] > 0.1 and profile['points'][2] < 0
+    assert profile['closest'][2][1] == 'wall'
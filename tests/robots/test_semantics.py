@@ -1,8 +1,11 @@
 import os
 
 import pytest
+from compas.datastructures import Mesh
 from compas.robots import RobotModel
 
+from compas_fab.robots import AttachedCollisionMesh
+from compas_fab.robots import CollisionMesh
 from compas_fab.robots import RobotSemantics
 from compas_fab.robots.ur5 import Robot as Ur5Robot
 
@@ -59,3 +62,48 @@ def test_ur5_semantics():
                                                         'wrist_1_joint',
                                                         'wrist_2_joint',
                                                         'wrist_3_joint']
+
+
+def test_ur5_allowed_collisions():
+    robot = Ur5Robot()
+    semantics = robot.semantics
+    assert semantics.disabled_collisions[0] == ('base_link', 'shoulder_link')
+    # Listed in the SRDF
+    assert semantics.is_collision_allowed('wrist_1_link', 'ee_link')
+    # Connected by a joint
+    assert semantics.is_collision_allowed('world', 'base_link')
+    assert not semantics.is_collision_allowed('base_link', 'forearm_link')
+
+    pairs = list(semantics.iter_collision_pairs(['base_link', 'shoulder_link', 'upper_arm_link', 'forearm_link']))
+    assert pairs == [('base_link', 'upper_arm_link'), ('base_link', 'forearm_link'), ('shoulder_link', 'forearm_link')]
+    allowed = set(frozenset(pair) for pair in semantics.iter_allowed_collision_pairs())
+    assert frozenset(('forearm_link', 'upper_arm_link')) in allowed
+    assert not any(frozenset(pair) in allowed for pair in semantics.iter_collision_pairs())
+
+
+def test_allow_touch_links():
+    semantics = Ur5Robot().semantics
+    mesh = Mesh.from_vertices_and_faces([[0, 0, 0], [1, 0, 0], [0, 1, 0]], [[0, 1, 2]])
+    acm = AttachedCollisionMesh(CollisionMesh(mesh, 'tool'), 'ee_link', touch_links=['wrist_3_link'])
+    assert ('tool', 'wrist_3_link') in semantics.iter_collision_pairs(['tool', 'wrist_3_link'])
+
+    semantics.allow_touch_links(acm)
+    assert semantics.is_collision_allowed('ee_link', 'tool')
+    assert semantics.is_collision_allowed('tool', 'wrist_3_link')
+    pairs = list(semantics.iter_collision_pairs(['tool', 'wrist_3_link', 'forearm_link']))
+    assert pairs == [('tool', 'forearm_link'), ('wrist_3_link', 'forearm_link')]
+
+    semantics.disallow_collision('tool', 'wrist_3_link')
+    assert not semantics.is_collision_allowed('tool', 'wrist_3_link')
+
+
+def test_allowed_collisions_version():
+    semantics = Ur5Robot().semantics
+    version = semantics.version
+
+    semantics.allow_collision('shoulder_link', 'wrist_3_link')
+    semantics.allow_collision('shoulder_link', 'wrist_3_link')
+    assert semantics.version == version + 1
+    semantics.disallow_collision('shoulder_link', 'wrist_3_link')
+    semantics.disallow_collision('shoulder_link', 'wrist_3_link')
+    assert semantics.version == version + 2
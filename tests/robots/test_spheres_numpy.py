@@ -0,0 +1,139 @@
+import os
+
+import numpy as np
+import pytest
+from compas.datastructures import Mesh
+from compas.geometry import Box
+from compas.geometry import Frame
+
+from compas_fab.robots import AttachedCollisionMesh
+from compas_fab.robots import CollisionCheckerNumpy
+from compas_fab.robots import CollisionMesh
+from compas_fab.robots import RobotSpheresNumpy
+from compas_fab.robots import SphereTreeNumpy
+from compas_fab.robots import sphere_distances_numpy
+from compas_fab.robots import spheres_numpy
+
+LEAF_RADIUS = 0.02
+
+
+@pytest.fixture(scope='module')
+def configurations():
+    return np.random.RandomState(0).uniform(-np.pi, np.pi, (200, 6))
+
+
+def test_sphere_distances():
+    distances = sphere_distances_numpy([[0, 0, 0], [0, 0, 0]], [1., 1.], [[3, 0, 0], [1, 0, 0]], [1., 1.])
+    assert distances.tolist() == [1.0, -1.0]
+
+
+def test_sphere_tree_encloses_triangles():
+    triangles = np.array([[[0, 0, 0], [1, 0, 0], [0, 1, 0]], [[0, 0, 1], [1, 0, 1], [0, 1, 1]]], dtype=float)
+    tree = SphereTreeNumpy(triangles, leaf_radius=0.1)
+    leaves = tree.children[:, 0] < 0
+
+    assert np.all(tree.radii[leaves] <= 0.1)
+    assert np.all(np.linalg.norm(triangles.reshape(-1, 3) - tree.centers[0], axis=1) <= tree.radii[0] + 1e-12)
+    assert np.all(np.linalg.norm(tree.points - tree.centers, axis=1) <= tree.radii + 1e-12)
+
+    # Every point of the surface is covered by a leaf sphere
+    samples = np.random.RandomState(0).dirichlet([1, 1, 1], 100)
+    points = np.concatenate([samples.dot(triangle) for triangle in triangles])
+    gaps = np.linalg.norm(points[:, None] - tree.centers[leaves], axis=2) - tree.radii[leaves]
+    assert np.all(gaps.min(axis=1) <= 1e-12)
+
+    copy = SphereTreeNumpy.from_data(tree.data)
+    assert np.allclose(copy.centers, tree.centers)
+    assert copy.children.tolist() == tree.children.tolist()
+
+
+def test_distances_are_conservative(ur5, wall, configurations):
+    spheres = RobotSpheresNumpy(ur5, [wall], leaf_radius=LEAF_RADIUS)
+    checker = CollisionCheckerNumpy(ur5, [wall])
+    colliding = checker.in_collision(configurations)
+
+    may_collide = spheres.may_collide(configurations)
+    assert colliding.any()
+    assert np.all(may_collide[colliding])
+
+    distances = spheres.distances(configurations)
+    assert distances.shape == (len(configurations), spheres.pair_count)
+    assert np.all(distances.min(axis=1)[colliding] <= 0)
+    assert np.allclose(distances.min(axis=1), np.minimum(spheres.self_distances(configurations),
+                                                         spheres.scene_distances(configurations)))
+
+
+def test_scene_distance(ur5, wall):
+    spheres = RobotSpheresNumpy(ur5, [wall], leaf_radius=LEAF_RADIUS)
+    assert ('forearm_link', 'wall') in spheres.pair_names
+    assert ('base_link', 'shoulder_link') not in spheres.pair_names
+
+    # Turning the robot away from the wall
+    configurations = [[np.pi, 0, 0, 0, 0, 0], [0.] * 6]
+    assert spheres.scene_distances(configurations, max_distance=0.2).tolist()[0] == 0.2
+    assert spheres.scene_distances(configurations, max_distance=0.2)[1] < 0
+
+    # Links of the robot are closer than twice the leaf radius
+    assert spheres.may_collide(configurations).tolist() == [True, True]
+    assert spheres.self_distances(configurations, max_distance=0.2).max() < 2 * LEAF_RADIUS
+
+
+def test_attached_collision_mesh(ur5):
+    box = Box(Frame.worldXY(), 0.05, 0.05, 0.05)
+    mesh = Mesh.from_vertices_and_faces(box.vertices, box.faces)
+    acm = AttachedCollisionMesh(CollisionMesh(mesh, 'tool'), 'ee_link')
+    spheres = RobotSpheresNumpy(ur5, attached_collision_meshes=[acm], leaf_radius=LEAF_RADIUS)
+
+    assert 'tool' in spheres.body_names
+    assert ('tool', 'ee_link') not in spheres.pair_names
+    assert ('shoulder_link', 'tool') in spheres.pair_names
+
+
+def test_store_and_load(ur5, tmpdir, monkeypatch, configurations):
+    directory = str(tmpdir)
+    spheres = RobotSpheresNumpy(ur5, leaf_radius=LEAF_RADIUS, directory=directory)
+    assert os.path.isfile(os.path.join(directory, spheres_numpy.SPHERES_FILENAME))
+
+    def build(self, robot):
+        raise AssertionError('The stored hierarchies should be loaded')
+
+    monkeypatch.setattr(RobotSpheresNumpy, '_link_trees', build)
+    loaded = RobotSpheresNumpy(ur5, leaf_radius=LEAF_RADIUS, directory=directory)
+    assert np.allclose(loaded.distances(configurations[:20]), spheres.distances(configurations[:20]))
+
+    with pytest.raises(AssertionError):
+        RobotSpheresNumpy(ur5, leaf_radius=2 * LEAF_RADIUS, directory=directory)
+
+
+def test_stored_in_local_cache_directory(ur5, tmpdir, monkeypatch):
+    directory = str(tmpdir)
+    monkeypatch.setattr(ur5, 'local_cache_directory', directory)
+    RobotSpheresNumpy(ur5, leaf_radius=LEAF_RADIUS)
+    assert os.path.isfile(os.path.join(directory, spheres_numpy.SPHERES_FILENAME))
+
+
+def test_path_distances(ur5, wall):
+    spheres = RobotSpheresNumpy(ur5, [wall], leaf_radius=LEAF_RADIUS)
+    path = np.linspace([-1.2, -1.2, 1.2, 0, 0, 0], [0, -1.2, 1.2, 0, 0, 0], 9)
+    pairs = np.flatnonzero([name[1] == 'wall' for name in spheres.pair_names])
+
+    distances = spheres.path_distances(path, pairs, max_distance=0.5)
+    assert distances.shape == (9, len(pairs))
+    assert np.allclose(distances, spheres.path_distances(path, pairs, max_distance=0.5, warm_start=False), atol=LEAF_RADIUS)
+    assert np.allclose(distances, spheres.distances(path, max_distance=0.5)[:, pairs], atol=LEAF_RADIUS)
+
+
+def test_clearance_profile(ur5, wall):
+    spheres = RobotSpheresNumpy(ur5, [wall], leaf_radius=LEAF_RADIUS)
+    path = np.linspace([-1.2, -1.2, 1.2, 0, 0, 0], [0, -1.2, 1.2, 0, 0, 0], 9)
+    profile = spheres.clearance_profile(path, max_distance=0.5)
+
+    # The arm turns towards the wall, into collision
+    assert profile['points'][0] > 0.1 and profile['points'][-1] < 0
+    assert profile['minimum'] == min(profile['points'])
+    assert profile['closest'][-1][1] == 'wall'
+    assert 'base_link' in profile['links'] and len(profile['links']['forearm_link']) == 9
+    assert np.allclose(np.min(list(profile['links'].values()), axis=0), profile['points'])
+
+    profile = RobotSpheresNumpy(ur5, leaf_radius=LEAF_RADIUS).clearance_profile(path, max_distance=0.5)
+    assert profile['minimum'] == 0.5 and profile['closest'] == [None] * 9